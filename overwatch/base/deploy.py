@@ -1435,6 +1435,10 @@ class nginx(executable):
         basePath (str): Path to the ``nginx`` settings and configuration directory. Default: "/etc/nginx".
         configPath (str): Path to the main ``nginx`` configuration directory. Default: "${basePath}/conf.d".
         sitesPath (str): Path to the ``nginx`` sites directory. Default: "${basePath}/sites-enabled".
+        protectedFolder (str): Path to the protected (data) folder of the web app. If specified, ``nginx`` serves
+            the protected files after the web app authorizes the request via ``X-Accel-Redirect``. Default: ``None``.
+        protectedLocation (str): Internal location under which the protected folder is served.
+            Default: "/protectedInternal".
     """
     def __init__(self, config):
         name = "nginx"
@@ -1451,7 +1455,8 @@ class nginx(executable):
         """ Setup required for the ``nginx`` executable.
 
         In particular, we need to write out the main configuration (which directs to the socket to which traffic
-        should be passed), as well as the ``gzip`` configuration.
+        should be passed), as well as the ``gzip`` configuration. If a protected folder is specified, an internal
+        location which serves the protected files is also added.
         """
         mainNginxConfig = """
         server {
@@ -1461,10 +1466,22 @@ class nginx(executable):
             location / {
                 include uwsgi_params;
                 uwsgi_pass unix:///tmp/sockets/%(name)s.sock;
-            }
+            }%(protectedLocation)s
         }"""
+        protectedLocation = ""
+        if self.config.get("protectedFolder"):
+            # Only accessible via ``X-Accel-Redirect`` from the web app, which handles the authentication.
+            protectedLocation = """
+            location %(location)s/ {
+                internal;
+                alias %(path)s/;
+            }"""
+            protectedLocation = protectedLocation % {
+                "location": self.config.get("protectedLocation", "/protectedInternal").rstrip("/"),
+                "path": os.path.abspath(self.config["protectedFolder"]),
+            }
         # Use "%" formatting because the `nginx` config uses curly brackets.
-        mainNginxConfig = mainNginxConfig % {"name": self.config["webAppName"]}
+        mainNginxConfig = mainNginxConfig % {"name": self.config["webAppName"], "protectedLocation": protectedLocation}
         mainNginxConfig = inspect.cleandoc(mainNginxConfig)
 
         # Determine the path to the main config file.
@@ -1548,6 +1565,11 @@ class overwatchFlaskExecutable(overwatchExecutable):
             if self.config["nginx"].get("enabled", False) is True:
                 self.nginx = nginx(self.config["nginx"])
                 self.nginx.run()
+                # If nginx serves the protected files, the web app only needs to authorize the requests.
+                if self.config["nginx"].get("protectedFolder"):
+                    additionalOptions = self.config.setdefault("additionalOptions", {})
+                    additionalOptions["protectedFilesOffloadHeader"] = "X-Accel-Redirect"
+                    additionalOptions["protectedFilesInternalLocation"] = self.config["nginx"].get("protectedLocation", "/protectedInternal")
 
         # Create an underlying uwsgi app to handle the setup and execution.
         self = uwsgi.createObject(self)
@@ -115,6 +115,10 @@ def createFileDictionary(currentDir, runDir, subsystem):
 
     # Add uncombined .root files to mergeDict, then sort by timestamp
     for name in os.listdir(os.path.join(currentDir, runDir, subsystem)):
+        # Files of compacted runs are only stored as deltas, but they still correspond to the original files.
+        # See ``overwatch.processing.compactFiles``.
+        if name.endswith(".delta.npz"):
+            name = name.replace(".delta.npz", ".root")
         # Need to avoid temporary files, so avoid those which starts with ".".
         if ".root" in name and "combined" not in name and "timeSlice" not in name and not name.startswith("."):
             filename = os.path.join(filenamePrefix, name)
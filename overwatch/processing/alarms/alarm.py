@@ -5,6 +5,7 @@
 """
 import numpy as np
 from overwatch.processing.alarms.collectors import alarmCollector
+from overwatch.processing.alarms.rolling import rollingWindow
 
 try:
     from typing import *  # noqa
@@ -12,6 +13,7 @@ except ImportError:
     # Imports in this block below here are used solely for typing information
     from ..trending.objects.object import TrendingObject  # noqa
     from overwatch.processing.alarms.aggregatingAlarm import AggregatingAlarm  # noqa
+    from overwatch.processing.alarms.rolling import RollingWindow  # noqa
 
 
 class Alarm(object):
@@ -25,8 +27,28 @@ class Alarm(object):
         self.receivers.append(receiver)
 
     def processCheck(self, trend=None):  # type: (Optional[TrendingObject]) -> None
-        args = (self.prepareTrendValues(trend),) if trend else ()
-        result = self.checkAlarm(*args)
+        """ Check the alarm for the most recent value of the trend.
+
+        Alarms which support rolling windows (see ``createWindow()``) are evaluated incrementally via
+        ``checkWindow()``. Otherwise, the alarm is evaluated with all trended values via ``checkAlarm()``.
+        """
+        window = rollingWindow(trend, self) if trend else None
+        if window is not None:
+            result = self.checkWindow(window)
+        else:
+            args = (self.prepareTrendValues(trend),) if trend else ()
+            result = self.checkAlarm(*args)
+        self.processResult(result, trend)
+
+    def processResult(self, result, trend=None):  # type: (Tuple[bool, str], Optional[TrendingObject]) -> None
+        """ Announce the result of a check and notify the aggregating alarm (if any).
+
+        Args:
+            result (tuple): (isAlarm, msg), as returned by ``checkAlarm()``.
+            trend (TrendingObject): Trending object which was checked. Default: None (for aggregating alarms).
+        Returns:
+            None.
+        """
         isAlarm, msg = result
 
         if isAlarm:
@@ -57,6 +79,48 @@ class Alarm(object):
         """abstract method"""
         raise NotImplementedError
 
+    def createWindow(self, maxCount=None):  # type: (Optional[int]) -> Optional[RollingWindow]
+        """ Create the rolling window needed to evaluate the alarm incrementally.
+
+        Args:
+            maxCount (int): Maximum number of values stored in the trend. Default: None.
+        Returns:
+            RollingWindow: Rolling window, or None if the alarm must be evaluated with all trended values.
+        """
+        return None
+
+    def checkWindow(self, window):  # type: (RollingWindow) -> (bool, str)
+        """ Equivalent of ``checkAlarm()`` for the rolling window created by ``createWindow()``. """
+        raise NotImplementedError
+
+    def batchKey(self):  # type: () -> Optional[tuple]
+        """ Key which identifies alarms that can be evaluated together via ``checkBatch()``.
+
+        Alarms of the same type with the same parameters must have the same key.
+
+        Returns:
+            tuple: Key, or None if the alarm can't be evaluated in a batch.
+        """
+        return None
+
+    @property
+    def batchWindow(self):  # type: () -> int
+        """ Number of recent values needed by ``checkBatch()``. """
+        return 1
+
+    def checkBatch(self, values, counts):  # type: (np.ndarray, np.ndarray) -> Tuple[np.ndarray, List[str]]
+        """ Equivalent of ``checkAlarm()`` for many trends at once.
+
+        Args:
+            values (np.ndarray): Most recent ``batchWindow`` values of each trend, with one row per trend. Rows of
+                trends which have fewer values are padded at the start with ``NaN``.
+            counts (np.ndarray): Number of values of each trend.
+        Returns:
+            tuple: (isAlarm, messages), where isAlarm is a boolean array with one entry per trend, and messages
+                contains the message of each trend (empty if there is no alarm).
+        """
+        raise NotImplementedError
+
     def _announceAlarm(self, msg):  # type: (str) -> None
         for receiver in self.receivers:
             receiver(msg)
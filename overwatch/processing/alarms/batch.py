@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+""" Evaluation of the alarms of many trending objects at once.
+
+Rather than checking each alarm of each trending object separately when a new value is trended, the alarms can be
+evaluated once per processing cycle. Alarms of the same type with the same parameters (the same ``batchKey()``) are
+grouped together, the recent values of all of their trending objects are stacked into one matrix, and each group is
+evaluated with a single vectorized ``checkBatch()`` call. Alarms which don't support batch evaluation fall back to
+``checkAlarm()``.
+
+Since a trending object may receive several values in a cycle (one per received file), each value which was received
+since the last cycle is evaluated, with one row per value containing the values up to and including it. Thus, values
+which only briefly cross a threshold raise an alarm, as they do when the alarms are evaluated for each value.
+
+Once all alarms are evaluated, the results are announced via ``Alarm.processResult()`` in the order in which the values
+were received, so the aggregating alarms (``AndAlarm``, ``OrAlarm``) are resolved from the results of their children.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from overwatch.processing.alarms.rolling import recentTrendValues
+
+try:
+    from typing import *  # noqa
+except ImportError:
+    # Imports in this block below here are used solely for typing information
+    from ..trending.objects.object import TrendingObject  # noqa
+    from overwatch.processing.alarms.alarm import Alarm  # noqa
+
+
+def stackTrendValues(trends, n, nNewValues=None):
+    # type: (List[TrendingObject], int, Optional[List[int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+    """ Stack the recent values of a set of trending objects into a matrix.
+
+    Each trending object contributes one row per new value, which contains the ``n`` values up to and including
+    that value. The rows of each trending object are ordered from the oldest to the most recent new value.
+
+    Args:
+        trends (list): Trending objects.
+        n (int): Number of values in each row.
+        nNewValues (list): Number of new values of each trending object. It is limited to the number of values
+            which are still stored. Default: None, which corresponds to only the most recent value.
+    Returns:
+        tuple: (values, counts, indices, offsets), where values has one row of ``n`` values per new value (padded at
+            the start with ``NaN`` if the trending object had fewer values), counts is the number of values of the
+            trending object up to and including the new value, indices is the index of the trending object of each
+            row, and offsets is the position of the new value relative to the most recent value (0 for the most
+            recent value).
+    """
+    if nNewValues is None:
+        nNewValues = [1] * len(trends)
+    rows = []  # type: List[np.ndarray]
+    counts = []  # type: List[int]
+    indices = []  # type: List[int]
+    offsets = []  # type: List[int]
+    for i, (trend, nNew) in enumerate(zip(trends, nNewValues)):
+        recentValues, count = recentTrendValues(trend, n + nNew - 1)
+        nNew = min(nNew, len(recentValues))
+        padded = np.concatenate([np.full(n + nNew - 1 - len(recentValues), np.nan), recentValues])
+        for offset in range(nNew - 1, -1, -1):
+            end = len(padded) - offset
+            rows.append(padded[end - n:end])
+            counts.append(count - offset)
+            indices.append(i)
+            offsets.append(offset)
+    return (np.array(rows, dtype=float).reshape(len(rows), n), np.array(counts, dtype=int),
+            np.array(indices, dtype=int), np.array(offsets, dtype=int))
+
+
+def evaluateAlarms(trends, nNewValues=None):  # type: (List[TrendingObject], Optional[List[int]]) -> None
+    """ Evaluate the alarms of a set of trending objects for the values which they received since the last evaluation.
+
+    Args:
+        trends (list): Trending objects whose alarms should be evaluated.
+        nNewValues (list): Number of new values of each trending object. Default: None, which corresponds to only
+            the most recent value.
+    Returns:
+        None.
+    """
+    if nNewValues is None:
+        nNewValues = [1] * len(trends)
+    groups = OrderedDict()  # type: Dict[Any, List[Tuple[Alarm, TrendingObject, int]]]
+    results = []  # type: List[Tuple[int, Alarm, Tuple[bool, str], TrendingObject]]
+    for trend, nNew in zip(trends, nNewValues):
+        if not len(trend.trendedValues):
+            continue
+        for alarm in trend.alarms:
+            key = alarm.batchKey()
+            if key is None:
+                values = alarm.prepareTrendValues(trend)
+                for offset in range(min(nNew, len(values)) - 1, -1, -1):
+                    results.append((offset, alarm, alarm.checkAlarm(values[:len(values) - offset]), trend))
+            else:
+                groups.setdefault(key, []).append((alarm, trend, nNew))
+
+    for entries in groups.values():
+        alarm = entries[0][0]
+        values, counts, indices, offsets = stackTrendValues([trend for _, trend, _ in entries], alarm.batchWindow,
+                                                            [nNew for _, _, nNew in entries])
+        isAlarm, messages = alarm.checkBatch(values, counts)
+        for i, offset, result, msg in zip(indices, offsets, isAlarm, messages):
+            entryAlarm, trend, _ = entries[i]
+            results.append((offset, entryAlarm, (bool(result), msg), trend))
+
+    # Announce the results in the order in which the values were received. The sort is stable, so the results
+    # of the same value remain in the order of the trending objects.
+    results.sort(key=lambda result: -result[0])
+    for _, alarm, result, trend in results:
+        alarm.processResult(result, trend)
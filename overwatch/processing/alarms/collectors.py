@@ -4,12 +4,17 @@
 """
 
 from slackclient import SlackClient
+import os
 import smtplib
+import socket
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import logging
 from collections import defaultdict
 
+from overwatch.processing.alarms.dispatcher import notificationDispatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,24 +35,89 @@ class Singleton(_Singleton('SingletonMeta', (object,), {})):
 
 
 class Mail(Singleton):
+    """ Manages the connection to the SMTP server.
+
+    The connection is only opened when the first email is sent, and is then kept open between emails. It's shared
+    by all senders in a process (a forked process opens its own connection). If it is closed (for example, by the
+    server), it's opened again when the next email is sent.
+
+    Args:
+        alarmsParameters (dict): Parameters read from configuration files
+    Attributes:
+        smtp (smtplib.SMTP): Connection to the SMTP server. None if not connected.
+    """
     def __init__(self, alarmsParameters=None):
+        self.parameters = {}
+        self.smtp = None
+        self._pid = None
+        self._lock = threading.Lock()
         if alarmsParameters is not None:
-            self.parameters = alarmsParameters
-            try:
-                smtpSettings = alarmsParameters["emailDelivery"]["smtpSettings"]
-                host = smtpSettings["address"]
-                port = smtpSettings["port"]
-                password = smtpSettings["password"]
-                self.user_name = smtpSettings["userName"]
-            except KeyError:
-                logger.debug("EmailDelivery not configured")
-            else:
-                self.smtp = smtplib.SMTP(host=host, port=port)
-                self._login(password)
+            self.configure(alarmsParameters)
+
+    def configure(self, alarmsParameters):
+        """ Set the SMTP settings. This doesn't connect to the server.
+
+        Args:
+            alarmsParameters (dict): Parameters read from configuration files
+        Return:
+            None.
+        """
+        self.parameters = alarmsParameters
+        try:
+            smtpSettings = alarmsParameters["emailDelivery"]["smtpSettings"]
+            self.host = smtpSettings["address"]
+            self.port = smtpSettings["port"]
+            self.password = smtpSettings["password"]
+            self.user_name = smtpSettings["userName"]
+        except KeyError:
+            logger.debug("EmailDelivery not configured")
+        else:
+            self.useTLS = smtpSettings.get("useTLS", True)
+        with self._lock:
+            if self.smtp is not None:
+                self._disconnect()
+
+    def _connect(self):
+        self.smtp = smtplib.SMTP(host=self.host, port=self.port)
+        self._pid = os.getpid()
+        self._login(self.password)
 
     def _login(self, password):
-        self.smtp.starttls()
-        self.smtp.login(user=self.user_name, password=password)
+        if self.useTLS:
+            self.smtp.starttls()
+        if password:
+            self.smtp.login(user=self.user_name, password=password)
+
+    def _disconnect(self):
+        try:
+            self.smtp.close()
+        except (smtplib.SMTPException, socket.error):
+            pass
+        self.smtp = None
+
+    def sendmail(self, recipients, msg):
+        """ Send an email, connecting to the SMTP server if necessary.
+
+        Args:
+            recipients (list): Email addresses of the recipients.
+            msg (str): Full email message.
+        Return:
+            None.
+        Raises:
+            smtplib.SMTPException, socket.error: If the email couldn't be sent. The connection is closed, such that
+                it's opened again for the next email.
+        """
+        with self._lock:
+            if self.smtp is not None and self._pid != os.getpid():
+                # The connection belongs to the parent process, so it must not be used (or closed) here.
+                self.smtp = None
+            if self.smtp is None:
+                self._connect()
+            try:
+                self.smtp.sendmail(self.user_name, recipients, msg)
+            except (smtplib.SMTPException, socket.error):
+                self._disconnect()
+                raise
 
 
 def printCollector(alarm):
@@ -57,6 +127,8 @@ def printCollector(alarm):
 class MailSender:
     """Manages sending emails.
 
+    Emails are sent asynchronously by the notification dispatcher (see ``dispatcher.py``).
+
     Args:
         addresses (list): List of email addresses
     Attributes:
@@ -67,7 +139,15 @@ class MailSender:
         self.recipients = addresses
 
     def __call__(self, alarm):
-        self.sendMail(alarm)
+        notificationDispatcher.submit(self, alarm)
+
+    @property
+    def dispatchKey(self):
+        """ Messages for the same recipients are sent together by the notification dispatcher. """
+        return ("email", tuple(self.recipients or ()))
+
+    def deliver(self, payload):
+        self.sendMail(payload)
 
     def sendMail(self, payload):
         """ Sends message to specified earlier recipients.
@@ -88,7 +168,7 @@ class MailSender:
                 msg['To'] = ", ".join(self.recipients)
                 msg['Subject'] = 'Overwatch Alarm'
                 msg.attach(MIMEText(payload, 'plain'))
-                mail.smtp.sendmail(mail.user_name, self.recipients, msg.as_string())
+                mail.sendmail(self.recipients, msg.as_string())
 
                 logger.debug(success.format(recipients=", ".join(self.recipients)))
             else:
@@ -98,24 +178,56 @@ class MailSender:
 class SlackNotification(Singleton):
     """Manages sending notifications on Slack.
 
+    Messages are sent asynchronously by the notification dispatcher (see ``dispatcher.py``).
+
     Args:
         alarmsParameters (dict): Parameters read from configuration files
     Attributes:
-        slackClient (SlackClient):
+        slackClient (SlackClient): Client, which is created when the first message is sent (once per process).
         channel (str): Channel name
     """
 
     def __init__(self, alarmsParameters=None):
+        self.parameters = {}
+        self._apiToken = None
+        self._slackClient = None
+        self._pid = None
         if alarmsParameters is not None:
-            self.parameters = alarmsParameters
-            try:
-                self.slackClient = SlackClient(alarmsParameters["slack"]["apiToken"])
-                self.channel = alarmsParameters["slack"]["slackChannel"]
-            except KeyError:
-                logger.debug("Slack not configured")
+            self.configure(alarmsParameters)
+
+    def configure(self, alarmsParameters):
+        """ Set the Slack settings. This doesn't connect to Slack.
+
+        Args:
+            alarmsParameters (dict): Parameters read from configuration files
+        Return:
+            None.
+        """
+        self.parameters = alarmsParameters
+        self._slackClient = None
+        try:
+            self._apiToken = alarmsParameters["slack"]["apiToken"]
+            self.channel = alarmsParameters["slack"]["slackChannel"]
+        except KeyError:
+            logger.debug("Slack not configured")
+
+    @property
+    def slackClient(self):
+        if self._slackClient is None or self._pid != os.getpid():
+            self._slackClient = SlackClient(self._apiToken)
+            self._pid = os.getpid()
+        return self._slackClient
 
     def __call__(self, alarm):
-        self.sendMessage(alarm)
+        notificationDispatcher.submit(self, alarm)
+
+    @property
+    def dispatchKey(self):
+        """ Messages for the same channel are sent together by the notification dispatcher. """
+        return ("slack", getattr(self, "channel", None))
+
+    def deliver(self, payload):
+        self.sendMessage(payload)
 
     def sendMessage(self, payload):
         """ Sends message to specified earlier channel.
@@ -129,9 +241,11 @@ class SlackNotification(Singleton):
         fail = "Slack not configured, couldn't send messages"
 
         if 'slack' in self.parameters:
-            self.slackClient.api_call(
+            response = self.slackClient.api_call(
                 'chat.postMessage', channel=self.channel, text=payload,
                 username='Alarms OVERWATCH', icon_emoji=':robot_face:')
+            if not response.get('ok', False):
+                raise RuntimeError("Slack message failed: {error}".format(error=response.get('error')))
             logger.debug(success.format(channel=self.channel))
         else:
             logger.debug(fail)
@@ -172,7 +286,7 @@ class AlarmCollector(object):
         Return:
             None.
         """
-        for receiver in self.receivers.keys():
+        for receiver in list(self.receivers.keys()):
             if receiver != printCollector and receiver != SlackNotification():
                 msg = '\n'.join(self.receivers[receiver])
                 receiver(msg)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+""" Asynchronous dispatch of alarm notifications.
+
+Sending an email or a Slack message can take a long time (or fail entirely) if the remote service is slow, so
+notifications are not sent from the processing loop. Instead, receivers which support dispatching (``MailSender``
+and ``SlackNotification``) submit their messages to a bounded queue, and a background thread delivers them.
+
+The background thread collects the messages for each destination (for example, one set of email recipients) over
+a time window, removes repeated messages, and then delivers them as one notification. Failed deliveries are retried
+with an exponential backoff, and the receivers reconnect as needed. If the queue is full (for example, because the
+remote service is unavailable for a long time), new messages are dropped rather than blocking the processing. The
+number of queued, delivered, failed and dropped messages is available via ``NotificationDispatcher.stats()`` and is
+logged after each delivery.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import queue
+except ImportError:
+    # Python 2
+    import Queue as queue  # noqa
+
+try:
+    from typing import *  # noqa
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+
+class _Flush(object):
+    """ Request for the background thread to deliver all pending messages immediately. """
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _Batch(object):
+    """ Messages which were collected for one destination.
+
+    Attributes:
+        receiver (callable): Receiver which delivers the messages.
+        created (float): Time when the first message was received.
+        messages (OrderedDict): Number of times that each message was received, keyed by message.
+    """
+    def __init__(self, receiver, created):  # type: (Any, float) -> None
+        self.receiver = receiver
+        self.created = created
+        self.messages = OrderedDict()  # type: Dict[str, int]
+
+    def payload(self):  # type: () -> str
+        """ Combine the messages into one notification. Repeated messages are only included once. """
+        return "\n".join(msg if count == 1 else "{msg} (repeated {count} times)".format(msg=msg, count=count)
+                         for msg, count in self.messages.items())
+
+
+class NotificationDispatcher(object):
+    """ Delivers notifications in a background thread.
+
+    Receivers must provide ``dispatchKey`` (messages with the same key are delivered together) and
+    ``deliver(payload)``, which sends the notification and raises an exception if it fails.
+
+    Args:
+        coalesceTime (float): Time (in seconds) over which messages for the same destination are collected before
+            they are delivered. Default: 60.
+        maxQueueSize (int): Maximum number of messages waiting to be collected. Default: 1000.
+        maxRetries (int): Number of times that a failed delivery is retried. Default: 5.
+        backoff (float): Time (in seconds) to wait before the first retry. It doubles for each further retry.
+            Default: 1.
+        maxBackoff (float): Maximum time (in seconds) to wait between retries. Default: 60.
+
+    Attributes:
+        delivered (int): Number of delivered notifications.
+        failed (int): Number of notifications which couldn't be delivered, even after retrying.
+        dropped (int): Number of messages which were dropped because the queue was full.
+        deduplicated (int): Number of repeated messages which were combined with an earlier message.
+    """
+    def __init__(self, coalesceTime=60., maxQueueSize=1000, maxRetries=5, backoff=1., maxBackoff=60.):
+        # type: (float, int, int, float, float) -> None
+        self.coalesceTime = coalesceTime
+        self.maxRetries = maxRetries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self._queue = queue.Queue(maxsize=maxQueueSize)  # type: queue.Queue
+        self._thread = None  # type: Optional[threading.Thread]
+        self._lock = threading.Lock()
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.deduplicated = 0
+
+    def configure(self, parameters):  # type: (dict) -> None
+        """ Configure the dispatcher from the Overwatch configuration.
+
+        Args:
+            parameters (dict): Parameters read from configuration files. The ``notificationCoalesceTime`` and
+                ``notificationQueueSize`` values are used if available.
+        Returns:
+            None.
+        """
+        self.coalesceTime = parameters.get("notificationCoalesceTime", self.coalesceTime)
+        with self._queue.mutex:
+            self._queue.maxsize = parameters.get("notificationQueueSize", self._queue.maxsize)
+
+    def submit(self, receiver, msg):  # type: (Any, str) -> bool
+        """ Queue a message for delivery by a receiver.
+
+        This never blocks. If the queue is full, the message is dropped.
+
+        Args:
+            receiver (callable): Receiver which should deliver the message.
+            msg (str): Message.
+        Returns:
+            bool: True if the message was queued.
+        """
+        self._start()
+        try:
+            self._queue.put_nowait((receiver, msg, time.time()))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Notification queue is full. Dropped message for {key} ({dropped} dropped so far)".format(
+                key=receiver.dispatchKey, dropped=self.dropped))
+            return False
+        return True
+
+    def flush(self, timeout=None):  # type: (Optional[float]) -> bool
+        """ Deliver all queued messages immediately, without waiting for the end of their time window.
+
+        Args:
+            timeout (float): Maximum time (in seconds) to wait for the delivery. Default: None, which waits until
+                the messages are delivered.
+        Returns:
+            bool: True if all messages were delivered (or failed) within the timeout.
+        """
+        if self._thread is None:
+            return True
+        request = _Flush()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def stats(self):  # type: () -> Dict[str, int]
+        """ Counters describing the state of the dispatcher. """
+        return {
+            "queueDepth": self._queue.qsize(),
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "deduplicated": self.deduplicated,
+        }
+
+    def _start(self):  # type: () -> None
+        """ Start the background thread if it's not running. """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="NotificationDispatcher")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):  # type: () -> None
+        """ Collect the queued messages and deliver them at the end of their time window. """
+        batches = OrderedDict()  # type: Dict[Any, _Batch]
+        while True:
+            timeout = None
+            if batches:
+                firstCreated = min(batch.created for batch in batches.values())
+                timeout = max(firstCreated + self.coalesceTime - time.time(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, _Flush):
+                self._deliverBatches(batches, force=True)
+                item.done.set()
+                continue
+            if item is not None:
+                receiver, msg, received = item
+                batch = batches.get(receiver.dispatchKey)
+                if batch is None:
+                    batch = batches[receiver.dispatchKey] = _Batch(receiver, received)
+                if msg in batch.messages:
+                    self.deduplicated += 1
+                batch.messages[msg] = batch.messages.get(msg, 0) + 1
+            self._deliverBatches(batches)
+
+    def _deliverBatches(self, batches, force=False):  # type: (Dict[Any, _Batch], bool) -> None
+        """ Deliver the batches whose time window has passed (or all of them, if forced). """
+        now = time.time()
+        for key in list(batches):
+            batch = batches[key]
+            if force or now >= batch.created + self.coalesceTime:
+                del batches[key]
+                self._deliver(batch)
+
+    def _deliver(self, batch):  # type: (_Batch) -> None
+        """ Deliver a batch, retrying with an exponential backoff if it fails. """
+        payload = batch.payload()
+        for attempt in range(self.maxRetries + 1):
+            try:
+                batch.receiver.deliver(payload)
+            except Exception as e:
+                if attempt == self.maxRetries:
+                    self.failed += 1
+                    logger.error("Failed to deliver notification to {key}: {e}".format(key=batch.receiver.dispatchKey, e=e))
+                    break
+                wait = min(self.backoff * 2 ** attempt, self.maxBackoff)
+                logger.warning("Delivering notification to {key} failed ({e}). Retrying in {wait} s".format(
+                    key=batch.receiver.dispatchKey, e=e, wait=wait))
+                time.sleep(wait)
+            else:
+                self.delivered += 1
+                break
+        logger.info("Notification dispatcher: {stats}".format(stats=self.stats()))
+
+
+notificationDispatcher = NotificationDispatcher()
+
+
+@atexit.register
+def _flushAtExit():  # type: () -> None
+    """ Try to deliver the remaining notifications when the process exits. """
+    notificationDispatcher.flush(timeout=10)
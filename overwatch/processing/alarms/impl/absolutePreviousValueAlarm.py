@@ -4,6 +4,7 @@
 .. codeauthor:: Jacek Nabywaniec <>, AGH University of Science and Technology
 """
 from overwatch.processing.alarms.alarm import Alarm
+from overwatch.processing.alarms.rolling import RollingWindow
 
 
 class AbsolutePreviousValueAlarm(Alarm):
@@ -24,3 +25,9 @@ class AbsolutePreviousValueAlarm(Alarm):
         msg = "(AbsolutePreviousValueAlarm): curValue: {curValue}, prevValue: {prevValue}, change more than: {maxDelta}".format(
             curValue=curValue, prevValue=prevValue, maxDelta=self.maxDelta)
         return True, msg
+
+    def createWindow(self, maxCount=None):
+        return RollingWindow(2, maxCount=maxCount)
+
+    def checkWindow(self, window):
+        return self.checkAlarm([window.last(2), window.last()][2 - min(window.count, 2):])
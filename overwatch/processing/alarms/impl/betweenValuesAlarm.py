@@ -4,6 +4,7 @@
 .. codeauthor:: Pawel Ostrowski <ostr000@interia.pl>, AGH University of Science and Technology
 """
 from overwatch.processing.alarms.alarm import Alarm
+from overwatch.processing.alarms.rolling import RollingWindow
 
 
 class BetweenValuesAlarm(Alarm):
@@ -19,3 +20,18 @@ class BetweenValuesAlarm(Alarm):
 
         msg = "(BetweenValuesAlarm): value {} not in [{}, {}]".format(testedValue, self.minVal, self.maxVal)
         return True, msg
+
+    def createWindow(self, maxCount=None):
+        return RollingWindow(1, maxCount=maxCount)
+
+    def checkWindow(self, window):
+        return self.checkAlarm([window.last()])
+
+    def batchKey(self):
+        return (type(self), self.minVal, self.maxVal)
+
+    def checkBatch(self, values, counts):
+        testedValues = values[:, -1]
+        isAlarm = (counts > 0) & ~((self.minVal <= testedValues) & (testedValues <= self.maxVal))
+        messages = [self.checkAlarm([value])[1] if alarm else '' for value, alarm in zip(testedValues, isAlarm)]
+        return isAlarm, messages
@@ -4,6 +4,8 @@
 .. codeauthor:: Jacek Nabywaniec <>, AGH University of Science and Technology
 """
 from overwatch.processing.alarms.alarm import Alarm
+from overwatch.processing.alarms.rolling import RollingWindow
+import numpy as np
 
 
 class CheckLastNAlarm(Alarm):
@@ -26,3 +28,29 @@ class CheckLastNAlarm(Alarm):
         msg = "(CheckLastNAlarm): less than {} % values of last {} trending values not in [{}, {}]".format(
             self.ratio * 100, self.N, self.minVal, self.maxVal)
         return True, msg
+
+    def createWindow(self, maxCount=None):
+        return RollingWindow(self.N, predicate=lambda value: self.maxVal > value > self.minVal, maxCount=maxCount)
+
+    def checkWindow(self, window):
+        if window.count < self.N or window.nMatching >= self.ratio * self.N:
+            return False, ''
+
+        msg = "(CheckLastNAlarm): less than {} % values of last {} trending values not in [{}, {}]".format(
+            self.ratio * 100, self.N, self.minVal, self.maxVal)
+        return True, msg
+
+    def batchKey(self):
+        return (type(self), self.minVal, self.maxVal, self.ratio, self.N)
+
+    @property
+    def batchWindow(self):
+        return self.N
+
+    def checkBatch(self, values, counts):
+        with np.errstate(invalid='ignore'):
+            nInBorder = np.sum((self.maxVal > values) & (values > self.minVal), axis=1)
+        isAlarm = (counts >= self.N) & (nInBorder < self.ratio * self.N)
+        message = "(CheckLastNAlarm): less than {} % values of last {} trending values not in [{}, {}]".format(
+            self.ratio * 100, self.N, self.minVal, self.maxVal)
+        return isAlarm, [message if alarm else '' for alarm in isAlarm]
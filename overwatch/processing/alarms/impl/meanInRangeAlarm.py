@@ -4,6 +4,7 @@
 .. codeauthor:: Jacek Nabywaniec <>, AGH University of Science and Technology
 """
 from overwatch.processing.alarms.alarm import Alarm
+from overwatch.processing.alarms.rolling import RollingWindow
 import numpy as np
 
 
@@ -26,3 +27,29 @@ class MeanInRangeAlarm(Alarm):
         msg = "(MeanInRangeAlarm): mean of last {n} values not in [{min}, {max}]".format(
             n=self.N, min=self.minVal, max=self.maxVal)
         return True, msg
+
+    def createWindow(self, maxCount=None):
+        return RollingWindow(self.N, maxCount=maxCount)
+
+    def checkWindow(self, window):
+        if window.count < self.N or self.minVal < window.mean < self.maxVal:
+            return False, ''
+
+        msg = "(MeanInRangeAlarm): mean of last {n} values not in [{min}, {max}]".format(
+            n=self.N, min=self.minVal, max=self.maxVal)
+        return True, msg
+
+    def batchKey(self):
+        return (type(self), self.minVal, self.maxVal, self.N)
+
+    @property
+    def batchWindow(self):
+        return self.N
+
+    def checkBatch(self, values, counts):
+        means = np.mean(values, axis=1)
+        with np.errstate(invalid='ignore'):
+            isAlarm = (counts >= self.N) & ~((self.minVal < means) & (means < self.maxVal))
+        message = "(MeanInRangeAlarm): mean of last {n} values not in [{min}, {max}]".format(
+            n=self.N, min=self.minVal, max=self.maxVal)
+        return isAlarm, [message if alarm else '' for alarm in isAlarm]
@@ -4,6 +4,7 @@
 .. codeauthor:: Jacek Nabywaniec <>, AGH University of Science and Technology
 """
 from overwatch.processing.alarms.alarm import Alarm
+from overwatch.processing.alarms.rolling import RollingWindow
 
 
 class RelativePreviousValueAlarm(Alarm):
@@ -26,3 +27,9 @@ class RelativePreviousValueAlarm(Alarm):
         msg = "(RelativePreviousValueAlarm): curValue: {curValue}, prevValue: {prevValue}, change more than: {ratio}".format(
             curValue=curValue, prevValue=prevValue, ratio=self.ratio)
         return True, msg
+
+    def createWindow(self, maxCount=None):
+        return RollingWindow(2, maxCount=maxCount)
+
+    def checkWindow(self, window):
+        return self.checkAlarm([window.last(2), window.last()][2 - min(window.count, 2):])
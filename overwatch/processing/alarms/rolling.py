@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+""" Rolling window state for incremental alarm evaluation.
+
+Rather than copying the entire trend for every alarm on every new value, alarms which only depend on the most
+recent values keep a ``RollingWindow`` per (trending object, alarm). The window stores the last ``size`` values,
+their running sum, and the number of values which satisfy an optional predicate, each of which is updated in
+constant time when a new value is added.
+
+The windows are stored in a volatile attribute of the trending object (``_v_alarmWindows``), so they aren't
+written to the database. If they're lost (for example, because the trending object was loaded again from the
+database), they're recreated from the most recent values of the trend.
+"""
+import numpy as np
+
+try:
+    from typing import *  # noqa
+except ImportError:
+    pass
+
+
+class RollingWindow(object):
+    """ The most recent values of a trend.
+
+    Args:
+        size (int): Number of values to keep.
+        predicate (callable): Function which determines whether a value should be counted in ``nMatching``.
+            Default: None.
+        maxCount (int): Maximum number of values which can be stored in the trend, such that ``count`` matches the
+            length of the trend. Default: None, which corresponds to no limit.
+
+    Attributes:
+        size (int): Number of values to keep.
+        count (int): Number of values in the trend (not only in the window).
+        total (float): Sum of the values in the window.
+        nMatching (int): Number of values in the window which satisfy the predicate.
+    """
+    def __init__(self, size, predicate=None, maxCount=None):  # type: (int, Optional[Callable[[float], bool]], Optional[int]) -> None
+        self.size = size
+        self.predicate = predicate
+        self.maxCount = maxCount
+        self._values = np.zeros(size)
+        self._matching = np.zeros(size, dtype=bool)
+        self._head = 0
+        self._n = 0
+        self.count = 0
+        self.total = 0.
+        self.nMatching = 0
+
+    def append(self, value):  # type: (float) -> None
+        """ Add a new value, replacing the oldest value if the window is full. """
+        if self._n == self.size:
+            self.total -= self._values[self._head]
+            self.nMatching -= self._matching[self._head]
+        else:
+            self._n += 1
+        matching = bool(self.predicate(value)) if self.predicate else False
+        self._values[self._head] = value
+        self._matching[self._head] = matching
+        self.total += value
+        self.nMatching += matching
+        self._head = (self._head + 1) % self.size
+        self.count += 1
+        if self.maxCount is not None:
+            self.count = min(self.count, self.maxCount)
+        if self._head == 0:
+            # Recalculate the sum once per pass through the window to avoid accumulating rounding errors.
+            self.total = float(np.sum(self._values))
+
+    def extend(self, values, count=None):  # type: (Iterable[float], Optional[int]) -> None
+        """ Add a set of values.
+
+        Args:
+            values (iterable): Values to add, in chronological order.
+            count (int): Number of values in the trend after adding the values. Default: None, which only counts
+                the added values.
+        Returns:
+            None.
+        """
+        for value in values:
+            self.append(value)
+        if count is not None:
+            self.count = count
+
+    def last(self, n=1):  # type: (int) -> float
+        """ Retrieve the n-th most recent value (``last(1)`` is the most recent value). """
+        return self._values[(self._head - n) % self.size]
+
+    def __len__(self):  # type: () -> int
+        return self._n
+
+    @property
+    def mean(self):  # type: () -> float
+        return self.total / len(self) if len(self) else 0.
+
+
+def latestTrendValue(trend):  # type: (Any) -> float
+    """ Retrieve the most recent value of a trend (only the first component for values with multiple components). """
+    latestValue = trend.latestValue() if hasattr(trend, "latestValue") else None
+    value = latestValue[1] if latestValue is not None else trend.trendedValues[-1]
+    return np.ravel(value)[0]
+
+
+def recentTrendValues(trend, n):  # type: (Any, int) -> Tuple[np.ndarray, int]
+    """ Retrieve the most recent values of a trend (only the first component for values with multiple components).
+
+    Args:
+        trend (TrendingObject): Trending object.
+        n (int): Number of values to retrieve.
+    Returns:
+        tuple: (values, total number of values in the trend)
+    """
+    if hasattr(trend, "chronologicalView"):
+        values = trend.chronologicalView(lastN=n)[1]
+        count = trend.currentEntry
+    else:
+        values = np.array(trend.trendedValues[-n:])
+        count = len(trend.trendedValues)
+    if values.ndim > 1:
+        values = values[:, 0]
+    return values, count
+
+
+def rollingWindow(trend, alarm):  # type: (Any, Any) -> Optional[RollingWindow]
+    """ Retrieve the rolling window of an alarm for a trend, updated with the most recent value of the trend.
+
+    This should be called once for each new value of the trend.
+
+    Args:
+        trend (TrendingObject): Trending object.
+        alarm (Alarm): Alarm which is evaluated.
+    Returns:
+        RollingWindow: The updated window, or None if the alarm doesn't support rolling windows.
+    """
+    windows = getattr(trend, "_v_alarmWindows", None)
+    if windows is None:
+        windows = {}
+        trend._v_alarmWindows = windows
+    window = windows.get(alarm)
+    if window is None:
+        window = alarm.createWindow(maxCount=getattr(trend, "capacity", None))
+        if window is None:
+            return None
+        values, count = recentTrendValues(trend, window.size)
+        window.extend(values, count)
+        windows[alarm] = window
+    else:
+        window.append(latestTrendValue(trend))
+    return window
@@ -0,0 +1,544 @@
+#!/usr/bin/env python
+
+""" Compact storage of the cumulative files of closed runs.
+
+In cumulative mode, each file received for a subsystem is a full snapshot of the histograms, and consecutive
+files only differ by the events received in the few minutes between them. Consequently, most of the data stored
+for a run is redundant. For a run which has finished, the files of a subsystem can be compacted into a base
+snapshot (the most recent file, which is kept as is) and a delta per file. Each delta contains only the bins which
+changed with respect to the previous file, stored as a sparse array in a compressed ``numpy`` archive named
+``SYShists.YYYY_MM_DD_HH_mm_ss.delta.npz`` next to where the original file was stored.
+
+Any original file can then be reconstructed by summing the deltas up to and including that file, using the
+base snapshot to define the histograms. Similarly, a cumulative time slice (which would otherwise be created
+by ``mergeFiles.subtractFiles()``) is just the sum of the deltas within the time slice, so it can be created
+directly from the deltas.
+
+Files which are received after a subsystem was compacted are compacted incrementally: they are stored as deltas
+relative to the previous base snapshot, and the most recent file becomes the new base snapshot.
+"""
+
+# Python 2/3 support
+from __future__ import print_function
+from __future__ import absolute_import
+from future.utils import iteritems
+from future.utils import itervalues
+
+# General
+import collections
+import glob
+import os
+import numpy as np
+import logging
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# ROOT
+import ROOT
+
+from ..base import utilities
+from . import processingClasses
+
+# Extension which replaces ``.root`` for the delta files.
+deltaExtension = ".delta.npz"
+
+# Stores the content of a histogram in a snapshot. ``sumw2`` is ``None`` if the histogram doesn't store
+# the sum of the squares of weights.
+histogramArrays = collections.namedtuple("histogramArrays", ["values", "sumw2", "entries"])
+
+def deltaFilename(filename):
+    """ Determine the delta filename which corresponds to a given ROOT filename.
+
+    Args:
+        filename (str): Path to the ROOT file.
+    Returns:
+        str: Path to the corresponding delta file.
+    """
+    return os.path.splitext(filename)[0] + deltaExtension
+
+def isCompacted(filename):
+    """ Check whether a given ROOT file has been replaced by a delta.
+
+    Args:
+        filename (str): Path to the ROOT file.
+    Returns:
+        bool: True if the file is only available through its delta.
+    """
+    return not os.path.exists(filename) and os.path.exists(deltaFilename(filename))
+
+def hasDelta(filename):
+    """ Check whether a delta has been stored for a given ROOT file.
+
+    Args:
+        filename (str): Path to the ROOT file.
+    Returns:
+        bool: True if the file was compacted into a delta (regardless of whether the original file still exists).
+    """
+    return os.path.exists(deltaFilename(filename))
+
+def _arrayView(array, nCells):
+    """ View the buffer of a ROOT array as a ``numpy`` array without copying it.
+
+    Args:
+        array (cppyy.LowLevelView): Buffer of the array, as returned by ``TH1D::GetArray()`` or ``TArrayD::GetArray()``.
+        nCells (int): Number of cells in the array.
+    Returns:
+        numpy.ndarray: View of the buffer. Modifying it modifies the underlying ROOT array.
+    """
+    array.reshape((nCells,))
+    return np.asarray(array)
+
+def _storesBinContents(hist):
+    """ Check whether the bin contents of a histogram are stored directly in its array.
+
+    This is the case for the standard histograms (``TH1D``, ``TH2F``, etc). However, profiles store the sum of the
+    weighted values (such that the bin content is the mean), and some histograms (such as ``TH2Poly``) don't store
+    their bins in an array, so their bins need to be accessed individually.
+
+    Args:
+        hist (ROOT.TH1): Histogram to be checked.
+    Returns:
+        bool: True if the array of the histogram contains the bin contents.
+    """
+    return hasattr(hist, "GetArray") and not hist.InheritsFrom(ROOT.TProfile.Class())
+
+def histogramToArrays(hist):
+    """ Extract the content of a histogram into ``numpy`` arrays.
+
+    All cells (including the underflow and overflow bins) are stored in the global bin numbering scheme of ROOT,
+    so the histogram dimension doesn't matter.
+
+    Args:
+        hist (ROOT.TH1): Histogram to be converted.
+    Returns:
+        histogramArrays: Content of the histogram.
+    """
+    nCells = hist.GetNcells()
+    if _storesBinContents(hist):
+        # ``astype`` copies, so the arrays remain valid after the histogram is deleted.
+        values = _arrayView(hist.GetArray(), nCells).astype(np.float64)
+    else:
+        values = np.array([hist.GetBinContent(i) for i in range(nCells)], dtype = np.float64)
+    sumw2 = None
+    if hist.GetSumw2N() > 0:
+        sumw2 = _arrayView(hist.GetSumw2().GetArray(), nCells).astype(np.float64)
+    return histogramArrays(values = values, sumw2 = sumw2, entries = hist.GetEntries())
+
+def setHistogramFromArrays(hist, arrays):
+    """ Set the content of a histogram from ``numpy`` arrays.
+
+    The histogram is reset before the content is set.
+
+    Args:
+        hist (ROOT.TH1): Histogram to be filled. It must have the same binning as when the arrays were extracted.
+        arrays (histogramArrays): Content of the histogram.
+    Returns:
+        None. The histogram is modified.
+    """
+    hist.Reset()
+    nCells = hist.GetNcells()
+    if _storesBinContents(hist):
+        _arrayView(hist.GetArray(), nCells)[:] = arrays.values
+    else:
+        for i in np.flatnonzero(arrays.values):
+            hist.SetBinContent(int(i), arrays.values[i])
+    if arrays.sumw2 is not None:
+        if hist.GetSumw2N() == 0:
+            hist.Sumw2()
+        _arrayView(hist.GetSumw2().GetArray(), nCells)[:] = arrays.sumw2
+    # The contents may have been set directly, so the statistics must be recalculated from the bins.
+    hist.ResetStats()
+    hist.SetEntries(arrays.entries)
+
+def readSnapshot(filename):
+    """ Read all histograms in a ROOT file into ``numpy`` arrays.
+
+    Args:
+        filename (str): Path to the ROOT file.
+    Returns:
+        OrderedDict: Keys are histogram names, while values are ``histogramArrays``.
+    """
+    snapshot = collections.OrderedDict()
+    fIn = ROOT.TFile(filename, "READ")
+    for key in fIn.GetListOfKeys():
+        classOfObject = ROOT.gROOT.GetClass(key.GetClassName())
+        if not classOfObject.InheritsFrom(ROOT.TH1.Class()):
+            continue
+        snapshot[key.GetName()] = histogramToArrays(key.ReadObj())
+    fIn.Close()
+    return snapshot
+
+def writeDelta(filename, snapshot, previousSnapshot, baseFilename):
+    """ Write the difference between two snapshots as a sparse delta.
+
+    Only the bins which changed between the snapshots are stored.
+
+    Args:
+        filename (str): Path to the delta file.
+        snapshot (OrderedDict): Snapshot to be stored, as returned by ``readSnapshot()``.
+        previousSnapshot (OrderedDict): Previous snapshot, as returned by ``readSnapshot()``. If ``None``, the delta
+            contains the full (but still sparse) snapshot.
+        baseFilename (str): Filename (without path) of the base snapshot, which defines the histograms.
+    Returns:
+        None.
+    """
+    arrays = {"base": np.array(baseFilename),
+              "names": np.array(list(snapshot.keys())),
+              "entries": np.array([hist.entries for hist in snapshot.values()], dtype = np.float64)}
+    for i, (histName, hist) in enumerate(iteritems(snapshot)):
+        values = hist.values
+        sumw2 = hist.sumw2
+        if previousSnapshot is not None:
+            previous = previousSnapshot[histName]
+            values = values - previous.values
+            if sumw2 is not None:
+                sumw2 = sumw2 - previous.sumw2 if previous.sumw2 is not None else sumw2
+        changed = values != 0
+        if sumw2 is not None:
+            changed |= sumw2 != 0
+        indices = np.flatnonzero(changed)
+        arrays["indices_{}".format(i)] = indices
+        arrays["values_{}".format(i)] = values[indices]
+        # An empty array indicates that the histogram doesn't store the sum of the squares of weights.
+        arrays["sumw2_{}".format(i)] = sumw2[indices] if sumw2 is not None else np.array([], dtype = np.float64)
+        arrays["hasSumw2_{}".format(i)] = np.array(sumw2 is not None)
+
+    # ``savez_compressed`` always appends ``.npz``, so we write via a file object to keep the exact filename.
+    with open(filename, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+def readDelta(filename):
+    """ Read a delta which was written by ``writeDelta()``.
+
+    Args:
+        filename (str): Path to the delta file.
+    Returns:
+        tuple: (baseFilename, delta) where baseFilename (str) is the filename of the base snapshot and delta
+            (OrderedDict) has histogram names as keys and tuples of (indices, values, sumw2, hasSumw2, entries)
+            as values.
+    """
+    delta = collections.OrderedDict()
+    with np.load(filename) as arrays:
+        baseFilename = str(arrays["base"])
+        for i, histName in enumerate(arrays["names"]):
+            delta[str(histName)] = (arrays["indices_{}".format(i)],
+                                    arrays["values_{}".format(i)],
+                                    arrays["sumw2_{}".format(i)],
+                                    bool(arrays["hasSumw2_{}".format(i)]),
+                                    arrays["entries"][i])
+    return (baseFilename, delta)
+
+def currentBaseFilename(directory):
+    """ Determine the filename of the current base snapshot of a compacted subsystem.
+
+    Each delta records the base snapshot at the time it was written, but the base snapshot changes when files are
+    compacted incrementally. The most recent delta always refers to the current base snapshot.
+
+    Args:
+        directory (str): Path to the directory containing the delta files.
+    Returns:
+        str: Filename (without path) of the base snapshot.
+    Raises:
+        ValueError: If there are no deltas in the directory.
+    """
+    deltaFilenames = findDeltas(directory)
+    if not deltaFilenames:
+        raise ValueError("No deltas available in {directory}!".format(directory = directory))
+    with np.load(deltaFilenames[-1]) as arrays:
+        return str(arrays["base"])
+
+def findDeltas(directory):
+    """ Find the delta files in a directory, sorted by time.
+
+    Args:
+        directory (str): Path to the directory containing the delta files.
+    Returns:
+        list: Paths to the delta files, sorted by the time stamp in the filename.
+    """
+    filenames = glob.glob(os.path.join(directory, "*" + deltaExtension))
+    return sorted(filenames, key = lambda filename: utilities.extractTimeStampFromFilename(os.path.basename(filename)))
+
+def sumDeltas(filenames, nCells):
+    """ Sum the given deltas into full histogram arrays.
+
+    Args:
+        filenames (list): Paths to the delta files to be summed.
+        nCells (dict): Number of cells for each histogram, keyed by histogram name.
+    Returns:
+        dict: Keys are histogram names, while values are ``histogramArrays``. The entries are those of the last delta,
+            such that they correspond to the snapshot of the last file.
+    """
+    summed = {}
+    for filename in filenames:
+        _, delta = readDelta(filename)
+        for histName, (indices, values, sumw2, hasSumw2, entries) in iteritems(delta):
+            if histName not in summed:
+                summed[histName] = histogramArrays(values = np.zeros(nCells[histName]),
+                                                   sumw2 = np.zeros(nCells[histName]) if hasSumw2 else None,
+                                                   entries = 0)
+            hist = summed[histName]
+            hist.values[indices] += values
+            if hasSumw2 and hist.sumw2 is not None:
+                hist.sumw2[indices] += sumw2
+            summed[histName] = hist._replace(entries = entries)
+    return summed
+
+def writeHistogramsFromDeltas(directory, deltaFilenames, outputFilename, entriesOffsets = None):
+    """ Write a ROOT file containing the sum of the given deltas.
+
+    The histograms are defined by the base snapshot of the deltas.
+
+    Args:
+        directory (str): Path to the directory containing the base snapshot and the delta files.
+        deltaFilenames (list): Paths to the delta files to be summed.
+        outputFilename (str): Path to the output ROOT file. It will be overwritten if it exists.
+        entriesOffsets (dict): Entries to be subtracted from the number of entries for each histogram, keyed
+            by histogram name. Default: ``None``.
+    Returns:
+        None.
+    """
+    fBase = ROOT.TFile(os.path.join(directory, currentBaseFilename(directory)), "READ")
+    hists = collections.OrderedDict()
+    for key in fBase.GetListOfKeys():
+        classOfObject = ROOT.gROOT.GetClass(key.GetClassName())
+        if not classOfObject.InheritsFrom(ROOT.TH1.Class()):
+            continue
+        hist = key.ReadObj()
+        hist.SetDirectory(0)
+        hists[key.GetName()] = hist
+    fBase.Close()
+
+    summed = sumDeltas(deltaFilenames, {histName: hist.GetNcells() for histName, hist in iteritems(hists)})
+    fOut = ROOT.TFile(outputFilename, "RECREATE")
+    for histName, hist in iteritems(hists):
+        if histName not in summed:
+            continue
+        arrays = summed[histName]
+        if entriesOffsets:
+            arrays = arrays._replace(entries = arrays.entries - entriesOffsets.get(histName, 0))
+        setHistogramFromArrays(hist, arrays)
+        fOut.cd()
+        hist.Write()
+    fOut.Close()
+
+def reconstructSnapshot(filename, outputFilename = None):
+    """ Reconstruct an original file from the deltas of a compacted subsystem.
+
+    Args:
+        filename (str): Path to the original ROOT file.
+        outputFilename (str): Path where the reconstructed file should be written. Default: ``None``, which
+            will write it to the original path.
+    Returns:
+        None.
+
+    Raises:
+        ValueError: If the file was not compacted.
+    """
+    if not os.path.exists(deltaFilename(filename)):
+        raise ValueError("No delta available for file {filename}!".format(filename = filename))
+    if outputFilename is None:
+        outputFilename = filename
+
+    directory = os.path.dirname(filename)
+    timeStamp = utilities.extractTimeStampFromFilename(os.path.basename(filename))
+    deltaFilenames = [f for f in findDeltas(directory) if utilities.extractTimeStampFromFilename(os.path.basename(f)) <= timeStamp]
+    logger.info("Reconstructing {filename} from {n} deltas".format(filename = filename, n = len(deltaFilenames)))
+    writeHistogramsFromDeltas(directory, deltaFilenames, outputFilename)
+
+def reconstructToCache(filename, cacheDir, cacheFilename, maxSize):
+    """ Reconstruct an original file into a cache directory which is limited in size.
+
+    This allows the original files to be provided (for example, by the web app) without writing them back
+    next to the deltas, which would undo the compaction. If the file is already available in the cache, it is
+    marked as the most recently used rather than reconstructed again. Once the files in the cache exceed the
+    maximum size, the least recently used files are removed.
+
+    Args:
+        filename (str): Path to the original ROOT file.
+        cacheDir (str): Path to the cache directory.
+        cacheFilename (str): Path of the reconstructed file relative to the cache directory.
+        maxSize (int): Maximum size of the files in the cache in bytes. The requested file is always kept,
+            even if it exceeds the size by itself.
+    Returns:
+        str: Path to the reconstructed file.
+    """
+    outputFilename = os.path.join(cacheDir, cacheFilename)
+    if os.path.exists(outputFilename):
+        os.utime(outputFilename, None)
+        return outputFilename
+
+    if not os.path.exists(os.path.dirname(outputFilename)):
+        os.makedirs(os.path.dirname(outputFilename))
+    # Reconstruct to a temporary file so that other processes never see a partially written file.
+    tempFilename = "{filename}.{pid}.tmp".format(filename = outputFilename, pid = os.getpid())
+    reconstructSnapshot(filename, outputFilename = tempFilename)
+    os.replace(tempFilename, outputFilename)
+
+    # Remove the least recently used files until the cache is within the limit.
+    cachedFiles = []
+    for path, _, filenames in os.walk(cacheDir):
+        for cachedFilename in (os.path.join(path, f) for f in filenames if not f.endswith(".tmp")):
+            try:
+                stat = os.stat(cachedFilename)
+            except OSError:
+                # It was removed by another process in the meantime.
+                continue
+            cachedFiles.append((stat.st_mtime, stat.st_size, cachedFilename))
+    size = sum(fileSize for _, fileSize, _ in cachedFiles)
+    for _, fileSize, cachedFilename in sorted(cachedFiles):
+        if size <= maxSize:
+            break
+        if cachedFilename == outputFilename:
+            continue
+        logger.debug("Removing {filename} from the reconstructed files cache".format(filename = cachedFilename))
+        if os.path.exists(cachedFilename):
+            os.remove(cachedFilename)
+        size -= fileSize
+
+    return outputFilename
+
+def subtractSnapshots(minFile, maxFile, outfile):
+    """ Subtract the histograms of one compacted snapshot from those of a later snapshot.
+
+    This is the equivalent of ``mergeFiles.subtractFiles()`` for compacted files. Since the difference between
+    the two snapshots is the sum of the deltas after ``minFile`` up to and including ``maxFile``, the result is
+    determined directly from the deltas, without reconstructing either snapshot.
+
+    Note:
+        The sum of the squares of weights is determined from the deltas, so it corresponds to the data in the
+        time window, rather than adding the values of both files as is done by ``TH1::Add()``.
+
+    Args:
+        minFile (str): Filename of the ROOT file containing data to be subtracted.
+        maxFile (str): Filename of the ROOT file containing data to to subtracted from.
+        outfile (str): Filename of the output file which will contain the subtracted histograms.
+    Returns:
+        None.
+    Raises:
+        ValueError: If either file hasn't been compacted, since the deltas then don't cover the time slice.
+    """
+    # Otherwise, we would silently skip the content of the files which haven't yet been compacted.
+    for filename in [minFile, maxFile]:
+        if not hasDelta(filename):
+            raise ValueError("File {filename} has not been compacted, so the time slice cannot be determined from the deltas!".format(filename = filename))
+    directory = os.path.dirname(maxFile)
+    minTimeStamp = utilities.extractTimeStampFromFilename(os.path.basename(minFile))
+    maxTimeStamp = utilities.extractTimeStampFromFilename(os.path.basename(maxFile))
+    deltaFilenames = []
+    for filename in findDeltas(directory):
+        timeStamp = utilities.extractTimeStampFromFilename(os.path.basename(filename))
+        if minTimeStamp < timeStamp <= maxTimeStamp:
+            deltaFilenames.append(filename)
+    if not deltaFilenames:
+        raise ValueError("No deltas available between {minFile} and {maxFile}!".format(minFile = minFile, maxFile = maxFile))
+
+    # The entries are stored as absolute values, so we need those of the earlier snapshot.
+    _, minDelta = readDelta(deltaFilename(minFile))
+    entriesOffsets = {histName: values[-1] for histName, values in iteritems(minDelta)}
+    writeHistogramsFromDeltas(directory, deltaFilenames, outfile, entriesOffsets = entriesOffsets)
+
+def compactSubsystem(dirPrefix, subsystem):
+    """ Compact the files of a subsystem into a base snapshot and per file deltas.
+
+    The most recent file is kept as the base snapshot. Each file is stored as a delta relative to the previous
+    file, and all files other than the base snapshot are then removed. If the subsystem was already compacted,
+    only the files which were received since then are compacted, relative to the previous base snapshot. The
+    compaction is skipped if the histograms are not the same in all files, since the base snapshot then can't
+    define all histograms.
+
+    Note:
+        This is only meaningful in cumulative mode, and should only be performed for runs which have finished.
+
+    Args:
+        dirPrefix (str): Path to the root directory where the data is stored.
+        subsystem (subsystemContainer): Subsystem whose files should be compacted.
+    Returns:
+        int: Number of bytes saved by the compaction.
+    """
+    # Skip if the subsystem does not have it's own files
+    if subsystem.subsystem != subsystem.fileLocationSubsystem:
+        return 0
+    filenames = [os.path.join(dirPrefix, fileCont.filename) for fileCont in sorted(subsystem.files.values(), key = lambda x: x.fileTime)]
+    # Files are compacted in order, so the compacted files always precede those which haven't been compacted.
+    nCompacted = sum(1 for filename in filenames if hasDelta(filename))
+    newFilenames = filenames[nCompacted:]
+    if not newFilenames:
+        logger.info("Subsystem {subsystem} in {baseDir} is already compacted.".format(subsystem = subsystem.subsystem, baseDir = subsystem.baseDir))
+        return 0
+    if nCompacted == 0 and len(newFilenames) < 2:
+        return 0
+
+    # The previous base snapshot (if it exists) is now also replaced by its delta.
+    previousBaseFilename = filenames[nCompacted - 1] if nCompacted else None
+    filenamesToRemove = ([previousBaseFilename] if previousBaseFilename else []) + newFilenames[:-1]
+    sizeBefore = sum(os.path.getsize(filename) for filename in filenamesToRemove + newFilenames[-1:])
+    baseFilename = newFilenames[-1]
+    baseSnapshot = readSnapshot(baseFilename)
+    nCells = {histName: len(hist.values) for histName, hist in iteritems(baseSnapshot)}
+
+    previousSnapshot = readSnapshot(previousBaseFilename) if previousBaseFilename else None
+    if previousSnapshot is not None and {histName: len(hist.values) for histName, hist in iteritems(previousSnapshot)} != nCells:
+        logger.warning("Histograms in {filename} don't match those in {baseFilename}. Skipping compaction of subsystem {subsystem}!".format(filename = previousBaseFilename, baseFilename = baseFilename, subsystem = subsystem.subsystem))
+        return 0
+    deltaFilenames = []
+    for filename in newFilenames:
+        snapshot = baseSnapshot if filename == baseFilename else readSnapshot(filename)
+        if {histName: len(hist.values) for histName, hist in iteritems(snapshot)} != nCells:
+            logger.warning("Histograms in {filename} don't match those in {baseFilename}. Skipping compaction of subsystem {subsystem}!".format(filename = filename, baseFilename = baseFilename, subsystem = subsystem.subsystem))
+            for f in deltaFilenames:
+                os.remove(f)
+            return 0
+        deltaFilenames.append(deltaFilename(filename))
+        writeDelta(deltaFilenames[-1], snapshot, previousSnapshot, os.path.basename(baseFilename))
+        previousSnapshot = snapshot
+
+    # Only remove the original files once all deltas were successfully written.
+    for filename in filenamesToRemove:
+        os.remove(filename)
+
+    sizeAfter = os.path.getsize(baseFilename) + sum(os.path.getsize(f) for f in deltaFilenames)
+    logger.info("Compacted {n} files of subsystem {subsystem} in {baseDir}, saving {saved} bytes.".format(n = len(newFilenames), subsystem = subsystem.subsystem, baseDir = subsystem.baseDir, saved = sizeBefore - sizeAfter))
+    return sizeBefore - sizeAfter
+
+def hasRunEnded(run, minutesSinceLastFile):
+    """ Check whether a run has ended, such that it can be compacted.
+
+    ``runContainer.isRunOngoing()`` is not sufficient, since a run isn't necessarily over if a subsystem didn't
+    receive a new file in the most recent processing. Instead, we require that no file has been received for
+    a (configurable) time which is much longer than the interval between files.
+
+    Args:
+        run (runContainer): Run to be checked.
+        minutesSinceLastFile (float): Minimum time in minutes since the most recent file of the run.
+    Returns:
+        bool: True if the run has ended.
+    """
+    if any(subsystem.newFile for subsystem in itervalues(run.subsystems)):
+        return False
+    # A negative value means that the time couldn't be determined, so we assume that the run is still ongoing.
+    minutes = processingClasses.runContainer.minutesSinceLastTimestamp(run)
+    return minutes >= 0 and minutes >= minutesSinceLastFile
+
+def compactRuns(runs, dirPrefix, minutesSinceLastFile = 60):
+    """ Driver function to compact the files of all finished runs.
+
+    Args:
+        runs (dict): Dict of ``runContainers`` to compact. The keys are the runDirs, in the from of ``Run######``.
+        dirPrefix (str): Path to the root directory where the data is stored.
+        minutesSinceLastFile (float): Minimum time in minutes since the most recent file of a run before it is
+            considered to have ended. See ``hasRunEnded()``. Default: 60.
+    Returns:
+        OrderedDict: Report of the disk space saved. Keys are runDirs, while values are dicts with subsystem names
+            as keys and the number of bytes saved as values.
+    """
+    report = collections.OrderedDict()
+    for runDir, run in iteritems(runs):
+        if not hasRunEnded(run, minutesSinceLastFile):
+            logger.info("Skipping compaction of {runDir} since it may be ongoing.".format(runDir = runDir))
+            continue
+        report[runDir] = {}
+        for subsystemName, subsystem in iteritems(run.subsystems):
+            report[runDir][subsystemName] = compactSubsystem(dirPrefix, subsystem)
+        logger.info("Compacting {runDir} saved {saved} bytes in total.".format(runDir = runDir, saved = sum(report[runDir].values())))
+
+    return report
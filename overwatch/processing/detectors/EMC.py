@@ -26,6 +26,8 @@ import numpy
 
 # Basic processing classes
 from .. import processingClasses
+# Cached overlay primitives
+from .. import overlays
 
 # For retrieving debug configuration
 from ...base import config
@@ -353,11 +355,32 @@ def labelSupermodules(hist):
         # Show title
         ROOT.gStyle.SetOptTitle(1)
 
+def scaleByNumberOfEvents(subsystem, hist, processingOptions, **kwargs):
+    """ Processing function which scales the histogram by number of events.
+
+    The histogram is only scaled if requested by the EMC processing options. Since this function modifies the
+    values of the histogram, it's also applied when extracting trended values.
+
+    Args:
+        subsystem (subsystemContainer): The subsystem for the current run.
+        hist (histogramContainer): The histogram being processed.
+        processingOptions (dict): Processing options to be used in this function. It may be the same
+            as the options specified in the subsystem, but it doesn't need to be, such as in the case
+            of processing for time slices.
+        **kwargs (dict): Reserved for future use.
+    Returns:
+        None.
+    """
+    if processingOptions["scaleHists"]:
+        hist.hist.Scale(1. / subsystem.nEvents)
+
+scaleByNumberOfEvents.modifiesHistogramValues = True
+
 def smOptions(subsystem, hist, processingOptions, **kwargs):
     """ Processing function for histograms which are broken out by super module (SM).
 
-    It scales the histogram by number of events as as appropriate based on the EMC processing options,
-    as well as labeling each histogram by its SM number.
+    It labels each histogram by its SM number. The histogram is scaled by the number of events separately
+    via ``scaleByNumberOfEvents()``.
 
     Args:
         subsystem (subsystemContainer): The subsystem for the current run.
@@ -370,8 +393,6 @@ def smOptions(subsystem, hist, processingOptions, **kwargs):
         None.
     """
     #canvas.SetLogz(logz)
-    if processingOptions["scaleHists"]:
-        hist.hist.Scale(1. / subsystem.nEvents)
     labelSupermodules(hist)
 
 def feeSMOptions(subsystem, hist, processingOptions, **kwargs):
@@ -393,6 +414,47 @@ def feeSMOptions(subsystem, hist, processingOptions, **kwargs):
     hist.hist.GetXaxis().SetRangeUser(0, 250)
     hist.hist.GetYaxis().SetRangeUser(0, 20)
 
+def buildTRUGrid(geometry):
+    """ Build the grid of lines representing the TRU regions.
+
+    The lines are built once per process and then cached and reused for each histogram via ``overlays``.
+
+    Args:
+        geometry (None): Unused, as the grid is always drawn with the same coordinates.
+    Returns:
+        list: ``TLine`` objects which make up the grid.
+    """
+    lines = []
+    # Grid for TRUs in full EMCal SMs
+    for x in range(8, 48, 8):
+        lines.append(ROOT.TLine(x, 0, x, 60))
+    # 60 + 1 to ensure that 60 is plotted
+    for y in range(12, 60 + 1, 12):
+        lines.append(ROOT.TLine(0, y, 48, y))
+
+    # Grid for TRUs in 1/3 EMCal SMs
+    lines.append(ROOT.TLine(0, 64, 48, 64))
+    lines.append(ROOT.TLine(24, 60, 24, 64))
+
+    # Grid for TRUs in 2/3 DCal SMs
+    for x in range(8, 48, 8):
+        if (x == 24):
+            # skip PHOS hole
+            continue
+        lines.append(ROOT.TLine(x, 64, x, 100))
+    for y in range(76, 100, 12):
+        lines.append(ROOT.TLine(0, y, 16, y))
+        # skip PHOS hole
+        lines.append(ROOT.TLine(32, y, 48, y))
+
+    # Grid for TRUs in 1/3 DCal SMs
+    lines.append(ROOT.TLine(0, 100, 48, 100))
+    lines.append(ROOT.TLine(24, 100, 24, 104))
+
+    return lines
+
+overlays.registerOverlay("EMC.TRUGrid", buildTRUGrid)
+
 def addTRUGrid(subsystem, hist):
     """ Add a grid of lines representing the TRU regions.
 
@@ -404,9 +466,9 @@ def addTRUGrid(subsystem, hist):
         already contains a canvas, this is a reasonable assumption. It is explicitly noted because the dependence
         is only implicit.
 
-    Warning:
-        The grid is created by allocating a large number of ``TLine`` objects which are owned by python, but not by
-        ROOT. Although this hasn't been observed to be a problem, this could in principle lead to memory problems.
+    Note:
+        The ``TLine`` objects of the grid are only created for the first histogram. They are cached (see
+        ``buildTRUGrid()``) and drawn again for each further histogram.
 
     Args:
         subsystem (subsystemContainer): The subsystem for the current run.
@@ -414,49 +476,7 @@ def addTRUGrid(subsystem, hist):
     Returns:
         None. The current canvas is modified.
     """
-    # Draw grid for TRUs in full EMCal SMs
-    for x in range(8, 48, 8):
-        line = ROOT.TLine(x, 0, x, 60)
-        ROOT.SetOwnership(line, False)
-        line.Draw()
-    # 60 + 1 to ensure that 60 is plotted
-    for y in range(12, 60 + 1, 12):
-        line = ROOT.TLine(0, y, 48, y)
-        ROOT.SetOwnership(line, False)
-        line.Draw()
-
-    # Draw grid for TRUs in 1/3 EMCal SMs
-    line = ROOT.TLine(0, 64, 48, 64)
-    ROOT.SetOwnership(line, False)
-    line.Draw()
-    line = ROOT.TLine(24, 60, 24, 64)
-    ROOT.SetOwnership(line, False)
-    line.Draw()
-
-    # Draw grid for TRUs in 2/3 DCal SMs
-    for x in range(8, 48, 8):
-        if (x == 24):
-            # skip PHOS hole
-            continue
-        line = ROOT.TLine(x, 64, x, 100)
-        ROOT.SetOwnership(line, False)
-        line.Draw()
-    for y in range(76, 100, 12):
-        line = ROOT.TLine(0, y, 16, y)
-        ROOT.SetOwnership(line, False)
-        line.Draw()
-        # skip PHOS hole
-        line = ROOT.TLine(32, y, 48, y)
-        ROOT.SetOwnership(line, False)
-        line.Draw()
-
-    # Draw grid for TRUs in 1/3 DCal SMs
-    line = ROOT.TLine(0, 100, 48, 100)
-    ROOT.SetOwnership(line, False)
-    line.Draw()
-    line = ROOT.TLine(24, 100, 24, 104)
-    ROOT.SetOwnership(line, False)
-    line.Draw()
+    overlays.drawOverlay("EMC.TRUGrid")
 
 def generalClusterOptions(subsystem, hist, processingOptions, **kwargs):
     """ Processing function for all cluster histograms.
@@ -714,7 +734,7 @@ def cellIDVsTimeHighGain(subsystem, hist, processingOptions, **kwargs):
 def edgePosOptions(subsystem, hist, processingOptions, **kwargs):
     """ Processing function for patch edge positions histograms.
 
-    It scales the histogram by number of events as as appropriate based on the EMC processing options,
+    It labels the scaling of the histogram (which is scaled separately via ``scaleByNumberOfEvents()``),
     as well as adding a TRU grid.
 
     Args:
@@ -729,7 +749,6 @@ def edgePosOptions(subsystem, hist, processingOptions, **kwargs):
     """
     zAxisLabel = "entries"
     if processingOptions["scaleHists"]:
-        hist.hist.Scale(1. / subsystem.nEvents)
         zAxisLabel = "entries / events"
     hist.hist.GetZaxis().SetTitle(zAxisLabel)
 
@@ -745,8 +764,8 @@ def fastOROptions(subsystem, hist, processingOptions, **kwargs):
     - 1D with cell ID vs amplitude.
     - 2D with cell amplitude vs row, column position.
 
-    For both histogram types, it scales the histogram by number of events as as appropriate based
-    on the EMC processing options.
+    For both histogram types, the histogram is scaled by number of events separately via
+    ``scaleByNumberOfEvents()``.
 
     For the 1D histograms, it can look for hot channels based on a threshold set in the processing options.
     For any channels that are above this threshold, they cell IDs are stored in the ``histogramContainer``.
@@ -777,9 +796,6 @@ def fastOROptions(subsystem, hist, processingOptions, **kwargs):
         # Add grid of TRU boundaries
         addTRUGrid(subsystem, hist)
 
-        # Scale hist
-        if processingOptions["scaleHists"]:
-            hist.hist.Scale(1. / subsystem.nEvents)
         hist.hist.GetZaxis().SetTitle("entries / events")
     else:
         # Check thresholds for hot fastORs in 1D hists
@@ -799,9 +815,9 @@ def fastOROptions(subsystem, hist, processingOptions, **kwargs):
             threshold = processingOptions["hotChannelThreshold"] / 1000.0
 
         # Set hist options
-        hist.hist.Sumw2()
-        if processingOptions["scaleHists"]:
-            hist.hist.Scale(1. / subsystem.nEvents)
+        # Scaling the hist already enables the sum of the squares of weights.
+        if hist.hist.GetSumw2N() == 0:
+            hist.hist.Sumw2()
 
         # Set style
         hist.hist.SetMarkerStyle(ROOT.kFullCircle)
@@ -810,15 +826,32 @@ def fastOROptions(subsystem, hist, processingOptions, **kwargs):
         hist.hist.SetLineColor(ROOT.kBlue + 1)
 
         # Find bins above the threshold
-        absIdList = []
-        for iBin in range(1, hist.hist.GetXaxis().GetNbins() + 1):
-            if hist.hist.GetBinContent(iBin) > threshold:
-                # Translate back from bin number (1, Nbins() + 1) to fastOR ID (0, Nbins())
-                absIdList.append(iBin - 1)
+        # Index 0 of the bin contents corresponds to bin 1, so the index is already the fastOR ID (0, Nbins())
+        absIdList = numpy.flatnonzero(histogramContents(hist.hist)[0] > threshold).tolist()
 
         hist.information["Threshold"] = threshold
         hist.information["Fast OR Hot Channels ID"] = absIdList
 
+def buildEnergyAxis(geometry):
+    """ Build the axis showing the conversion from patch ADC counts to energy.
+
+    Args:
+        geometry (tuple): (adcMin, adcMax), the range of the ADC axis.
+    Returns:
+        list: The ``TGaxis``. It is initially positioned at y = 0.
+    """
+    # Conversion from EMCal L1 ADC to energy
+    kEMCL1ADCtoGeV = 0.07874
+    adcMin, adcMax = geometry
+    EMax = adcMax * kEMCL1ADCtoGeV
+    EMin = adcMin * kEMCL1ADCtoGeV
+
+    energyAxis = ROOT.TGaxis(adcMin, 0, adcMax, 0, EMin, EMax, 510, "-")
+    energyAxis.SetTitle("Energy (GeV)")
+    return [energyAxis]
+
+overlays.registerOverlay("EMC.energyAxis", buildEnergyAxis)
+
 def addEnergyAxisToPatches(subsystem, hist, processingOptions, **kwargs):
     """ Processing function to add an additional axis to patch ADC amplitude spectra showing the conversion from
     ADC counts to energy.
@@ -833,8 +866,8 @@ def addEnergyAxisToPatches(subsystem, hist, processingOptions, **kwargs):
         is only implicit.
 
     Note:
-        The ownership of ``TGaxis`` is given to ROOT to ensure that it continues to exist outside of the
-        function scope.
+        The ``TGaxis`` is cached (see ``buildEnergyAxis()``) for each ADC range, so only its vertical position
+        is updated for each histogram.
 
     Args:
         subsystem (subsystemContainer): The subsystem for the current run.
@@ -846,20 +879,16 @@ def addEnergyAxisToPatches(subsystem, hist, processingOptions, **kwargs):
     Returns:
         None. The current canvas is modified.
     """
-    # Conversion from EMCal L1 ADC to energy
-    kEMCL1ADCtoGeV = 0.07874
     adcMin = hist.hist.GetXaxis().GetXmin()
     adcMax = hist.hist.GetXaxis().GetXmax()
-    EMax = adcMax * kEMCL1ADCtoGeV
-    EMin = adcMin * kEMCL1ADCtoGeV
 
     # Setup the energy axis.
     # Note that although gPad.GetUymax() seems ideal here, it won't work properly due # to the histogram
     # being plotted as a long. Instead, we need to extract the value based on the maximum.
     yMax = 2 * hist.hist.GetMaximum()
-    energyAxis = ROOT.TGaxis(adcMin, yMax, adcMax, yMax, EMin, EMax, 510, "-")
-    ROOT.SetOwnership(energyAxis, False)
-    energyAxis.SetTitle("Energy (GeV)")
+    energyAxis, = overlays.retrieveOverlay("EMC.energyAxis", geometry = (adcMin, adcMax))
+    energyAxis.SetY1(yMax)
+    energyAxis.SetY2(yMax)
     energyAxis.Draw()
 
 def patchAmpOptions(subsystem, hist, processingOptions, **kwargs):
@@ -993,6 +1022,7 @@ def findFunctionsForEMCHistogram(subsystem, hist, **kwargs):
 
     # Plot by SM
     if "SM" in hist.histName:
+        hist.functionsToApply.append(scaleByNumberOfEvents)
         hist.functionsToApply.append(smOptions)
 
         # For FEE plots, set a different range
@@ -1031,6 +1061,7 @@ def findFunctionsForEMCHistogram(subsystem, hist, **kwargs):
 
     # EdgePos plots
     if "EdgePos" in hist.histName:
+        hist.functionsToApply.append(scaleByNumberOfEvents)
         hist.functionsToApply.append(edgePosOptions)
 
     # Check summary FastOR hists
@@ -1041,6 +1072,7 @@ def findFunctionsForEMCHistogram(subsystem, hist, **kwargs):
     #logger.debug(possibleFastORNames)
     #if "FastORL" in hist.GetName() and "SM" not in hist.GetName():
     if any(substring == hist.histName for substring in possibleFastORNames):
+        hist.functionsToApply.append(scaleByNumberOfEvents)
         hist.functionsToApply.append(fastOROptions)
 
     # PlotMaxPatch plots
@@ -1136,6 +1168,31 @@ def sortSMsInPhysicalOrder(histList, sortKey):
 
     return tempList
 
+def histogramContents(hist):
+    """ Retrieve the bin contents of a ``TH1`` or ``TH2`` as a ``numpy`` array.
+
+    The contents are read directly from the histogram array when possible, which avoids calling
+    ``GetBinContent(...)`` for each bin. The under- and overflow bins are excluded.
+
+    Args:
+        hist (TH1): Histogram to be read.
+    Returns:
+        numpy.ndarray: Bin contents with shape (nBinsY, nBinsX) (nBinsY is 1 for a ``TH1``), such that
+            bin (binX, binY) is stored at [binY - 1, binX - 1].
+    """
+    xbins = hist.GetNbinsX()
+    ybins = hist.GetNbinsY()
+    nCells = hist.GetNcells()
+    # The array of profiles contains the sums rather than the bin contents.
+    if hasattr(hist, "GetArray") and not hist.InheritsFrom(ROOT.TProfile.Class()) and not hist.InheritsFrom(ROOT.TProfile2D.Class()):
+        contents = numpy.array(numpy.asarray(hist.GetArray())[:nCells], dtype = numpy.float64)
+    else:
+        contents = numpy.array([hist.GetBinContent(i) for i in range(nCells)], dtype = numpy.float64)
+    if hist.GetDimension() == 1:
+        return contents[1:xbins + 1].reshape(1, xbins)
+    # For TH3, this corresponds to the z underflow bin, consistent with ``GetBinContent(binX, binY)``.
+    return contents.reshape(-1, ybins + 2, xbins + 2)[0, 1:ybins + 1, 1:xbins + 1]
+
 def checkForOutliers(hist):
     """ Checks for outliers in the provided histogram.
 
@@ -1196,16 +1253,8 @@ def hasSignalOutlier(hist):
     # Whether to include empty bins in mean/std dev calculation
     ignoreEmptyBins = False
     xbins = hist.GetNbinsX()
-    ybins = hist.GetNbinsY()
-    totalBins = xbins * ybins
-    signal = numpy.zeros(totalBins)
-
-    # Get bins for hist
-    for binX in range(1, xbins + 1):
-        for binY in range(1, ybins + 1):
-            binContent = hist.GetBinContent(binX, binY)
-            # Bins start at 1, arrays at 0
-            signal[(binX - 1) + (binY - 1) * xbins] = binContent
+    # Bin (binX, binY) is stored at (binX - 1) + (binY - 1) * xbins
+    signal = histogramContents(hist).ravel()
 
     # Change calculation technique depending on option and type of hist
     if ignoreEmptyBins:
@@ -1219,19 +1268,20 @@ def hasSignalOutlier(hist):
     threshUp = mean + stdev
     threshDown = mean - stdev
 
+    # Determine which bins are outliers
+    outliers = (signal > threshUp) | (signal < threshDown)
+    if ignoreEmptyBins:
+        outliers &= signal > 0
     # index of outliers in signal array
-    outlierList = []
-    # Determine if a bin is an outlier
-    for binX in range(1, xbins + 1):
-        for binY in range(1, ybins + 1):
-            amp = signal[(binX - 1) + (binY - 1) * xbins]
-            if(amp > threshUp or amp < threshDown):
-                if not ignoreEmptyBins or amp > 0:
-                    logger.info("bin (" + repr(binX) + "," + repr(binY) + ") has amplitude " + repr(amp) + "! This is outside of threshold, [" + '%.2f' % threshDown + "," + '%.2f' % threshUp + "]")
-                    outlierList.append((binX - 1) + (binY - 1) * xbins)
+    outlierList = numpy.flatnonzero(outliers)
+    if len(outlierList):
+        # A single message rather than one per bin, since there can be many outliers in large histograms.
+        logger.info("{n} bins have an amplitude outside of threshold, [{down:.2f},{up:.2f}]".format(n = len(outlierList), down = threshDown, up = threshUp))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Outlier bins (binX, binY): amplitude: " + ", ".join("(" + repr(int(index % xbins + 1)) + "," + repr(int(index // xbins + 1)) + "): " + repr(signal[index]) for index in outlierList))
 
     # Exclude outliers and recalculate
-    newSignal = numpy.delete(signal, outlierList)
+    newSignal = signal[~outliers]
     if ignoreEmptyBins:
         newMean = numpy.mean(newSignal[newSignal > 0])
         newStdev = numpy.std(newSignal[newSignal > 0])
@@ -25,6 +25,8 @@ logger = logging.getLogger(__name__)
 import ROOT
 
 from . import processingClasses
+from . import compactFiles
+from . import snapshotStore
 
 def merge(currentDir, run, subsystem, cumulativeMode = True, timeSlice = None):
     """ For a given run and subsystem, handles merging of files into a "combined file" which
@@ -94,9 +96,34 @@ def merge(currentDir, run, subsystem, cumulativeMode = True, timeSlice = None):
         latestFile = filesToMerge[-1].filename
         # Subtract latestFile from earliestFile
         timeSlicesFilename = os.path.join(currentDir, subsystem.baseDir, timeSlice.filename.filename)
-        subtractFiles(os.path.join(currentDir, earliestFile),
-                      os.path.join(currentDir, latestFile),
-                      timeSlicesFilename)
+        # If the snapshots are available in the snapshot store, the subtraction can be performed on the stored arrays,
+        # using the combined file to rebuild the histograms.
+        snapshotsDir = snapshotStore.snapshotsDir(currentDir, subsystem)
+        if subsystem.combinedFile and os.path.exists(os.path.join(currentDir, subsystem.combinedFile.filename)) and \
+                snapshotStore.hasSnapshots(snapshotsDir, filesToMerge[0].fileTime, filesToMerge[-1].fileTime):
+            snapshotStore.writeSubtractedSnapshots(snapshotsDir,
+                                                   filesToMerge[0].fileTime,
+                                                   filesToMerge[-1].fileTime,
+                                                   os.path.join(currentDir, subsystem.combinedFile.filename),
+                                                   timeSlicesFilename)
+            logger.info("Completed time slicing via subtraction of stored snapshots with result stored in {}!\nMerging complete!".format(timeSlicesFilename))
+            return None
+        earliestFile = os.path.join(currentDir, earliestFile)
+        latestFile = os.path.join(currentDir, latestFile)
+        if compactFiles.hasDelta(earliestFile) and compactFiles.hasDelta(latestFile):
+            # If the run has been compacted, the time slice can be determined directly from the deltas.
+            compactFiles.subtractSnapshots(earliestFile, latestFile, timeSlicesFilename)
+        elif compactFiles.isCompacted(earliestFile):
+            # The later file was received after the run was compacted, so it isn't covered by the deltas.
+            # Instead, we reconstruct the earlier file temporarily and subtract the ROOT files.
+            reconstructedFile = os.path.splitext(timeSlicesFilename)[0] + ".reconstructed.root"
+            compactFiles.reconstructSnapshot(earliestFile, reconstructedFile)
+            try:
+                subtractFiles(reconstructedFile, latestFile, timeSlicesFilename)
+            finally:
+                os.remove(reconstructedFile)
+        else:
+            subtractFiles(earliestFile, latestFile, timeSlicesFilename)
         logger.info("Completed time slicing via subtraction with result stored in {}!\nMerging complete!".format(timeSlicesFilename))
         return None
 
@@ -138,7 +165,10 @@ def merge(currentDir, run, subsystem, cumulativeMode = True, timeSlice = None):
     if numberOfFiles == 1:
         # Avoid errors with TFileMerger and only one file.
         # Plus, performance should be better
-        shutil.copy(os.path.join(currentDir, filesToMerge[0].filename), outFile)
+        if compactFiles.isCompacted(os.path.join(currentDir, filesToMerge[0].filename)):
+            compactFiles.reconstructSnapshot(os.path.join(currentDir, filesToMerge[0].filename), outFile)
+        else:
+            shutil.copy(os.path.join(currentDir, filesToMerge[0].filename), outFile)
     else:
         merger.OutputFile(outFile)
         merger.Merge()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+""" Cache of static overlay primitives which are drawn on top of histograms.
+
+Some detectors draw the same static primitives (such as the grid of TRU boundaries for the EMC) on top of
+many histograms. Creating new ``ROOT`` objects for every draw (and releasing ownership to ``ROOT``) means that
+they are never freed, so the memory usage (and the time per draw) grows over the lifetime of the processing.
+Instead, a detector plugin registers a function which builds the primitives once for a given geometry, and the
+cached primitives are then drawn again for each histogram::
+
+    def buildGrid(geometry):
+        xMax, yMax = geometry
+        return [ROOT.TLine(x, 0, x, yMax) for x in range(8, xMax, 8)]
+
+    overlays.registerOverlay("SYS.grid", buildGrid)
+    ...
+    overlays.drawOverlay("SYS.grid", geometry = (48, 104))
+
+The cache is per process. The primitives are owned by the cache (ie. by python), so clearing the canvas
+doesn't delete them, and they're available for the next draw.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Functions which build the primitives of each overlay, keyed by overlay name.
+_builders = {}
+# Built primitives, keyed by (overlay name, geometry).
+_cache = {}
+
+def registerOverlay(name, builder):
+    """ Register a function which builds the primitives of an overlay.
+
+    Registering a different builder for an existing name replaces the previous builder and removes the cached
+    primitives of that overlay.
+
+    Args:
+        name (str): Name of the overlay. By convention, it is prefixed by the subsystem (ex. ``EMC.TRUGrid``).
+        builder (callable): Function which takes the geometry (which may be ``None``) and returns a list of
+            the primitives (``TObject``) to be drawn.
+    Returns:
+        None.
+    """
+    if _builders.get(name, builder) is not builder:
+        logger.debug("Replacing overlay {name}".format(name = name))
+        clearOverlayCache(name)
+    _builders[name] = builder
+
+def retrieveOverlay(name, geometry = None):
+    """ Retrieve the primitives of an overlay, building them if they're not yet cached.
+
+    Args:
+        name (str): Name of the overlay.
+        geometry (tuple): Hashable description of the geometry (such as axis ranges), which is passed to the
+            builder. Primitives are cached separately for each geometry. Default: None.
+    Returns:
+        list: The cached primitives.
+    Raises:
+        KeyError: If the overlay is not registered.
+    """
+    key = (name, geometry)
+    if key not in _cache:
+        _cache[key] = list(_builders[name](geometry))
+    return _cache[key]
+
+def drawOverlay(name, geometry = None, drawOptions = ""):
+    """ Draw the primitives of an overlay on the current pad.
+
+    Args:
+        name (str): Name of the overlay.
+        geometry (tuple): Hashable description of the geometry. See ``retrieveOverlay()``. Default: None.
+        drawOptions (str): Options passed to ``Draw()`` for each primitive. Default: "".
+    Returns:
+        list: The drawn primitives.
+    """
+    primitives = retrieveOverlay(name, geometry)
+    for primitive in primitives:
+        primitive.Draw(drawOptions)
+    return primitives
+
+def clearOverlayCache(name = None):
+    """ Remove cached primitives, such that they are built again when they are next drawn.
+
+    Args:
+        name (str): Only remove the primitives of this overlay. Default: None, which removes all primitives.
+    Returns:
+        None.
+    """
+    for key in list(_cache):
+        if name is None or key[0] == name:
+            del _cache[key]
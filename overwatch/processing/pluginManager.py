@@ -17,6 +17,13 @@ they are also loaded by the plugin manager for convenience.
 
 The subsystems to actually load are specified in the configuration file.
 
+The main routing plugin functions of each subsystem are resolved once when this module is imported and
+stored in a dispatch table (``dispatchTables``), such that they don't need to be looked up by name each time
+that they are called. They are also validated at that point, so a plugin with an invalid signature fails
+immediately instead of when it is first needed. Similarly, the processing functions which are assigned to
+each histogram name are cached (see ``findFunctionsForHist``). The time spent in each plugin function is
+recorded by ``pluginTimer``, so slow detector code is visible in the logs.
+
 .. codeauthor:: Raymond Ehlers <raymond.ehlers@cern.ch>, Yale University
 """
 
@@ -33,15 +40,239 @@ logger = logging.getLogger(__name__)
 # Used to load functions from other modules
 import importlib
 import inspect
+import time
+
+import ROOT
 
 # Configuration
 from ..base import config
+from . import processingClasses
 (processingParameters, filesRead) = config.readConfig(config.configurationType.processing)
 
 # Get the current module
 # Used to load functions from other modules and then look them up.
 currentModule = sys.modules[__name__]
 
+# Main routing plugin functions. Keys are the function names (where ``{}`` is replaced by the subsystem name), while
+# values are the number of positional arguments that the functions must accept.
+pluginRoutes = {
+    "createAdditional{}Histograms": 1,
+    "create{}HistogramStacks": 1,
+    "set{}HistogramOptions": 1,
+    "create{}HistogramGroups": 1,
+    "findFunctionsFor{}Histogram": 2,
+    "define{}TrendingObjects": 1,
+}
+# Number of positional arguments that processing and projection functions must accept.
+# They are of the form ``func(subsystem, hist, processingOptions, **kwargs)``.
+nHistFunctionArgs = 3
+
+# Resolved routing plugin functions. Keys are subsystem names, while values are dicts from the routes defined in
+# ``pluginRoutes`` to the plugin function (or ``None`` if the subsystem doesn't implement it).
+dispatchTables = {}
+# Processing functions which were assigned to each hist by ``findFunctionsFor(SYS)Histogram(...)``. Keys are
+# (subsystem name, hist name), while values are the functions.
+histFunctionsCache = {}
+# (function, number of positional arguments) which have already been validated.
+validatedFunctions = set()
+
+class PluginTimer(object):
+    """ Records the time spent in plugin functions.
+
+    Attributes:
+        timings (dict): Keys are the function names (of the form ``SYS_functionName``), while values are
+            lists of [number of calls, total time, maximum time], where the times are in seconds.
+    """
+    def __init__(self):
+        self.timings = {}
+
+    @staticmethod
+    def functionName(func):
+        """ Determine the name under which the time spent in a function is recorded.
+
+        Args:
+            func (function): Plugin function.
+        Returns:
+            str: Name of the form ``SYS_functionName`` if the function is from a subsystem module. Otherwise,
+                just the name of the function.
+        """
+        moduleName = getattr(func, "__module__", None) or ""
+        name = getattr(func, "__name__", repr(func))
+        if ".detectors." in moduleName:
+            return subsystemNamespace(functionName = name, subsystemName = moduleName.split(".")[-1])
+        return name
+
+    def call(self, func, *args, **kwargs):
+        """ Call a plugin function and record the time spent in it.
+
+        Args:
+            func (function): Plugin function to be called.
+            args (list): Positional arguments for the function.
+            kwargs (dict): Keyword arguments for the function.
+        Returns:
+            The return value of the function.
+        """
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.record(self.functionName(func), time.time() - start)
+
+    def record(self, name, duration):
+        """ Record the time spent in a single function call.
+
+        Args:
+            name (str): Name of the function.
+            duration (float): Time spent in the function in seconds.
+        Returns:
+            None.
+        """
+        timing = self.timings.setdefault(name, [0, 0., 0.])
+        timing[0] += 1
+        timing[1] += duration
+        timing[2] = max(timing[2], duration)
+
+    def summary(self, nFunctions = None):
+        """ Summarize the recorded timings.
+
+        Args:
+            nFunctions (int): Maximum number of functions to include. Default: None, which includes all functions.
+        Returns:
+            list: (name, number of calls, total time, maximum time) for each function, sorted by the total time
+                (with the slowest first).
+        """
+        summary = sorted(((name,) + tuple(timing) for name, timing in self.timings.items()), key = lambda x: x[2], reverse = True)
+        return summary[:nFunctions] if nFunctions is not None else summary
+
+    def logSummary(self, nFunctions = 10):
+        """ Log the functions in which the most time was spent and reset the recorded timings.
+
+        Args:
+            nFunctions (int): Number of functions to log. Default: 10.
+        Returns:
+            None.
+        """
+        summary = self.summary(nFunctions = nFunctions)
+        if summary:
+            logger.info("Time spent in plugin functions:\n{timings}".format(timings = "\n".join(
+                "\t{name}: {nCalls} calls, total: {total:.3f} s, max: {maximum:.3f} s".format(name = name, nCalls = nCalls, total = total, maximum = maximum)
+                for name, nCalls, total, maximum in summary)))
+        self.timings = {}
+
+# Records the time spent in each plugin function.
+pluginTimer = PluginTimer()
+
+def callPlugin(func, *args, **kwargs):
+    """ Call a plugin function, recording the time spent in it.
+
+    Args:
+        func (function): Plugin function to be called.
+        args (list): Positional arguments for the function.
+        kwargs (dict): Keyword arguments for the function.
+    Returns:
+        The return value of the function.
+    """
+    return pluginTimer.call(func, *args, **kwargs)
+
+def acceptsPositionalArguments(func, nArgs):
+    """ Check whether a function can be called with the given number of positional arguments.
+
+    Args:
+        func (function): Function to check.
+        nArgs (int): Number of positional arguments.
+    Returns:
+        bool: True if the function can be called with ``nArgs`` positional arguments.
+    """
+    if not callable(func):
+        return False
+    args = [None] * nArgs
+    try:
+        signature = inspect.signature(func)
+    except AttributeError:
+        # Python 2
+        try:
+            inspect.getcallargs(func, *args)
+        except TypeError:
+            return False
+        return True
+    except ValueError:
+        # The signature isn't available (for example, for some builtins), so we can't check it.
+        return True
+    try:
+        signature.bind(*args)
+    except TypeError:
+        return False
+    return True
+
+def validateFunction(func, nArgs, description):
+    """ Validate that a plugin function can be called with the expected arguments.
+
+    Args:
+        func (function): Function to validate.
+        nArgs (int): Number of positional arguments that the function must accept.
+        description (str): Description of the function for the error message.
+    Returns:
+        None.
+    Raises:
+        ValueError: If the function can't be called with ``nArgs`` positional arguments.
+    """
+    if (func, nArgs) in validatedFunctions:
+        return
+    if not acceptsPositionalArguments(func, nArgs):
+        raise ValueError("Plugin function {description} ({func}) must accept {nArgs} positional argument(s)!".format(description = description, func = func, nArgs = nArgs))
+    validatedFunctions.add((func, nArgs))
+
+def modifiesHistogramValues(func):
+    """ Check whether a processing function modifies the values of a histogram.
+
+    Most processing functions only change how a histogram is displayed. Functions which change the values (for
+    example, by normalizing by the number of events) are marked by setting their ``modifiesHistogramValues``
+    attribute to True. Only these functions are applied when extracting trended values, since they don't
+    require the histogram to be drawn.
+
+    Args:
+        func (function): Processing function to check.
+    Returns:
+        bool: True if the function modifies the values of the histogram.
+    """
+    return getattr(func, "modifiesHistogramValues", False) is True
+
+def compileDispatchTable(subsystemName):
+    """ Resolve and validate the routing plugin functions of a subsystem.
+
+    Args:
+        subsystemName (str): The subsystem in the form of a three letter, all capital name (ex. ``EMC``).
+    Returns:
+        dict: Dispatch table from the routes defined in ``pluginRoutes`` to the plugin functions (or ``None``
+            if the subsystem doesn't implement it).
+    Raises:
+        ValueError: If a plugin function has an invalid signature.
+    """
+    dispatchTable = {}
+    for route, nArgs in pluginRoutes.items():
+        functionName = subsystemNamespace(functionName = route.format(subsystemName), subsystemName = subsystemName)
+        func = getattr(currentModule, functionName, None)
+        if func is not None:
+            validateFunction(func, nArgs, functionName)
+        dispatchTable[route] = func
+    return dispatchTable
+
+def retrievePlugin(route, subsystemName):
+    """ Retrieve a routing plugin function from the dispatch table of a subsystem.
+
+    Args:
+        route (str): Route of the plugin, as defined in ``pluginRoutes``.
+        subsystemName (str): The subsystem in the form of a three letter, all capital name (ex. ``EMC``).
+    Returns:
+        function: The plugin function, or None if the subsystem doesn't implement it.
+    """
+    dispatchTable = dispatchTables.get(subsystemName)
+    if dispatchTable is None:
+        # The subsystem wasn't loaded on import, so it won't have any plugin functions. However, we still
+        # store the table to avoid repeating the lookup.
+        dispatchTable = dispatchTables[subsystemName] = compileDispatchTable(subsystemName)
+    return dispatchTable[route]
+
 def subsystemNamespace(functionName, subsystemName):
     """ Prepend the subsystem name to a function to act as a namespace.
 
@@ -76,12 +307,14 @@ def createAdditionalHistograms(subsystem):
     Returns:
         None.
     """
-    functionName = "createAdditional{}Histograms".format(subsystem.subsystem)
-    functionName = subsystemNamespace(functionName = functionName, subsystemName = subsystem.subsystem)
-    histogramCreationFunction = getattr(currentModule, functionName, None)
+    histogramCreationFunction = retrievePlugin("createAdditional{}Histograms", subsystem.subsystem)
     if histogramCreationFunction is not None:
         logger.info("Found additional histogram creation function for subsystem {}".format(subsystem.subsystem))
-        histogramCreationFunction(subsystem)
+        callPlugin(histogramCreationFunction, subsystem)
+        # Validate the projection functions now, rather than when the hists are processed.
+        for hist in subsystem.histsAvailable.values():
+            for func in hist.projectionFunctionsToApply:
+                validateFunction(func, nHistFunctionArgs, "projection function for {histName}".format(histName = hist.histName))
     else:
         logger.info("Could not find additional histogram creation function for subsystem {}.".format(subsystem.subsystem))
 
@@ -100,11 +333,9 @@ def createHistogramStacks(subsystem):
     Returns:
         None.
     """
-    functionName = "create{}HistogramStacks".format(subsystem.subsystem)
-    functionName = subsystemNamespace(functionName = functionName, subsystemName = subsystem.subsystem)
-    histogramStackFunction = getattr(currentModule, functionName, None)
+    histogramStackFunction = retrievePlugin("create{}HistogramStacks", subsystem.subsystem)
     if histogramStackFunction is not None:
-        histogramStackFunction(subsystem)
+        callPlugin(histogramStackFunction, subsystem)
     else:
         logger.info("Could not find histogram stack function for subsystem {subsystem}.".format(subsystem = subsystem.subsystem))
         # Ensure that the histograms propagate to the next dict if there is not stack function!
@@ -129,11 +360,9 @@ def setHistogramOptions(subsystem):
     Returns:
         None.
     """
-    functionName = "set{}HistogramOptions".format(subsystem.subsystem)
-    functionName = subsystemNamespace(functionName = functionName, subsystemName = subsystem.subsystem)
-    histogramOptionsFunction = getattr(currentModule, functionName, None)
+    histogramOptionsFunction = retrievePlugin("set{}HistogramOptions", subsystem.subsystem)
     if histogramOptionsFunction is not None:
-        histogramOptionsFunction(subsystem)
+        callPlugin(histogramOptionsFunction, subsystem)
     else:
         logger.info("Could not find histogram options function for subsystem {subsystem}.".format(subsystem = subsystem.subsystem))
 
@@ -150,12 +379,10 @@ def createHistGroups(subsystem):
     Returns:
         bool: True if the function was called
     """
-    functionName = "create{}HistogramGroups".format(subsystem.subsystem)
-    functionName = subsystemNamespace(functionName = functionName, subsystemName = subsystem.subsystem)
     # Get the function
-    sortFunction = getattr(currentModule, functionName, None)
+    sortFunction = retrievePlugin("create{}HistogramGroups", subsystem.subsystem)
     if sortFunction is not None:
-        sortFunction(subsystem)
+        callPlugin(sortFunction, subsystem)
         return True
 
     # If it doesn't work for any reason, return false so that we can create a default
@@ -178,17 +405,32 @@ def findFunctionsForHist(subsystem, hist):
         This function must handle all possible histograms for a subsystem, so it is strongly
         recommended to select them via hist name or another property.
 
+    Note:
+        The functions which are assigned to a hist are cached by subsystem and hist name, so the plugin is
+        only called the first time that a hist name is seen in this process. For further runs, the cached
+        functions are assigned directly. Consequently, the assigned functions must only depend on the hist name.
+
     Args:
         subsystem (subsystemContainer): Current subsystem container.
         hist (histogramContainer): Current histogram to be processed.
     Returns:
         None.
+    Raises:
+        ValueError: If an assigned function has an invalid signature.
     """
-    functionName = "findFunctionsFor{}Histogram".format(subsystem.subsystem)
-    functionName = subsystemNamespace(functionName = functionName, subsystemName = subsystem.subsystem)
-    findFunction = getattr(currentModule, functionName, None)
+    key = (subsystem.subsystem, hist.histName)
+    if key in histFunctionsCache:
+        hist.functionsToApply.extend(histFunctionsCache[key])
+        return
+
+    findFunction = retrievePlugin("findFunctionsFor{}Histogram", subsystem.subsystem)
     if findFunction is not None:
-        findFunction(subsystem, hist)
+        nExistingFunctions = len(hist.functionsToApply)
+        callPlugin(findFunction, subsystem, hist)
+        functions = list(hist.functionsToApply[nExistingFunctions:])
+        for func in functions:
+            validateFunction(func, nHistFunctionArgs, "processing function for {histName}".format(histName = hist.histName))
+        histFunctionsCache[key] = functions
     else:
         logger.info("Could not find histogram function for subsystem {subsystem}".format(subsystem = subsystem.subsystem))
 
@@ -206,17 +448,104 @@ def defineTrendingObjects(subsystem):
     Returns:
         dict: Keys are the name of the trending objects, while values are the trending objects themselves.
     """
-    functionName = "define{}TrendingObjects".format(subsystem)
-    functionName = subsystemNamespace(functionName = functionName, subsystemName = subsystem)
-    defineTrendingFunction = getattr(currentModule, functionName, None)
+    defineTrendingFunction = retrievePlugin("define{}TrendingObjects", subsystem)
     trending = {}
     if defineTrendingFunction is not None:
-        trending = defineTrendingFunction(trending)
+        trending = callPlugin(defineTrendingFunction, trending)
     else:
         logger.info("Could not find histogram trending function for subsystem {subsystem}".format(subsystem = subsystem))
 
     return trending
 
+def createHistogramContainers(subsystem, keysInFile):
+    """ Create the histogram containers of a subsystem based on the histograms in a file.
+
+    These are the setup steps for a new subsystem in ``processRuns.processRootFile()``, from creating the histogram
+    containers for the histograms in the file, through calling the routing plugin functions above, to determining the
+    processing functions of each sorted histogram. The histograms themselves aren't read (except to extract the
+    number of events).
+
+    Args:
+        subsystem (subsystemContainer): Current subsystem container.
+        keysInFile (TList): Keys of the file which contains the histograms. The file must still be open.
+    Returns:
+        None. However, the hist containers and groups of the subsystem are modified.
+    """
+    for key in keysInFile:
+        classOfObject = ROOT.TClass.GetClass(key.GetClassName())
+        if classOfObject.InheritsFrom(ROOT.TH1.Class()):
+            # Create histogram object
+            hist = processingClasses.histogramContainer(key.GetName())
+            # Wait to read the object until we are actually going to process it.
+            hist.hist = None
+            hist.canvas = None
+            # However, store the object type so we know how to configure it without the underlying
+            # hist being available.
+            hist.histType = classOfObject
+
+            # Store the histogram container so we can continue processing.
+            subsystem.histsInFile[hist.histName] = hist
+
+            # Extract the number of events if the proper histogram is available.
+            # NOTE: This requires other histograms not to have "events" in their name,
+            #       but so far (Aug 2018), this seems to be a reasonable assumption.
+            if "events" in hist.histName.lower():
+                subsystem.nEvents = key.ReadObj().GetBinContent(1)
+
+    # Create additional histograms
+    #logger.debug("pre  create additional histsAvailable: {}".format(", ".join(subsystem.histsAvailable.keys())))
+    createAdditionalHistograms(subsystem)
+    #logger.debug("post create additional histsAvailable: {}".format(", ".join(subsystem.histsAvailable.keys())))
+
+    # Create the subsystem stacks
+    createHistogramStacks(subsystem)
+
+    # Customize histogram traits
+    setHistogramOptions(subsystem)
+
+    # Create histogram sorting groups
+    if not subsystem.histGroups:
+        sortingSuccess = createHistGroups(subsystem)
+        if sortingSuccess is False:
+            logger.debug("Subsystem {subsystem} does not have a sorting function. Adding all histograms into one group!".format(subsystem = subsystem.subsystem))
+
+            if subsystem.fileLocationSubsystem != subsystem.subsystem:
+                selection = subsystem.subsystem
+            else:
+                # NOTE: In addition to being a normal option, this ensures that the HLT will always catch all
+                #       extra histograms from HLT files!
+                #       However, having this selection for other subsystems is dangerous, because it will include
+                #       many unrelated hists
+                selection = ""
+            logger.info("selection: {selection}".format(selection = selection))
+            subsystem.histGroups.append(processingClasses.histogramGroupContainer(subsystem.subsystem + " Histograms", selection))
+
+    # See how we've done.
+    logger.debug("post groups histsAvailable: {}".format(", ".join(subsystem.histsAvailable.keys())))
+
+    # Finally classify into the groups and determine which functions to apply
+    for hist in subsystem.histsAvailable.values():
+        # Add the histogram name to the proper group
+        classifiedHist = False
+        for group in subsystem.histGroups:
+            if group.selectionPattern in hist.histName:
+                group.histList.append(hist.histName)
+                classifiedHist = True
+                # Break so that we don't have multiple copies of hists!
+                break
+
+        # See if we've classified successfully.
+        logger.debug("{subsystem} hist: {histName} - classified: {classifiedHist}".format(subsystem = subsystem.subsystem, histName = hist.histName, classifiedHist = classifiedHist))
+
+        if classifiedHist:
+            # Determine the processing functions to apply
+            findFunctionsForHist(subsystem, hist)
+            # Add it to the subsystem
+            subsystem.hists[hist.histName] = hist
+        else:
+            # We don't want to process histograms which haven't been defined.
+            logger.debug("Skipping histogram {} since it is not classifiable for subsystem {}".format(hist.histName, subsystem.subsystem))
+
 ###################################################
 # Load detector functions from other modules
 #
@@ -272,3 +601,6 @@ for subsystem in subsystems:
             logger.info("")
     else:
         logger.info("")
+
+    # Resolve and validate the routing plugin functions once, so they don't need to be looked up by name later.
+    dispatchTables[subsystem] = compileDispatchTable(subsystem)
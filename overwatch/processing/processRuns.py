@@ -35,8 +35,8 @@ ROOT.gROOT.ProcessLine("gErrorIgnoreLevel = kWarning;")
 
 # General includes
 import copy
-import hashlib
 import os
+import time
 import uuid
 import logging
 logger = logging.getLogger(__name__)
@@ -51,11 +51,16 @@ from ..base import utilities
 from . import mergeFiles
 from . import pluginManager
 from . import processingClasses
+from . import projections
+from . import runSummaries
+from . import snapshotStore
+from .trending import extraction
+from .trending import store as trendingStore
 from .trending.manager import TrendingManager
 
 
 def processRootFile(filename, outputFormatting, subsystem, processingOptions = None,
-                    forceRecreateSubsystem = False, trendingManager = None):
+                    forceRecreateSubsystem = False, trendingManager = None, histGroupsToProcess = None):
     """ Given a root file, process all histograms for a given subsystem.
 
     Processing includes assigning the contained histograms to a subsystem, allowing for customization via
@@ -77,7 +82,7 @@ def processRootFile(filename, outputFormatting, subsystem, processingOptions = N
     subsystem and could be processed by it later (depending on the configured subsystems).
 
     Note:
-        Trending objects are filled (in ``processHist()``) when the relevant hists are processed in this function.
+        Trending objects are filled when each file is received (see ``trending.extraction``) rather than here.
 
     Args:
         filename (str): The full path to the file to be processed.
@@ -90,6 +95,8 @@ def processRootFile(filename, outputFormatting, subsystem, processingOptions = N
             it will use the default subsystem processing options.
         forceRecreateSubsystem (bool): True if subsystems will be recreated, even if they already exist.
         trendingManager (TrendingManager): Manages the trending subsystem.
+        histGroupsToProcess (list): Selection patterns of the hist groups to be processed. Default: ``None``, which
+            will process all hist groups.
     Returns:
         None. However, the underlying subsystems, histograms, etc, are modified.
     """
@@ -110,80 +117,7 @@ def processRootFile(filename, outputFormatting, subsystem, processingOptions = N
     # Only need to do this the first time for each run
     # We know it is the first run if there are no histograms for this subsystem.
     if not subsystem.hists:
-        for key in keysInFile:
-            classOfObject = ROOT.TClass.GetClass(key.GetClassName())
-            if classOfObject.InheritsFrom(ROOT.TH1.Class()):
-                # Create histogram object
-                hist = processingClasses.histogramContainer(key.GetName())
-                # Wait to read the object until we are actually going to process it.
-                hist.hist = None
-                hist.canvas = None
-                # However, store the object type so we know how to configure it without the underlying
-                # hist being available.
-                hist.histType = classOfObject
-
-                # Store the histogram container so we can continue processing.
-                subsystem.histsInFile[hist.histName] = hist
-
-                # Extract the number of events if the proper histogram is available.
-                # NOTE: This requires other histograms not to have "events" in their name,
-                #       but so far (Aug 2018), this seems to be a reasonable assumption.
-                if "events" in hist.histName.lower():
-                    subsystem.nEvents = key.ReadObj().GetBinContent(1)
-
-        # Create additional histograms
-        #logger.debug("pre  create additional histsAvailable: {}".format(", ".join(subsystem.histsAvailable.keys())))
-        pluginManager.createAdditionalHistograms(subsystem)
-        #logger.debug("post create additional histsAvailable: {}".format(", ".join(subsystem.histsAvailable.keys())))
-
-        # Create the subsystem stacks
-        pluginManager.createHistogramStacks(subsystem)
-
-        # Customize histogram traits
-        pluginManager.setHistogramOptions(subsystem)
-
-        # Create histogram sorting groups
-        if not subsystem.histGroups:
-            sortingSuccess = pluginManager.createHistGroups(subsystem)
-            if sortingSuccess is False:
-                logger.debug("Subsystem {subsystem} does not have a sorting function. Adding all histograms into one group!".format(subsystem = subsystem.subsystem))
-
-                if subsystem.fileLocationSubsystem != subsystem.subsystem:
-                    selection = subsystem.subsystem
-                else:
-                    # NOTE: In addition to being a normal option, this ensures that the HLT will always catch all
-                    #       extra histograms from HLT files!
-                    #       However, having this selection for other subsystems is dangerous, because it will include
-                    #       many unrelated hists
-                    selection = ""
-                logger.info("selection: {selection}".format(selection = selection))
-                subsystem.histGroups.append(processingClasses.histogramGroupContainer(subsystem.subsystem + " Histograms", selection))
-
-        # See how we've done.
-        logger.debug("post groups histsAvailable: {}".format(", ".join(subsystem.histsAvailable.keys())))
-
-        # Finally classify into the groups and determine which functions to apply
-        for hist in subsystem.histsAvailable.values():
-            # Add the histogram name to the proper group
-            classifiedHist = False
-            for group in subsystem.histGroups:
-                if group.selectionPattern in hist.histName:
-                    group.histList.append(hist.histName)
-                    classifiedHist = True
-                    # Break so that we don't have multiple copies of hists!
-                    break
-
-            # See if we've classified successfully.
-            logger.debug("{subsystem} hist: {histName} - classified: {classifiedHist}".format(subsystem = subsystem.subsystem, histName = hist.histName, classifiedHist = classifiedHist))
-
-            if classifiedHist:
-                # Determine the processing functions to apply
-                pluginManager.findFunctionsForHist(subsystem, hist)
-                # Add it to the subsystem
-                subsystem.hists[hist.histName] = hist
-            else:
-                # We don't want to process histograms which haven't been defined.
-                logger.debug("Skipping histogram {} since it is not classifiable for subsystem {}".format(hist.histName, subsystem.subsystem))
+        pluginManager.createHistogramContainers(subsystem, keysInFile)
 
     # Set the proper processing options
     # If it was passed in, it was probably from time slices
@@ -195,24 +129,40 @@ def processRootFile(filename, outputFormatting, subsystem, processingOptions = N
     # Start of run should unique to each run!
     canvas = ROOT.TCanvas("processRunsCanvas{}{}".format(subsystem.subsystem, subsystem.startOfRun),
                           "processRunsCanvas{}{}".format(subsystem.subsystem, subsystem.startOfRun))
-    # Loop over histograms and draw
+
+    # Determine the histograms to process
+    histsToProcess = []
     for histGroup in subsystem.histGroups:
-        for histName in histGroup.histList:
-            # Retrieve histogram container and underlying histogram
-            hist = subsystem.hists[histName]
+        if histGroupsToProcess is not None and histGroup.selectionPattern not in histGroupsToProcess:
+            continue
+        histsToProcess.extend(subsystem.hists[histName] for histName in histGroup.histList)
+    # Histograms which are projected from the same source histogram are projected together.
+    projectionEngine = projections.ProjectionEngine(fIn = fIn, subsystem = subsystem,
+                                                    processingOptions = processingOptions,
+                                                    hists = histsToProcess)
+
+    # Loop over histograms and draw
+    for hist in histsToProcess:
+        # Retrieve the underlying histogram
+        projected = projectionEngine.isRegistered(hist)
+        if projected:
+            retrievedHist = projectionEngine.retrieveProjection(hist)
+        else:
             retrievedHist = hist.retrieveHistogram(fIn = fIn, ROOT = ROOT)
-            if not retrievedHist:
-                # We first log at info level so the information is available, and then we fire a warning
-                # at the warning level. We've split these up so that the warning doesn't end up as a different
-                # entry in sentry for every different histogram.
-                logger.info("Could not retrieve histogram for hist {}, histList: {}".format(hist.histName, hist.histList))
-                # Disable the warning level log - it seems that this can happen at times when a file just lacks
-                # the file for whatever reason (even if it was present before in the same). The best we can do is log
-                # it internally (ie not to sentry) and continue.
-                #logger.warning("Could not retrieve histogram!")
-                continue
-            processHist(subsystem = subsystem, hist = hist, canvas = canvas, outputFormatting = outputFormatting,
-                        processingOptions = processingOptions, trendingManager = trendingManager)
+        if not retrievedHist:
+            # We first log at info level so the information is available, and then we fire a warning
+            # at the warning level. We've split these up so that the warning doesn't end up as a different
+            # entry in sentry for every different histogram.
+            logger.info("Could not retrieve histogram for hist {}, histList: {}".format(hist.histName, hist.histList))
+            # Disable the warning level log - it seems that this can happen at times when a file just lacks
+            # the file for whatever reason (even if it was present before in the same). The best we can do is log
+            # it internally (ie not to sentry) and continue.
+            #logger.warning("Could not retrieve histogram!")
+            continue
+        processHist(subsystem = subsystem, hist = hist, canvas = canvas, outputFormatting = outputFormatting,
+                    processingOptions = processingOptions, trendingManager = trendingManager,
+                    applyProjectionFunctions = not projected)
+    projectionEngine.clear()
 
     # Delete the canvas. Although ROOT will mostly likely handle this eventually, the
     # garbage collection doesn't have to happen immediately. So we help it out by explictly
@@ -224,11 +174,11 @@ def processRootFile(filename, outputFormatting, subsystem, processingOptions = N
     fIn.Close()
 
 def processHist(subsystem, hist, canvas, outputFormatting, processingOptions,
-                subsystemName = None, trendingManager = None):
+                subsystemName = None, trendingManager = None, applyProjectionFunctions = True):
     """ Main histogram processing function.
 
     This function is responsible for taking a given ``histogramContainer``, process the underlying histogram
-    via processing functions, fill trending objects (if applicable), and then store the result in images and
+    via processing functions, attach trending alarms (if applicable), and then store the result in images and
     ``json`` for display in the web app. Here, we execute the plug-in functionality assigned earlier and
     perform the actual drawing of the hist onto a canvas.
 
@@ -272,8 +222,10 @@ def processHist(subsystem, hist, canvas, outputFormatting, processingOptions,
             for processing the trending objects where we don't have access to their corresponding ``subsystemContainer``.
             The subsystem name of the ``trendingContainer`` (``TDG``) does not necessarily correspond to the subsystem
             of the object being processed, so we have to pass it here.
-        trendingManager (TrendingManager): Will be notified when as histogram is processed to allow the use of
-            the histogram values in trending.
+        trendingManager (TrendingManager): Provides the alarm messages of the trending objects which use
+            this histogram, so they can be shown with the histogram.
+        applyProjectionFunctions (bool): True if the projection functions of the histogram should be applied.
+            False if the histogram was already projected (such as by the ``ProjectionEngine``). Default: True.
     Returns:
         None. However, the subsystem, histogram, etc are modified and their representations in images
             and ``json`` are written to disk.
@@ -297,9 +249,10 @@ def processHist(subsystem, hist, canvas, outputFormatting, processingOptions,
 
     # Apply projection functions
     # Must be done before drawing!
-    for func in hist.projectionFunctionsToApply:
-        logger.debug("Calling projection func: {func}".format(func = func))
-        hist.hist = func(subsystem, hist, processingOptions)
+    if applyProjectionFunctions:
+        for func in hist.projectionFunctionsToApply:
+            logger.debug("Calling projection func: {func}".format(func = func))
+            hist.hist = pluginManager.callPlugin(func, subsystem, hist, processingOptions)
 
     # Setup and draw histogram
     # Turn off title, but store the value
@@ -311,12 +264,16 @@ def processHist(subsystem, hist, canvas, outputFormatting, processingOptions,
     #logger.debug("Functions to apply: {functionsToApply}".format(functionsToApply = hist.functionsToApply))
     for func in hist.functionsToApply:
         logger.debug("Calling func: {func}".format(func = func))
-        func(subsystem, hist, processingOptions)
+        pluginManager.callPlugin(func, subsystem, hist, processingOptions)
 
     logger.debug("histName: {}, hist: {}".format(hist.histName, hist.hist))
 
     if trendingManager:
-        trendingManager.notifyAboutNewHistogramValue(hist)
+        # The trended values are extracted from each file when it is received (see ``extraction.extractNewFiles()``),
+        # so we only need to show the alarms which were raised for this histogram. The base directory is of the
+        # form ``Run123456/SYS``.
+        runDir = os.path.dirname(subsystem.baseDir)
+        hist.information.update(trendingManager.popAlarmInformation(hist.histName, int(runDir.replace("Run", ""))))
 
     # Save
     outputName = hist.histName
@@ -340,6 +297,7 @@ def processHist(subsystem, hist, canvas, outputFormatting, processingOptions,
         f.write(ROOT.TBufferJSON.ConvertToJSON(canvas).Data().encode())
 
     # Clear hist and canvas so that we can successfully save
+    # NOTE: This also releases hists which were projected by the ``ProjectionEngine``.
     hist.hist = None
     hist.canvas = None
 
@@ -462,20 +420,14 @@ def validateAndCreateNewTimeSlice(run, subsystem, minTimeMinutes, maxTimeMinutes
     minFilteredTimeStamp = filesToMerge[0].fileTime
     maxFilteredTimeStamp = filesToMerge[-1].fileTime
 
-    # Check if the time slice already exists and return if that is the case
-    #logger.info("subsystem.timeSlice: {timeSlices}".format(timeSlices = subsystem.timeSlices))
-    for key, timeSlice in iteritems(subsystem.timeSlices):
-        #logger.info("minFilteredTimeStamp: {minFilteredTimeStamp}, maxFilteredTimeStamp: {maxFilteredTimeStamp}, timeSlice.minTime: {minTime}, timeSlice.maxTime: {maxTime}".format(minFilteredTimeStamp = minFilteredTimeStamp, maxFilteredTimeStamp = maxFilteredTimeStamp, minTime = timeSlice.minTime, maxTime = timeSlice.maxTime))
-        processingOptionsAreTheSame, errors = compareProcessingOptionsDicts(inputProcessingOptions, timeSlice.processingOptions, errors)
-        # Handle errors immediately
-        if errors != {}:
-            return (None, None, errors)
-        if timeSlice.minUnixTimeAvailable == minFilteredTimeStamp and timeSlice.maxUnixTimeAvailable == maxFilteredTimeStamp and processingOptionsAreTheSame:
-            # Already exists - we don't need to re-merge or reprocess
-            return (key, False, None)
-
-    # Hash processing options to ensure that different options with the same times don't overwrite each other!
-    optionsHash = hashlib.sha1(str(inputProcessingOptions).encode()).hexdigest()
+    # Check if the time slice already exists and return if that is the case.
+    # The options are hashed to ensure that different options with the same times don't overwrite each other!
+    optionsHash = processingClasses.timeSliceContainer.hashProcessingOptions(inputProcessingOptions)
+    existingKey = subsystem.findTimeSlice(minFilteredTimeStamp, maxFilteredTimeStamp, optionsHash)
+    if existingKey is not None:
+        # Already exists - we don't need to re-merge or reprocess
+        return (existingKey, False, None)
+
     # Determine index by ``UUID`` to ensure that there is no clash in the dict keys.
     timeSliceCont = processingClasses.timeSliceContainer(minUnixTimeRequested = minTimeCutUnix,
                                                          maxUnixTimeRequested = maxTimeCutUnix,
@@ -489,13 +441,116 @@ def validateAndCreateNewTimeSlice(run, subsystem, minTimeMinutes, maxTimeMinutes
     for key, val in iteritems(inputProcessingOptions):
         timeSliceCont.processingOptions[key] = val
 
-    # Store the final result in the time slices dictionary for future reference.
+    # Store the final result in the time slices cache for future reference.
     uuidDictKey = str(uuid.uuid4())
-    subsystem.timeSlices[uuidDictKey] = timeSliceCont
+    subsystem.addTimeSlice(uuidDictKey, timeSliceCont)
 
     return (uuidDictKey, True, None)
 
-def processTimeSlices(runs, runDir, minTimeRequested, maxTimeRequested, subsystemName, inputProcessingOptions):
+def determineHistGroupsToProcessFirst(subsystem, histGroup):
+    """ Split the subsystem hist groups into those which should be rendered immediately and the rest.
+
+    The hist group which is displayed for a given request is rendered first. This follows the run page, where
+    the first non-empty hist group is displayed if no hist group is selected.
+
+    Args:
+        subsystem (subsystemContainer): Subsystem for which the hist groups should be rendered.
+        histGroup (str): Selection pattern of the requested hist group. It is fine for it to be an empty string.
+            ``None`` corresponds to no hist group being selected.
+    Returns:
+        tuple: (histGroupsToProcess, remainingHistGroups) where histGroupsToProcess (list) contains the selection
+            patterns of the hist groups to render immediately (or is ``None`` if all should be rendered because
+            the requested hist group couldn't be found), and remainingHistGroups (list) contains the selection
+            patterns of the other non-empty hist groups.
+    """
+    selectionPatterns = [group.selectionPattern for group in subsystem.histGroups if group.histList]
+    if histGroup is None and selectionPatterns:
+        histGroup = selectionPatterns[0]
+    if histGroup not in selectionPatterns:
+        return (None, [])
+
+    return ([histGroup], [pattern for pattern in selectionPatterns if pattern != histGroup])
+
+def timeSliceOutputFormatting(timeSlice):
+    """ Determine the output formatting used to save the histograms of a time slice.
+
+    Args:
+        timeSlice (timeSliceContainer): Time slice which is being processed.
+    Returns:
+        str: Output formatting string in the format expected by ``processRootFile()``.
+    """
+    return os.path.join("{base}", "%(prefix)s.{name}.{ext}" % {"prefix": timeSlice.filenamePrefix})
+
+def renderTimeSliceHistGroups(subsystem, timeSlice, histGroupsToProcess):
+    """ Render hist groups of a time slice which were not rendered when the time slice was created.
+
+    Args:
+        subsystem (subsystemContainer): Subsystem to which the time slice belongs.
+        timeSlice (timeSliceContainer): Time slice whose hist groups should be rendered.
+        histGroupsToProcess (list): Selection patterns of the pending hist groups to render.
+    Returns:
+        None. The hist groups are no longer pending.
+    """
+    logger.info("Rendering pending hist groups {histGroups} for time slice {filenamePrefix}".format(histGroups = histGroupsToProcess, filenamePrefix = timeSlice.filenamePrefix))
+    processRootFile(timeSlice.mergedFilePath(subsystem),
+                    timeSliceOutputFormatting(timeSlice), subsystem,
+                    processingOptions = timeSlice.processingOptions,
+                    histGroupsToProcess = histGroupsToProcess)
+    for pattern in histGroupsToProcess:
+        timeSlice.pendingHistGroups.remove(pattern)
+
+def processPendingTimeSlices(subsystem):
+    """ Render the pending hist groups of all time slices of a subsystem.
+
+    When a time slice is created, only the requested hist group is rendered, so the user doesn't have to wait
+    for the entire subsystem. The other hist groups are rendered in the background by the standard processing
+    through this function. If one of them is requested before it was rendered, it's rendered on request
+    instead (see ``processPendingTimeSliceHistGroups()``).
+
+    Args:
+        subsystem (subsystemContainer): Subsystem whose time slices should be rendered.
+    Returns:
+        int: Number of hist groups which were rendered.
+    """
+    nRendered = 0
+    for timeSlice in list(subsystem.timeSlices.values()):
+        histGroupsToProcess = list(getattr(timeSlice, "pendingHistGroups", []))
+        if not histGroupsToProcess:
+            continue
+        if not os.path.exists(timeSlice.mergedFilePath(subsystem)):
+            logger.warning("Merged file for time slice {filenamePrefix} is not available, so its pending hist groups cannot be rendered.".format(filenamePrefix = timeSlice.filenamePrefix))
+            continue
+        renderTimeSliceHistGroups(subsystem, timeSlice, histGroupsToProcess)
+        nRendered += len(histGroupsToProcess)
+    return nRendered
+
+def processPendingTimeSliceHistGroups(subsystem, timeSlice, histGroup):
+    """ Render a hist group of a time slice which was requested before it was rendered in the background.
+
+    When a time slice is created, only the requested hist group is rendered. The other hist groups are
+    rendered by the standard processing (see ``processPendingTimeSlices()``), but if one of them is requested
+    from the run page first, it's rendered through this function so that it can be displayed.
+
+    Args:
+        subsystem (subsystemContainer): Subsystem to which the time slice belongs.
+        timeSlice (timeSliceContainer): Time slice for which the hist group was requested.
+        histGroup (str): Selection pattern of the requested hist group. ``None`` corresponds to no hist group
+            being selected, in which case the first hist group is used.
+    Returns:
+        bool: True if the hist group was rendered.
+    """
+    histGroupsToProcess, _ = determineHistGroupsToProcessFirst(subsystem, histGroup)
+    if histGroupsToProcess is None:
+        return False
+    histGroupsToProcess = [pattern for pattern in histGroupsToProcess if timeSlice.isHistGroupPending(pattern)]
+    if not histGroupsToProcess:
+        return False
+
+    renderTimeSliceHistGroups(subsystem, timeSlice, histGroupsToProcess)
+
+    return True
+
+def processTimeSlices(runs, runDir, minTimeRequested, maxTimeRequested, subsystemName, inputProcessingOptions, histGroup = None):
     """ Creates a time slice or performs user directed reprocessing.
 
     Time slices are created by processing a given run using only data in a given time range (and potentially modifying the
@@ -518,6 +573,9 @@ def processTimeSlices(runs, runDir, minTimeRequested, maxTimeRequested, subsyste
         subsystemName (str): The subsystem of the time slice request by three letter, all capital name (ex. ``EMC``).
         inputProcessingOptions (dict): Processing options requested for the time slice. Keys are the names of
         the options, while values are the actual values of the processing options.
+        histGroup (str): Selection pattern of the hist group which was requested. Only this hist group is rendered
+            immediately, while the other hist groups are rendered when they are requested. Default: ``None``, which
+            corresponds to the first hist group.
     Returns:
         str or dict: If successful, we return the time slice key (str) under which the requested time slice is stored
             in the ``subsystemContainer.timeSlices`` dictionary. If an error was encountered, we return an error
@@ -536,6 +594,8 @@ def processTimeSlices(runs, runDir, minTimeRequested, maxTimeRequested, subsyste
     # Along this may be a bit slow, we do it here so that the most up to date information is available for
     # the time slice - particularly in the case of an ongoing run.
     runDict = utilities.moveRootFiles(processingParameters["dirPrefix"], processingParameters["subsystemList"])
+    # NOTE: The run summaries of these runs are updated by the next standard processing, since the moved
+    #       files mark the subsystems as having new files.
     processMovedFilesIntoRuns(runs, runDict)
 
     # Validate and create (or retrieve) the ``timeSliceContainer``.
@@ -549,35 +609,51 @@ def processTimeSlices(runs, runDir, minTimeRequested, maxTimeRequested, subsyste
     timeSlice = subsystem.timeSlices[timeSliceKey]
 
     # Merge the files that are included in the time slice.
-    # Return if there were errors in merging
-    try:
-        mergeFiles.merge(processingParameters["dirPrefix"], run, subsystem,
-                         cumulativeMode = processingParameters["cumulativeMode"],
-                         timeSlice = timeSlice)
-    except ValueError as e:
-        # Return the merge error to the user.
-        # We want to return a list, so we just return all of the args.
-        return {"Merge Error": e.args}
+    # The merged file is shared between time slices over the same files, so if only the processing options
+    # differ from an existing time slice, we can skip directly to processing.
+    if os.path.exists(timeSlice.mergedFilePath(subsystem)):
+        logger.info("Using existing merged file {filename} for the time slice.".format(filename = timeSlice.filename.filename))
+    else:
+        # Return if there were errors in merging
+        try:
+            mergeFiles.merge(processingParameters["dirPrefix"], run, subsystem,
+                             cumulativeMode = processingParameters["cumulativeMode"],
+                             timeSlice = timeSlice)
+        except ValueError as e:
+            # Remove the failed time slice so that it isn't returned from the cache by the next request.
+            subsystem.removeTimeSlice(timeSliceKey)
+            # Return the merge error to the user.
+            # We want to return a list, so we just return all of the args.
+            return {"Merge Error": e.args}
 
     # Print time slice request variables for log
     logger.debug("Time slice request values:")
     logger.debug("subsystem.subsystem: {subsystem}, subsystem.fileLocationSubsystem: {fileLocationSubsystem}, minTimeRequested: {minTimeRequested}, maxTimeRequested: {maxTimeRequested}".format(subsystem = subsystem.subsystem, fileLocationSubsystem = subsystem.fileLocationSubsystem, minTimeRequested = minTimeRequested, maxTimeRequested = maxTimeRequested))
 
     # Generate the histograms
-    outputFormattingSave = os.path.join("{base}", "%(prefix)s.{name}.{ext}" % {"prefix": timeSlice.filenamePrefix})
+    # Only the requested hist group is rendered now so that the user doesn't have to wait for the entire
+    # subsystem. The remaining hist groups are rendered by the standard processing (or when they are requested).
+    outputFormattingSave = timeSliceOutputFormatting(timeSlice)
+    histGroupsToProcess, pendingHistGroups = determineHistGroupsToProcessFirst(subsystem, histGroup)
+    timeSlice.pendingHistGroups.extend(pendingHistGroups)
     logger.debug("outputFormattingSave: {}".format(outputFormattingSave))
-    logger.debug("path: {}".format(os.path.join(processingParameters["dirPrefix"],
-                                                subsystem.baseDir,
-                                                timeSlice.filename.filename)))
+    logger.debug("path: {}".format(timeSlice.mergedFilePath(subsystem)))
     logger.debug("timeSlice.processingOptions: {}".format(timeSlice.processingOptions))
-    processRootFile(os.path.join(processingParameters["dirPrefix"],
-                                 subsystem.baseDir,
-                                 timeSlice.filename.filename),
+    logger.debug("histGroupsToProcess: {}, pendingHistGroups: {}".format(histGroupsToProcess, pendingHistGroups))
+    processRootFile(timeSlice.mergedFilePath(subsystem),
                     outputFormattingSave, subsystem,
-                    processingOptions = timeSlice.processingOptions)
+                    processingOptions = timeSlice.processingOptions,
+                    histGroupsToProcess = histGroupsToProcess)
 
     logger.info("Finished processing {prettyName}!".format(prettyName = run.prettyName))
 
+    # Keep the time slice cache bounded. The newly requested time slice is always kept.
+    evictedKeys = subsystem.enforceTimeSliceCacheLimits(maxEntries = processingParameters["timeSliceCacheMaxEntries"],
+                                                        maxBytes = processingParameters["timeSliceCacheMaxBytes"],
+                                                        keepKey = timeSliceKey)
+    if evictedKeys:
+        logger.info("Evicted {n} time slice(s) from the cache: {evictedKeys}".format(n = len(evictedKeys), evictedKeys = evictedKeys))
+
     # No errors, so return the key
     return timeSliceKey
 
@@ -811,10 +887,11 @@ def processAllRuns(db = None):
 
     - Retrieve the run information or recreate it if it doesn't exist. If recreated, it will be populated
       with existing information already stored in the data directory.
-    - Retrieve the trending object or recreate it if it doesn't exist. As of August 2018, the trending
-      objects will be empty when recreated.
+    - Retrieve the trending object or recreate it if it doesn't exist. Recreated trending objects are empty,
+      but they can be caught up via ``overwatchTrendingBackfill``.
     - Move new files into the Overwatch file structure and create runs and/or subsystems from those new files.
       If the corresponding objects already exist, then they are updated.
+    - Extract the trended values from each new file.
     - Perform the actual processing, which includes executing the subsystem (detector) plug-in functionality.
       The processing will only be performed if necessary (ie if there are new files which need processing).
       This can also be overridden by specifically requesting reprocessing.
@@ -843,6 +920,9 @@ def processAllRuns(db = None):
         db = getDatabaseFactory().getDB()
         created_connection_in_this_function = True
 
+    # Runs whose summaries need to be updated (in addition to those which are missing). See ``runSummaries``.
+    updatedRunDirs = set()
+
     # Setup the runs dict by either retrieving it or recreating it.
     if db.contains("runs") and databaseParameters["databaseType"] == "zodb":
         # The objects already exist, so we use the existing information.
@@ -853,10 +933,12 @@ def processAllRuns(db = None):
         # At the end of the previous processing run, this flag wasn't clear so we can know
         # which files were just processed. Since we are now starting a new processing run,
         # we now must be clear this flag so we don't reprocess those runs again.
-        for run in itervalues(runs):
+        for runDir, run in iteritems(runs):
             for subsystem in itervalues(run.subsystems):
                 if subsystem.newFile:
                     subsystem.newFile = False
+                    # The run summary stores whether there was a new file, so it must be updated.
+                    updatedRunDirs.add(runDir)
     else:
         # Create the runs tree to store the information
         db.set("runs", {})
@@ -947,6 +1029,8 @@ def processAllRuns(db = None):
     # Set up the trending.
     if processingParameters["trending"]:
         trendingManager = TrendingManager(db, processingParameters)
+        # Continue with the existing trended values (unless recreating was requested).
+        trendingManager.restoreTrendingObjects()
         trendingManager.createTrendingObjects()
     else:
         trendingManager = None
@@ -958,6 +1042,19 @@ def processAllRuns(db = None):
     runDict = utilities.moveRootFiles(processingParameters["dirPrefix"], processingParameters["subsystemList"])
     logger.info("Files moved: {runDict}".format(runDict = runDict))
     processMovedFilesIntoRuns(runs, runDict)
+    updatedRunDirs.update(runDict)
+
+    # Extract the trended values from each new file, so the trending doesn't depend on how often we process.
+    if trendingManager:
+        extractedFiles = extraction.extractNewFiles(trendingManager, runs, runDict, processingParameters["dirPrefix"])
+        # If the alarms are evaluated in a batch, evaluate them now, such that the messages are available when
+        # the histograms are processed.
+        trendingManager.processAlarms()
+
+    # Store the content of the new files as arrays, such that it is available without ROOT.
+    # See ``overwatch.processing.snapshotStore``.
+    if processingParameters["snapshotStore"]:
+        snapshotStore.ingestRuns(runs, processingParameters["dirPrefix"])
 
     # Potentially helpful debug information
     if processingParameters["debug"]:
@@ -993,26 +1090,42 @@ def processAllRuns(db = None):
                     forceRecreateSubsystem = processingParameters["forceRecreateSubsystem"],
                     trendingManager = trendingManager,
                 )
-                # TODO need additional info
-                # As of August 2018, this is where the trending container should step in to
-                # update the trending objects if they are not entirely up to date (say, if they're
-                # missing entries because the trending objects were recreated).
-                # TODO: Loop over process root file with various until it is up to date
+                # Note when the outputs were updated so that the web app knows that cached pages are stale.
+                subsystem.lastProcessed = time.time()
+                # NOTE: If the trending objects are not entirely up to date (say, if they're missing entries
+                #       because the trending objects were recreated), they can be caught up from the stored
+                #       files via ``overwatchTrendingBackfill``. See ``overwatch.processing.trending.backfill``.
                 pass
             else:
                 # We often want to skip processing since most runs won't have new files and will not need to be processed most times.
                 logger.debug("Don't need to process {prettyName} for subsystem {subsystem}. It has already been processed".format(prettyName = run.prettyName, subsystem = subsystem.subsystem))
 
+            # Render the hist groups of time slices which weren't rendered when they were requested.
+            nRendered = processPendingTimeSlices(subsystem)
+            if nRendered:
+                logger.info("Rendered {nRendered} pending time slice hist groups for {prettyName}, {subsystem}".format(nRendered = nRendered, prettyName = run.prettyName, subsystem = subsystem.subsystem))
+
         # Commit after we have successfully processed each run
         db.commit()
 
     logger.info("Finished standard processing!")
 
+    # Update the summary index which is used for the run list, such that the web app doesn't need to load the runs.
+    if not db.contains("runSummaries"):
+        db.set("runSummaries", runSummaries.createRunSummaries(btree = databaseParameters["databaseType"] == "zodb"))
+    nUpdated = runSummaries.updateRunSummaries(db.get("runSummaries"), runs, runDirs = updatedRunDirs)
+    logger.debug("Updated {nUpdated} run summaries".format(nUpdated = nUpdated))
+    db.commit()
+    # Make slow plugin functions visible.
+    pluginManager.pluginTimer.logSummary()
+
     # Run trending now that we have gotten to the most recent run
     if trendingManager:
         trendingManager.processTrending()
         db.set('trending', trendingManager.subsystems)
         db.commit()
+        # Note the extracted files so that they aren't extracted again by a backfill.
+        trendingStore.updateCheckpoints(processingParameters["dirPrefix"], extractedFiles)
         logger.info("Finished trending processing!")
 
     # Add users and secret key if debugging
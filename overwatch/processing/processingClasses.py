@@ -25,6 +25,8 @@ import BTrees.OOBTree
 import persistent
 
 import os
+import glob
+import hashlib
 import pendulum
 import logging
 # Setup logger
@@ -242,6 +244,14 @@ class subsystemContainer(persistent.Persistent):
         timeSlices (BTree): Dict-like object which describes subsystem time slices. A UUID is the dict key (so they
             can be uniquely identified), while a timeSliceContainer with the corresponding time slice properties
             is the value.
+        timeSlicesIndex (BTree): Dict-like object which indexes the time slice cache. Keys are
+            ``(minUnixTimeAvailable, maxUnixTimeAvailable, optionsHash)`` tuples, while values are the corresponding
+            UUID keys in ``timeSlices``. Use ``findTimeSlice()`` rather than accessing it directly.
+        timeSlicesUsage (PersistentList): UUID keys of the time slices, ordered from least to most recently used.
+            It determines which time slice is evicted first when the cache limits are exceeded.
+        timeSlicesMergedFiles (BTree): Dict-like object which reference counts the merged time slice ROOT files.
+            Keys are ``(minUnixTimeAvailable, maxUnixTimeAvailable)`` tuples, while values are the number of time
+            slices which use the merged file for that range of files.
         combinedFile (fileContainer): File container corresponding to the combined file.
         baseDir (str): Path to the base storage directory for the subsystem. Of the form ``Run123456/SYS``.
         imgDir (str): Path to the image storage directory for the subsystem. Of the form ``Run123456/SYS/img``.
@@ -264,6 +274,8 @@ class subsystemContainer(persistent.Persistent):
             and it was processed, this flag should only be changed to ``False`` after the next processing iteration
             begins. This allows the status of the run (determined through the subsystem) to be displayed in the web app.
             Default: True because if the subsystem is being created, we likely need reprocessing.
+        lastProcessed (float): Unix time at which the standard processing last updated the subsystem. It is used by the
+            web app to determine whether cached pages are still up to date. Default: 0, which means not yet processed.
         nEvents (int): Number of events in the subsystem. Processing will look for a histogram that contains ``events``
             in the name and attempt to extract the number of events based on the number of entries. Should not be used
             unless the subsystem explicitly includes a histogram with the number of events. Default: 1.
@@ -296,6 +308,10 @@ class subsystemContainer(persistent.Persistent):
         # Contains all files for that particular run
         self.files = BTrees.OOBTree.BTree()
         self.timeSlices = persistent.mapping.PersistentMapping()
+        # Index, usage order, and merged file reference counts for the time slice cache
+        self.timeSlicesIndex = BTrees.OOBTree.BTree()
+        self.timeSlicesUsage = persistent.list.PersistentList()
+        self.timeSlicesMergedFiles = BTrees.OOBTree.BTree()
         # Only one combined file, so we do not need a dict!
         self.combinedFile = None
 
@@ -320,6 +336,8 @@ class subsystemContainer(persistent.Persistent):
         # True if we received a new file, therefore leading to reprocessing
         # If the subsystem is being created, we likely need reprocessing, so defaults to true
         self.newFile = True
+        # Time of the most recent standard processing. Set by the processing.
+        self.lastProcessed = 0
 
         # Number of events in the subsystem. The processing will attempt to determine the number of events,
         # but it is a subsystem dependent quantity. It needs explicit support.
@@ -430,6 +448,150 @@ class subsystemContainer(persistent.Persistent):
         self.histsAvailable.clear()
         self.hists.clear()
 
+    def _timeSlicesCacheIndex(self):
+        """ Retrieve the time slice cache index, building it if necessary.
+
+        Subsystems which were stored before the index (or the merged file reference counts) were introduced
+        don't have them available, so they are built from the existing time slices. Those time slices are
+        considered to be used in the order in which they are stored.
+
+        Args:
+            None
+        Returns:
+            BTree: The time slice cache index. See ``timeSlicesIndex``.
+        """
+        if not hasattr(self, "timeSlicesIndex"):
+            self.timeSlicesIndex = BTrees.OOBTree.BTree()
+            self.timeSlicesUsage = persistent.list.PersistentList()
+            for key, timeSlice in iteritems(self.timeSlices):
+                self.timeSlicesIndex[timeSlice.cacheKey()] = key
+                self.timeSlicesUsage.append(key)
+        if not hasattr(self, "timeSlicesMergedFiles"):
+            self.timeSlicesMergedFiles = BTrees.OOBTree.BTree()
+            for timeSlice in itervalues(self.timeSlices):
+                # Time slices created before the merged file was shared have their own ROOT file, so they
+                # don't take a reference to the shared merged file.
+                if not timeSlice.sharesMergedFile():
+                    continue
+                fileRange = timeSlice.fileRange()
+                self.timeSlicesMergedFiles[fileRange] = self.timeSlicesMergedFiles.get(fileRange, 0) + 1
+        return self.timeSlicesIndex
+
+    def findTimeSlice(self, minUnixTimeAvailable, maxUnixTimeAvailable, optionsHash):
+        """ Find an existing time slice in the cache.
+
+        If the time slice is found, it is marked as the most recently used.
+
+        Args:
+            minUnixTimeAvailable (int): Minimum unix time of the files in the time slice.
+            maxUnixTimeAvailable (int): Maximum unix time of the files in the time slice.
+            optionsHash (str): Hash of the processing options of the time slice.
+        Returns:
+            str: Key under which the time slice is stored in ``timeSlices``, or ``None`` if it doesn't exist.
+        """
+        key = self._timeSlicesCacheIndex().get((minUnixTimeAvailable, maxUnixTimeAvailable, optionsHash))
+        if key is not None:
+            self.timeSlicesUsage.remove(key)
+            self.timeSlicesUsage.append(key)
+        return key
+
+    def addTimeSlice(self, key, timeSlice):
+        """ Store a new time slice in the cache as the most recently used time slice.
+
+        The time slice also takes a reference to the merged ROOT file for its file range, which is
+        shared with any other time slices over the same files (ie. which only differ in processing options).
+
+        Args:
+            key (str): Key under which the time slice should be stored in ``timeSlices``.
+            timeSlice (timeSliceContainer): Time slice to be stored.
+        Returns:
+            None.
+        """
+        self._timeSlicesCacheIndex()[timeSlice.cacheKey()] = key
+        self.timeSlicesUsage.append(key)
+        fileRange = timeSlice.fileRange()
+        self.timeSlicesMergedFiles[fileRange] = self.timeSlicesMergedFiles.get(fileRange, 0) + 1
+        self.timeSlices[key] = timeSlice
+
+    def removeTimeSlice(self, key):
+        """ Remove a time slice from the cache, including the files that it created.
+
+        The image and json files that were created when processing the time slice are always removed.
+        The merged ROOT file is only removed once no other time slice refers to it.
+
+        Args:
+            key (str): Key under which the time slice is stored in ``timeSlices``.
+        Returns:
+            None.
+        """
+        timeSlice = self.timeSlices[key]
+        filenames = timeSlice.outputFilenames(self)
+
+        index = self._timeSlicesCacheIndex()
+        if timeSlice.sharesMergedFile():
+            fileRange = timeSlice.fileRange()
+            references = self.timeSlicesMergedFiles.get(fileRange, 1) - 1
+            if references > 0:
+                self.timeSlicesMergedFiles[fileRange] = references
+            else:
+                self.timeSlicesMergedFiles.pop(fileRange, None)
+                filenames.append(timeSlice.mergedFilePath(self))
+        else:
+            # Time slices created before the merged file was shared have their own ROOT file, so it can always be removed.
+            filenames.append(timeSlice.mergedFilePath(self))
+
+        for filename in filenames:
+            if os.path.exists(filename):
+                logger.debug("Removing time slice file {filename}".format(filename = filename))
+                os.remove(filename)
+
+        if timeSlice.cacheKey() in index:
+            del index[timeSlice.cacheKey()]
+        if key in self.timeSlicesUsage:
+            self.timeSlicesUsage.remove(key)
+        del self.timeSlices[key]
+
+    def enforceTimeSliceCacheLimits(self, maxEntries, maxBytes, keepKey = None):
+        """ Evict the least recently used time slices until the cache is within the given limits.
+
+        Args:
+            maxEntries (int): Maximum number of time slices to keep. A value <= 0 disables the limit.
+            maxBytes (int): Maximum size on disk of the files created by the time slices. Shared merged
+                ROOT files are only counted once. A value <= 0 disables the limit.
+            keepKey (str): Key of a time slice which must not be evicted, such as the one which was just
+                requested. Default: ``None``.
+        Returns:
+            list: Keys of the time slices which were evicted.
+        """
+        # Ensure that the index exists before using the usage order.
+        self._timeSlicesCacheIndex()
+        filenames = {}
+        sizes = {}
+        if maxBytes > 0:
+            for key in self.timeSlicesUsage:
+                timeSlice = self.timeSlices[key]
+                filenames[key] = set(timeSlice.outputFilenames(self) + [timeSlice.mergedFilePath(self)])
+                for filename in filenames[key]:
+                    if filename not in sizes and os.path.exists(filename):
+                        sizes[filename] = os.path.getsize(filename)
+
+        def totalSize():
+            remainingFilenames = set().union(*filenames.values()) if filenames else set()
+            return sum(sizes.get(filename, 0) for filename in remainingFilenames)
+
+        evicted = []
+        candidates = [key for key in self.timeSlicesUsage if key != keepKey]
+        for key in candidates:
+            tooManyEntries = maxEntries > 0 and len(self.timeSlices) > maxEntries
+            tooManyBytes = maxBytes > 0 and totalSize() > maxBytes
+            if not tooManyEntries and not tooManyBytes:
+                break
+            self.removeTimeSlice(key)
+            filenames.pop(key, None)
+            evicted.append(key)
+
+        return evicted
+
 class timeSliceContainer(persistent.Persistent):
     """ Time slice information container.
 
@@ -459,11 +621,16 @@ class timeSliceContainer(persistent.Persistent):
         optionsHash (str): SHA1 hash of the processing options used to construct the time slice. This hash
             is used for caching by comparing the processing options for a new time slice request with those
             already processed. If the hashes are the same, we can directly return the already processed result.
-        filenamePrefix (str): Filename for the timeSlice file, based on the given start and end times.
-        filename (fileContainer): File container for the timeSlice file.
+        filenamePrefix (str): Filename prefix for the files created when processing the time slice, based on the
+            given start and end times, as well as the options hash.
+        filename (fileContainer): File container for the merged timeSlice ROOT file. It only depends on the start
+            and end times, so it is shared by time slices which only differ in their processing options.
         processingOptions (PersistentMapping): Implemented by the time slice container to note options used
             during standard processing. The time slice processing options can vary when compared to standard
             subsystem processing, so storing the options allow us to apply the custom time slice options.
+        pendingHistGroups (PersistentList): Selection patterns of the hist groups which have not yet been rendered
+            for this time slice. The requested hist group is rendered immediately, while the others are rendered
+            in the background by the standard processing (or when they are requested, if that happens first).
     """
     def __init__(self, minUnixTimeRequested, maxUnixTimeRequested, minUnixTimeAvailable, maxUnixTimeAvailable, startOfRun, filesToMerge, optionsHash):
         # Requested times
@@ -483,7 +650,8 @@ class timeSliceContainer(persistent.Persistent):
         self.filenamePrefix = "timeSlice.{}.{}.{}".format(self.minUnixTimeAvailable, self.maxUnixTimeAvailable, self.optionsHash)
 
         # Create filename
-        self.filename = fileContainer(self.filenamePrefix + ".root")
+        # The merged file only depends on the files in the time slice, so it is shared between processing options.
+        self.filename = fileContainer(self.mergedFilename(self.minUnixTimeAvailable, self.maxUnixTimeAvailable))
 
         # Processing options
         # Implemented by the detector to note how it was processed that may be changed during time slice processing
@@ -491,6 +659,10 @@ class timeSliceContainer(persistent.Persistent):
         # Same as the type of options implemented in the subsystemContainer!
         self.processingOptions = {}
 
+        # Selection patterns of the hist groups which haven't been rendered yet.
+        # They are rendered when they are first requested.
+        self.pendingHistGroups = persistent.list.PersistentList()
+
     def __repr__(self):
         """ Representation of the object. """
         # Dummy call. See note at the top of the module.
@@ -515,6 +687,97 @@ class timeSliceContainer(persistent.Persistent):
                                                      filesToMerge = self.filesToMerge,
                                                      optionsHash = self.optionsHash)
 
+    def isHistGroupPending(self, selectionPattern):
+        """ Check whether a hist group has not yet been rendered for this time slice.
+
+        Args:
+            selectionPattern (str): Selection pattern of the hist group.
+        Returns:
+            bool: True if the hist group still needs to be rendered.
+        """
+        # Time slices stored before partial rendering was introduced were always fully rendered.
+        return selectionPattern in getattr(self, "pendingHistGroups", [])
+
+    @staticmethod
+    def hashProcessingOptions(processingOptions):
+        """ Hash the given processing options.
+
+        The options are sorted before hashing so that the hash doesn't depend on the order of the keys.
+
+        Args:
+            processingOptions (dict): Processing options to be hashed.
+        Returns:
+            str: SHA1 hash of the processing options.
+        """
+        return hashlib.sha1(str(sorted(iteritems(processingOptions))).encode()).hexdigest()
+
+    def cacheKey(self):
+        """ Key which identifies this time slice in the subsystem time slice cache.
+
+        Args:
+            None
+        Returns:
+            tuple: (minUnixTimeAvailable, maxUnixTimeAvailable, optionsHash).
+        """
+        return (self.minUnixTimeAvailable, self.maxUnixTimeAvailable, self.optionsHash)
+
+    def fileRange(self):
+        """ Range of files which are merged for this time slice.
+
+        Args:
+            None
+        Returns:
+            tuple: (minUnixTimeAvailable, maxUnixTimeAvailable).
+        """
+        return (self.minUnixTimeAvailable, self.maxUnixTimeAvailable)
+
+    @staticmethod
+    def mergedFilename(minUnixTimeAvailable, maxUnixTimeAvailable):
+        """ Filename of the merged ROOT file for a given range of files.
+
+        Args:
+            minUnixTimeAvailable (int): Minimum unix time of the files in the time slice.
+            maxUnixTimeAvailable (int): Maximum unix time of the files in the time slice.
+        Returns:
+            str: Filename of the merged time slice ROOT file.
+        """
+        return "timeSlice.{}.{}.root".format(minUnixTimeAvailable, maxUnixTimeAvailable)
+
+    def sharesMergedFile(self):
+        """ Check whether this time slice uses the merged ROOT file which is shared between processing options.
+
+        Time slices which were created before the merged file was shared have their own ROOT file instead.
+
+        Args:
+            None
+        Returns:
+            bool: True if the time slice uses the shared merged file.
+        """
+        return self.filename.filename == self.mergedFilename(*self.fileRange())
+
+    def mergedFilePath(self, subsystem):
+        """ Full path to the merged ROOT file of this time slice.
+
+        Args:
+            subsystem (subsystemContainer): Subsystem to which the time slice belongs.
+        Returns:
+            str: Full path to the merged ROOT file.
+        """
+        return os.path.join(processingParameters["dirPrefix"], subsystem.baseDir, self.filename.filename)
+
+    def outputFilenames(self, subsystem):
+        """ Determine the image and json files which were created when processing this time slice.
+
+        Args:
+            subsystem (subsystemContainer): Subsystem to which the time slice belongs.
+        Returns:
+            list: Full paths to the existing image and json files of the time slice.
+        """
+        filenames = []
+        for outputDir in [subsystem.imgDir, subsystem.jsonDir]:
+            filenames.extend(glob.glob(os.path.join(processingParameters["dirPrefix"], outputDir, self.filenamePrefix + ".*")))
+        return filenames
+
     def timeInMinutes(self, inputTime):
         """ Return the time from the input unix time to the start of the run in minutes.
 
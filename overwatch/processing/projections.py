@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+""" Compute the projections of derived histograms which share the same source histogram.
+
+Some subsystems define histograms which are projected from a histogram in the file (for example, the TPC
+projects several histograms from each of a few large TH3 histograms). Retrieving each of them independently
+reads (and clones) the same source histogram once per derived histogram. Instead, the ``ProjectionEngine``
+reads each source histogram once per processed file, computes the projections of all of the derived
+histograms which are registered for it in one pass, and then immediately releases the source histogram.
+Each projection is then released after its histogram has been rendered.
+"""
+
+from collections import OrderedDict
+import logging
+
+import ROOT
+
+from . import pluginManager
+
+logger = logging.getLogger(__name__)
+
+def detachFromDirectory(hist):
+    """ Detach a histogram from its ``TDirectory`` and give the ownership to python.
+
+    By default, ``ROOT`` attaches histograms which are read or created to the current directory (usually the
+    input file), such that they're only deleted when the file is closed. Once detached, the histogram is deleted
+    as soon as there are no further references to it in python. Deleting a histogram also removes it from any
+    canvas that it was drawn on.
+
+    Args:
+        hist (ROOT.TH1): Histogram to be detached.
+    Returns:
+        ROOT.TH1: The detached histogram.
+    """
+    hist.SetDirectory(0)
+    ROOT.SetOwnership(hist, True)
+    return hist
+
+class ProjectionEngine(object):
+    """ Computes the projected histograms of a subsystem for a single input file.
+
+    Histogram containers are registered if they have projection functions and are retrieved from a single
+    histogram in the file (ie. their ``histList`` contains one entry). Other histogram containers should be
+    retrieved via ``histogramContainer.retrieveHistogram()`` as usual.
+
+    Args:
+        fIn (ROOT.TFile): File in which the source histograms are stored.
+        subsystem (subsystemContainer): Subsystem which contains the projected histograms.
+        processingOptions (dict): Processing options which are passed to the projection functions.
+        hists (list): Histogram containers which will be processed.
+
+    Attributes:
+        fIn (ROOT.TFile): File in which the source histograms are stored.
+        subsystem (subsystemContainer): Subsystem which contains the projected histograms.
+        processingOptions (dict): Processing options which are passed to the projection functions.
+        sources (OrderedDict): Registered histogram containers, keyed by the name of their source histogram.
+        projections (dict): Projected histograms which haven't yet been retrieved, keyed by the name of the
+            histogram container. The value is ``None`` if the source histogram isn't available.
+    """
+    def __init__(self, fIn, subsystem, processingOptions, hists):
+        self.fIn = fIn
+        self.subsystem = subsystem
+        self.processingOptions = processingOptions
+        self.sources = OrderedDict()
+        self._sourceNames = {}
+        for hist in hists:
+            if hist.projectionFunctionsToApply and hist.histList is not None and len(hist.histList) == 1:
+                sourceName = next(iter(hist.histList))
+                self.sources.setdefault(sourceName, []).append(hist)
+                self._sourceNames[hist.histName] = sourceName
+        self.projections = {}
+
+    def isRegistered(self, hist):
+        """ Check whether the histogram is projected by the engine.
+
+        Args:
+            hist (histogramContainer): Histogram container to check.
+        Returns:
+            bool: True if the histogram is registered with the engine.
+        """
+        return hist.histName in self._sourceNames
+
+    def retrieveProjection(self, hist):
+        """ Retrieve the projected histogram for a registered histogram container.
+
+        The projections of all histograms which share its source histogram are computed the first time that
+        any of them are retrieved. The projection functions have been applied when this returns, so they must
+        not be applied again.
+
+        Args:
+            hist (histogramContainer): Registered histogram container. The projection is stored in ``hist.hist``.
+        Returns:
+            bool: True if the histogram was successfully retrieved.
+        """
+        if hist.histName not in self.projections:
+            self._project(self._sourceNames[hist.histName])
+        # Remove our reference, such that the projection is released once the hist container is done with it.
+        hist.hist = self.projections.pop(hist.histName, None)
+        return hist.hist is not None
+
+    def _project(self, sourceName):
+        """ Read a source histogram and compute all of its registered projections.
+
+        Args:
+            sourceName (str): Name of the source histogram in the file.
+        Returns:
+            None. The projections are stored in ``projections``.
+        """
+        hists = self.sources[sourceName]
+        key = self.fIn.GetKey(sourceName)
+        if not key:
+            self.projections.update((hist.histName, None) for hist in hists)
+            return
+
+        logger.debug("Projecting {nHists} hists from {sourceName}".format(nHists = len(hists), sourceName = sourceName))
+        source = detachFromDirectory(key.ReadObj())
+        axes = [source.GetXaxis(), source.GetYaxis(), source.GetZaxis()]
+        ranges = [(axis.GetFirst(), axis.GetLast()) for axis in axes]
+        for hist in hists:
+            hist.hist = source
+            for func in hist.projectionFunctionsToApply:
+                logger.debug("Calling projection func: {func}".format(func = func))
+                hist.hist = pluginManager.callPlugin(func, self.subsystem, hist, self.processingOptions)
+            # Detach immediately, since ROOT would otherwise reuse (and overwrite) a projection with
+            # the same name when computing the next projection.
+            self.projections[hist.histName] = detachFromDirectory(hist.hist)
+            hist.hist = None
+            # Restore restricted ranges so they don't propagate to the next projection.
+            for axis, (first, last) in zip(axes, ranges):
+                axis.SetRange(first, last)
+        # The source histogram is released when we return.
+
+    def clear(self):
+        """ Release any projections which haven't been retrieved.
+
+        Args:
+            None.
+        Returns:
+            None.
+        """
+        self.projections.clear()
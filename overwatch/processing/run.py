@@ -51,6 +51,8 @@ sentry_sdk.init(dsn = sentryDSN, integrations = [sentry_logging])
 
 # Imports are below here so that they can be logged
 from overwatch.processing import processRuns
+from overwatch.processing import compactFiles
+from overwatch.processing.trending import backfill
 
 def run():
     """ Main entry point for starting ``processAllRuns()``.
@@ -89,5 +91,52 @@ def run():
 
     db.close_connection()
 
+def runCompaction():
+    """ Main entry point for compacting the files of finished runs.
+
+    The files of each finished run are replaced by a base snapshot and per file deltas. For more
+    information, see ``overwatch.processing.compactFiles``. This is only meaningful in cumulative mode.
+
+    Args:
+        None.
+    Returns:
+        None.
+    """
+    if not processingParameters["cumulativeMode"]:
+        logger.warning("Compaction is only supported in cumulative mode. Not compacting any runs!")
+        return
+
+    db = getDatabaseFactory().getDB()
+    report = compactFiles.compactRuns(db.get("runs"), processingParameters["dirPrefix"],
+                                      minutesSinceLastFile = processingParameters["compactionMinutesSinceLastFile"])
+    for runDir, subsystems in report.items():
+        logger.info("{runDir}: saved {saved} bytes ({subsystems})".format(
+            runDir = runDir,
+            saved = sum(subsystems.values()),
+            subsystems = subsystems,
+        ))
+    logger.info("Compaction saved {saved} bytes in total.".format(saved = sum(sum(subsystems.values()) for subsystems in report.values())))
+    db.close_connection()
+
+def runTrendingBackfill():
+    """ Main entry point for catching up the trending objects from the stored files.
+
+    The stored files are replayed through the trending objects in time order, starting from the last checkpoint.
+    For more information, see ``overwatch.processing.trending.backfill``.
+
+    Args:
+        None.
+    Returns:
+        None.
+    """
+    if not processingParameters["trending"]:
+        logger.warning("Trending is disabled. Not backfilling the trending!")
+        return
+
+    db = getDatabaseFactory().getDB()
+    nFiles = backfill.backfillTrending(db, db.get("runs"), processingParameters)
+    logger.info("Backfilled trending from {nFiles} files.".format(nFiles = nFiles))
+    db.close_connection()
+
 if __name__ == "__main__":
     run()
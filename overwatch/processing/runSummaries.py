@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+""" Compact summary index of the available runs.
+
+The run list only needs a few properties of each run (run number, start time, available subsystems, and
+whether the run is ongoing), but retrieving them from the ``runContainer`` objects requires loading each
+run and its subsystems from the database. Instead, the processing maintains a separate index of small run
+summaries, which is stored in the database under ``runSummaries``. It is keyed by ``runDir`` (in the same
+manner as the ``runs``), while the values are plain dicts, so they are stored directly in the buckets of the
+index rather than as separate database objects.
+
+The web app then only reads the summaries of the runs which are displayed, walking the index from the most
+recent run.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+from future.utils import itervalues
+
+import BTrees.OOBTree
+import pendulum
+import logging
+# Setup logger
+logger = logging.getLogger(__name__)
+
+from . import processingClasses
+
+def createRunSummaries(btree = True):
+    """ Create an empty summary index.
+
+    Args:
+        btree (bool): True if the index should be a ``BTree``, which is preferred for ZODB. Otherwise,
+            it is a dict. Default: True.
+    Returns:
+        BTree or dict: Empty summary index.
+    """
+    return BTrees.OOBTree.BTree() if btree else {}
+
+def createRunSummary(run):
+    """ Create the summary of a run.
+
+    Args:
+        run (runContainer): Run to be summarized.
+    Returns:
+        dict: Summary of the run, containing the ``runDir``, ``runNumber``, ``prettyName``, ``subsystems``
+            (list of subsystem names), ``startOfRun`` (unix time), ``startOfRunTimeStamp`` (formatted for display),
+            ``lastFileTime`` (unix time of the most recent file, or None if there are no files) and ``newFile``
+            (True if any subsystem just received a new file).
+    """
+    subsystemNames = list(run.subsystems.keys())
+    startOfRun = None
+    if subsystemNames:
+        # Same convention as ``runContainer.startOfRunTimeStamp()``: any subsystem will do, so we take the last one.
+        startOfRun = run.subsystems[subsystemNames[-1]].startOfRun
+    lastFileTime = None
+    newFile = False
+    for subsystem in itervalues(run.subsystems):
+        newFile = newFile or subsystem.newFile is True
+        if len(subsystem.files):
+            fileTime = subsystem.files[subsystem.files.keys()[-1]].fileTime
+            lastFileTime = fileTime if lastFileTime is None else max(lastFileTime, fileTime)
+
+    return {
+        "runDir": run.runDir,
+        "runNumber": run.runNumber,
+        "prettyName": run.prettyName,
+        "subsystems": subsystemNames,
+        "startOfRun": startOfRun,
+        "startOfRunTimeStamp": processingClasses.subsystemContainer.prettyPrintUnixTime(startOfRun) if startOfRun is not None else False,
+        "lastFileTime": lastFileTime,
+        "newFile": newFile,
+    }
+
+def updateRunSummaries(summaries, runs, runDirs = None):
+    """ Update the summaries of the given runs.
+
+    Runs which are missing from the index are always added.
+
+    Args:
+        summaries (BTree or dict): Summary index to be updated.
+        runs (BTree or dict): Dict-like object which stores all run, subsystem, and hist information. Keys are the
+            in the ``runDir`` format ("Run123456"), while the values are ``runContainer`` objects.
+        runDirs (iterable): Runs whose summaries should be updated. Default: None, which updates all runs.
+    Returns:
+        int: Number of summaries which were updated.
+    """
+    # Only the keys are needed to determine which runs are missing, so the runs aren't loaded.
+    runDirs = set(runs.keys() if runDirs is None else runDirs)
+    runDirs.update(runDir for runDir in runs.keys() if runDir not in summaries)
+    for runDir in runDirs:
+        if runDir in runs:
+            summaries[runDir] = createRunSummary(runs[runDir])
+    return len(runDirs)
+
+def isRunOngoing(summary):
+    """ Checks if a run is ongoing based on its summary.
+
+    Analogous to ``runContainer.isRunOngoing(...)``: the run is ongoing if a subsystem just received a new
+    file or if the most recent file was received in the last five minutes.
+
+    Args:
+        summary (dict): Summary of the run.
+    Returns:
+        bool: True if the run is ongoing.
+    """
+    if summary["newFile"]:
+        return True
+    if summary["lastFileTime"] is None:
+        return False
+    # The timestamps of the files are set in Geneva, so we need to construct the timestamp in Geneva to compare against.
+    geneva = pendulum.from_timestamp(summary["lastFileTime"], tz = "Europe/Zurich")
+    return pendulum.now().diff(geneva).in_minutes() < 5
+
+def _runDirs(summaries):
+    """ Sorted keys of the summary index. The keys of a ``BTree`` are already sorted, so they're not copied. """
+    if hasattr(summaries, "maxKey"):
+        return summaries.keys()
+    return sorted(summaries)
+
+def mostRecentRunSummary(summaries):
+    """ Retrieve the summary of the most recent run.
+
+    Args:
+        summaries (BTree or dict): Summary index.
+    Returns:
+        dict: Summary of the most recent run, or None if there are no runs.
+    """
+    if not summaries:
+        return None
+    if hasattr(summaries, "maxKey"):
+        return summaries[summaries.maxKey()]
+    return summaries[max(summaries)]
+
+def retrieveRunSummaries(summaries, runOffset = 0, nRuns = 50, subsystemName = None, minTime = None, maxTime = None):
+    """ Retrieve a page of run summaries, starting from the most recent run.
+
+    The filters on the start of run time assume that the start time increases with the run number, such that the
+    search can stop as soon as a run which started before ``minTime`` is found.
+
+    Args:
+        summaries (BTree or dict): Summary index.
+        runOffset (int): Number of matching runs to skip. Default: 0.
+        nRuns (int): Maximum number of runs to return. Default: 50.
+        subsystemName (str): Only include runs which contain this subsystem. Default: None.
+        minTime (int): Only include runs which started at or after this unix time. Default: None.
+        maxTime (int): Only include runs which started at or before this unix time. Default: None.
+    Returns:
+        tuple: (summaries, totalNumberOfRuns), where summaries (list) are the summaries of the selected runs
+            (with the most recent first), and totalNumberOfRuns (int) is the number of runs which match the filters.
+    """
+    runDirs = _runDirs(summaries)
+    if subsystemName is None and minTime is None and maxTime is None:
+        # Nothing to filter, so we can select the range directly.
+        nTotal = len(runDirs)
+        start = max(nTotal - runOffset - nRuns, 0)
+        stop = max(nTotal - runOffset, 0)
+        selected = [summaries[runDirs[i]] for i in range(stop - 1, start - 1, -1)]
+        return selected, nTotal
+
+    selected = []
+    nTotal = 0
+    for runDir in reversed(runDirs):
+        summary = summaries[runDir]
+        startOfRun = summary["startOfRun"]
+        if minTime is not None and startOfRun is not None and startOfRun < minTime:
+            break
+        if maxTime is not None and (startOfRun is None or startOfRun > maxTime):
+            continue
+        if subsystemName is not None and subsystemName not in summary["subsystems"]:
+            continue
+        if runOffset <= nTotal < runOffset + nRuns:
+            selected.append(summary)
+        nTotal += 1
+    return selected, nTotal
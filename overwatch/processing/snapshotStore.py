@@ -0,0 +1,441 @@
+#!/usr/bin/env python
+
+""" Columnar ``numpy`` store of the histogram snapshots received for a run.
+
+Each file received for a subsystem is a snapshot of its histograms. When the store is enabled (via the
+``snapshotStore`` configuration option), the content of each received file is converted at ingest into one
+``.npy`` array per histogram, with one row per snapshot, stored in the ``snapshots`` directory next to the
+received files::
+
+    Run123/EMC/snapshots/timestamps.npy         # Unix time of each snapshot (one entry per row).
+    Run123/EMC/snapshots/histName.npy           # Bin contents, of shape (nSnapshots, nCells).
+    Run123/EMC/snapshots/histName.sumw2.npy     # Sum of the squares of weights, if stored by the histogram.
+
+The bins are stored in the global bin numbering scheme of ROOT (see ``compactFiles.histogramToArrays()``). Rows are
+appended in place, so ingesting a file doesn't require rewriting the existing snapshots. The timestamps are written
+last, so they define which rows are valid if the ingest is interrupted.
+
+Since the arrays can be memory mapped, time slices (subtracting two snapshots in cumulative mode), per file
+trending, and outlier checks can be performed as vectorized array operations without ROOT. ROOT is only needed to
+convert the received files and to rebuild the histograms for the final rendering.
+"""
+
+# Python 2/3 support
+from __future__ import print_function
+from __future__ import absolute_import
+from future.utils import iteritems
+
+# General
+import collections
+import glob
+import io
+import os
+import numpy as np
+import logging
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# ROOT
+import ROOT
+
+from . import compactFiles
+
+# Name of the directory (within the subsystem directory) where the snapshots are stored.
+snapshotsDirName = "snapshots"
+timestampsFilename = "timestamps.npy"
+sumw2Extension = ".sumw2.npy"
+
+def snapshotsDir(dirPrefix, subsystem):
+    """ Determine the directory where the snapshots of a subsystem are stored.
+
+    Args:
+        dirPrefix (str): Path to the root directory where the data is stored.
+        subsystem (subsystemContainer): Subsystem for which the snapshots are stored.
+    Returns:
+        str: Path to the snapshots directory.
+    """
+    return os.path.join(dirPrefix, subsystem.baseDir, snapshotsDirName)
+
+def histogramFilename(directory, histName, sumw2 = False):
+    """ Determine the filename where the snapshots of a histogram are stored.
+
+    Args:
+        directory (str): Path to the snapshots directory.
+        histName (str): Name of the histogram.
+        sumw2 (bool): If True, return the filename for the sum of the squares of weights. Default: False.
+    Returns:
+        str: Path to the array file.
+    """
+    return os.path.join(directory, storedName(histName) + (sumw2Extension if sumw2 else ".npy"))
+
+def storedName(histName):
+    """ Determine the name under which a histogram is stored.
+
+    Path separators are replaced so that the histogram name can't escape the snapshots directory. Consequently,
+    the names returned by ``storedHistograms()`` may differ from the names of the histograms in the received files.
+
+    Args:
+        histName (str): Name of the histogram.
+    Returns:
+        str: Name of the histogram in the store.
+    """
+    return histName.replace(os.sep, "_")
+
+def appendRow(filename, row, nRows, fillValue = 0):
+    """ Append a row to an array stored in a ``.npy`` file.
+
+    The row is appended in place by updating the shape stored in the header and writing the row at the end of
+    the existing data. If the header has to grow (which ``numpy`` usually avoids by padding the header), the
+    file is rewritten to a temporary file which then replaces the existing file.
+
+    Args:
+        filename (str): Path to the ``.npy`` file. It will be created if it doesn't exist.
+        row (numpy.ndarray or scalar): Row to be appended. Scalars are stored in a 1D array.
+        nRows (int): Number of valid rows in the file. Any additional rows (for example, from an interrupted
+            ingest) are overwritten. If the file doesn't exist, the first ``nRows`` rows are filled with ``fillValue``.
+        fillValue (float): Value of the rows which precede the first stored row in a new file. Default: 0.
+    Returns:
+        None.
+    Raises:
+        ValueError: If the row doesn't match the shape of the stored rows.
+    """
+    row = np.asarray(row)
+    if not os.path.exists(filename):
+        array = np.full((nRows + 1,) + row.shape, fillValue, dtype = row.dtype)
+        array[nRows] = row
+        _writeArray(filename, array)
+        return
+
+    with open(filename, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(f)
+        headerLength = f.tell()
+        if shape[1:] != row.shape:
+            raise ValueError("Row shape {rowShape} doesn't match the stored shape {shape} in {filename}!".format(rowShape = row.shape, shape = shape, filename = filename))
+        if nRows > shape[0]:
+            raise ValueError("Requested {nRows} rows, but only {storedRows} are stored in {filename}!".format(nRows = nRows, storedRows = shape[0], filename = filename))
+
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                      "fortran_order": fortranOrder,
+                                                      "shape": (nRows + 1,) + row.shape})
+        if len(header.getvalue()) == headerLength:
+            rowBytes = row.astype(dtype).tobytes()
+            f.seek(headerLength + nRows * len(rowBytes))
+            f.write(rowBytes)
+            f.truncate()
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+
+    # The header can't be updated in place, so we need to rewrite the file.
+    array = np.load(filename)[:nRows]
+    _writeArray(filename, np.concatenate([array, row.astype(array.dtype)[np.newaxis]]))
+
+def _writeArray(filename, array):
+    """ Write an array to a ``.npy`` file, replacing any existing file atomically.
+
+    The array is written to a temporary file in the same directory, which then replaces the existing file. Thus,
+    readers which have the existing file memory mapped (or an interrupted write) never see a partially written file.
+
+    Args:
+        filename (str): Path to the ``.npy`` file.
+        array (numpy.ndarray): Array to be written.
+    Returns:
+        None.
+    """
+    tempFilename = filename + ".tmp"
+    with open(tempFilename, "wb") as f:
+        np.lib.format.write_array(f, array, version = (1, 0))
+    os.replace(tempFilename, filename)
+
+def loadTimestamps(directory):
+    """ Load the timestamps of the snapshots which have been stored.
+
+    Args:
+        directory (str): Path to the snapshots directory.
+    Returns:
+        numpy.ndarray: Unix time of each stored snapshot. Empty if no snapshots are stored.
+    """
+    filename = os.path.join(directory, timestampsFilename)
+    if not os.path.exists(filename):
+        return np.array([], dtype = np.int64)
+    return np.load(filename)
+
+def loadHistogram(directory, histName, sumw2 = False):
+    """ Load the snapshots of a histogram.
+
+    The array is memory mapped, so only the rows (snapshots) which are actually accessed are read from disk.
+
+    Args:
+        directory (str): Path to the snapshots directory.
+        histName (str): Name of the histogram.
+        sumw2 (bool): If True, load the sum of the squares of weights instead of the bin contents. Default: False.
+    Returns:
+        numpy.ndarray: Array of shape (nSnapshots, nCells), or None if it isn't stored.
+    """
+    filename = histogramFilename(directory, histName, sumw2 = sumw2)
+    if not os.path.exists(filename):
+        return None
+    nRows = len(loadTimestamps(directory))
+    return np.load(filename, mmap_mode = "r")[:nRows]
+
+def storedHistograms(directory):
+    """ Determine the names of the histograms which are stored.
+
+    Args:
+        directory (str): Path to the snapshots directory.
+    Returns:
+        list: Names of the stored histograms.
+    """
+    names = []
+    for filename in sorted(glob.glob(os.path.join(directory, "*.npy"))):
+        name = os.path.basename(filename)
+        if name == timestampsFilename or name.endswith(sumw2Extension):
+            continue
+        names.append(name[:-len(".npy")])
+    return names
+
+def ingestSnapshot(directory, timestamp, snapshot):
+    """ Add a snapshot to the store.
+
+    Args:
+        directory (str): Path to the snapshots directory. It will be created if necessary.
+        timestamp (int): Unix time of the snapshot.
+        snapshot (OrderedDict): Histogram content, as returned by ``compactFiles.readSnapshot()``.
+    Returns:
+        bool: True if the snapshot was added.
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    timestamps = loadTimestamps(directory)
+    if len(timestamps) > 0 and timestamp <= timestamps[-1]:
+        if timestamp not in timestamps:
+            logger.warning("Snapshot at {timestamp} is older than the most recent snapshot stored in {directory}. Skipping it!".format(timestamp = timestamp, directory = directory))
+        return False
+
+    nRows = len(timestamps)
+    added = set()
+    for histName, hist in iteritems(snapshot):
+        try:
+            appendRow(histogramFilename(directory, histName), hist.values, nRows)
+            if hist.sumw2 is not None:
+                appendRow(histogramFilename(directory, histName, sumw2 = True), hist.sumw2, nRows)
+            added.add(storedName(histName))
+        except ValueError as e:
+            # Most likely, the binning of the histogram has changed. We can't store it, so we skip it.
+            logger.warning("Cannot store snapshot of {histName}: {e}".format(histName = histName, e = e.args[0]))
+
+    # Histograms which are stored but missing from this snapshot (or which couldn't be stored) are assumed
+    # to be unchanged, so the previous row is repeated.
+    for histName in storedHistograms(directory):
+        if histName in added:
+            continue
+        for sumw2 in [False, True]:
+            filename = histogramFilename(directory, histName, sumw2 = sumw2)
+            if os.path.exists(filename) and nRows > 0:
+                appendRow(filename, np.load(filename, mmap_mode = "r")[nRows - 1], nRows)
+
+    # The timestamps are written last so they only include the rows which were fully written.
+    appendRow(os.path.join(directory, timestampsFilename), np.int64(timestamp), nRows)
+    return True
+
+def ingestSubsystem(dirPrefix, subsystem):
+    """ Add all files of a subsystem which haven't yet been stored to the store.
+
+    Args:
+        dirPrefix (str): Path to the root directory where the data is stored.
+        subsystem (subsystemContainer): Subsystem whose files should be stored.
+    Returns:
+        int: Number of snapshots which were added.
+    """
+    directory = snapshotsDir(dirPrefix, subsystem)
+    timestamps = loadTimestamps(directory)
+    lastTimestamp = timestamps[-1] if len(timestamps) > 0 else None
+
+    nAdded = 0
+    for fileTime, fileCont in subsystem.files.items():
+        if lastTimestamp is not None and fileTime <= lastTimestamp:
+            continue
+        filename = os.path.join(dirPrefix, fileCont.filename)
+        if not os.path.exists(filename):
+            logger.warning("File {filename} is not available, so it cannot be added to the snapshot store.".format(filename = filename))
+            continue
+        # The histogram contents are copied from views of the ROOT buffers, so the bins aren't looped over.
+        if ingestSnapshot(directory, fileTime, compactFiles.readSnapshot(filename)):
+            nAdded += 1
+    if nAdded:
+        logger.debug("Added {nAdded} snapshots to {directory}".format(nAdded = nAdded, directory = directory))
+    return nAdded
+
+def ingestRuns(runs, dirPrefix):
+    """ Add the new files of all subsystems to the snapshot store.
+
+    Only subsystems with new files are considered. Subsystems which aren't their own ``fileLocationSubsystem`` share
+    the snapshots of the subsystem where their files are stored, so they are skipped.
+
+    Args:
+        runs (BTree): Dict-like object which stores all run, subsystem, and hist information. Keys are the
+            in the ``runDir`` format ("Run123456"), while the values are ``runContainer`` objects.
+        dirPrefix (str): Path to the root directory where the data is stored.
+    Returns:
+        None.
+    """
+    for runDir, run in iteritems(runs):
+        for subsystem in run.subsystems.values():
+            if subsystem.newFile and subsystem.subsystem == subsystem.fileLocationSubsystem:
+                ingestSubsystem(dirPrefix, subsystem)
+
+def snapshotIndex(timestamps, unixTime):
+    """ Find the most recent snapshot at or before a given time.
+
+    Args:
+        timestamps (numpy.ndarray): Unix time of each stored snapshot.
+        unixTime (int): Time of interest.
+    Returns:
+        int: Index of the snapshot, or None if there is no snapshot at or before the given time.
+    """
+    index = np.searchsorted(timestamps, unixTime, side = "right") - 1
+    return int(index) if index >= 0 else None
+
+def hasSnapshots(directory, *unixTimes):
+    """ Check whether snapshots are stored for all of the given times.
+
+    Args:
+        directory (str): Path to the snapshots directory.
+        unixTimes (int): Times which must correspond exactly to stored snapshots.
+    Returns:
+        bool: True if all of the times are stored.
+    """
+    timestamps = loadTimestamps(directory)
+    return len(timestamps) > 0 and bool(np.all(np.isin(unixTimes, timestamps)))
+
+def subtractSnapshots(directory, minTime, maxTime):
+    """ Determine the content accumulated between two snapshots.
+
+    Args:
+        directory (str): Path to the snapshots directory.
+        minTime (int): Unix time of the earlier snapshot. Its content is subtracted.
+        maxTime (int): Unix time of the later snapshot.
+    Returns:
+        OrderedDict: Keys are histogram names, while values are ``compactFiles.histogramArrays``. The entries are
+            set to the sum of the bin contents.
+    Raises:
+        ValueError: If there are no snapshots for the requested times.
+    """
+    timestamps = loadTimestamps(directory)
+    minIndex = snapshotIndex(timestamps, minTime)
+    maxIndex = snapshotIndex(timestamps, maxTime)
+    if minIndex is None or maxIndex is None:
+        raise ValueError("No snapshots available in {directory} for the time range {minTime}-{maxTime}!".format(directory = directory, minTime = minTime, maxTime = maxTime))
+
+    result = collections.OrderedDict()
+    for histName in storedHistograms(directory):
+        values = loadHistogram(directory, histName)
+        difference = values[maxIndex] - values[minIndex]
+        sumw2 = loadHistogram(directory, histName, sumw2 = True)
+        if sumw2 is not None:
+            # As for ``TH1::Add()``, the sum of the squares of weights is added.
+            sumw2 = sumw2[maxIndex] + sumw2[minIndex]
+        result[histName] = compactFiles.histogramArrays(values = difference, sumw2 = sumw2, entries = difference.sum())
+    return result
+
+def trendValues(directory, histName, function = None):
+    """ Calculate a value for each snapshot of a histogram.
+
+    Args:
+        directory (str): Path to the snapshots directory.
+        histName (str): Name of the histogram.
+        function (callable): Vectorized function which is applied to the array of shape (nSnapshots, nCells)
+            and returns one value per snapshot. Default: None, which corresponds to the sum of the bin contents.
+    Returns:
+        tuple: (timestamps, values) where both are ``numpy.ndarray`` with one entry per snapshot.
+    """
+    if function is None:
+        def function(values):
+            return values.sum(axis = 1)
+    values = loadHistogram(directory, histName)
+    timestamps = loadTimestamps(directory)
+    if values is None:
+        return (timestamps[:0], np.array([], dtype = np.float64))
+    return (timestamps, np.asarray(function(values)))
+
+def findOutliers(values, nSigma = 3., mask = None):
+    """ Find bins which deviate from the mean bin content by more than a number of standard deviations.
+
+    Each row (snapshot) is treated independently.
+
+    Args:
+        values (numpy.ndarray): Array of shape (nSnapshots, nCells) or (nCells,).
+        nSigma (float): Number of standard deviations beyond which a bin is considered an outlier. Default: 3.
+        mask (numpy.ndarray): Boolean array of shape (nCells,) selecting the bins which should be considered
+            (for example, to exclude the underflow and overflow bins). Default: None, which considers all bins.
+    Returns:
+        numpy.ndarray: Boolean array of the same shape as ``values`` which is True for the outliers.
+    """
+    values = np.atleast_2d(values)
+    selected = values if mask is None else values[:, mask]
+    mean = selected.mean(axis = 1, keepdims = True)
+    stdDev = selected.std(axis = 1, keepdims = True)
+    outliers = np.abs(values - mean) > nSigma * stdDev
+    if mask is not None:
+        outliers &= mask
+    return outliers
+
+def writeHistograms(content, templateFilename, outputFilename):
+    """ Rebuild ROOT histograms from array content and write them to a file.
+
+    The histograms are matched to the template by their name, or by their stored name (see ``storedName()``),
+    and are written with the name of the template histogram.
+
+    Args:
+        content (OrderedDict): Keys are histogram names, while values are ``compactFiles.histogramArrays``.
+        templateFilename (str): Path to a ROOT file which contains the histograms, which are used to define the
+            binning and properties of the rebuilt histograms.
+        outputFilename (str): Path to the output ROOT file.
+    Returns:
+        None.
+    """
+    fTemplate = ROOT.TFile(templateFilename, "READ")
+    # The keys are used instead of ``Get()`` because ``Get()`` interprets a "/" in the name as a directory.
+    # Keys for the exact names take precedence over the stored names. For multiple cycles, the first key is the
+    # most recent one, as for ``Get()``.
+    keys = list(fTemplate.GetListOfKeys())
+    templateKeys = {}
+    for key in keys:
+        templateKeys.setdefault(key.GetName(), key)
+    for key in keys:
+        templateKeys.setdefault(storedName(key.GetName()), key)
+
+    fOut = ROOT.TFile(outputFilename, "RECREATE")
+    for histName, arrays in iteritems(content):
+        key = templateKeys.get(histName)
+        template = key.ReadObj() if key is not None else None
+        if not template or template.GetNcells() != len(arrays.values):
+            logger.warning("Cannot rebuild {histName} from {templateFilename}. Skipping it!".format(histName = histName, templateFilename = templateFilename))
+            continue
+        fOut.cd()
+        hist = template.Clone(key.GetName())
+        compactFiles.setHistogramFromArrays(hist, arrays)
+        hist.Write()
+    fOut.Close()
+    fTemplate.Close()
+
+def writeSubtractedSnapshots(directory, minTime, maxTime, templateFilename, outputFilename):
+    """ Create a time slice ROOT file by subtracting two stored snapshots.
+
+    This is the equivalent of ``mergeFiles.subtractFiles()``, but the subtraction is performed on the stored arrays.
+
+    Args:
+        directory (str): Path to the snapshots directory.
+        minTime (int): Unix time of the earlier snapshot. Its content is subtracted.
+        maxTime (int): Unix time of the later snapshot.
+        templateFilename (str): Path to a ROOT file which contains the histograms.
+        outputFilename (str): Path to the output ROOT file.
+    Returns:
+        None.
+    """
+    writeHistograms(subtractSnapshots(directory, minTime, maxTime), templateFilename, outputFilename)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+""" Backfill of the trending objects from the stored files.
+
+When the trending objects are recreated (for example, via ``forceRecreateSubsystem``) or they missed entries, they
+are caught up by replaying the stored files through ``TrendingManager.notifyAboutNewHistogramValue()`` in time order.
+Reading the histograms from the files is performed in parallel across runs and files, while the trending objects are
+updated in the main process in the order of the files, so the order of the values in each trending object is
+preserved.
+
+The progress is stored as a checkpoint in the trending store of each subsystem (see
+``overwatch.processing.trending.store``), so an interrupted backfill continues where it stopped rather than
+starting again from the beginning. Since the processing also advances the checkpoints, a backfill only resumes if
+it marked itself as in progress. Otherwise, recreating the trending objects replays all of the files, while
+catching up continues from the checkpoints with the trending objects stored in the database.
+"""
+import logging
+import multiprocessing
+
+import overwatch.processing.trending.constants as CON
+from overwatch.processing.trending import extraction
+from overwatch.processing.trending.manager import TrendingManager
+from overwatch.processing.trending.store import isBackfillInProgress, readCheckpoint, setBackfillInProgress, \
+    storeDirectory, writeCheckpoint
+
+try:
+    from typing import *  # noqa
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+
+def filesToBackfill(runs, trendingManager, checkpoints, useCombinedFiles=False):
+    """ Determine the files which haven't yet been backfilled, in time order.
+
+    Args:
+        runs (BTree): Dict-like object which stores all run, subsystem, and hist information. Keys are the
+            in the ``runDir`` format ("Run123456"), while the values are ``runContainer`` objects.
+        trendingManager (TrendingManager): Manager of the trending objects.
+        checkpoints (dict): Backfill checkpoints, keyed by subsystem name. See ``store.readCheckpoint()``.
+        useCombinedFiles (bool): If True, only the combined file of each run is used rather than every received
+            file. Default: False.
+    Returns:
+        list: (time, subsystem, runDir, filename, sources) of the files to backfill, sorted by time. ``filename``
+            is relative to the ``dirPrefix``, while ``sources`` are the trended histogram names to the names of
+            the histograms in the file (see ``extraction.sourceHistogramNames()``).
+    """
+    files = []
+    for runDir, run in runs.items():
+        for subsystemName in trendingManager.parameters[CON.SUBSYSTEMS]:
+            subsystem = run.subsystems.get(subsystemName) if run.subsystems else None
+            if subsystem is None:
+                continue
+            extraction.prepareHistogramContainers(subsystem, trendingManager.parameters[CON.DIR_PREFIX])
+            sources = extraction.sourceHistogramNames(subsystem, trendingManager.subscribedHistogramNames(subsystemName))
+            if not sources:
+                continue
+            if useCombinedFiles:
+                fileConts = [subsystem.combinedFile] if subsystem.combinedFile else []
+                times = [subsystem.endOfRun]
+            else:
+                fileConts = [fileCont for fileCont in subsystem.files.values()
+                             if not fileCont.combinedFile and not fileCont.timeSlice]
+                times = [fileCont.fileTime for fileCont in fileConts]
+            lastTime = checkpoints.get(subsystemName, {}).get(runDir)
+            for fileTime, fileCont in zip(times, fileConts):
+                if lastTime is not None and fileTime <= lastTime:
+                    continue
+                files.append((fileTime, subsystem, runDir, fileCont.filename, sources))
+
+    files.sort(key=lambda x: x[0])
+    return files
+
+
+def backfillTrending(db, runs, parameters, nProcesses=None, useCombinedFiles=False, checkpointInterval=100):
+    """ Replay the stored files through the trending objects, starting from the last checkpoint.
+
+    If an earlier backfill was interrupted, or if ``forceRecreateSubsystem`` isn't set, the trending objects are
+    restored from the database and only the files after the checkpoint are replayed. Otherwise, the trending
+    objects are recreated and all of the files are replayed, regardless of the checkpoints (which may have been
+    advanced by the processing for the objects which were just discarded). After every ``checkpointInterval``
+    files (and at the end), the trended values are written to the trending store, the trending objects are stored
+    in the database, and the checkpoints are updated (in that order).
+
+    Args:
+        db (AbstractDatabase): Database which stores the runs and the trending objects.
+        runs (BTree): Dict-like object which stores all run, subsystem, and hist information.
+        parameters (dict): Processing parameters.
+        nProcesses (int): Number of processes used to read the files. Default: None, which corresponds to the
+            number of CPUs. If 1, the files are read in the main process.
+        useCombinedFiles (bool): If True, only the combined file of each run is used. Default: False.
+        checkpointInterval (int): Number of files between checkpoints. Default: 100.
+    Returns:
+        int: Number of files which were backfilled.
+    """
+    dirPrefix = parameters[CON.DIR_PREFIX]
+    directories = {subsystemName: storeDirectory(dirPrefix, subsystemName) for subsystemName in parameters[CON.SUBSYSTEMS]}
+    resume = any(isBackfillInProgress(directory) for directory in directories.values()) or not parameters[CON.RECREATE]
+    if resume:
+        # Continue with the stored trending objects, rather than starting from empty objects.
+        checkpoints = {subsystemName: readCheckpoint(directory) for subsystemName, directory in directories.items()}
+        parameters = dict(parameters)
+        parameters[CON.RECREATE] = False
+    else:
+        # The recreated trending objects don't contain any values, so the existing checkpoints no longer apply.
+        checkpoints = {subsystemName: {} for subsystemName in directories}
+    for directory in directories.values():
+        if not resume:
+            writeCheckpoint(directory, {})
+        setBackfillInProgress(directory, True)
+    trendingManager = TrendingManager(db, parameters)
+    if resume:
+        trendingManager.restoreTrendingObjects()
+    trendingManager.createTrendingObjects()
+
+    files = filesToBackfill(runs, trendingManager, checkpoints, useCombinedFiles=useCombinedFiles)
+    logger.info("Backfilling trending from {nFiles} files{resume}".format(
+        nFiles=len(files), resume=" (resuming from checkpoint)" if resume else ""))
+
+    pool = multiprocessing.Pool(nProcesses) if nProcesses != 1 else None
+    try:
+        for start in range(0, len(files), checkpointInterval):
+            batch = files[start:start + checkpointInterval]
+            for subsystemName, extracted in extraction.extractFiles(trendingManager, batch, dirPrefix, pool=pool).items():
+                checkpoints[subsystemName].update(extracted)
+            logger.info("Backfilled {nFiles}/{total} files".format(nFiles=start + len(batch), total=len(files)))
+            _checkpoint(db, trendingManager, checkpoints)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    trendingManager.processTrending()
+    _checkpoint(db, trendingManager, checkpoints)
+    for directory in directories.values():
+        setBackfillInProgress(directory, False)
+    return len(files)
+
+
+def _checkpoint(db, trendingManager, checkpoints):  # type: (Any, TrendingManager, Dict[str, Dict[str, int]]) -> None
+    # The checkpoint is written last, so it never refers to values which haven't been stored.
+    trendingManager.flushStores()
+    db.set(CON.TRENDING, trendingManager.subsystems)
+    db.commit()
+    for subsystemName, checkpoint in checkpoints.items():
+        if checkpoint:
+            writeCheckpoint(storeDirectory(trendingManager.parameters[CON.DIR_PREFIX], subsystemName), checkpoint)
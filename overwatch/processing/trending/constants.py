@@ -10,9 +10,14 @@ TRENDING = 'trending'
 SUBSYSTEMS = 'subsystemList'
 DIR_PREFIX = 'dirPrefix'
 RECREATE = 'forceRecreateSubsystem'
+BATCH_ALARMS = 'batchAlarms'
 
 EXTENSION = 'fileExtension'
 ENTRIES = "entries"
+MINUTE_ENTRIES = "minuteEntries"
+HOUR_ENTRIES = "hourEntries"
+RUN_ENTRIES = "runEntries"
+GAP_THRESHOLD = "gapThreshold"
 
 IMAGE = 'img'
 JSON = 'json'
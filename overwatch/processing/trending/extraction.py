@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+""" Extraction of trended values directly from stored files.
+
+These functions read only the histograms which are needed by the trending objects from a ROOT file and pass
+them to the ``TrendingManager``, without storing any images. Before the values are extracted, the projection and
+processing functions of the subsystem are applied, just as they are in ``processRuns.processHist()``, so the trended
+values are the same as those of the processed histograms (for example, after normalizing by the number of events).
+Reading the histograms is independent of the trending objects, so it can be performed in separate processes (the
+returned histograms can be pickled).
+
+The extraction runs for every received file when it is moved into the run structure (see
+``extractNewFiles()``), so the trending objects receive one value per file, regardless of how often the
+histograms are processed. The same extraction is used to backfill the trending objects from the stored files
+(see ``overwatch.processing.trending.backfill``).
+"""
+import logging
+import os
+import shutil
+import tempfile
+from collections import defaultdict
+
+import ROOT
+
+import overwatch.processing.pluginManager as pluginManager
+import overwatch.processing.trending.constants as CON
+from overwatch.base import utilities
+from overwatch.processing import compactFiles
+from overwatch.processing import processingClasses
+
+try:
+    from typing import *  # noqa
+except ImportError:
+    pass
+else:
+    # Needed for typing information
+    from overwatch.processing.trending.manager import TrendingManager  # noqa
+
+logger = logging.getLogger(__name__)
+
+
+def runNumberFromDir(baseDir):  # type: (str) -> int
+    """ Extract the run number from a subsystem base directory of the form ``Run123456/SYS``. """
+    return int(os.path.dirname(baseDir).replace("Run", ""))
+
+
+def prepareHistogramContainers(subsystem, dirPrefix):  # type: (processingClasses.subsystemContainer, str) -> bool
+    """ Create the histogram containers of a subsystem which hasn't yet been processed.
+
+    The histogram containers determine the source histograms and the functions which are applied before the values
+    are extracted. For runs which haven't yet been processed (such as a new run or when backfilling), they aren't
+    available yet, so they are created from the most recent file of the subsystem, in the same way as during the
+    processing (see ``pluginManager.createHistogramContainers()``).
+
+    Args:
+        subsystem (subsystemContainer): Subsystem which contains the histograms.
+        dirPrefix (str): Path to the root directory where the data is stored.
+    Returns:
+        bool: True if the histogram containers are available.
+    """
+    if subsystem.hists:
+        return True
+    # The most recent file is the one which isn't removed when compacting the files of the run.
+    filenames = [os.path.join(dirPrefix, fileCont.filename) for fileCont in subsystem.files.values()]
+    filenames = [filename for filename in filenames if os.path.exists(filename)]
+    if not filenames:
+        return False
+    fIn = ROOT.TFile(filenames[-1], "READ")
+    try:
+        keysInFile = fIn.GetListOfKeys()
+        keysInFile.Sort()
+        pluginManager.createHistogramContainers(subsystem, keysInFile)
+    finally:
+        fIn.Close()
+    return bool(subsystem.hists)
+
+
+def eventsHistogramNames(subsystem):  # type: (processingClasses.subsystemContainer) -> List[str]
+    """ Names of the histograms which contain the number of events (see ``pluginManager.createHistogramContainers()``). """
+    return [histName for histName in subsystem.histsInFile.keys() if "events" in histName.lower()]
+
+
+def sourceHistogramNames(subsystem, histNames):  # type: (processingClasses.subsystemContainer, List[str]) -> Dict[str, str]
+    """ Determine which histogram in the file is the source of each trended histogram.
+
+    Histograms which are projected from another histogram (see ``histogramContainer.histList``) are read via that
+    histogram. Stacks of multiple histograms aren't supported for trending. The histogram containers should
+    be prepared first via ``prepareHistogramContainers()``. Otherwise, the trended histograms are read directly.
+
+    Args:
+        subsystem (subsystemContainer): Subsystem which contains the histograms.
+        histNames (list): Names of the trended histograms.
+    Returns:
+        dict: Keys are trended histogram names, while values are the names of the histograms in the file.
+    """
+    sources = {}
+    for histName in histNames:
+        container = subsystem.hists.get(histName) if subsystem.hists else None
+        if container is not None and container.histList is not None:
+            if len(container.histList) != 1:
+                continue
+            sources[histName] = next(iter(container.histList))
+        else:
+            sources[histName] = histName
+    return sources
+
+
+def readHistograms(filename, histNames):  # type: (str, Iterable[str]) -> Dict[str, ROOT.TH1]
+    """ Read only the given histograms from a ROOT file.
+
+    Files which were compacted (see ``overwatch.processing.compactFiles``) are reconstructed into a temporary file.
+
+    Args:
+        filename (str): Path to the ROOT file.
+        histNames (iterable): Names of the histograms to read. Histograms which aren't in the file are ignored.
+    Returns:
+        dict: Keys are histogram names, while values are the histograms, which are detached from the file.
+    """
+    tempDir = None
+    if compactFiles.isCompacted(filename):
+        tempDir = tempfile.mkdtemp()
+        reconstructedFilename = os.path.join(tempDir, os.path.basename(filename))
+        compactFiles.reconstructSnapshot(filename, reconstructedFilename)
+        filename = reconstructedFilename
+
+    hists = {}
+    fIn = ROOT.TFile(filename, "READ")
+    try:
+        for histName in set(histNames):
+            key = fIn.GetKey(histName)
+            if not key:
+                continue
+            hist = key.ReadObj()
+            if isinstance(hist, ROOT.TH1):
+                hist.SetDirectory(0)
+            hists[histName] = hist
+    finally:
+        fIn.Close()
+        if tempDir:
+            shutil.rmtree(tempDir)
+    return hists
+
+
+def _histogramForTrending(subsystem, histName, sourceHist):
+    # type: (processingClasses.subsystemContainer, str, ROOT.TH1) -> processingClasses.histogramContainer
+    """ Apply the functions which change the values of a histogram, as in ``processRuns.processHist()``.
+
+    Only the projection functions and the processing functions which modify the histogram values (such as
+    normalizing by the number of events, see ``pluginManager.modifiesHistogramValues()``) are applied. The
+    histogram isn't drawn, so functions which only affect how it is displayed are skipped.
+
+    Args:
+        subsystem (subsystemContainer): Subsystem which contains the histograms.
+        histName (str): Name of the trended histogram.
+        sourceHist (ROOT.TH1): Histogram read from the file which is the source of the trended histogram.
+    Returns:
+        histogramContainer: Temporary container of the processed histogram.
+    """
+    container = subsystem.hists.get(histName) if subsystem.hists else None
+    hist = processingClasses.histogramContainer(histName)
+    # Clone so that the functions don't modify the source hist, which may be used by other trended hists.
+    hist.hist = sourceHist.Clone("{}_temp".format(histName))
+    if container is None:
+        return hist
+
+    hist.histType = container.histType
+    for func in container.projectionFunctionsToApply:
+        hist.hist = pluginManager.callPlugin(func, subsystem, hist, subsystem.processingOptions)
+    for func in container.functionsToApply:
+        if pluginManager.modifiesHistogramValues(func):
+            pluginManager.callPlugin(func, subsystem, hist, subsystem.processingOptions)
+    return hist
+
+
+def notifyTrendingManager(trendingManager, subsystem, sources, hists, timestamp, runNumber):
+    # type: (TrendingManager, processingClasses.subsystemContainer, Dict[str, str], Dict[str, ROOT.TH1], float, int) -> int
+    """ Pass histograms which were read from a file to the trending manager.
+
+    The functions which change the values of the histograms are applied (see ``_histogramForTrending()``), but the
+    histograms aren't drawn or stored as images. The number of events of the subsystem is set from the file while
+    the functions are applied. Alarm information is stored in the trending manager so that it is shown with the
+    histograms when they are next processed.
+
+    Args:
+        trendingManager (TrendingManager): Manager of the trending objects.
+        subsystem (subsystemContainer): Subsystem which contains the histograms.
+        sources (dict): Trended histogram names to the names of the histograms in the file, as returned by
+            ``sourceHistogramNames()``.
+        hists (dict): Histograms read from the file, as returned by ``readHistograms()``.
+        timestamp (float): Unix time of the file.
+        runNumber (int): Run number of the file.
+    Returns:
+        int: Number of histograms which were passed to the trending manager.
+    """
+    nNotified = 0
+    nEvents = subsystem.nEvents
+    for histName in eventsHistogramNames(subsystem):
+        if histName in hists:
+            subsystem.nEvents = hists[histName].GetBinContent(1)
+    try:
+        for histName, sourceName in sources.items():
+            if sourceName not in hists:
+                continue
+            hist = _histogramForTrending(subsystem, histName, hists[sourceName])
+            trendingManager.notifyAboutNewHistogramValue(hist, timestamp=timestamp, runNumber=runNumber)
+            hist.hist = None
+            nNotified += 1
+    finally:
+        # The processing uses the number of events from when the subsystem was created.
+        subsystem.nEvents = nEvents
+    return nNotified
+
+
+def _readHistograms(args):  # type: (Tuple[str, List[str]]) -> Dict[str, ROOT.TH1]
+    """ Wrapper around ``readHistograms()`` which can be passed to ``multiprocessing.Pool.imap()``. """
+    return readHistograms(*args)
+
+
+def extractFiles(trendingManager, files, dirPrefix, pool=None):
+    # type: (TrendingManager, List[tuple], str, Any) -> Dict[str, Dict[str, int]]
+    """ Extract the trended values from a set of files.
+
+    Args:
+        trendingManager (TrendingManager): Manager of the trending objects.
+        files (list): (time, subsystem, runDir, filename, sources) of each file, sorted by time. ``filename`` is
+            relative to the ``dirPrefix``, while ``sources`` are as returned by ``sourceHistogramNames()``.
+        dirPrefix (str): Path to the root directory where the data is stored.
+        pool (multiprocessing.Pool): If given, the files are read by the pool. The trending objects are still
+            updated in the order of the files. Default: None.
+    Returns:
+        dict: Time of the most recent extracted file, keyed by subsystem name and then by run directory.
+    """
+    args = [(os.path.join(dirPrefix, filename), list(set(sources.values()).union(eventsHistogramNames(subsystem))))
+            for _, subsystem, _, filename, sources in files]
+    # ``imap`` returns the results in order, so the trending objects receive the values in time order.
+    results = pool.imap(_readHistograms, args) if pool else map(_readHistograms, args)
+    extracted = defaultdict(dict)  # type: Dict[str, Dict[str, int]]
+    for (fileTime, subsystem, runDir, _, sources), hists in zip(files, results):
+        notifyTrendingManager(trendingManager, subsystem, sources, hists,
+                              timestamp=fileTime, runNumber=int(runDir.replace("Run", "")))
+        extracted[subsystem.subsystem][runDir] = fileTime
+    return extracted
+
+
+def extractNewFiles(trendingManager, runs, runDict, dirPrefix):
+    # type: (TrendingManager, Any, Dict[str, Dict[str, Any]], str) -> Dict[str, Dict[str, int]]
+    """ Extract the trended values from the files which were just moved into the run structure.
+
+    Must be called after ``processRuns.processMovedFilesIntoRuns()``. Subsystems which aren't their own
+    ``fileLocationSubsystem`` are extracted from the files of the subsystem where their files are stored.
+
+    Args:
+        trendingManager (TrendingManager): Manager of the trending objects.
+        runs (BTree): Dict-like object which stores all run, subsystem, and hist information. Keys are the
+            in the ``runDir`` format ("Run123456"), while the values are ``runContainer`` objects.
+        runDict (dict): Nested dict which contains the moved filenames. For the precise structure, see
+            ``base.utilities.moveFiles()``.
+        dirPrefix (str): Path to the root directory where the data is stored.
+    Returns:
+        dict: Time of the most recent extracted file, keyed by subsystem name and then by run directory.
+    """
+    files = []
+    for runDir, movedFiles in runDict.items():
+        # Runs which weren't added (such as replayed data) are skipped.
+        if runDir not in runs:
+            continue
+        run = runs[runDir]
+        for subsystemName in trendingManager.parameters[CON.SUBSYSTEMS]:
+            subsystem = run.subsystems.get(subsystemName)
+            if subsystem is None:
+                continue
+            prepareHistogramContainers(subsystem, dirPrefix)
+            sources = sourceHistogramNames(subsystem, trendingManager.subscribedHistogramNames(subsystemName))
+            if not sources:
+                continue
+            for filename in movedFiles.get(subsystem.fileLocationSubsystem, []):
+                fileCont = subsystem.files.get(utilities.extractTimeStampFromFilename(filename))
+                if fileCont is not None:
+                    files.append((fileCont.fileTime, subsystem, runDir, fileCont.filename, sources))
+
+    files.sort(key=lambda x: x[0])
+    logger.info("Extracting trended values from {nFiles} new files".format(nFiles=len(files)))
+    return extractFiles(trendingManager, files, dirPrefix)
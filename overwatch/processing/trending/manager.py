@@ -17,8 +17,12 @@ from persistent import Persistent
 
 import overwatch.processing.pluginManager as pluginManager
 import overwatch.processing.trending.constants as CON
+from overwatch.processing.trending.statistics import HistogramStatistics
+from overwatch.processing.trending.store import TrendingStore, storeDirectory
 from overwatch.processing.alarms.collectors import Mail, SlackNotification
 from overwatch.processing.alarms.collectors import alarmCollector
+from overwatch.processing.alarms.batch import evaluateAlarms
+from overwatch.processing.alarms.dispatcher import notificationDispatcher
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +49,8 @@ class TrendingManager(Persistent):
     Created trending objects are saved to database and assigned to the right histograms.
     When the ROOT hist is processed, the manger is notified about new histogram.
     It invokes all trending objects that wanted this specific histogram.
+    Constructing the manager has no side effects: the output directories are only created when the trending
+    objects are first plotted, and the notification backends are only configured when alarms are first checked.
 
     Args:
         dbRoot (PersistentMapping): Database
@@ -54,6 +60,14 @@ class TrendingManager(Persistent):
         parameters (dict): Parameters read from configuration files
         histToTrending (dict): Dictionary whose key is histogram and value is the list of trending objects
         subsystems (dict): Database for trending
+        stores (dict): Columnar stores of the trended values, keyed by subsystem name
+        updatedTrendingObjects (set): (subsystem name, trending object name) of the trending objects which received
+            new values since they were last rendered
+        alarmInformation (dict): Alarm messages which haven't yet been shown with the histograms. Keys are
+            (run number, histogram name), while values are dicts which are added to ``histogramContainer.information``
+        pendingAlarms (dict): Trending objects whose alarms haven't yet been evaluated and the number of values
+            which they received since then, keyed by (subsystem name, trending object name). Only used if the alarms
+            are evaluated in a batch (see ``processAlarms()``).
         """
 
     def __init__(self, db, parameters):  # type: (PersistentMapping, dict)->None
@@ -62,11 +76,27 @@ class TrendingManager(Persistent):
         self.histToTrending = defaultdict(list)  # type: Dict[str, List[TrendingObject]]
 
         self.subsystems = BTrees.OOBTree.BTree()  # type: Dict[str, Dict[str, TrendingObject]]
-        self._prepareDirStructure()
-        Mail(alarmsParameters=parameters)
-        SlackNotification(alarmsParameters=parameters)
+        self.stores = {}  # type: Dict[str, TrendingStore]
+        self.updatedTrendingObjects = set()  # type: Set[Tuple[str, str]]
+        self.alarmInformation = defaultdict(dict)  # type: Dict[Tuple[Optional[int], str], Dict[str, str]]
+        self.pendingAlarms = {}  # type: Dict[Tuple[str, str], Tuple[TrendingObject, int]]
+        self._directoriesPrepared = False
+        self._notificationsPrepared = False
+        for subsystemName in self.parameters[CON.SUBSYSTEMS]:
+            self._prepareDataBase(subsystemName)
+
+    def _prepareNotifications(self):
+        """ Configure the notification backends. Only done once, before the first alarms are checked. """
+        if self._notificationsPrepared:
+            return
+        Mail().configure(self.parameters)
+        SlackNotification().configure(self.parameters)
+        notificationDispatcher.configure(self.parameters)
+        self._notificationsPrepared = True
 
     def _prepareDirStructure(self):
+        if self._directoriesPrepared:
+            return
         trendingDir = os.path.join(self.parameters[CON.DIR_PREFIX], CON.TRENDING, '{{subsystemName}}', '{type}')
         imgDir = trendingDir.format(type=CON.IMAGE)
         jsonDir = trendingDir.format(type=CON.JSON)
@@ -79,8 +109,7 @@ class TrendingManager(Persistent):
             subJsonDir = jsonDir.format(subsystemName=subsystemName)
             if not os.path.exists(subJsonDir):
                 os.makedirs(subJsonDir)
-
-            self._prepareDataBase(subsystemName)
+        self._directoriesPrepared = True
 
     def _prepareDataBase(self, objName):
         if objName not in self.subsystems:
@@ -120,48 +149,174 @@ class TrendingManager(Persistent):
                 logger.debug(success.format(name=info.name, subsystemName=subsystemName))
             else:
                 logger.debug(fail.format(name=self.subsystems[subsystemName][info.name], subsystemName=subsystemName))
+                # Objects which were restored from the database still need to receive their histograms.
+                self._subscribe(self.subsystems[subsystemName][info.name], info.histogramNames)
+
+    def _store(self, subsystemName):  # type: (str) -> TrendingStore
+        if subsystemName not in self.stores:
+            self.stores[subsystemName] = TrendingStore(storeDirectory(self.parameters[CON.DIR_PREFIX], subsystemName))
+        return self.stores[subsystemName]
 
     def _subscribe(self, trendingObject, histogramNames):  # type: (TrendingObject, List[str])->None
         for histName in histogramNames:
-            self.histToTrending[histName].append(trendingObject)
+            if trendingObject not in self.histToTrending[histName]:
+                self.histToTrending[histName].append(trendingObject)
+
+    def restoreTrendingObjects(self):
+        """ Use the trending objects stored in the database rather than starting from empty objects.
+
+        Must be called before ``createTrendingObjects()``, which will then only create the missing objects
+        (unless recreating is requested).
+
+        Args:
+            None.
+        Returns:
+            None.
+        """
+        if not self.db.contains(CON.TRENDING):
+            return
+        for subsystemName, subsystem in self.db.get(CON.TRENDING).items():
+            self._prepareDataBase(subsystemName)
+            for name, trendingObject in subsystem.items():
+                self.subsystems[subsystemName][name] = trendingObject
+
+    def subscribedHistogramNames(self, subsystemName):  # type: (str) -> List[str]
+        """ Names of the histograms which are needed by the trending objects of a subsystem. """
+        return [histName for histName, trends in self.histToTrending.items()
+                if any(trend.subsystemName == subsystemName for trend in trends)]
 
     def processTrending(self):
         """ Process the trending objects.
 
-        It loops over the trending objects and passes them to ``processHist()`` for plotting.
+        It loops over the trending objects and passes them to ``processHist()`` for plotting. Only the trending
+        objects which received new values (via ``notifyAboutNewHistogramValue()``) or whose output files are missing
+        are plotted. The new trended values and the trending object metadata are then written to the columnar store
+        of each subsystem. Any alarms which are pending batch evaluation are evaluated first.
 
         Args:
             None.
         Returns:
             None.
         """
+        self.processAlarms()
+        self._prepareDirStructure()
         # Cannot have same name as other canvases, otherwise the canvas will be replaced, leading to segfaults
         canvasName = 'processTrendingCanvas'
         canvas = ROOT.TCanvas(canvasName, canvasName)
         for subsystemName, subsystem in self.subsystems.items():  # type: (str, Dict[str, TrendingObject])
             logger.debug("subsystem: {subsystemName} is going to be trended".format(subsystemName=subsystemName))
+            nRendered = 0
+            nSkipped = 0
             for name, trendingObject in subsystem.items():  # type: (str, TrendingObject)
+                if (subsystemName, name) not in self.updatedTrendingObjects and \
+                        all(os.path.exists(filename) for filename in trendingObject.outputFilenames()):
+                    nSkipped += 1
+                    continue
                 logger.debug("trendingObject: {trendingObject}".format(trendingObject=trendingObject))
                 trendingObject.processHist(canvas)
+                nRendered += 1
+            logger.info("Trending for subsystem {subsystemName}: rendered {nRendered} objects, skipped {nSkipped} unchanged objects".format(
+                subsystemName=subsystemName, nRendered=nRendered, nSkipped=nSkipped))
+        self.flushStores()
+        self.updatedTrendingObjects.clear()
+
+    def flushStores(self):
+        """ Write the new trended values and the trending object metadata to the columnar store of each subsystem.
+
+        Args:
+            None.
+        Returns:
+            None.
+        """
+        for subsystemName, subsystem in self.subsystems.items():  # type: (str, Dict[str, TrendingObject])
+            store = self._store(subsystemName)
+            store.writeMetadata(subsystem)
+            store.flush()
 
-    def notifyAboutNewHistogramValue(self, hist):  # type: (histogramContainer) -> None
+    def notifyAboutNewHistogramValue(self, hist, timestamp=None, runNumber=None):
+        # type: (histogramContainer, Optional[float], Optional[int]) -> None
         """ This function is called when the ROOT histogram is being processed.
 
         It loops over trending objects to which histogram is subscribed to and calls function that extracts
         trended value from histogram e.g. mean, standard deviation (depending on trending object).
-        Then check alarms.
+        The statistics requested by the trending objects are computed together, once per histogram.
+        Then check alarms. If the alarms are evaluated in a batch (the ``batchAlarms`` parameter), the trending
+        objects are instead recorded, and their alarms are evaluated together by ``processAlarms()``.
 
         Args:
             hist (histogramContainer): Histogram which is processed.
+            timestamp (float): Unix time of the data in the histogram. Default: None.
+            runNumber (int): Run number of the histogram. Default: None.
         Returns:
             None.
         """
-        for trend in self.histToTrending.get(hist.histName, []):
-            trend.extractTrendValue(hist)
+        trends = self.histToTrending.get(hist.histName, [])
+        batchAlarms = self.parameters.get(CON.BATCH_ALARMS, False)
+        statistics = HistogramStatistics(hist.hist)
+        statistics.compute(set(name for trend in trends for name in getattr(trend, 'statistics', ())))
+        for trend in trends:
+            trend.setCurrentContext(timestamp, runNumber)
+            if getattr(trend, 'statistics', ()):
+                trend.extractTrendValue(hist, statistics)
+            else:
+                trend.extractTrendValue(hist)
+            self.updatedTrendingObjects.add((trend.subsystemName, trend.name))
+            latestValue = trend.latestValue()
+            if latestValue is not None:
+                self._store(trend.subsystemName).addValue(trend.name, *latestValue)
+            if batchAlarms:
+                if trend.alarms:
+                    key = (trend.subsystemName, trend.name)
+                    self.pendingAlarms[key] = (trend, self.pendingAlarms.get(key, (trend, 0))[1] + 1)
+                continue
+            if trend.alarms:
+                self._prepareNotifications()
             for alarm in trend.alarms:
                 alarm.processCheck(trend)
             if trend.alarmsMessages:
-                hist.information["Alarm" + trend.name] = '\n'.join(trend.alarmsMessages)
+                message = '\n'.join(trend.alarmsMessages)
+                hist.information["Alarm" + trend.name] = message
+                self.alarmInformation[(runNumber, hist.histName)]["Alarm" + trend.name] = message
                 trend.alarmsMessages = []
             alarmCollector.showOnConsole()
         # alarmCollector.announceOnSlack()
+
+    def processAlarms(self):
+        """ Evaluate the alarms of the trending objects which received new values, all together.
+
+        Used when the alarms are evaluated in a batch (the ``batchAlarms`` parameter). The alarms are evaluated
+        for each value which the trending objects received since the last evaluation via
+        ``alarms.batch.evaluateAlarms()``. The resulting messages are stored for the histograms of each trending
+        object (see ``popAlarmInformation()``), and the collected messages are shown once.
+
+        Args:
+            None.
+        Returns:
+            None.
+        """
+        if not self.pendingAlarms:
+            return
+        self._prepareNotifications()
+        trends = [trend for trend, _ in self.pendingAlarms.values()]
+        nNewValues = [nNew for _, nNew in self.pendingAlarms.values()]
+        self.pendingAlarms.clear()
+        evaluateAlarms(trends, nNewValues)
+        for trend in trends:
+            if not trend.alarmsMessages:
+                continue
+            message = '\n'.join(trend.alarmsMessages)
+            for histName in trend.histogramNames:
+                self.alarmInformation[(trend.currentRunNumber, histName)]["Alarm" + trend.name] = message
+            trend.alarmsMessages = []
+        alarmCollector.showOnConsole()
+
+    def popAlarmInformation(self, histName, runNumber=None):  # type: (str, Optional[int]) -> Dict[str, str]
+        """ Retrieve the alarm messages of a histogram which haven't yet been shown with the histogram.
+
+        Args:
+            histName (str): Name of the histogram.
+            runNumber (int): Run number of the histogram. Default: None.
+        Returns:
+            dict: Alarm messages keyed by ``"Alarm" + trending object name``. Empty if there are no new messages.
+        """
+        return self.alarmInformation.pop((runNumber, histName), {})
@@ -6,13 +6,17 @@ can save create histogram to image file and json file.
 
 .. codeauthor:: Pawel Ostrowski <ostr000@interia.pl>, AGH University of Science and Technology
 """
+import collections
 import logging
 import os
+import time
 
+import numpy as np
 import ROOT
 from persistent import Persistent
 
 import overwatch.processing.trending.constants as CON
+from overwatch.processing.trending.statistics import HistogramStatistics
 
 try:
     from typing import *  # noqa
@@ -26,6 +30,11 @@ logger = logging.getLogger(__name__)
 
 
 class TrendingObject(Persistent):
+    # Time and run number of the histogram from which values are currently being extracted. They are set by
+    # the ``TrendingManager`` via ``setCurrentContext()``. They are defined at the class level so that they
+    # are also available for objects which were stored before they were introduced.
+    currentTimestamp = None  # type: Optional[float]
+    currentRunNumber = None  # type: Optional[int]
 
     def __init__(self, name, description, histogramNames, subsystemName, parameters):
         # type: (str, str, list, str, dict) -> None
@@ -91,18 +100,22 @@ class TrendingObject(Persistent):
         self.histogram = self.retrieveHist()
         self.histogram.Draw(self.drawOptions)
 
+        imgFile, jsonFile = self.outputFilenames()
+        logger.debug("Saving hist to {path}".format(path=imgFile))
+        canvas.SaveAs(imgFile)
+
+        with open(jsonFile, "wb") as f:
+            f.write(ROOT.TBufferJSON.ConvertToJSON(canvas).Data().encode())
+
+    def outputFilenames(self):  # type: () -> Tuple[str, str]
+        """ Paths to the image and json files which are written by ``processHist()``. """
         # Replace any slashes with underscores to ensure that it can be used safely as a filename
         outputNameWithoutExt = self.name.replace("/", "_") + '.{extension}'
         outputPath = os.path.join(self.parameters[CON.DIR_PREFIX], CON.TRENDING,
                                   self.subsystemName, '{type}', outputNameWithoutExt)
         imgFile = outputPath.format(type=CON.IMAGE, extension=self.parameters[CON.EXTENSION])
         jsonFile = outputPath.format(type=CON.JSON, extension='json')
-
-        logger.debug("Saving hist to {path}".format(path=imgFile))
-        canvas.SaveAs(imgFile)
-
-        with open(jsonFile, "wb") as f:
-            f.write(ROOT.TBufferJSON.ConvertToJSON(canvas).Data().encode())
+        return imgFile, jsonFile
 
     @staticmethod
     def resetCanvas(canvas):
@@ -112,6 +125,461 @@ class TrendingObject(Persistent):
         canvas.SetLogy(False)
         canvas.SetLogz(False)
 
+    def latestValue(self):  # type: () -> Optional[Tuple[float, Any]]
+        """ Retrieve the most recently extracted value and its time, or None if it isn't available. """
+        return None
+
+    def setCurrentContext(self, timestamp, runNumber):  # type: (Optional[float], Optional[int]) -> None
+        """ Set the time and run number associated with the next extracted values. """
+        self.currentTimestamp = timestamp
+        self.currentRunNumber = runNumber
+
     def setAlarms(self, alarms):  # type: (List['Alarm']) -> None
         """ Invoked by trendingInfo after trendingObject is created"""
         self.alarms = alarms
+
+
+# Values of a trending object over a time range, as returned by ``RingBufferTrendingObject.query()``.
+# ``timestamps`` contains the start of each bucket (or the time of each value in the full resolution tier,
+# and the run number for the per run tier).
+trendingHistory = collections.namedtuple("trendingHistory", ["tier", "timestamps", "minimum", "maximum", "mean", "count"])
+
+
+class TrendingValuesChunk(Persistent):
+    """ Fixed size block of the values stored in a ``RingBufferTrendingObject``.
+
+    Each chunk is stored as a separate record in the database, so appending a value only requires writing
+    the chunk which contains it, rather than the entire buffer.
+    """
+
+    def __init__(self, size, valueShape):
+        # type: (int, Tuple[int, ...]) -> None
+        self.values = np.zeros((size,) + tuple(valueShape), dtype=np.float64)
+        self.timestamps = np.full(size, np.nan)
+
+    def setEntry(self, index, value, timestamp):
+        # type: (int, Any, float) -> None
+        self.values[index] = value
+        self.timestamps[index] = timestamp
+        # The arrays are modified in place, so we need to notify the database of the change explicitly.
+        self._p_changed = True
+
+
+class TrendingBucketsChunk(Persistent):
+    """ Fixed size block of the buckets stored in a ``TrendingRollupTier``.
+
+    As for ``TrendingValuesChunk``, each chunk is stored as a separate record in the database, so updating a
+    bucket only requires writing the chunk which contains it, rather than the entire tier.
+    """
+
+    def __init__(self, size):  # type: (int) -> None
+        self.keys = np.full(size, np.nan)
+        self.minimum = np.zeros(size)
+        self.maximum = np.zeros(size)
+        self.total = np.zeros(size)
+        self.count = np.zeros(size, dtype=np.int64)
+
+    def setBucket(self, index, key, value):  # type: (int, float, float) -> None
+        """ Start a new bucket with a single value. """
+        self.keys[index] = key
+        self.minimum[index] = value
+        self.maximum[index] = value
+        self.total[index] = value
+        self.count[index] = 1
+        # The arrays are modified in place, so we need to notify the database of the change explicitly.
+        self._p_changed = True
+
+    def addToBucket(self, index, value):  # type: (int, float) -> None
+        """ Add a value to an existing bucket. """
+        self.minimum[index] = min(self.minimum[index], value)
+        self.maximum[index] = max(self.maximum[index], value)
+        self.total[index] += value
+        self.count[index] += 1
+        self._p_changed = True
+
+
+class TrendingRollupTier(Persistent):
+    """ Bounded history of trended values aggregated into buckets.
+
+    Each bucket stores the minimum, maximum, sum and number of the values which were added to it. Buckets are
+    either a fixed time width (for example, one minute) or a run. The most recent ``capacity`` buckets are kept
+    in a ring buffer, so the memory usage doesn't depend on the length of the run. The ring buffer is split into
+    persistent chunks of ``chunkSize`` buckets (see ``TrendingBucketsChunk``), so adding a value only writes the
+    chunk which contains its bucket (along with the small head index stored in this object when a new bucket
+    is started).
+
+    Tiers which were stored with the bucket arrays directly in the object are migrated when they are first accessed.
+
+    Args:
+        name (str): Name of the tier.
+        bucketWidth (int): Width of each bucket in seconds, or None if the values are aggregated per run.
+        capacity (int): Maximum number of buckets to store.
+    """
+    # Number of buckets in each persistent chunk.
+    chunkSize = 32
+    _bucketArrays = ("keys", "minimum", "maximum", "total", "count")
+
+    def __init__(self, name, bucketWidth, capacity):
+        # type: (str, Optional[int], int) -> None
+        self.name = name
+        self.bucketWidth = bucketWidth
+        self.capacity = max(int(capacity), 1)
+        # Stored with the buffer, so that changing the class default doesn't affect existing buffers.
+        self._chunkSize = self.chunkSize
+        self._chunks = [TrendingBucketsChunk(min(self._chunkSize, self.capacity - start))
+                        for start in range(0, self.capacity, self._chunkSize)]
+        self.head = 0
+        self.size = 0
+
+    def _bucketChunks(self):  # type: () -> List[TrendingBucketsChunk]
+        """ Retrieve the chunks, migrating tiers which were stored with the bucket arrays if necessary. """
+        if getattr(self, "_chunks", None) is None:
+            arrays = {name: self.__dict__.pop(name) for name in self._bucketArrays}
+            self._chunkSize = self.chunkSize
+            chunks = []
+            for start in range(0, self.capacity, self._chunkSize):
+                chunk = TrendingBucketsChunk(min(self._chunkSize, self.capacity - start))
+                for name, array in arrays.items():
+                    getattr(chunk, name)[:] = array[start:start + len(chunk.keys)]
+                chunks.append(chunk)
+            self._chunks = chunks
+        return self._chunks
+
+    def _locate(self, index):  # type: (int) -> Tuple[TrendingBucketsChunk, int]
+        """ Determine the chunk and the index within the chunk of a bucket. """
+        return self._bucketChunks()[index // self._chunkSize], index % self._chunkSize
+
+    def bucketKey(self, timestamp, runNumber):  # type: (float, Optional[int]) -> Optional[float]
+        """ Determine the bucket for a value, or None if it can't be assigned to a bucket in this tier. """
+        if self.bucketWidth is None:
+            return runNumber
+        if timestamp is None or np.isnan(timestamp):
+            return None
+        return float(timestamp // self.bucketWidth * self.bucketWidth)
+
+    def add(self, value, timestamp, runNumber):  # type: (float, float, Optional[int]) -> None
+        """ Add a value to the corresponding bucket, creating a new bucket if necessary. """
+        key = self.bucketKey(timestamp, runNumber)
+        if key is None:
+            return
+        chunk, index = self._locate((self.head - 1) % self.capacity)
+        if self.size > 0 and chunk.keys[index] == key:
+            chunk.addToBucket(index, value)
+        else:
+            # Overwrites the oldest bucket if the tier is full.
+            chunk, index = self._locate(self.head)
+            chunk.setBucket(index, key, value)
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def oldestKey(self):  # type: () -> Optional[float]
+        if self.size == 0:
+            return None
+        chunk, index = self._locate((self.head - self.size) % self.capacity)
+        return chunk.keys[index]
+
+    def view(self, minKey=None, maxKey=None):  # type: (Optional[float], Optional[float]) -> trendingHistory
+        """ Retrieve the buckets within the given range in chronological order. """
+        chunks = self._bucketChunks()
+        arrays = {name: np.concatenate([getattr(chunk, name) for chunk in chunks]) for name in self._bucketArrays}
+        order = (np.arange(self.size) + self.head - self.size) % self.capacity
+        keys = arrays["keys"][order]
+        selected = np.ones(len(keys), dtype=bool)
+        if minKey is not None:
+            selected &= keys >= minKey
+        if maxKey is not None:
+            selected &= keys <= maxKey
+        order = order[selected]
+        return trendingHistory(tier=self.name, timestamps=arrays["keys"][order], minimum=arrays["minimum"][order],
+                               maximum=arrays["maximum"][order], mean=arrays["total"][order] / arrays["count"][order],
+                               count=arrays["count"][order])
+
+
+def buildTrendingGraph(name, title, timestamps, values, errors=None, gapThreshold=None):
+    # type: (str, str, np.ndarray, np.ndarray, Optional[np.ndarray], Optional[float]) -> ROOT.TObject
+    """ Build a graph of trended values, with the time of each value on the x axis.
+
+    The graph is constructed directly from the arrays, rather than point by point. If the time between
+    consecutive values is larger than ``gapThreshold`` (for example, between runs), the values are split into
+    separate graphs which are combined into a ``TMultiGraph``, so that the segments aren't connected. If any of the
+    times are unknown (``NaN``, as for migrated values), the index of each value is used instead of the time.
+
+    Args:
+        name (str): Name of the graph.
+        title (str): Title of the graph, which is also used for the y axis.
+        timestamps (np.ndarray): Unix time of each value.
+        values (np.ndarray): Trended values.
+        errors (np.ndarray): Error of each value. Default: None, which corresponds to no errors.
+        gapThreshold (float): Minimum time in seconds between values to be considered a gap. Default: None, which
+            doesn't split the values.
+    Returns:
+        ROOT.TGraphErrors or ROOT.TMultiGraph: Graph of the values.
+    """
+    y = np.ascontiguousarray(values, dtype=np.float64)
+    ey = np.ascontiguousarray(errors if errors is not None else np.zeros(len(y)), dtype=np.float64)
+    timeDisplay = not np.any(np.isnan(timestamps))
+    x = np.ascontiguousarray(timestamps if timeDisplay else np.arange(len(y)), dtype=np.float64)
+    ex = np.zeros(len(y))
+
+    splitIndices = []  # type: Sequence[int]
+    if timeDisplay and gapThreshold is not None:
+        splitIndices = np.flatnonzero(np.diff(x) > gapThreshold) + 1
+    segments = list(zip(*(np.split(arr, splitIndices) for arr in (x, y, ex, ey))))
+
+    def createGraph(x, y, ex, ey):
+        # The array constructor isn't available for empty graphs.
+        graph = ROOT.TGraphErrors(len(x), x, y, ex, ey) if len(x) else ROOT.TGraphErrors()
+        graph.SetMarkerStyle(ROOT.kFullCircle)
+        return graph
+
+    if len(segments) > 1:
+        histogram = ROOT.TMultiGraph()
+        for segment in segments:
+            graph = createGraph(*segment)
+            # The multigraph owns the graphs.
+            ROOT.SetOwnership(graph, False)
+            histogram.Add(graph)
+    else:
+        histogram = createGraph(x, y, ex, ey)
+    histogram.SetName(name)
+    histogram.SetTitle(title)
+    histogram.GetXaxis().SetTitle("Time" if timeDisplay else "Entry")
+    histogram.GetYaxis().SetTitle(title)
+    histogram.GetXaxis().SetTimeDisplay(timeDisplay)
+    if timeDisplay:
+        histogram.GetXaxis().SetTimeFormat("%d/%m %H:%M%F1970-01-01 00:00:00")
+    return histogram
+
+
+class RingBufferTrendingObject(TrendingObject):
+    """ Trending object which stores its values in a preallocated ring buffer.
+
+    The buffer has a fixed capacity of ``maxEntries`` values. Once it is full, each new value overwrites the oldest
+    one, so appending a value never reallocates or copies the stored values. The buffer is split into persistent
+    chunks of ``chunkSize`` entries (see ``TrendingValuesChunk``), such that only the chunk containing the new value
+    (and the small head index stored in this object) is written to the database when committing. Each value is
+    stored with the time at which it was added.
+
+    ``trendedValues`` provides the stored values in chronological order, so the object can be used in the same
+    way as other trending objects. For the corresponding times, see ``chronologicalView()``.
+
+    In addition to the full resolution values, the history is aggregated into per minute, per hour, and per run
+    tiers (see ``TrendingRollupTier``), each with a bounded number of buckets, so that long term trends are
+    available with bounded memory. ``query()`` retrieves the history from the tier which fits the requested time
+    range and resolution. The tiers aggregate the first component of each value (for example, the mean rather than
+    its error).
+
+    Trending objects which trend statistics of the histogram only need to specify the names of the ``statistics``
+    (see ``overwatch.processing.trending.statistics``). The value is the single statistic, or the tuple of the
+    statistics if ``valueShape`` is ``(n,)``. The statistics are computed once per histogram and shared by all
+    trending objects which use the histogram.
+
+    ``retrieveHist()`` draws the values as a function of their times (see ``buildTrendingGraph()``). Values with
+    ``valueShape`` of ``(2,)`` are drawn as a value and its error.
+
+    Objects which were stored with ``trendedValues`` as a ``numpy`` array are migrated when they are first accessed.
+    Since the original times are unknown, the migrated values have ``NaN`` timestamps.
+    """
+    # Shape of each trended value. For example, ``(2,)`` for a value and its error.
+    valueShape = ()  # type: Tuple[int, ...]
+    # Names of the histogram statistics which are trended.
+    statistics = ()  # type: Tuple[str, ...]
+    # Number of entries in each persistent chunk of the buffer.
+    chunkSize = 32
+    # Aggregated tiers, ordered from the finest to the coarsest, specified by
+    # (name, bucket width in seconds or None for per run, parameter name for the number of buckets, default number of buckets).
+    rollupTiers = [
+        ("minute", 60, CON.MINUTE_ENTRIES, 720),
+        ("hour", 3600, CON.HOUR_ENTRIES, 720),
+        ("run", None, CON.RUN_ENTRIES, 500),
+    ]
+
+    def initializeTrendingArray(self):  # type: () -> np.ndarray
+        return np.zeros((0,) + self.valueShape, dtype=np.float64)
+
+    @property
+    def capacity(self):  # type: () -> int
+        return max(int(self.maxEntries), 1)
+
+    @property
+    def trendedValues(self):  # type: () -> np.ndarray
+        """ Stored values in chronological order. """
+        return self.chronologicalView()[1]
+
+    @trendedValues.setter
+    def trendedValues(self, values):  # type: (Sequence) -> None
+        """ Replace the stored values. If there are more values than the capacity, only the most recent are kept. """
+        self._initializeBuffer()
+        for value in list(values)[-self.capacity:]:
+            self.appendValue(value, timestamp=np.nan)
+
+    def _initializeBuffer(self):  # type: () -> None
+        chunks = []
+        for start in range(0, self.capacity, self.chunkSize):
+            chunks.append(TrendingValuesChunk(min(self.chunkSize, self.capacity - start), self.valueShape))
+        self._chunks = chunks
+        # Stored with the buffer, so that changing the class default doesn't affect existing buffers.
+        self._chunkSize = self.chunkSize
+        # Position where the next value will be written.
+        self._head = 0
+        self.currentEntry = 0
+        # The aggregated tiers are recreated from the full resolution values when they are next needed.
+        self._tiers = None
+
+    def _ringBuffer(self):  # type: () -> List[TrendingValuesChunk]
+        """ Retrieve the buffer chunks, migrating objects which were stored with a ``numpy`` array if necessary. """
+        if getattr(self, "_chunks", None) is None:
+            # ``trendedValues`` is a property, so the stored array is only available through the instance dict.
+            oldValues = self.__dict__.pop("trendedValues", self.initializeTrendingArray())
+            logger.debug("Migrating {nValues} values of trending object {name} to a ring buffer".format(nValues=len(oldValues), name=self.name))
+            self.trendedValues = oldValues
+        return self._chunks
+
+    def _rollups(self):  # type: () -> List[TrendingRollupTier]
+        """ Retrieve the aggregated tiers, creating them from the full resolution values if necessary. """
+        if getattr(self, "_tiers", None) is None:
+            tiers = [TrendingRollupTier(name, bucketWidth, self.parameters.get(parameterName, defaultEntries))
+                     for name, bucketWidth, parameterName, defaultEntries in self.rollupTiers]
+            # The run numbers of the stored values are unknown, so only the time based tiers can be filled.
+            timestamps, values = self.chronologicalView()
+            for timestamp, value in zip(timestamps, values):
+                for tier in tiers:
+                    tier.add(np.ravel(value)[0], timestamp, None)
+            self._tiers = tiers
+        return self._tiers
+
+    def appendValue(self, value, timestamp=None, runNumber=None):  # type: (Any, Optional[float], Optional[int]) -> None
+        """ Add a value to the buffer, overwriting the oldest value if the buffer is full.
+
+        Args:
+            value (float or np.ndarray): Value to be added, with shape ``valueShape``.
+            timestamp (float): Unix time associated with the value. Default: None, which corresponds to
+                ``currentTimestamp`` if it is set, or the current time otherwise.
+            runNumber (int): Run number associated with the value. Default: None, which corresponds to
+                ``currentRunNumber``.
+        Returns:
+            None.
+        """
+        chunks = self._ringBuffer()
+        # Retrieve the tiers first so that, if they need to be created, the new value isn't included twice.
+        tiers = self._rollups()
+        if timestamp is None:
+            timestamp = self.currentTimestamp if self.currentTimestamp is not None else time.time()
+        if runNumber is None:
+            runNumber = self.currentRunNumber
+        chunks[self._head // self._chunkSize].setEntry(self._head % self._chunkSize, value, timestamp)
+        self._head = (self._head + 1) % self.capacity
+        self.currentEntry = min(self.currentEntry + 1, self.capacity)
+        for tier in tiers:
+            tier.add(np.ravel(value)[0], timestamp, runNumber)
+
+    def latestValue(self):  # type: () -> Optional[Tuple[float, np.ndarray]]
+        if self.currentEntry == 0:
+            return None
+        # Access the entry directly to avoid assembling the whole buffer.
+        index = (self._head - 1) % self.capacity
+        chunk = self._ringBuffer()[index // self._chunkSize]
+        return chunk.timestamps[index % self._chunkSize], chunk.values[index % self._chunkSize]
+
+    def extractTrendValue(self, hist, statistics=None):  # type: (histogramContainer, Optional[HistogramStatistics]) -> None
+        """ Extract the trended statistics from the histogram.
+
+        Args:
+            hist (histogramContainer): Histogram which is processed.
+            statistics (HistogramStatistics): Statistics of the histogram which are shared with other trending
+                objects. Default: None, in which case they are computed for this object.
+        Returns:
+            None.
+        """
+        if not self.statistics:
+            raise NotImplementedError
+        if statistics is None:
+            statistics = HistogramStatistics(hist.hist)
+        values = statistics.compute(self.statistics)
+        value = tuple(values[name] for name in self.statistics)
+        self.appendValue(value if self.valueShape else value[0])
+
+    def retrieveHist(self):  # type: () -> ROOT.TObject
+        timestamps, values = self.chronologicalView()
+        errors = None
+        if values.ndim > 1:
+            values, errors = values[:, 0], values[:, 1]
+        return buildTrendingGraph(self.name, self.desc, timestamps, values, errors,
+                                  gapThreshold=self.parameters.get(CON.GAP_THRESHOLD, 600))
+
+    def chronologicalView(self, lastN=None):  # type: (Optional[int]) -> Tuple[np.ndarray, np.ndarray]
+        """ Retrieve the stored values and their times in chronological order.
+
+        Args:
+            lastN (int): Only return the most recent ``lastN`` values. Default: None, which returns all values.
+        Returns:
+            tuple: (timestamps, values), where timestamps has shape ``(n,)`` and values has shape
+                ``(n,) + valueShape``.
+        """
+        chunks = self._ringBuffer()
+        if self.currentEntry < self.capacity:
+            order = np.arange(self.currentEntry)
+        else:
+            order = (np.arange(self.capacity) + self._head) % self.capacity
+        if lastN is not None:
+            order = order[len(order) - min(lastN, len(order)):]
+        values = np.concatenate([chunk.values for chunk in chunks])
+        timestamps = np.concatenate([chunk.timestamps for chunk in chunks])
+        return timestamps[order], values[order]
+
+    def query(self, minTime=None, maxTime=None, resolution=None):
+        # type: (Optional[float], Optional[float], Optional[float]) -> trendingHistory
+        """ Retrieve the history of the trended values over a time range.
+
+        Only one tier is read. If a resolution is requested, the coarsest tier with buckets no wider than the
+        resolution is used. Otherwise, the finest tier which still covers the start of the time range is used.
+
+        Args:
+            minTime (float): Unix time of the start of the range. Default: None, which doesn't restrict the start.
+            maxTime (float): Unix time of the end of the range. Default: None, which doesn't restrict the end.
+            resolution (float): Requested resolution in seconds. Default: None.
+        Returns:
+            trendingHistory: History within the range. For the full resolution tier, the minimum, maximum and mean
+                are all equal to the value, while the count is 1.
+        """
+        timeTiers = [tier for tier in self._rollups() if tier.bucketWidth is not None]
+        tier = None
+        if resolution is not None:
+            usableTiers = [t for t in timeTiers if t.bucketWidth <= resolution]
+            tier = usableTiers[-1] if usableTiers else None
+        elif minTime is not None:
+            timestamps, _ = self.chronologicalView()
+            finiteTimestamps = timestamps[np.isfinite(timestamps)]
+            if len(finiteTimestamps) == 0 or finiteTimestamps[0] > minTime:
+                coveringTiers = [t for t in timeTiers if t.oldestKey() is not None and t.oldestKey() <= minTime]
+                tier = coveringTiers[0] if coveringTiers else timeTiers[-1]
+
+        if tier is not None:
+            # Include the bucket which contains the start of the range.
+            minKey = tier.bucketKey(minTime, None) if minTime is not None else None
+            return tier.view(minKey, maxTime)
+
+        timestamps, values = self.chronologicalView()
+        if values.ndim > 1:
+            values = values[:, 0]
+        selected = np.ones(len(timestamps), dtype=bool)
+        if minTime is not None:
+            selected &= timestamps >= minTime
+        if maxTime is not None:
+            selected &= timestamps <= maxTime
+        values = values[selected]
+        return trendingHistory(tier="full", timestamps=timestamps[selected], minimum=values, maximum=values,
+                               mean=values, count=np.ones(len(values), dtype=np.int64))
+
+    def runHistory(self, minRunNumber=None, maxRunNumber=None):
+        # type: (Optional[int], Optional[int]) -> trendingHistory
+        """ Retrieve the trended values aggregated per run.
+
+        Args:
+            minRunNumber (int): Smallest run number to include. Default: None.
+            maxRunNumber (int): Largest run number to include. Default: None.
+        Returns:
+            trendingHistory: History where ``timestamps`` contains the run numbers.
+        """
+        runTier = [tier for tier in self._rollups() if tier.bucketWidth is None][0]
+        return runTier.view(minRunNumber, maxRunNumber)
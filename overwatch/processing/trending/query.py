@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+""" Read-only queries of the trending results.
+
+The web app only needs the names and descriptions of the trending objects and (for interactive plots) their
+values over a time range. Both are available from the columnar store (see ``trending.store``), so
+``TrendingQuery`` answers them with a few small reads of the store files, without loading the trending objects from
+the database and without any side effects.
+
+Each subsystem store has a version, which is derived from the modification time and size of its metadata and time
+column. The version changes whenever new values or metadata are written, so it's used both to cache the index of the
+trending objects between requests and to provide ``ETag`` and ``Last-Modified`` values for HTTP caching.
+"""
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from overwatch.processing.trending.store import METADATA, TIME_COLUMN, TrendingStoreReader, storeDirectory
+
+try:
+    from typing import *  # noqa
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+
+class TrendingQuery(object):
+    """ Read-only access to the trending objects of a set of subsystems.
+
+    Args:
+        dirPrefix (str): Path to the root directory where the data is stored.
+        subsystemNames (list): Names of the subsystems.
+
+    Attributes:
+        dirPrefix (str): Path to the root directory where the data is stored.
+        subsystemNames (list): Names of the subsystems.
+    """
+    def __init__(self, dirPrefix, subsystemNames):  # type: (str, List[str]) -> None
+        self.dirPrefix = dirPrefix
+        self.subsystemNames = list(subsystemNames)
+        self._index = None  # type: Optional[Tuple[str, Dict[str, Dict[str, dict]]]]
+
+    def _reader(self, subsystemName):  # type: (str) -> TrendingStoreReader
+        return TrendingStoreReader(storeDirectory(self.dirPrefix, subsystemName))
+
+    def version(self, subsystemName=None):  # type: (Optional[str]) -> Tuple[str, Optional[float]]
+        """ Determine the version of the stored trending results.
+
+        Args:
+            subsystemName (str): Only consider this subsystem. Default: None, which considers all subsystems.
+        Returns:
+            tuple: (etag, lastModified), where etag (str) changes whenever the stored results change, and lastModified
+                (float) is the unix time when they were last modified (None if nothing is stored).
+        """
+        subsystemNames = [subsystemName] if subsystemName is not None else self.subsystemNames
+        state = []
+        lastModified = None
+        for name in subsystemNames:
+            directory = storeDirectory(self.dirPrefix, name)
+            for filename in [METADATA, TIME_COLUMN + ".npy"]:
+                try:
+                    stat = os.stat(os.path.join(directory, filename))
+                except OSError:
+                    state.append((name, filename))
+                    continue
+                state.append((name, filename, stat.st_mtime, stat.st_size))
+                lastModified = max(lastModified, stat.st_mtime) if lastModified is not None else stat.st_mtime
+        etag = hashlib.md5(repr(state).encode()).hexdigest()
+        return etag, lastModified
+
+    def index(self):  # type: () -> Dict[str, Dict[str, dict]]
+        """ Names and metadata of the available trending objects.
+
+        The index is cached until the stored results change.
+
+        Args:
+            None.
+        Returns:
+            OrderedDict: Keys are subsystem names, while values are dicts from trending object names to their metadata
+                (which includes ``desc`` and ``histogramNames``). Both are sorted by name. Subsystems which haven't yet
+                been stored are not included.
+        """
+        etag, _ = self.version()
+        if self._index is not None and self._index[0] == etag:
+            return self._index[1]
+        index = OrderedDict()
+        for subsystemName in sorted(self.subsystemNames):
+            metadata = self._reader(subsystemName).metadata()
+            if metadata:
+                index[subsystemName] = OrderedDict(sorted(metadata.items()))
+        self._index = (etag, index)
+        return index
+
+    def values(self, subsystemName, name, minTime=None, maxTime=None, maxPoints=None):
+        # type: (str, str, Optional[float], Optional[float], Optional[int]) -> Optional[dict]
+        """ Retrieve the trended values of a trending object within a time range.
+
+        Args:
+            subsystemName (str): Name of the subsystem.
+            name (str): Name of the trending object.
+            minTime (float): Only include values at or after this time. Default: None.
+            maxTime (float): Only include values at or before this time. Default: None.
+            maxPoints (int): Maximum number of values to return. If there are more values in the range, evenly spaced
+                values are selected (always including the most recent value). Default: None, which returns all values.
+        Returns:
+            dict: JSON serializable values, with ``times`` and ``values`` lists (and ``errors`` for trending objects
+                which store an error), as well as the ``subsystem``, ``name`` and ``desc``. Times where the object
+                doesn't have a value are skipped. None if the trending object doesn't exist.
+        """
+        metadata = self.index().get(subsystemName, {}).get(name)
+        if metadata is None:
+            return None
+        times, values = self._reader(subsystemName).column(name, minTime=minTime, maxTime=maxTime)
+        values = np.asarray(values)
+        centralValues = values if values.ndim == 1 else values.reshape(len(values), -1)[:, 0]
+        selected = np.flatnonzero(~np.isnan(centralValues))
+        if maxPoints is not None and len(selected) > maxPoints > 0:
+            selected = selected[np.linspace(0, len(selected) - 1, maxPoints).round().astype(int)]
+
+        result = OrderedDict([
+            ("subsystem", subsystemName),
+            ("name", name),
+            ("desc", metadata.get("desc", "")),
+            ("times", np.asarray(times)[selected].tolist()),
+            ("values", centralValues[selected].tolist()),
+        ])
+        if values.ndim > 1 and values.reshape(len(values), -1).shape[1] > 1:
+            result["errors"] = values.reshape(len(values), -1)[selected, 1].tolist()
+        return result
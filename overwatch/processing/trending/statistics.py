@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+""" Batched extraction of histogram statistics for trending.
+
+Many trending objects trend different statistics of the same histogram (for example, the maximum, mean and
+standard deviation). Rather than each trending object calling ROOT separately, the ``TrendingManager`` creates one
+``HistogramStatistics`` per histogram, which computes all statistics requested by the subscribed trending objects
+from a single read of the bin contents and the histogram statistics (``TH1::GetStats()``), and then passes it to
+each of the trending objects.
+
+The statistics are consistent with the corresponding ROOT methods (for example, ``maximum`` with
+``TH1::GetMaximum()`` and ``meanError`` with ``TH1::GetMeanError()``), including respecting restricted axis
+ranges. Additional statistics are added by defining a method which computes it from the bin contents and/or the
+histogram statistics and adding it to ``HistogramStatistics.available``.
+"""
+import logging
+
+import numpy as np
+import ROOT
+
+try:
+    from typing import *  # noqa
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+# ROOT methods which provide each statistic. They are used for objects which don't provide their bin contents.
+_rootMethods = {
+    "maximum": "GetMaximum",
+    "minimum": "GetMinimum",
+    "mean": "GetMean",
+    "meanError": "GetMeanError",
+    "stdDev": "GetStdDev",
+    "stdDevError": "GetStdDevError",
+    "entries": "GetEntries",
+}
+
+
+class HistogramStatistics(object):
+    """ Statistics of a histogram, computed together from one read of the histogram.
+
+    The statistics are computed when they are first requested and then cached, so they can be shared by all
+    trending objects which use the histogram.
+
+    Args:
+        hist (ROOT.TH1): Histogram.
+
+    Attributes:
+        hist (ROOT.TH1): Histogram.
+        values (dict): Statistics which have been computed, keyed by name.
+    """
+    # Names of the available statistics. Quantiles are available via ``quantile<percent>`` (for example, ``quantile50``
+    # for the median).
+    available = ("maximum", "minimum", "mean", "meanError", "stdDev", "stdDevError", "entries", "integral",
+                 "emptyBinFraction")
+
+    def __init__(self, hist):  # type: (ROOT.TH1) -> None
+        self.hist = hist
+        self.values = {}  # type: Dict[str, float]
+        self._contents = None  # type: Optional[np.ndarray]
+        self._stats = None  # type: Optional[np.ndarray]
+
+    def __getitem__(self, name):  # type: (str) -> float
+        if name not in self.values:
+            self.compute([name])
+        return self.values[name]
+
+    def compute(self, names):  # type: (Iterable[str]) -> Dict[str, float]
+        """ Compute the requested statistics.
+
+        Args:
+            names (iterable): Names of the statistics.
+        Returns:
+            dict: All statistics which have been computed so far, keyed by name.
+        """
+        names = [name for name in names if name not in self.values]
+        if not names:
+            return self.values
+        if not isinstance(self.hist, ROOT.TH1):
+            # Fall back to ROOT style methods for objects which don't provide their bin contents.
+            for name in names:
+                self.values[name] = getattr(self.hist, _rootMethods[name])()
+            return self.values
+
+        if self._contents is None:
+            self._readHistogram()
+        for name in names:
+            if name.startswith("quantile"):
+                self.values[name] = self._quantile(float(name[len("quantile"):]) / 100.)
+            elif name in self.available:
+                self.values[name] = getattr(self, "_" + name)()
+            else:
+                raise KeyError("Statistic {name} is not available".format(name=name))
+        return self.values
+
+    def _readHistogram(self):  # type: () -> None
+        """ Read the bin contents (within the axis ranges, without under- and overflow) and statistics. """
+        hist = self.hist
+        nCells = hist.GetNcells()
+        # The array of profiles contains the sums rather than the bin contents.
+        getArray = getattr(hist, "GetArray", None) if not isinstance(hist, (ROOT.TProfile, ROOT.TProfile2D)) else None
+        if getArray is not None:
+            contents = np.asarray(getArray())[:nCells]
+        else:
+            # Some histogram types don't store their contents in an array, so we need to retrieve them individually.
+            contents = np.array([hist.GetBinContent(i) for i in range(nCells)])
+        # Cells are stored with x varying fastest.
+        axes = [hist.GetXaxis(), hist.GetYaxis(), hist.GetZaxis()]
+        shape = [axis.GetNbins() + 2 if i < hist.GetDimension() else 1 for i, axis in enumerate(axes)]
+        contents = contents.reshape(shape[::-1])
+        ranges = [slice(axis.GetFirst(), axis.GetLast() + 1) if i < hist.GetDimension() else slice(None)
+                  for i, axis in enumerate(axes)]
+        self._contents = np.asarray(contents[tuple(ranges[::-1])], dtype=np.float64)
+        # sumw, sumw2, sumwx, sumwx2, (and further terms for higher dimensions)
+        self._stats = np.zeros(13)
+        hist.GetStats(self._stats)
+
+    def _maximum(self):  # type: () -> float
+        maximum = self.hist.GetMaximumStored()
+        if maximum != -1111:
+            return maximum
+        return float(self._contents.max()) if self._contents.size else 0.
+
+    def _minimum(self):  # type: () -> float
+        minimum = self.hist.GetMinimumStored()
+        if minimum != -1111:
+            return minimum
+        return float(self._contents.min()) if self._contents.size else 0.
+
+    def _effectiveEntries(self):  # type: () -> float
+        sumw, sumw2 = self._stats[:2]
+        return sumw * sumw / sumw2 if sumw2 else 0.
+
+    def _mean(self):  # type: () -> float
+        sumw = self._stats[0]
+        return self._stats[2] / sumw if sumw else 0.
+
+    def _meanError(self):  # type: () -> float
+        neff = self._effectiveEntries()
+        return self["stdDev"] / np.sqrt(neff) if neff > 0 else 0.
+
+    def _stdDev(self):  # type: () -> float
+        sumw = self._stats[0]
+        if not sumw:
+            return 0.
+        mean = self["mean"]
+        return float(np.sqrt(abs(self._stats[3] / sumw - mean * mean)))
+
+    def _stdDevError(self):  # type: () -> float
+        neff = self._effectiveEntries()
+        return self["stdDev"] / np.sqrt(2 * neff) if neff > 0 else 0.
+
+    def _entries(self):  # type: () -> float
+        return self.hist.GetEntries()
+
+    def _integral(self):  # type: () -> float
+        return float(self._contents.sum())
+
+    def _emptyBinFraction(self):  # type: () -> float
+        return float(np.count_nonzero(self._contents == 0)) / self._contents.size if self._contents.size else 0.
+
+    def _quantile(self, fraction):  # type: (float) -> float
+        """ Quantile of the x axis, linearly interpolated within the bin (as ``TH1::GetQuantiles()``). """
+        contents = self._contents
+        if contents.ndim > 1:
+            # Project onto the x axis.
+            contents = contents.reshape(-1, contents.shape[-1]).sum(axis=0)
+        cumulative = np.cumsum(contents)
+        if not contents.size or cumulative[-1] <= 0:
+            return 0.
+        cumulative /= cumulative[-1]
+        axis = self.hist.GetXaxis()
+        edges = np.array([axis.GetBinLowEdge(i) for i in range(axis.GetFirst(), axis.GetLast() + 2)])
+        index = min(int(np.searchsorted(cumulative, fraction, side="left")), len(cumulative) - 1)
+        previous = cumulative[index - 1] if index > 0 else 0.
+        width = cumulative[index] - previous
+        offset = (fraction - previous) / width if width > 0 else 0.
+        return float(edges[index] + offset * (edges[index + 1] - edges[index]))
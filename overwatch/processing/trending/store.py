@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+""" Columnar store of trended values outside of the database.
+
+The trended values of each subsystem are appended to a columnar store on disk, with one ``.npy`` column per
+trending object and a time column which is shared by all of the objects in the subsystem::
+
+    trending/EMC/store/time.npy             # Unix time of each row.
+    trending/EMC/store/objectName.npy       # Values of the trending object, with one row per time (NaN if missing).
+    trending/EMC/store/metadata.json        # Name, description and column of each trending object.
+
+Values are collected by ``TrendingStore`` during processing and appended when the trending is processed. The
+columns are written before the time column, so the length of the time column defines which rows are complete.
+Consequently, readers (such as the web app) can memory map the files read-only via ``TrendingStoreReader`` and
+retrieve slices without copying and without coordinating with the processing, and they don't need to load the
+trending objects from the database. The trending objects in the database store the metadata and the bounded
+recent history used for the alarms.
+"""
+import json
+import logging
+import os
+from collections import defaultdict
+
+import numpy as np
+
+import overwatch.processing.trending.constants as CON
+from overwatch.processing.snapshotStore import appendRow
+
+try:
+    from typing import *  # noqa
+except ImportError:
+    pass
+else:
+    # Needed for typing information
+    from overwatch.processing.trending.objects.object import TrendingObject  # noqa
+
+logger = logging.getLogger(__name__)
+
+STORE = 'store'
+TIME_COLUMN = 'time'
+METADATA = 'metadata.json'
+CHECKPOINT = 'backfill.json'
+IN_PROGRESS = 'backfill.inProgress'
+
+
+def storeDirectory(dirPrefix, subsystemName):  # type: (str, str) -> str
+    return os.path.join(dirPrefix, CON.TRENDING, subsystemName, STORE)
+
+
+def columnName(name):  # type: (str) -> str
+    """ Name of the column of a trending object. Slashes are replaced so it can be used safely as a filename. """
+    return name.replace("/", "_")
+
+
+class TrendingStore(object):
+    """ Writer for the trended values of one subsystem.
+
+    Args:
+        directory (str): Path to the store directory.
+
+    Attributes:
+        directory (str): Path to the store directory.
+        pending (dict): Values which haven't yet been written. Keys are times, while values are dicts from
+            trending object name to value.
+    """
+
+    def __init__(self, directory):  # type: (str) -> None
+        self.directory = directory
+        self.pending = defaultdict(dict)  # type: Dict[float, Dict[str, Any]]
+
+    def _filename(self, column):  # type: (str) -> str
+        return os.path.join(self.directory, column + '.npy')
+
+    def addValue(self, name, timestamp, value):  # type: (str, float, Any) -> None
+        """ Add a value, which will be written with the next ``flush()``. """
+        self.pending[timestamp][columnName(name)] = np.asarray(value, dtype=np.float64)
+
+    def writeMetadata(self, trendingObjects):  # type: (Dict[str, TrendingObject]) -> None
+        """ Write the properties of the trending objects, so they're available without the database. """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        metadata = {}
+        for name, trendingObject in trendingObjects.items():
+            metadata[name] = {
+                "desc": trendingObject.desc,
+                "histogramNames": list(trendingObject.histogramNames),
+                "column": columnName(name),
+            }
+        # Write to a temporary file first, such that readers never see a partially written file.
+        filename = os.path.join(self.directory, METADATA)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(metadata, f, indent=1, sort_keys=True)
+        os.rename(filename + '.tmp', filename)
+
+    def flush(self):  # type: () -> int
+        """ Append the pending values to the store, with one row per time.
+
+        Returns:
+            int: Number of rows which were appended.
+        """
+        if not self.pending:
+            return 0
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        timeFilename = self._filename(TIME_COLUMN)
+        nRows = len(np.load(timeFilename, mmap_mode='r')) if os.path.exists(timeFilename) else 0
+        # Columns of objects which don't have a value at a particular time are filled with NaN.
+        shapes = {}
+        for filename in os.listdir(self.directory):
+            column, ext = os.path.splitext(filename)
+            if ext == '.npy' and column != TIME_COLUMN:
+                shapes[column] = np.load(os.path.join(self.directory, filename), mmap_mode='r').shape[1:]
+
+        nAppended = 0
+        for timestamp in sorted(self.pending):
+            values = self.pending[timestamp]
+            for column, value in values.items():
+                shapes.setdefault(column, value.shape)
+            for column, shape in shapes.items():
+                value = values.get(column, np.full(shape, np.nan))
+                appendRow(self._filename(column), value, nRows, fillValue=np.nan)
+            # The time is written last, so it only includes complete rows.
+            appendRow(timeFilename, np.float64(timestamp), nRows)
+            nRows += 1
+            nAppended += 1
+
+        self.pending.clear()
+        logger.debug("Appended {nAppended} rows to {directory}".format(nAppended=nAppended, directory=self.directory))
+        return nAppended
+
+
+class TrendingStoreReader(object):
+    """ Read-only access to the trended values of one subsystem.
+
+    The files are memory mapped, so the returned arrays are views into the store rather than copies.
+
+    Args:
+        directory (str): Path to the store directory.
+    """
+
+    def __init__(self, directory):  # type: (str) -> None
+        self.directory = directory
+
+    def metadata(self):  # type: () -> Dict[str, dict]
+        """ Properties of the stored trending objects. Empty if the store doesn't exist yet. """
+        filename = os.path.join(self.directory, METADATA)
+        if not os.path.exists(filename):
+            return {}
+        with open(filename, 'r') as f:
+            return json.load(f)
+
+    def times(self):  # type: () -> np.ndarray
+        filename = os.path.join(self.directory, TIME_COLUMN + '.npy')
+        if not os.path.exists(filename):
+            return np.array([], dtype=np.float64)
+        return np.load(filename, mmap_mode='r')
+
+    def column(self, name, minTime=None, maxTime=None):
+        # type: (str, Optional[float], Optional[float]) -> Tuple[np.ndarray, np.ndarray]
+        """ Retrieve the values of a trending object.
+
+        Args:
+            name (str): Name of the trending object.
+            minTime (float): Only include values at or after this time. Default: None.
+            maxTime (float): Only include values at or before this time. Default: None.
+        Returns:
+            tuple: (times, values). If the times are in order (which is the usual case), these are views into the
+                store. Rows where the object doesn't have a value are NaN.
+        """
+        times = self.times()
+        filename = os.path.join(self.directory, columnName(name) + '.npy')
+        if not os.path.exists(filename):
+            return times[:0], np.array([], dtype=np.float64)
+        # The column may already contain rows which are still being written, so we only consider complete rows.
+        values = np.load(filename, mmap_mode='r')[:len(times)]
+        if minTime is None and maxTime is None:
+            return times, values
+        if np.all(times[1:] >= times[:-1]):
+            start = np.searchsorted(times, minTime, side='left') if minTime is not None else 0
+            stop = np.searchsorted(times, maxTime, side='right') if maxTime is not None else len(times)
+            return times[start:stop], values[start:stop]
+        selected = np.ones(len(times), dtype=bool)
+        if minTime is not None:
+            selected &= times >= minTime
+        if maxTime is not None:
+            selected &= times <= maxTime
+        return times[selected], values[selected]
+
+
+def readCheckpoint(directory):  # type: (str) -> Dict[str, int]
+    """ Read the backfill checkpoint of a subsystem.
+
+    Args:
+        directory (str): Path to the store directory.
+    Returns:
+        dict: Keys are run directories, while values are the time of the most recent file which has been backfilled.
+    """
+    filename = os.path.join(directory, CHECKPOINT)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def writeCheckpoint(directory, checkpoint):  # type: (str, Dict[str, int]) -> None
+    """ Write the backfill checkpoint of a subsystem. See ``readCheckpoint()``. """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    filename = os.path.join(directory, CHECKPOINT)
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=1, sort_keys=True)
+    os.rename(filename + '.tmp', filename)
+
+
+def isBackfillInProgress(directory):  # type: (str) -> bool
+    """ Check whether a backfill of a subsystem was started but hasn't yet finished.
+
+    Only the backfill marks itself as in progress, while the checkpoints are also advanced by the processing (see
+    ``updateCheckpoints()``). Consequently, this (rather than the checkpoint) determines whether a backfill should
+    resume.
+
+    Args:
+        directory (str): Path to the store directory.
+    Returns:
+        bool: True if the backfill is in progress.
+    """
+    return os.path.exists(os.path.join(directory, IN_PROGRESS))
+
+
+def setBackfillInProgress(directory, inProgress):  # type: (str, bool) -> None
+    """ Mark the backfill of a subsystem as in progress or finished. See ``isBackfillInProgress()``. """
+    filename = os.path.join(directory, IN_PROGRESS)
+    if inProgress:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        open(filename, 'w').close()
+    elif os.path.exists(filename):
+        os.remove(filename)
+
+
+def updateCheckpoints(dirPrefix, extracted):  # type: (str, Dict[str, Dict[str, int]]) -> None
+    """ Advance the backfill checkpoints with files whose values were extracted during the processing.
+
+    This ensures that a later backfill doesn't extract the same files again.
+
+    Args:
+        dirPrefix (str): Path to the root directory where the data is stored.
+        extracted (dict): Time of the most recent extracted file, keyed by subsystem name and then by run directory.
+    Returns:
+        None.
+    """
+    for subsystemName, runTimes in extracted.items():
+        directory = storeDirectory(dirPrefix, subsystemName)
+        checkpoint = readCheckpoint(directory)
+        for runDir, fileTime in runTimes.items():
+            checkpoint[runDir] = max(checkpoint.get(runDir, fileTime), fileTime)
+        writeCheckpoint(directory, checkpoint)
+
+
+def readMetadata(dirPrefix, subsystemNames):  # type: (str, List[str]) -> Dict[str, Dict[str, dict]]
+    """ Read the metadata of the trending objects for a set of subsystems.
+
+    Args:
+        dirPrefix (str): Path to the root directory where the data is stored.
+        subsystemNames (list): Names of the subsystems.
+    Returns:
+        dict: Keys are subsystem names, while values are dicts from trending object names to their metadata.
+            Subsystems without a store are not included.
+    """
+    metadata = {}
+    for subsystemName in subsystemNames:
+        directory = storeDirectory(dirPrefix, subsystemName)
+        if os.path.exists(os.path.join(directory, METADATA)):
+            metadata[subsystemName] = TrendingStoreReader(directory).metadata()
+    return metadata
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+""" Cache for rendered page fragments.
+
+Rendering a run page loops over every histogram group and histogram of the subsystem, but the output only
+changes when the subsystem is processed again. Since many users view the same pages during a run, the rendered
+fragments are cached and keyed by the run, subsystem, template, and the time at which the subsystem was last
+processed (along with the request options which are passed to the template). Once the processing updates the
+subsystem, the key changes, so the stale fragments are never served and are dropped when the new fragment is stored.
+
+Note that only fragments which don't depend on the user (such as the drawer and main content) should be cached.
+The full page layout contains the user name and CSRF token, so it must still be rendered for each request.
+"""
+
+import collections
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PageCache(object):
+    """ Least recently used cache of rendered fragments, limited by the size of the stored fragments.
+
+    Args:
+        maxSize (int): Maximum size of the stored fragments in bytes. Default: 64 MB.
+
+    Attributes:
+        maxSize (int): Maximum size of the stored fragments in bytes.
+        size (int): Current size of the stored fragments in bytes.
+        hits (int): Number of requests which were served from the cache.
+        misses (int): Number of requests which had to be rendered.
+        _entries (OrderedDict): Rendered fragments, ordered from least to most recently used. Keys are
+            ``(runDir, subsystemName, templateName, lastProcessed, options)`` tuples, while values are
+            ``(fragment, size)`` tuples.
+        _lock (threading.Lock): Lock to guard the entries, since the web app may serve requests in multiple threads.
+    """
+    def __init__(self, maxSize = 64 * 1024 * 1024):
+        self.maxSize = maxSize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(runDir, subsystemName, templateName, lastProcessed, **options):
+        """ Create the key of a fragment.
+
+        Args:
+            runDir (str): Run of the fragment. Of the form ``Run123456``.
+            subsystemName (str): Subsystem of the fragment.
+            templateName (str): Name of the template which renders the fragment.
+            lastProcessed (float): Unix time at which the subsystem was last processed.
+            options (dict): Additional values which are passed to the template and change the output.
+        Returns:
+            tuple: Key of the fragment.
+        """
+        return (runDir, subsystemName, templateName, lastProcessed, tuple(sorted(options.items())))
+
+    def retrieve(self, key, render):
+        """ Retrieve a fragment, rendering and storing it if it's not available.
+
+        Args:
+            key (tuple): Key of the fragment, as created by ``key(...)``.
+            render (callable): Function which renders the fragment. It is called without any arguments.
+        Returns:
+            str: The rendered fragment.
+        """
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                # Move it to the most recently used position.
+                entry = self._entries.pop(key)
+                self._entries[key] = entry
+                return entry[0]
+            self.misses += 1
+
+        # Render outside of the lock so that other requests aren't blocked.
+        fragment = render()
+        self.store(key, fragment)
+        return fragment
+
+    def store(self, key, fragment):
+        """ Store a rendered fragment.
+
+        Fragments of the same run, subsystem, and template which were rendered for an earlier processing are
+        dropped, since they will never be requested again.
+
+        Args:
+            key (tuple): Key of the fragment, as created by ``key(...)``.
+            fragment (str): Rendered fragment.
+        Returns:
+            None.
+        """
+        fragmentSize = len(fragment.encode("utf-8"))
+        if fragmentSize > self.maxSize:
+            logger.debug("Fragment for {key} is larger than the cache. Not storing it.".format(key = key))
+            return
+        runDir, subsystemName, templateName, lastProcessed = key[:4]
+        with self._lock:
+            self._remove(lambda k: k[:3] == (runDir, subsystemName, templateName) and k[3] < lastProcessed)
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (fragment, fragmentSize)
+            self.size += fragmentSize
+            # Evict the least recently used fragments until we are below the limit.
+            while self.size > self.maxSize:
+                _, (_, evictedSize) = self._entries.popitem(last = False)
+                self.size -= evictedSize
+
+    def invalidate(self, runDir = None, subsystemName = None):
+        """ Remove the stored fragments of a subsystem.
+
+        Args:
+            runDir (str): Run whose fragments should be removed. Default: None, which corresponds to all runs.
+            subsystemName (str): Subsystem whose fragments should be removed. Default: None, which corresponds to
+                all subsystems.
+        Returns:
+            int: Number of fragments which were removed.
+        """
+        with self._lock:
+            return self._remove(lambda k: (runDir is None or k[0] == runDir) and (subsystemName is None or k[1] == subsystemName))
+
+    def _remove(self, selector):
+        """ Remove the fragments whose keys are selected. Must be called while holding the lock.
+
+        Args:
+            selector (callable): Function which returns True for the keys which should be removed.
+        Returns:
+            int: Number of fragments which were removed.
+        """
+        keys = [k for k in self._entries if selector(k)]
+        for k in keys:
+            self.size -= self._entries.pop(k)[1]
+        return len(keys)
+
+    def stats(self):
+        """ Summarize the cache usage.
+
+        Args:
+            None.
+        Returns:
+            dict: Number of ``hits``, ``misses``, the ``hitRate`` (None if there were no requests), number of
+                ``entries``, and the ``size`` and ``maxSize`` in bytes.
+        """
+        with self._lock:
+            nRequests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / float(nRequests) if nRequests else None,
+                "entries": len(self._entries),
+                "size": self.size,
+                "maxSize": self.maxSize,
+            }
@@ -607,6 +607,11 @@ function jsRootRequest() {
         var requestAddress = "/monitoring/protected/";
         // Add the filename from the histogram container corresponding to the request.
         requestAddress += $(this).data("filename");
+        // Add the version (if available) so that the browser can cache the file.
+        var version = $(this).data("version");
+        if (version !== undefined) {
+            requestAddress += "?v=" + version;
+        }
         console.log("requestAddress: " + requestAddress);
 
         // Sets the object where the hist will be drawn.
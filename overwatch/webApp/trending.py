@@ -4,32 +4,124 @@
 
 """
 
+import datetime
+import hashlib
 import logging
 from flask_login import login_required
-from flask import request, render_template, jsonify
+from flask import request, render_template, jsonify, Response
 from flask import Blueprint
 import jinja2
 import os
 
 import overwatch.processing.trending.constants as CON
-from overwatch.processing.trending.manager import TrendingManager
-from overwatch.webApp.webApp import serverParameters, databaseFactory
+from overwatch.processing.trending.query import TrendingQuery
+from overwatch.webApp.webApp import serverParameters
 from overwatch.webApp import validation
 
 logger = logging.getLogger(__name__)
 trendingPage = Blueprint('trendingPage', __name__)
 
+# Read-only access to the trending results. It is shared between requests, such that the index of the trending
+# objects is only read again when the results change.
+trendingQuery = TrendingQuery(serverParameters[CON.DIR_PREFIX], serverParameters[CON.SUBSYSTEMS])
 
-def determineSubsystemName(subsystemName, trendingManager):  # type: (str, TrendingManager) -> str
-    """If subsystem argument is not valid, trying to return any subsystem from TrendingManager database"""
+
+def determineSubsystemName(subsystemName, trendingData):  # type: (str, dict) -> str
+    """If subsystem argument is not valid, trying to return any subsystem with trending objects"""
     if subsystemName:
         return subsystemName
 
-    for subsystemName, subsystem in trendingManager.db.get('trending').items():
+    for subsystemName, subsystem in trendingData.items():
         if len(subsystem):
             return subsystemName
 
 
+def retrieveTrendingData():
+    """ Retrieve the trending objects metadata for each subsystem.
+
+    The metadata is read from the trending store via the ``TrendingQuery`` (see
+    ``overwatch.processing.trending.query``), so the trending objects don't need to be loaded from the database.
+
+    Args:
+        None.
+    Returns:
+        dict: Keys are subsystem names, while values are dicts from trending object names to their metadata
+            (which provides their ``desc``). Both are sorted by name.
+    """
+    return trendingQuery.index()
+
+
+def conditionalJSON(etag, lastModified, createData):
+    """ Create a JSON response which supports caching via ``ETag`` and ``Last-Modified``.
+
+    If the client already has the current version, the data isn't created at all.
+
+    Args:
+        etag (str): Entity tag of the current version of the data.
+        lastModified (float): Unix time when the data was last modified. May be None if unknown.
+        createData (callable): Function which returns the JSON serializable data.
+    Returns:
+        Response: JSON response, or a ``304 Not Modified`` response if the client has the current version.
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status = 304)
+    else:
+        response = jsonify(createData())
+    response.set_etag(etag)
+    if lastModified is not None:
+        response.last_modified = datetime.datetime.utcfromtimestamp(int(lastModified))
+    # Clients may cache the response, but must check whether it is still current.
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
+
+@trendingPage.route("/" + CON.TRENDING + "/index", methods=["GET"])
+@login_required
+def trendingIndex():
+    """ Provide the names and descriptions of the available trending objects as JSON.
+
+    Returns:
+        Response: JSON mapping from subsystem name to trending object name to metadata.
+    """
+    etag, lastModified = trendingQuery.version()
+    return conditionalJSON(etag, lastModified, trendingQuery.index)
+
+
+@trendingPage.route("/" + CON.TRENDING + "/values/<string:subsystemName>/<path:name>", methods=["GET"])
+@login_required
+def trendingValues(subsystemName, name):
+    """ Provide the trended values of a trending object within a time range as JSON.
+
+    Note:
+        Function args are provided through the flask request object.
+
+    Args:
+        subsystemName (str): Name of the subsystem.
+        name (str): Name of the trending object.
+        minTime (float): Only include values at or after this unix time. Optional.
+        maxTime (float): Only include values at or before this unix time. Optional.
+        maxPoints (int): Maximum number of values to return. Optional.
+    Returns:
+        Response: JSON containing the times and values (and errors, if available) of the trending object. The
+            response is 404 if the trending object doesn't exist.
+    """
+    minTime = request.args.get("minTime", None, type = float)
+    maxTime = request.args.get("maxTime", None, type = float)
+    maxPoints = request.args.get("maxPoints", None, type = int)
+    if name not in trendingQuery.index().get(subsystemName, {}):
+        return jsonify(error = "Trending object {subsystemName}/{name} not found".format(
+            subsystemName = subsystemName, name = name)), 404
+
+    version, lastModified = trendingQuery.version(subsystemName)
+    # The response also depends on the requested range.
+    etag = hashlib.md5("{version}-{name}-{args}".format(
+        version = version, name = name, args = (minTime, maxTime, maxPoints)).encode()).hexdigest()
+    return conditionalJSON(etag, lastModified,
+                           lambda: trendingQuery.values(subsystemName, name, minTime = minTime,
+                                                        maxTime = maxTime, maxPoints = maxPoints))
+
+
 @trendingPage.route("/" + CON.TRENDING, methods=["GET", "POST"])
 @login_required
 def trending():
@@ -53,10 +145,8 @@ def trending():
     logger.debug("request: {0}".format(request.args))
     (error, subsystemName, requestedHist, jsRoot, ajaxRequest) = validation.validateTrending(request)
 
-    db = databaseFactory.getDB()
-
     # Return a useful error if trending is disabled
-    if not db.contains("trending"):
+    if not serverParameters[CON.TRENDING]:
         error.setdefault("Trending", []).append("Trending is disabled.")
         if ajaxRequest:
             drawerContent = ""
@@ -64,10 +154,9 @@ def trending():
             return jsonify(drawerContent = drawerContent, mainContent = mainContent)
         return render_template("error.html", errors = error)
 
-    # Create trending container from stored trending information
-    trendingManager = TrendingManager(db, serverParameters)
-    subsystemName = determineSubsystemName(subsystemName, trendingManager)
-    trendingData = db.get('trending')
+    # Retrieve the available trending objects
+    trendingData = retrieveTrendingData()
+    subsystemName = determineSubsystemName(subsystemName, trendingData)
 
     if not subsystemName:
         error.setdefault("Subsystem", []).append("Cannot find any trended subsystem")
@@ -11,6 +11,7 @@ protection.
 
 # General
 import json
+import pendulum
 from flask import request
 # Used to parse GET parameters
 try:
@@ -357,6 +358,38 @@ def convertRequestToPositiveInteger(paramName, source):
     logger.info("{}: {}".format(paramName, paramValue))
     return paramValue
 
+def convertRequestToUnixTime(paramName, source, endOfDay = False):
+    """ Converts a requested date into a unix time.
+
+    The date can be specified either as a date of the form "YYYY-MM-DD" (in the CERN time zone, as for
+    the displayed times) or directly as a unix time.
+
+    Args:
+        paramName (str): Name of the parameter in which we are interested in.
+        source (dict): Source of the information. Usually request.args or request.form.
+        endOfDay (bool): If True, a date is converted to the end of that day. Otherwise, it is converted
+            to the start of the day. Default: False.
+    Returns:
+        int or None: The requested unix time or ``None`` if it wasn't requested or was somehow invalid.
+    """
+    paramValue = source.get(paramName, None, type = str)
+    if not paramValue:
+        return None
+    try:
+        if paramValue.isdigit():
+            paramValue = int(paramValue)
+        else:
+            date = pendulum.parse(paramValue, tz = "Europe/Zurich")
+            date = date.end_of("day") if endOfDay else date.start_of("day")
+            paramValue = int(date.timestamp())
+    except (ValueError, AttributeError):
+        # AttributeError is raised if the value is parsed as something other than a date (such as a duration).
+        logger.info("Invalid time for {}: {}".format(paramName, paramValue))
+        paramValue = None
+
+    logger.info("{}: {}".format(paramName, paramValue))
+    return paramValue
+
 def validateHistGroupAndHistName(histGroup, histName, subsystem, run, error):
     """ Check that the given hist group or hist name exists in the subsystem.
 
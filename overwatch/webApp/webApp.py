@@ -24,17 +24,27 @@ import json
 import collections
 import pendulum
 import pkg_resources
+import mimetypes
 # For server status
 import requests
 import logging
 
+# Database
+import transaction
+from ZODB.POSException import ConflictError
 from overwatch.database.factoryMethod import getDatabaseFactory
 from overwatch.processing.processingClasses import runContainer, subsystemContainer
 
 logger = logging.getLogger(__name__)
 
 # Flask
-from flask import Flask, url_for, request, render_template, redirect, flash, send_from_directory, jsonify, session
+from flask import Flask, url_for, request, render_template, redirect, flash, send_from_directory, jsonify, session, abort
+from werkzeug.security import safe_join
+# Handle python 2/3
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
 from flask_assets import Environment
@@ -54,15 +64,20 @@ from ..base import utilities as baseUtilities
 from . import routing
 from . import auth
 from . import validation
+from . import pageCache
 from . import utilities  # NOQA
 
 # Processing module includes
 from ..processing import processRuns
+from ..processing import compactFiles
+from ..processing import runSummaries
 
 # Flask setup
 app = Flask(__name__, static_url_path=serverParameters["staticURLPath"], static_folder=serverParameters["staticFolder"], template_folder=serverParameters["templateFolder"])
 
 databaseFactory = getDatabaseFactory()
+# Rendered run page fragments, which are shared between all users.
+runPageCache = pageCache.PageCache(maxSize = serverParameters["pageCacheMaxSize"] * 1024 * 1024)
 from .trending import trendingPage
 app.register_blueprint(trendingPage)
 
@@ -351,12 +366,21 @@ def index():
     which seems to be a reasonable balance between showing too much or too little information. This
     can be tuned further if necessary.
 
+    The run list is rendered from the compact run summary index (see ``overwatch.processing.runSummaries``),
+    so only the summaries of the displayed runs are read, rather than loading every run and its subsystems
+    from the database.
+
     Note:
         Function args are provided through the flask request object.
 
     Args:
         ajaxRequest (bool): True if the response should be via AJAX.
         runOffset (int): Number of runs to offset into the run list. Default: 0.
+        subsystem (str): Only show runs which contain this subsystem. Default: None.
+        startDate (str): Only show runs which started on or after this date. Either "YYYY-MM-DD" or unix time.
+            Default: None.
+        endDate (str): Only show runs which started on or before this date. Either "YYYY-MM-DD" or unix time.
+            Default: None.
     Returns:
         Response: The main index page populated via template.
     """
@@ -364,16 +388,28 @@ def index():
     ajaxRequest = validation.convertRequestToPythonBool("ajaxRequest", request.args)
     # We only use this once and there isn't much complicated, so we just perform the validation here.
     runOffset = validation.convertRequestToPositiveInteger(paramName = "runOffset", source = request.args)
+    subsystemName = validation.convertRequestToStringWhichMayBeEmpty("subsystem", request.args)
+    minTime = validation.convertRequestToUnixTime("startDate", request.args)
+    maxTime = validation.convertRequestToUnixTime("endDate", request.args, endOfDay = True)
+    # Passed to the pagination links so the filters are preserved.
+    runFilters = {k: request.args[k] for k in ["subsystem", "startDate", "endDate"] if request.args.get(k)}
 
     db = databaseFactory.getDB()
-    runs = db.get("runs")
+    if db.contains("runSummaries"):
+        summaries = db.get("runSummaries")
+    else:
+        # The summary index is created by the processing, so it won't be available if the processing hasn't
+        # run since it was introduced. In that case, we create it on the fly (which requires loading all runs).
+        logger.warning("Run summaries are not available. Creating them from the runs.")
+        summaries = runSummaries.createRunSummaries(btree = False)
+        runSummaries.updateRunSummaries(summaries, db.get("runs"))
 
     # Determine if a run is ongoing
     # To do so, we need the most recent run (regardless of which runs we selected to display)
-    mostRecentRun = runs[runs.keys()[-1]]
-    runOngoing = runContainer.isRunOngoing(mostRecentRun)
+    mostRecentRun = runSummaries.mostRecentRunSummary(summaries)
+    runOngoing = mostRecentRun is not None and runSummaries.isRunOngoing(mostRecentRun)
     if runOngoing:
-        runOngoingNumber = mostRecentRun.runNumber
+        runOngoingNumber = mostRecentRun["runNumber"]
     else:
         runOngoingNumber = ""
 
@@ -381,13 +417,12 @@ def index():
     # We select a default of 50 runs per page. Too many might be unreasonable.
     numberOfRunsToDisplay = 50
     # Restrict the runs that we are going to display to those that are included in our requested range.
-    # It is reversed because we process the earliest runs first. However, the reversed object isn't scriptable,
-    # so it must be converted to a list to slice it.
-    # +1 on the upper limit so that the 50 is inclusive
-    runsToUse = list(reversed(runs.values()))[runOffset:runOffset + numberOfRunsToDisplay + 1]
+    # The most recent runs are displayed first.
+    runsToUse, numberOfRuns = runSummaries.retrieveRunSummaries(summaries, runOffset = runOffset,
+                                                                nRuns = numberOfRunsToDisplay,
+                                                                subsystemName = subsystemName,
+                                                                minTime = minTime, maxTime = maxTime)
     logger.debug("runOffset: {}, numberOfRunsToDisplay: {}".format(runOffset, numberOfRunsToDisplay))
-    # Total number of runs, which should be displayed at the bottom.
-    numberOfRuns = len(runs.keys())
 
     # We want 10 anchors
     # NOTE: We need to convert it to an int to ensure that the mod call in the template works.
@@ -402,20 +437,81 @@ def index():
                                anchorFrequency = anchorFrequency,
                                runOffset = runOffset, numberOfRunsToDisplay = numberOfRunsToDisplay,
                                totalNumberOfRuns = numberOfRuns,
-                               startOfRunTimeStamp=runContainer.startOfRunTimeStamp)
+                               runFilters = runFilters,
+                               subsystemList = serverParameters["subsystemList"])
     else:
         drawerContent = render_template("runListDrawer.html", runs = runsToUse, runOngoing = runOngoing,
-                                        runOngoingNumber = runOngoingNumber, anchorFrequency = anchorFrequency,
-                                        startOfRunTimeStamp=runContainer.startOfRunTimeStamp)
+                                        runOngoingNumber = runOngoingNumber, anchorFrequency = anchorFrequency)
         mainContent = render_template("runListMainContent.html", runs = runsToUse, runOngoing = runOngoing,
                                       runOngoingNumber = runOngoingNumber,
                                       subsystemsWithRootFilesToShow = serverParameters["subsystemsWithRootFilesToShow"],
                                       anchorFrequency = anchorFrequency,
                                       runOffset = runOffset, numberOfRunsToDisplay = numberOfRunsToDisplay,
-                                      totalNumberOfRuns = numberOfRuns)
+                                      totalNumberOfRuns = numberOfRuns,
+                                      runFilters = runFilters,
+                                      subsystemList = serverParameters["subsystemList"])
 
         return jsonify(drawerContent = drawerContent, mainContent = mainContent)
 
+def renderRunPageFragments(subsystemName, templateArgs):
+    """ Render the drawer and main content of a run page, using the cached fragments when possible.
+
+    The fragments only depend on the run, subsystem, template, and the request options, so they are cached
+    until the subsystem is processed again. Time slices are rendered for a particular request, so they are
+    not cached.
+
+    Args:
+        subsystemName (str): Name of the subsystem of interest.
+        templateArgs (dict): Arguments for the templates. Must contain the ``run``, ``subsystem``,
+            ``selectedHistGroup``, ``selectedHist``, ``jsRoot``, and ``timeSlice``.
+    Returns:
+        tuple: (drawerContent, mainContent), where drawerContent (str) is the rendered drawer and
+            mainContent (str) is the rendered main content.
+    """
+    fragments = []
+    for fragmentName in ["runPageDrawer.html", "runPageMainContent.html"]:
+        # Attempt to use a subsystem specific template if available
+        templateName = subsystemName + fragmentName
+        if templateName not in serverParameters["availableRunPageTemplates"]:
+            templateName = fragmentName
+
+        def render(templateName = templateName):
+            return render_template(templateName, **templateArgs)
+
+        if templateArgs["timeSlice"] or runPageCache.maxSize <= 0:
+            fragments.append(render())
+        else:
+            key = runPageCache.key(templateArgs["run"].runDir, subsystemName, templateName,
+                                   getattr(templateArgs["subsystem"], "lastProcessed", 0),
+                                   selectedHistGroup = templateArgs["selectedHistGroup"],
+                                   selectedHist = templateArgs["selectedHist"],
+                                   jsRoot = templateArgs["jsRoot"])
+            fragments.append(runPageCache.retrieve(key, render))
+    return tuple(fragments)
+
+def commitTimeSliceChanges(db):
+    """ Commit changes to the time slices to the database.
+
+    Time slices are created in the web app, but the hist groups which weren't requested are rendered by the
+    processing, so the time slices (and which hist groups are still pending) need to be stored for the
+    processing to see them.
+
+    If the processing modified the same objects concurrently, the changes are discarded. In that case, the
+    time slice is recreated (or the pending hist group is rendered again) when it's next requested.
+
+    Args:
+        db (Database): Database which contains the time slices.
+    Returns:
+        bool: True if the changes were committed.
+    """
+    try:
+        db.commit()
+    except ConflictError as e:
+        logger.warning("Conflict when committing the time slice changes. Discarding them. Error: {e}".format(e = e))
+        transaction.abort()
+        return False
+    return True
+
 @app.route("/Run<int:runNumber>/<string:subsystemName>/<string:requestedFileType>", methods=["GET"])
 @login_required
 def runPage(runNumber, subsystemName, requestedFileType):
@@ -468,6 +564,13 @@ def runPage(runNumber, subsystemName, requestedFileType):
             jsonFilenameTemplate = jsonFilenameTemplate.format(timeSlice.filenamePrefix + ".{}")
         imgFilenameTemplate = os.path.join(subsystem.imgDir, "{}." + serverParameters["fileExtension"])
 
+        # Time slices only render the requested hist group when they are created. The others are rendered
+        # in the background by the processing, but if the requested hist group hasn't been rendered yet, it
+        # needs to be rendered now.
+        if timeSlice and requestedFileType == "runPage":
+            if processRuns.processPendingTimeSliceHistGroups(subsystem, timeSlice, requestedHistGroup):
+                commitTimeSliceChanges(db)
+
         # Print request status
         logger.debug("request: {}".format(request.args))
         logger.debug("runDir: {}, subsystem: {}, requestedFileType: {}, "
@@ -490,12 +593,16 @@ def runPage(runNumber, subsystemName, requestedFileType):
                 # We use try here because it's possible for this page not to exist if ``availableRunPageTemplates``
                 # is not determined properly due to other files interfering..
                 try:
-                    returnValue = render_template(runPageName, run = run, subsystem = subsystem,
-                                                  selectedHistGroup = requestedHistGroup, selectedHist = requestedHist,
-                                                  jsonFilenameTemplate = jsonFilenameTemplate,
-                                                  imgFilenameTemplate = imgFilenameTemplate,
-                                                  jsRoot = jsRoot, timeSlice = timeSlice,
-                                                  prettyPrintUnixTime=subsystemContainer.prettyPrintUnixTime)
+                    templateArgs = dict(run = run, subsystem = subsystem,
+                                        selectedHistGroup = requestedHistGroup, selectedHist = requestedHist,
+                                        jsonFilenameTemplate = jsonFilenameTemplate,
+                                        imgFilenameTemplate = imgFilenameTemplate,
+                                        jsRoot = jsRoot, timeSlice = timeSlice,
+                                        prettyPrintUnixTime=subsystemContainer.prettyPrintUnixTime)
+                    # The layout depends on the user, so only the drawer and main content are cached.
+                    drawerContent, mainContent = renderRunPageFragments(subsystemName, templateArgs)
+                    returnValue = render_template(runPageName, drawerContent = drawerContent,
+                                                  mainContent = mainContent, **templateArgs)
                 except jinja2.exceptions.TemplateNotFound as e:
                     error.setdefault("Template Error", []).append("Request template: \"{}\", but it was not found!".format(e.name))
             elif requestedFileType == "rootFiles":
@@ -517,30 +624,17 @@ def runPage(runNumber, subsystemName, requestedFileType):
     else:
         if error == {}:
             if requestedFileType == "runPage":
-                # Drawer
-                runPageDrawerName = subsystemName + "runPageDrawer.html"
-                if runPageDrawerName not in serverParameters["availableRunPageTemplates"]:
-                    runPageDrawerName = runPageDrawerName.replace(subsystemName, "")
-                # Main content
-                runPageMainContentName = subsystemName + "runPageMainContent.html"
-                if runPageMainContentName not in serverParameters["availableRunPageTemplates"]:
-                    runPageMainContentName = runPageMainContentName.replace(subsystemName, "")
-
                 # We use try here because it's possible for this page not to exist if ``availableRunPageTemplates``
                 # is not determined properly due to other files interfering..
                 # If either one fails, we want to jump right to the template error.
                 try:
-                    drawerContent = render_template(runPageDrawerName, run = run, subsystem = subsystem,
-                                                    selectedHistGroup = requestedHistGroup, selectedHist = requestedHist,
-                                                    jsonFilenameTemplate = jsonFilenameTemplate,
-                                                    imgFilenameTemplate = imgFilenameTemplate,
-                                                    jsRoot = jsRoot, timeSlice = timeSlice)
-                    mainContent = render_template(runPageMainContentName, run = run, subsystem = subsystem,
-                                                  selectedHistGroup = requestedHistGroup, selectedHist = requestedHist,
-                                                  jsonFilenameTemplate = jsonFilenameTemplate,
-                                                  imgFilenameTemplate = imgFilenameTemplate,
-                                                  jsRoot = jsRoot, timeSlice = timeSlice,
-                                                  prettyPrintUnixTime=subsystemContainer.prettyPrintUnixTime)
+                    drawerContent, mainContent = renderRunPageFragments(subsystemName, dict(
+                        run = run, subsystem = subsystem,
+                        selectedHistGroup = requestedHistGroup, selectedHist = requestedHist,
+                        jsonFilenameTemplate = jsonFilenameTemplate,
+                        imgFilenameTemplate = imgFilenameTemplate,
+                        jsRoot = jsRoot, timeSlice = timeSlice,
+                        prettyPrintUnixTime=subsystemContainer.prettyPrintUnixTime))
                 except jinja2.exceptions.TemplateNotFound as e:
                     error.setdefault("Template Error", []).append("Request template: \"{}\", but it was not found!".format(e.name))
             elif requestedFileType == "rootFiles":
@@ -570,32 +664,99 @@ def runPage(runNumber, subsystemName, requestedFileType):
                        histName = requestedHist,
                        histGroup = requestedHistGroup)
 
+def reconstructedFilePath(path):
+    """ Determine the path from which a file in the protected folder can be read.
+
+    Files of runs which were compacted (see ``overwatch.processing.compactFiles``) are only stored as deltas.
+    They are reconstructed into the ``reconstructedFilesCacheDir`` in the protected folder rather than next to
+    the deltas, since that would undo the compaction (and the processing may be compacting the directory).
+    The size of the cache is limited by ``reconstructedFilesCacheMaxSize``.
+
+    Args:
+        path (str): Path to the file in the protected folder.
+    Returns:
+        str: Path to the reconstructed file if the file was compacted, or the given path otherwise.
+    """
+    protectedFolder = os.path.realpath(serverParameters["protectedFolder"])
+    fullPath = os.path.realpath(path)
+    if not fullPath.startswith(protectedFolder + os.sep) or not compactFiles.isCompacted(fullPath):
+        return path
+    return compactFiles.reconstructToCache(fullPath,
+                                           cacheDir = os.path.join(protectedFolder, serverParameters["reconstructedFilesCacheDir"]),
+                                           cacheFilename = os.path.relpath(fullPath, protectedFolder),
+                                           maxSize = serverParameters["reconstructedFilesCacheMaxSize"] * 1024 * 1024)
+
 @app.route("/monitoring/protected/<path:filename>")
 @login_required
 def protected(filename):
     """ Serves the underlying files.
 
-    This function is response for actually making files available. Ideally, these would be served via
-    the production web server, but since access to the data requires authentication, we instead have
-    to provide access via this function. To provide this function, we utilized the approach
-    `described here <https://stackoverflow.com/a/27611882>`_.
+    This function is response for actually making files available. Since access to the data requires
+    authentication, the request must go through the web app. However, the web app only needs to authorize
+    the request. If ``protectedFilesOffloadHeader`` is configured, the transfer of the file is delegated
+    to the front-end web server via the ``X-Accel-Redirect`` (``nginx``) or ``X-Sendfile`` header, so the
+    web app worker is immediately available again. Otherwise, the file is served by flask, which responds
+    to conditional requests (via ``ETag`` and ``Last-Modified``) without transferring the file again.
+    For further information on the approach, see `here <https://stackoverflow.com/a/27611882>`_.
 
     Note:
-        This function ignores GET parameters. This is done intentionally to allow for avoiding problematic
+        This function ignores most GET parameters. This is done intentionally to allow for avoiding problematic
         caching by a browser. To avoid this caching, simply pass an additional get parameter after the
         filename which varies when we need to avoid the cache. This is particularly useful for time slices,
         where the name could be the same, but the information has changed since last being served.
 
+    Note:
+        Files of runs which were compacted (see ``overwatch.processing.compactFiles``) are reconstructed
+        from their deltas into the reconstructed files cache (see ``reconstructedFilePath()``), from which
+        they are served.
+
     Args:
         filename (str): Path to the file to be served.
+        v (str): Version of the file, which is provided through the flask request object. If it is passed, the
+            content of the file must not change for this version, so browsers may cache it for
+            ``protectedFilesMaxAge``. Otherwise, the browser must check whether the file has changed.
     Returns:
         Response: File with the proper headers.
     """
     logger.debug("filename: {filename}".format(filename = filename))
-    # Ignore the time GET parameter that is sometimes passed- just to avoid the cache when required
-    #if request.args.get("time"):
-    #    print "timeParameter:", request.args.get("time")
-    return send_from_directory(os.path.realpath(serverParameters["protectedFolder"]), filename)
+    protectedFolder = os.path.realpath(serverParameters["protectedFolder"])
+    path = safe_join(protectedFolder, filename)
+    if path is None:
+        abort(404)
+    # Files of compacted runs are only stored as deltas, so we serve a reconstructed copy instead.
+    reconstructedPath = reconstructedFilePath(path)
+    if reconstructedPath != path:
+        path = reconstructedPath
+        filename = os.path.relpath(path, protectedFolder)
+
+    offloadHeader = serverParameters["protectedFilesOffloadHeader"]
+    if offloadHeader:
+        if not os.path.isfile(path):
+            abort(404)
+        # We only authorize the request. The front-end server transfers the file (including handling
+        # conditional requests).
+        response = app.response_class(mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream")
+        if offloadHeader == "X-Accel-Redirect":
+            # nginx requires the URI of an internal location which serves the protected folder.
+            response.headers[offloadHeader] = "{location}/{filename}".format(
+                location = serverParameters["protectedFilesInternalLocation"].rstrip("/"),
+                filename = quote(os.path.relpath(path, protectedFolder).replace(os.sep, "/")))
+        else:
+            response.headers[offloadHeader] = path
+    else:
+        # Responds with "304 Not Modified" if the browser already has the current file.
+        response = send_from_directory(protectedFolder, filename)
+
+    # The files require authentication, so they may only be cached by the browser.
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if request.args.get("v"):
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = serverParameters["protectedFilesMaxAge"]
+    else:
+        # The file may be updated by the processing, so the browser needs to check that it is still current.
+        response.cache_control.no_cache = True
+    return response
 
 @app.route("/timeSlice", methods=["GET", "POST"])
 @login_required
@@ -651,7 +812,7 @@ def timeSlice():
             logger.debug("histName: {histName}".format(histName = histName))
 
             # Process the time slice
-            returnValue = processRuns.processTimeSlices(runs, runDir, minTime, maxTime, subsystem, inputProcessingOptions)
+            returnValue = processRuns.processTimeSlices(runs, runDir, minTime, maxTime, subsystem, inputProcessingOptions, histGroup = histGroup)
             logger.info("returnValue: {}".format(returnValue))
             logger.debug("runs[runDir].subsystems[subsystem].timeSlices: {}".format(runs[runDir].subsystems[subsystem].timeSlices))
 
@@ -659,6 +820,8 @@ def timeSlice():
             # However, if we received an error, we expect some sort of dictionary (mapping). We handle that below.
             if not isinstance(returnValue, collections.Mapping):
                 timeSliceKey = returnValue
+                # Store the time slice so that the processing can render the remaining hist groups.
+                commitTimeSliceChanges(db)
 
                 # Passed off the result to render via the run page since we a time slice just modifies
                 # the content which is displayed there.
@@ -741,15 +904,21 @@ def testingDataArchive():
             else:
                 for subsystem in run.subsystems.values():
                     # Write files to the zip file
-                    # Combined file
-                    zipFile.write(os.path.join(serverParameters["protectedFolder"], subsystem.combinedFile.filename))
-                    # Uncombined file. This is the last file that was received from the subsystem.
-                    zipFile.write(os.path.join(serverParameters["protectedFolder"], subsystem.files[subsystem.files.keys()[-1]].filename))
+                    filenames = [
+                        # Combined file
+                        subsystem.combinedFile.filename,
+                        # Uncombined file. This is the last file that was received from the subsystem.
+                        subsystem.files[subsystem.files.keys()[-1]].filename,
+                    ]
                     # We select 4 as an arbitrary point to ensure that there is some different between the data stored
                     # in it and the combined file.
                     if len(subsystem.files) > 4:
                         # Write an additional file for testing time slices.
-                        zipFile.write(os.path.join(serverParameters["protectedFolder"], subsystem.files[subsystem.files.keys()[-5]].filename))
+                        filenames.append(subsystem.files[subsystem.files.keys()[-5]].filename)
+                    for filename in filenames:
+                        path = os.path.join(serverParameters["protectedFolder"], filename)
+                        # Files of compacted runs are written from their reconstructed copy, but under their original name.
+                        zipFile.write(reconstructedFilePath(path), arcname = path)
                 numberOfFilesWritten += 1
 
     # Return with a download link
@@ -808,6 +977,13 @@ def overwatchStatus():
     # Add to status
     statuses["Time since last timestamp file"] = "{minutes} minutes".format(minutes = int(mostRecentRun.minutesSinceLastTimestamp()))
 
+    # Usage of the run page cache of this web app instance
+    cacheStats = runPageCache.stats()
+    statuses["Run page cache"] = "{hitRate} hit rate ({hits} hits, {misses} misses), {entries} fragments using {size:.1f} of {maxSize:.0f} MB".format(
+        hitRate = "{:.1%}".format(cacheStats["hitRate"]) if cacheStats["hitRate"] is not None else "No",
+        hits = cacheStats["hits"], misses = cacheStats["misses"], entries = cacheStats["entries"],
+        size = cacheStats["size"] / (1024. * 1024), maxSize = cacheStats["maxSize"] / (1024. * 1024))
+
     # Determine server statuses
     exceptionErrorMessage = "Request to \"{site}\" at \"{url}\" {errorType} with error message {e}!"
     sites = serverParameters["statusRequestSites"]
@@ -74,6 +74,10 @@ setup(
             # points to a different type of function. This function will on an interval if the
             # sleep time is set to a positive value. Otherwise, it will run once.
             "overwatchProcessing = overwatch.processing.run:run",
+            # Compact the files of finished runs in cumulative mode.
+            "overwatchCompactRuns = overwatch.processing.run:runCompaction",
+            # Catch up the trending objects from the stored files.
+            "overwatchTrendingBackfill = overwatch.processing.run:runTrendingBackfill",
             # Deployment script
             "overwatchDeploy = overwatch.base.deploy:run",
             # Utility script to update the database users
@@ -1062,6 +1062,47 @@ def testOverwatchExecutableProperties(loggingMixin, executableType, config, expe
         # We skip the gzip config contents because they're static
         mFile.assert_any_call(os.path.join("exec", "config", "conf.d", "gzip.conf"), "w")
 
+def testNginxProtectedFiles(loggingMixin, setupStartProcessWithLog, mocker):
+    """ Test serving the protected files via nginx, including configuring the web app to offload them. """
+    executable = deploy.retrieveExecutable("webApp", config = {
+        "uwsgi": {},
+        "nginx": {
+            "enabled": True,
+            "webAppName": "webApp",
+            "basePath": "exec/config",
+            "sitesPath": "sites-enabled",
+            "configPath": "conf.d",
+            "protectedFolder": "data",
+            "protectedLocation": "/protectedData",
+        },
+        "additionalOptions": {"testVal": True},
+    })
+
+    # Mock the file writing, as well as running nginx.
+    mFile = mocker.mock_open()
+    mocker.patch("overwatch.base.deploy.open", mFile)
+    mYaml = mocker.MagicMock()
+    mocker.patch("overwatch.base.deploy.configModule.yaml.dump", mYaml)
+    mocker.patch("overwatch.base.deploy.nginx.run", mocker.MagicMock())
+    mocker.patch("overwatch.base.deploy.os.makedirs", mocker.MagicMock())
+
+    executable.setup()
+    executable.nginx.setup()
+
+    # The web app only authorizes the requests.
+    expectedConfig = {
+        "testVal": True,
+        "protectedFilesOffloadHeader": "X-Accel-Redirect",
+        "protectedFilesInternalLocation": "/protectedData",
+    }
+    mYaml.assert_called_once_with(expectedConfig, mFile(), default_flow_style = False)
+
+    # While nginx serves the protected files, but only as an internal location.
+    expectedProtectedLocation = "    location /protectedData/ {\n        internal;\n        alias %(path)s/;\n    }\n}"
+    expectedProtectedLocation = expectedProtectedLocation % {"path": os.path.abspath("data")}
+    mFile.assert_any_call(os.path.join("exec", "config", "sites-enabled", "webAppNginx.conf"), "w")
+    assert mFile().write.call_args_list[0][0][0].endswith(expectedProtectedLocation)
+
 def testUwsgiExecutableRunFailure(loggingMixin):
     """ Minimal test to ensure that the uwsgi executable fails when attempting to execute it directly. """
     # Create the executable. The values don't matter.
@@ -5,4 +5,5 @@ pytest_plugins = [
     "tests.unit.fixtures.loggingPlugin",
     "tests.unit.fixtures.trendingFixtures",
     "tests.unit.fixtures.alarmFixtures",
+    "tests.unit.fixtures.processingFixtures",
 ]
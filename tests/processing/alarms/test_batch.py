@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+""" Tests for the batch evaluation of alarms. """
+import numpy as np
+import pytest
+import ROOT
+
+import overwatch.processing.trending.constants as CON
+import overwatch.processing.trending.objects as to
+from overwatch.processing.alarms.alarm import Alarm
+from overwatch.processing.alarms.batch import evaluateAlarms
+from overwatch.processing.alarms.collectors import alarmCollector
+from overwatch.processing.alarms.impl.andAlarm import AndAlarm
+from overwatch.processing.alarms.impl.betweenValuesAlarm import BetweenValuesAlarm
+from overwatch.processing.alarms.impl.checkLastNAlarm import CheckLastNAlarm
+from overwatch.processing.alarms.impl.meanInRangeAlarm import MeanInRangeAlarm
+from overwatch.processing.alarms.impl.relativePreviousValueAlarm import RelativePreviousValueAlarm
+from overwatch.processing.trending.manager import TrendingManager
+
+
+alarms = [
+    lambda: BetweenValuesAlarm(minVal=20, maxVal=80),
+    lambda: CheckLastNAlarm(minVal=20, maxVal=80, ratio=0.6, N=5),
+    lambda: MeanInRangeAlarm(minVal=40, maxVal=60, N=4),
+    lambda: RelativePreviousValueAlarm(ratio=1.5),
+]
+
+
+@pytest.mark.parametrize("createAlarm", alarms, ids=["betweenValues", "checkLastN", "meanInRange", "fallback"])
+def testEquivalentToEvaluatingEachTrend(tf_trendingArgs, createAlarm, mocker):
+    """ Evaluating a batch gives the same results and messages as evaluating each trend separately. """
+    rand = np.random.RandomState(2)
+    trends = []
+    for i in range(20):
+        trend = to.MeanTrending("trend{}".format(i), *tf_trendingArgs[1:])
+        # Include trends with fewer values than needed by the alarms.
+        for value in rand.uniform(-10, 110, size=i % 8 + 1):
+            trend.appendValue((value, 0.1))
+        trend.setAlarms([createAlarm()])
+        trends.append(trend)
+
+    expected = []
+    for trend in trends:
+        alarm = trend.alarms[0]
+        isAlarm, msg = alarm.checkAlarm(Alarm.prepareTrendValues(trend))
+        expected.append(["[]: " + msg] if isAlarm else [])
+
+    checkBatch = mocker.spy(type(trends[0].alarms[0]), "checkBatch")
+    evaluateAlarms(trends)
+
+    assert [trend.alarmsMessages for trend in trends] == expected
+    # Ensure that the test is meaningful.
+    assert 0 < sum(len(messages) for messages in expected) < len(trends)
+    # All alarms with the same parameters are evaluated together.
+    assert checkBatch.call_count == (1 if trends[0].alarms[0].batchKey() else 0)
+
+
+@pytest.mark.parametrize("createAlarm", alarms, ids=["betweenValues", "checkLastN", "meanInRange", "fallback"])
+def testEveryNewValueIsEvaluated(tf_trendingArgs, createAlarm):
+    """ Evaluating several new values at once gives the same results as evaluating after each value. """
+    rand = np.random.RandomState(3)
+    trends = []
+    nNewValues = []
+    expected = []
+    for i in range(10):
+        trend = to.MeanTrending("trend{}".format(i), *tf_trendingArgs[1:])
+        trend.setAlarms([createAlarm()])
+        nNew = i % 4 + 1
+        values = rand.uniform(-10, 110, size=i % 3 + nNew + 4)
+        messages = []
+        for j, value in enumerate(values):
+            trend.appendValue((value, 0.1))
+            if j >= len(values) - nNew:
+                isAlarm, msg = trend.alarms[0].checkAlarm(Alarm.prepareTrendValues(trend))
+                messages.extend(["[]: " + msg] if isAlarm else [])
+        trends.append(trend)
+        nNewValues.append(nNew)
+        expected.append(messages)
+
+    evaluateAlarms(trends, nNewValues)
+
+    assert [trend.alarmsMessages for trend in trends] == expected
+    # Ensure that the test is meaningful.
+    assert any(len(messages) > 1 for messages in expected)
+
+
+def testAlarmsAreGroupedByParameters(tf_trendingArgs, mocker):
+    trends = []
+    for i, (minVal, value) in enumerate([(0, 5), (0, -5), (10, 5), (10, 15)]):
+        trend = to.MaximumTrending("trend{}".format(i), *tf_trendingArgs[1:])
+        trend.appendValue(value)
+        trend.setAlarms([BetweenValuesAlarm(minVal=minVal, maxVal=100)])
+        trends.append(trend)
+    checkBatch = mocker.spy(BetweenValuesAlarm, "checkBatch")
+
+    evaluateAlarms(trends)
+
+    assert checkBatch.call_count == 2
+    assert [bool(trend.alarmsMessages) for trend in trends] == [False, True, True, False]
+
+
+def testAggregatingAlarmsAreResolved(tf_trendingArgs):
+    first = to.MaximumTrending("first", *tf_trendingArgs[1:])
+    second = to.MaximumTrending("second", *tf_trendingArgs[1:])
+    firstAlarm = BetweenValuesAlarm(minVal=0, maxVal=10, alarmText="first")
+    secondAlarm = BetweenValuesAlarm(minVal=0, maxVal=10, alarmText="second")
+    first.setAlarms([firstAlarm])
+    second.setAlarms([secondAlarm])
+    andAlarm = AndAlarm([firstAlarm, secondAlarm], alarmText="and")
+    messages = []
+    andAlarm.addReceiver(messages.append)
+
+    for firstValue, secondValue, expected in [(20, 5, False), (20, 20, True), (5, 20, False)]:
+        first.appendValue(firstValue)
+        second.appendValue(secondValue)
+        evaluateAlarms([first, second])
+        assert bool(messages) == expected
+        del messages[:]
+
+
+def testManagerEvaluatesAlarmsOncePerCycle(tmpdir, tf_trendingArgs, mocker, tf_histogramContainerClass):
+    parameters = tf_trendingArgs[4]
+    parameters.update({CON.DIR_PREFIX: tmpdir.strpath, CON.SUBSYSTEMS: ['TST'], CON.RECREATE: False,
+                       CON.BATCH_ALARMS: True})
+    manager = TrendingManager({}, parameters)
+    for name in ['first', 'second']:
+        trendingObject = to.MaximumTrending(name, 'desc', ['h1'], 'TST', parameters)
+        trendingObject.setAlarms([BetweenValuesAlarm(minVal=0, maxVal=10)])
+        manager.subsystems['TST'][name] = trendingObject
+        manager._subscribe(trendingObject, ['h1'])
+    showOnConsole = mocker.spy(alarmCollector, 'showOnConsole')
+    processCheck = mocker.spy(Alarm, 'processCheck')
+
+    for value, runNumber in [(5, 1), (20, 2)]:
+        hist = ROOT.TH1F("testManagerEvaluatesAlarms", "test", 10, 0, 10)
+        hist.SetBinContent(1, value)
+        manager.notifyAboutNewHistogramValue(tf_histogramContainerClass('h1', hist), timestamp=runNumber,
+                                             runNumber=runNumber)
+
+    assert showOnConsole.call_count == 0
+    manager.processAlarms()
+
+    assert processCheck.call_count == 0
+    assert showOnConsole.call_count == 1
+    assert manager.popAlarmInformation('h1', runNumber=1) == {}
+    assert set(manager.popAlarmInformation('h1', runNumber=2)) == {'Alarmfirst', 'Alarmsecond'}
+
+
+def testManagerEvaluatesIntermediateValues(tmpdir, tf_trendingArgs, tf_histogramContainerClass):
+    """ A value which crosses the threshold raises an alarm, even if it isn't the most recent value in the cycle. """
+    parameters = tf_trendingArgs[4]
+    parameters.update({CON.DIR_PREFIX: tmpdir.strpath, CON.SUBSYSTEMS: ['TST'], CON.RECREATE: False,
+                       CON.BATCH_ALARMS: True})
+    manager = TrendingManager({}, parameters)
+    trendingObject = to.MaximumTrending('first', 'desc', ['h1'], 'TST', parameters)
+    trendingObject.setAlarms([BetweenValuesAlarm(minVal=0, maxVal=10)])
+    manager.subsystems['TST']['first'] = trendingObject
+    manager._subscribe(trendingObject, ['h1'])
+
+    for value in [5, 20, 5]:
+        hist = ROOT.TH1F("testManagerEvaluatesIntermediateValues", "test", 10, 0, 10)
+        hist.SetBinContent(1, value)
+        manager.notifyAboutNewHistogramValue(tf_histogramContainerClass('h1', hist), timestamp=1, runNumber=1)
+    manager.processAlarms()
+
+    assert set(manager.popAlarmInformation('h1', runNumber=1)) == {'Alarmfirst'}
+    assert manager.pendingAlarms == {}
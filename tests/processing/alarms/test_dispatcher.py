@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+""" Tests for the asynchronous notification dispatcher. """
+import email
+import socket
+import threading
+
+import pytest
+
+try:
+    import socketserver
+except ImportError:
+    # Python 2
+    import SocketServer as socketserver  # noqa
+
+from overwatch.processing.alarms import collectors
+from overwatch.processing.alarms.collectors import Mail, MailSender
+from overwatch.processing.alarms.dispatcher import NotificationDispatcher
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """ Minimal SMTP server, which stores the received emails in ``server.messages``. """
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self.reply("221 Bye")
+                return
+            if command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for dataLine in iter(self.rfile.readline, b".\r\n"):
+                    data.append(dataLine.decode().replace("\r\n", "\n"))
+                self.server.messages.append(email.message_from_string("".join(data)))
+                self.reply("250 OK")
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtpServer():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPHandler)
+    server.daemon_threads = True
+    server.messages = []
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mail(smtpServer, mocker):
+    mocker.patch.dict(collectors._Singleton._instances)
+    collectors._Singleton._instances.pop(Mail, None)
+    parameters = {"emailDelivery": {"smtpSettings": {"address": "127.0.0.1", "port": smtpServer.server_address[1],
+                                                     "userName": "overwatch@localhost", "password": None,
+                                                     "useTLS": False}}}
+    mail = Mail(alarmsParameters=parameters)
+    yield mail
+    mail._disconnect()
+
+
+@pytest.fixture
+def dispatcher(mocker):
+    dispatcher = NotificationDispatcher(coalesceTime=60, backoff=0.01)
+    mocker.patch.object(collectors, "notificationDispatcher", dispatcher)
+    return dispatcher
+
+
+def testMessagesAreCoalesced(smtpServer, mail, dispatcher):
+    first = MailSender(["first@localhost"])
+    second = MailSender(["second@localhost"])
+    for msg in ["alarm 1", "alarm 2", "alarm 1"]:
+        first(msg)
+    second("alarm 3")
+    # Same recipients, so they're sent together.
+    MailSender(["first@localhost"])("alarm 4")
+
+    # Nothing is sent before the end of the time window.
+    assert dispatcher.stats()["delivered"] == 0
+    assert dispatcher.flush(timeout=10)
+
+    bodies = {message["To"]: message.get_payload()[0].get_payload().strip() for message in smtpServer.messages}
+    assert bodies == {
+        "first@localhost": "alarm 1 (repeated 2 times)\nalarm 2\nalarm 4",
+        "second@localhost": "alarm 3",
+    }
+    stats = dispatcher.stats()
+    assert stats["delivered"] == 2
+    assert stats["deduplicated"] == 1
+    assert stats["queueDepth"] == 0
+    # The connection is reused.
+    assert smtpServer.connections == 1
+
+
+def testConnectionIsOpenedForFirstEmail(smtpServer, mail, dispatcher):
+    assert mail.smtp is None
+    MailSender(["first@localhost"])("alarm")
+    dispatcher.flush(timeout=10)
+    assert smtpServer.connections == 1
+    assert len(smtpServer.messages) == 1
+
+
+def testTimeWindow(smtpServer, mail, dispatcher):
+    dispatcher.coalesceTime = 0.1
+    MailSender(["first@localhost"])("alarm")
+    for _ in range(100):
+        if smtpServer.messages:
+            break
+        threading.Event().wait(0.05)
+    assert len(smtpServer.messages) == 1
+
+
+def testReconnect(smtpServer, mail, dispatcher):
+    sender = MailSender(["first@localhost"])
+    sender("alarm 1")
+    dispatcher.flush(timeout=10)
+    # Simulate the server closing the connection.
+    mail.smtp.sock.shutdown(socket.SHUT_RDWR)
+
+    sender("alarm 2")
+    dispatcher.flush(timeout=10)
+
+    assert [message.get_payload()[0].get_payload().strip() for message in smtpServer.messages] == ["alarm 1", "alarm 2"]
+    assert smtpServer.connections == 2
+    assert dispatcher.stats()["failed"] == 0
+
+
+class BlockingReceiver(object):
+    dispatchKey = "blocking"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.payloads = []
+        self.attempts = 0
+
+    def deliver(self, payload):
+        self.attempts += 1
+        self.release.wait(10)
+        self.payloads.append(payload)
+
+
+def testFullQueueDropsMessages():
+    dispatcher = NotificationDispatcher(coalesceTime=0, maxQueueSize=2)
+    receiver = BlockingReceiver()
+    assert dispatcher.submit(receiver, "first")
+    # Wait until the first message is being delivered, so the following messages stay in the queue.
+    for _ in range(100):
+        if receiver.attempts:
+            break
+        threading.Event().wait(0.01)
+
+    results = [dispatcher.submit(receiver, "msg {}".format(i)) for i in range(4)]
+
+    assert results == [True, True, False, False]
+    assert dispatcher.stats()["dropped"] == 2
+    assert dispatcher.stats()["queueDepth"] == 2
+    receiver.release.set()
+    assert dispatcher.flush(timeout=10)
+    assert receiver.payloads == ["first", "msg 0", "msg 1"]
+
+
+def testFailedDeliveryIsRetried():
+    dispatcher = NotificationDispatcher(maxRetries=2, backoff=0.01)
+
+    class FailingReceiver(object):
+        dispatchKey = "failing"
+        attempts = 0
+
+        def deliver(self, payload):
+            self.attempts += 1
+            raise IOError("Unavailable")
+
+    receiver = FailingReceiver()
+    dispatcher.submit(receiver, "msg")
+    assert dispatcher.flush(timeout=10)
+    assert receiver.attempts == 3
+    assert dispatcher.stats()["failed"] == 1
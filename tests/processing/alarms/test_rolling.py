@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+""" Tests for the incremental evaluation of alarms with rolling windows. """
+import numpy as np
+import pytest
+
+import overwatch.processing.trending.objects as to
+from overwatch.processing.alarms.alarm import Alarm
+from overwatch.processing.alarms.impl.absolutePreviousValueAlarm import AbsolutePreviousValueAlarm
+from overwatch.processing.alarms.impl.betweenValuesAlarm import BetweenValuesAlarm
+from overwatch.processing.alarms.impl.checkLastNAlarm import CheckLastNAlarm
+from overwatch.processing.alarms.impl.meanInRangeAlarm import MeanInRangeAlarm
+from overwatch.processing.alarms.impl.relativePreviousValueAlarm import RelativePreviousValueAlarm
+from overwatch.processing.alarms.rolling import RollingWindow, rollingWindow
+from overwatch.processing.trending.constants import ENTRIES
+
+alarms = [
+    lambda: BetweenValuesAlarm(minVal=20, maxVal=80),
+    lambda: AbsolutePreviousValueAlarm(maxDelta=20),
+    lambda: RelativePreviousValueAlarm(ratio=1.5),
+    lambda: CheckLastNAlarm(minVal=20, maxVal=80, ratio=0.6, N=5),
+    lambda: MeanInRangeAlarm(minVal=40, maxVal=60, N=4),
+]
+
+
+@pytest.mark.parametrize("createAlarm", alarms,
+                         ids=["betweenValues", "absolutePrevious", "relativePrevious", "checkLastN", "meanInRange"])
+@pytest.mark.parametrize("trendingClass", [to.MaximumTrending, to.MeanTrending], ids=["scalar", "valueWithError"])
+def testEquivalentToFullEvaluation(tf_trendingArgs, createAlarm, trendingClass):
+    """ The rolling window gives the same results and messages as evaluating the alarm with all values. """
+    # Small capacity so that the trend wraps around.
+    tf_trendingArgs[4][ENTRIES] = 7
+    trend = trendingClass(*tf_trendingArgs)
+    alarm = createAlarm()
+    rand = np.random.RandomState(1)
+    nAlarms = 0
+    for i, value in enumerate(rand.uniform(-10, 110, size=100)):
+        trend.appendValue(value if not trend.valueShape else (value, 0.1), timestamp=i)
+        if i == 50:
+            # The windows are volatile, so they can be lost (for example, when the object is loaded again).
+            del trend._v_alarmWindows
+        expected = alarm.checkAlarm(Alarm.prepareTrendValues(trend))
+        result = alarm.checkWindow(rollingWindow(trend, alarm))
+        assert result == expected
+        nAlarms += result[0]
+    # Ensure that the test is meaningful.
+    assert 0 < nAlarms < 100
+
+
+def testProcessCheckDoesNotCopyTrend(tf_trendingArgs, mocker):
+    trend = to.MaximumTrending(*tf_trendingArgs)
+    alarm = MeanInRangeAlarm(minVal=0, maxVal=10, N=3)
+    messages = []
+    alarm.addReceiver(messages.append)
+    prepareTrendValues = mocker.spy(Alarm, "prepareTrendValues")
+
+    for value in [5, 6, 7, 30, 40]:
+        trend.appendValue(value)
+        alarm.processCheck(trend)
+
+    assert prepareTrendValues.call_count == 0
+    assert len(messages) == 2
+
+
+def testRollingWindow():
+    window = RollingWindow(3, predicate=lambda value: value > 1)
+    window.extend([1, 2, 3, 4])
+    assert len(window) == 3
+    assert window.count == 4
+    assert window.last() == 4
+    assert window.last(3) == 2
+    assert window.total == 9
+    assert window.mean == 3
+    assert window.nMatching == 3
+    window.append(0)
+    assert window.total == 7
+    assert window.nMatching == 2
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+""" Tests for the EMC hot channel and outlier detection. """
+import logging
+import timeit
+
+import numpy as np
+import pytest
+import ROOT
+
+from overwatch.processing.detectors import EMC
+
+logger = logging.getLogger(__name__)
+
+# Full size EMCal + DCal geometries.
+nFastORs = 5088
+nCellColumns = 96
+nCellRows = 208
+
+
+def referenceHotChannels(hist, threshold):
+    """ Hot channel search by looping over the bins (as previously done in ``fastOROptions()``). """
+    absIdList = []
+    for iBin in range(1, hist.GetXaxis().GetNbins() + 1):
+        if hist.GetBinContent(iBin) > threshold:
+            absIdList.append(iBin - 1)
+    return absIdList
+
+
+def referenceSignalOutlier(hist):
+    """ Outlier search by looping over the bins (as previously done in ``hasSignalOutlier()``). """
+    xbins = hist.GetNbinsX()
+    ybins = hist.GetNbinsY()
+    signal = np.zeros(xbins * ybins)
+    for binX in range(1, xbins + 1):
+        for binY in range(1, ybins + 1):
+            signal[(binX - 1) + (binY - 1) * xbins] = hist.GetBinContent(binX, binY)
+    mean = np.mean(signal)
+    stdev = np.std(signal)
+    outlierList = []
+    for binX in range(1, xbins + 1):
+        for binY in range(1, ybins + 1):
+            amp = signal[(binX - 1) + (binY - 1) * xbins]
+            if amp > mean + stdev or amp < mean - stdev:
+                outlierList.append((binX - 1) + (binY - 1) * xbins)
+    newSignal = np.delete(signal, outlierList)
+    return [len(outlierList), mean, stdev, np.mean(newSignal), np.std(newSignal)]
+
+
+def createFastORHist(name="EMCTRQA_histFastORL0"):
+    ROOT.TH1.AddDirectory(False)
+    hist = ROOT.TH1F(name, name, nFastORs, 0, nFastORs)
+    rand = np.random.RandomState(3)
+    for i, value in enumerate(rand.exponential(1e-3, size=nFastORs)):
+        hist.SetBinContent(i + 1, value)
+    # Hot channels, including one which is exactly at the threshold in single precision.
+    for fastOR, value in [(5, 0.5), (1000, 2.), (nFastORs - 1, 0.02), (2000, 1e-2)]:
+        hist.SetBinContent(fastOR + 1, value)
+    return hist
+
+
+def createCellHist(histType):
+    ROOT.TH1.AddDirectory(False)
+    rand = np.random.RandomState(4)
+    if histType == "TH1F":
+        hist = ROOT.TH1F("cellAmplitude", "cellAmplitude", nCellColumns * nCellRows, 0, nCellColumns * nCellRows)
+    else:
+        hist = getattr(ROOT, histType)("cellAmplitude", "cellAmplitude", nCellColumns, 0, nCellColumns, nCellRows, 0, nCellRows)
+    values = rand.normal(10, 1, size=hist.GetNcells())
+    values[rand.randint(0, len(values), size=20)] = 100
+    for i, value in enumerate(values):
+        hist.SetBinContent(i, value)
+    return hist
+
+
+@pytest.mark.parametrize("threshold", [0, 1e-2])
+def testFastORHotChannels(threshold, tf_histogramContainerClass):
+    hist = createFastORHist()
+    expected = referenceHotChannels(hist, 1e-2 if threshold == 0 else threshold / 1000.)
+    container = tf_histogramContainerClass(hist.GetName(), hist)
+    EMC.fastOROptions(None, container, {"scaleHists": False, "hotChannelThreshold": threshold})
+
+    assert container.information["Fast OR Hot Channels ID"] == expected
+    assert len(expected) > 0
+    assert all(isinstance(absId, int) for absId in expected)
+
+
+@pytest.mark.parametrize("histType", ["TH1F", "TH2F", "TH2D"])
+def testSignalOutlier(histType):
+    hist = createCellHist(histType)
+    result = EMC.hasSignalOutlier(hist)
+    expected = referenceSignalOutlier(hist)
+
+    assert result == expected
+    assert result[0] > 0
+
+
+def testHistogramContents():
+    hist = ROOT.TH2F("contents", "contents", 3, 0, 3, 2, 0, 2)
+    hist.SetBinContent(2, 1, 5)
+    hist.SetBinContent(3, 2, 7)
+    contents = EMC.histogramContents(hist)
+    assert contents.shape == (2, 3)
+    assert contents[0, 1] == 5
+    assert contents[1, 2] == 7
+    profile = ROOT.TProfile("profile", "profile", 3, 0, 3)
+    profile.Fill(1.5, 4)
+    profile.Fill(1.5, 2)
+    assert np.array_equal(EMC.histogramContents(profile), [[0, 3, 0]])
+
+
+def testBenchmark(tf_histogramContainerClass):
+    """ Compare the vectorized detection with the previous loops for full size EMCal + DCal geometries. """
+    fastORHist = createFastORHist()
+    cellHist = createCellHist("TH2F")
+
+    def hotChannels():
+        EMC.fastOROptions(None, tf_histogramContainerClass(fastORHist.GetName(), fastORHist),
+                          {"scaleHists": False, "hotChannelThreshold": 0})
+
+    timings = {
+        "hotChannels": (min(timeit.repeat(lambda: referenceHotChannels(fastORHist, 1e-2), number=1, repeat=3)),
+                        min(timeit.repeat(hotChannels, number=1, repeat=3))),
+        "signalOutlier": (min(timeit.repeat(lambda: referenceSignalOutlier(cellHist), number=1, repeat=3)),
+                          min(timeit.repeat(lambda: EMC.hasSignalOutlier(cellHist), number=1, repeat=3))),
+    }
+    for name, (loop, vectorized) in timings.items():
+        logger.info("{name}: loop: {loop:.2e} s, vectorized: {vectorized:.2e} s, speedup: {speedup:.0f}x".format(
+            name=name, loop=loop, vectorized=vectorized, speedup=loop / vectorized))
+        assert vectorized < loop
+
+
+def testTRUGridIsReused():
+    canvas = ROOT.TCanvas("gridCanvas", "gridCanvas")
+    EMC.addTRUGrid(None, None)
+    lines = [canvas.GetListOfPrimitives().At(i) for i in range(canvas.GetListOfPrimitives().GetSize())]
+    # Full EMCal SMs (5 + 5), 1/3 EMCal SMs (2), 2/3 DCal SMs (4 + 2 * 2) and 1/3 DCal SMs (2).
+    assert len(lines) == 22
+
+    canvas.Clear()
+    EMC.addTRUGrid(None, None)
+    redrawn = [canvas.GetListOfPrimitives().At(i) for i in range(canvas.GetListOfPrimitives().GetSize())]
+    assert [(line.GetX1(), line.GetY1(), line.GetX2(), line.GetY2()) for line in redrawn] == \
+        [(line.GetX1(), line.GetY1(), line.GetX2(), line.GetY2()) for line in lines]
+    assert all(ROOT.AddressOf(a)[0] == ROOT.AddressOf(b)[0] for a, b in zip(lines, redrawn))
+
+
+def testEnergyAxisIsRepositioned(tf_histogramContainerClass):
+    canvas = ROOT.TCanvas("axisCanvas", "axisCanvas")
+    axes = []
+    for maximum in [5, 10]:
+        canvas.Clear()
+        hist = ROOT.TH1F("EMCalPatchAmp", "EMCalPatchAmp", 10, 0, 100)
+        hist.SetBinContent(1, maximum)
+        hist.Draw()
+        EMC.addEnergyAxisToPatches(None, tf_histogramContainerClass(hist.GetName(), hist), {})
+        axes.append(canvas.GetListOfPrimitives().Last())
+        assert axes[-1].GetY1() == 2 * maximum
+        assert axes[-1].GetWmax() == pytest.approx(100 * 0.07874)
+    assert ROOT.AddressOf(axes[0])[0] == ROOT.AddressOf(axes[1])[0]
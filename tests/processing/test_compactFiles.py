@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+""" Tests for compacting the cumulative files of finished runs. """
+
+import pytest
+
+import numpy as np
+import os
+import logging
+logger = logging.getLogger(__name__)
+
+import ROOT
+
+from overwatch.base import utilities
+from overwatch.processing import compactFiles
+from overwatch.processing import mergeFiles
+from overwatch.processing import processingClasses
+
+def checkSnapshotsEqual(snapshot, expectedSnapshot, checkStatistics = True):
+    """ Helper function to check that two snapshots contain the same values. """
+    assert list(snapshot) == list(expectedSnapshot)
+    for histName, hist in snapshot.items():
+        expected = expectedSnapshot[histName]
+        assert np.allclose(hist.values, expected.values)
+        if checkStatistics:
+            assert hist.entries == expected.entries
+            assert (hist.sumw2 is None) == (expected.sumw2 is None)
+            if hist.sumw2 is not None:
+                assert np.allclose(hist.sumw2, expected.sumw2)
+    return True
+
+def testCompactAndReconstruct(cumulativeFiles):
+    """ Test that compacted files can be reconstructed. """
+    dirPrefix, subsystem, filenames = cumulativeFiles
+    originalSnapshots = [compactFiles.readSnapshot(filename) for filename in filenames]
+
+    saved = compactFiles.compactSubsystem(dirPrefix, subsystem)
+
+    assert saved > 0
+    # Only the base snapshot remains.
+    assert [os.path.exists(filename) for filename in filenames] == [False, False, True]
+    assert all(os.path.exists(compactFiles.deltaFilename(filename)) for filename in filenames)
+    assert [compactFiles.isCompacted(filename) for filename in filenames] == [True, True, False]
+    # Compacting again doesn't do anything.
+    assert compactFiles.compactSubsystem(dirPrefix, subsystem) == 0
+
+    for filename, expectedSnapshot in zip(filenames[:-1], originalSnapshots[:-1]):
+        compactFiles.reconstructSnapshot(filename)
+        assert checkSnapshotsEqual(compactFiles.readSnapshot(filename), expectedSnapshot) is True
+
+def testReconstructToCache(cumulativeFiles):
+    """ Test reconstructing compacted files into a cache which is limited in size. """
+    dirPrefix, subsystem, filenames = cumulativeFiles
+    originalSnapshots = [compactFiles.readSnapshot(filename) for filename in filenames]
+    compactFiles.compactSubsystem(dirPrefix, subsystem)
+    cacheDir = os.path.join(dirPrefix, "reconstructed")
+
+    cachedFilenames = []
+    for filename, expectedSnapshot in zip(filenames[:-1], originalSnapshots[:-1]):
+        # The cache only has space for one file.
+        cachedFilename = compactFiles.reconstructToCache(filename, cacheDir, os.path.relpath(filename, dirPrefix), maxSize = 1)
+        assert cachedFilename == os.path.join(cacheDir, os.path.relpath(filename, dirPrefix))
+        assert checkSnapshotsEqual(compactFiles.readSnapshot(cachedFilename), expectedSnapshot) is True
+        cachedFilenames.append(cachedFilename)
+    # The files are never written back to the data directory, and the least recently used file was removed.
+    assert [compactFiles.isCompacted(filename) for filename in filenames[:-1]] == [True, True]
+    assert [os.path.exists(filename) for filename in cachedFilenames] == [False, True]
+
+    # Available files are used directly.
+    modificationTime = os.path.getmtime(cachedFilenames[1])
+    os.utime(cachedFilenames[1], (modificationTime - 10, modificationTime - 10))
+    assert compactFiles.reconstructToCache(filenames[1], cacheDir, os.path.relpath(filenames[1], dirPrefix), maxSize = 1) == cachedFilenames[1]
+    assert os.path.getmtime(cachedFilenames[1]) > modificationTime - 10
+
+def addCumulativeFile(dirPrefix, subsystem, previousFilename, filename):
+    """ Helper function to add a cumulative file which was received after the previous file. """
+    fIn = ROOT.TFile(previousFilename, "READ")
+    hists = [fIn.Get(histName) for histName in ["hist1D", "hist2D"]]
+    for hist in hists:
+        hist.SetDirectory(0)
+    fIn.Close()
+    hists[0].Fill(7)
+    hists[1].Fill(3, 4, 2.5)
+    fileCont = processingClasses.fileContainer(filename = os.path.join(subsystem.baseDir, filename), startOfRun = subsystem.startOfRun)
+    fOut = ROOT.TFile(os.path.join(dirPrefix, fileCont.filename), "RECREATE")
+    for hist in hists:
+        hist.Write()
+    fOut.Close()
+    subsystem.files[fileCont.fileTime] = fileCont
+    return os.path.join(dirPrefix, fileCont.filename)
+
+def testIncrementalCompaction(cumulativeFiles):
+    """ Test that files which are received after compacting are compacted starting from the last delta. """
+    dirPrefix, subsystem, filenames = cumulativeFiles
+    originalSnapshots = [compactFiles.readSnapshot(filename) for filename in filenames]
+    compactFiles.compactSubsystem(dirPrefix, subsystem)
+
+    newFilename = addCumulativeFile(dirPrefix, subsystem, filenames[-1], "EMChists.2015_11_24_18_20_16.root")
+    originalSnapshots.append(compactFiles.readSnapshot(newFilename))
+    filenames.append(newFilename)
+    # The new file isn't covered by the deltas yet.
+    with pytest.raises(ValueError):
+        compactFiles.subtractSnapshots(filenames[0], newFilename, os.path.join(dirPrefix, "timeSlice.root"))
+
+    assert compactFiles.compactSubsystem(dirPrefix, subsystem) > 0
+    # The previous base is removed, and the new file is now the base.
+    assert [os.path.exists(filename) for filename in filenames] == [False, False, False, True]
+    assert [compactFiles.hasDelta(filename) for filename in filenames] == [True] * 4
+    assert compactFiles.currentBaseFilename(os.path.dirname(newFilename)) == os.path.basename(newFilename)
+
+    for filename, expectedSnapshot in zip(filenames[:-1], originalSnapshots[:-1]):
+        compactFiles.reconstructSnapshot(filename)
+        assert checkSnapshotsEqual(compactFiles.readSnapshot(filename), expectedSnapshot) is True
+
+@pytest.mark.parametrize("newFile, minutesSinceLastFile, expected", [
+    (False, 120, True),
+    (False, 30, False),
+    (False, -1, False),
+    (True, 120, False),
+], ids = ["Ended", "Recent file", "Unknown time", "New file"])
+def testHasRunEnded(cumulativeFiles, mocker, newFile, minutesSinceLastFile, expected):
+    """ Test determining whether a run has ended based on the time since the last file. """
+    _, subsystem, _ = cumulativeFiles
+    subsystem.newFile = newFile
+    run = mocker.MagicMock(subsystems = {"EMC": subsystem})
+    mocker.patch("overwatch.processing.processingClasses.runContainer.minutesSinceLastTimestamp",
+                 return_value = minutesSinceLastFile)
+    assert compactFiles.hasRunEnded(run, minutesSinceLastFile = 60) is expected
+
+@pytest.mark.parametrize("hist", [
+    ROOT.TH1I("histI", "histI", 5, 0, 5),
+    ROOT.TH2F("hist2F", "hist2F", 3, 0, 3, 4, 0, 4),
+    ROOT.TH1D("histD", "histD", 6, 0, 6),
+], ids = ["TH1I", "TH2F", "TH1D"])
+def testHistogramArrays(hist):
+    """ Test that the arrays which are extracted from the histogram buffers agree with the bin contents. """
+    hist.Sumw2()
+    for i in range(20):
+        if hist.InheritsFrom(ROOT.TH2.Class()):
+            hist.Fill(i % 3, i % 4, 1.5)
+        else:
+            hist.Fill(i % 6, 2. * i)
+    arrays = compactFiles.histogramToArrays(hist)
+    assert arrays.values.dtype == np.float64
+    assert np.allclose(arrays.values, [hist.GetBinContent(i) for i in range(hist.GetNcells())])
+    assert np.allclose(arrays.sumw2, [hist.GetSumw2().At(i) for i in range(hist.GetNcells())])
+
+    # Round trip
+    output = hist.Clone("{}Output".format(hist.GetName()))
+    compactFiles.setHistogramFromArrays(output, arrays)
+    assert np.allclose([output.GetBinContent(i) for i in range(output.GetNcells())], arrays.values)
+    assert np.allclose([output.GetBinError(i) for i in range(output.GetNcells())],
+                       [hist.GetBinError(i) for i in range(hist.GetNcells())])
+    assert output.GetEntries() == hist.GetEntries()
+
+def testSubtractCompactedSnapshots(cumulativeFiles):
+    """ Test that time slices from the deltas are the same as those from subtracting the original files. """
+    dirPrefix, subsystem, filenames = cumulativeFiles
+    expectedFilename = os.path.join(dirPrefix, "expected.root")
+    mergeFiles.subtractFiles(filenames[0], filenames[2], expectedFilename)
+    expectedSnapshot = compactFiles.readSnapshot(expectedFilename)
+
+    compactFiles.compactSubsystem(dirPrefix, subsystem)
+    outputFilename = os.path.join(dirPrefix, "timeSlice.root")
+    compactFiles.subtractSnapshots(filenames[0], filenames[2], outputFilename)
+
+    # The sum of the squares of weights and the entries are intentionally different, since ``TH1::Add()`` adds
+    # the sum of the squares of weights and recalculates the effective entries.
+    assert checkSnapshotsEqual(compactFiles.readSnapshot(outputFilename), expectedSnapshot, checkStatistics = False) is True
+
+def testFileDictionaryForCompactedRun(cumulativeFiles):
+    """ Test that compacted files are still found when recreating a run from the directory structure. """
+    dirPrefix, subsystem, filenames = cumulativeFiles
+    compactFiles.compactSubsystem(dirPrefix, subsystem)
+
+    fileDict, _ = utilities.createFileDictionary(dirPrefix, "Run123", "EMC")
+    assert sorted(fileDict.values()) == sorted(fileCont.filename for fileCont in subsystem.files.values())
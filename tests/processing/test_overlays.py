@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+""" Tests for the cached overlay primitives. """
+import pytest
+import ROOT
+
+from overwatch.processing import overlays
+
+
+@pytest.fixture
+def overlayBuilder(mocker):
+    mocker.patch.dict(overlays._builders)
+    mocker.patch.dict(overlays._cache)
+
+    calls = []
+
+    def builder(geometry):
+        calls.append(geometry)
+        return [ROOT.TLine(0, 0, geometry, geometry), ROOT.TLine(0, geometry, geometry, 0)]
+
+    overlays.registerOverlay("TST.lines", builder)
+    return calls
+
+
+def testPrimitivesAreBuiltOnce(overlayBuilder):
+    canvas = ROOT.TCanvas("overlayCanvas", "overlayCanvas")
+    first = overlays.drawOverlay("TST.lines", geometry = 10)
+    canvas.Clear()
+    second = overlays.drawOverlay("TST.lines", geometry = 10)
+
+    assert overlayBuilder == [10]
+    assert [id(primitive) for primitive in first] == [id(primitive) for primitive in second]
+    # Clearing the canvas doesn't delete the primitives, so they're drawn again.
+    assert canvas.GetListOfPrimitives().GetSize() == 2
+    assert second[0].GetX2() == 10
+
+
+def testPrimitivesPerGeometry(overlayBuilder):
+    overlays.retrieveOverlay("TST.lines", geometry = 10)
+    primitives = overlays.retrieveOverlay("TST.lines", geometry = 20)
+    assert overlayBuilder == [10, 20]
+    assert primitives[0].GetX2() == 20
+
+
+def testClearAndReplace(overlayBuilder):
+    overlays.retrieveOverlay("TST.lines", geometry = 10)
+    overlays.clearOverlayCache("TST.lines")
+    overlays.retrieveOverlay("TST.lines", geometry = 10)
+    assert overlayBuilder == [10, 10]
+
+    # Replacing the builder removes the cached primitives.
+    overlays.registerOverlay("TST.lines", lambda geometry: [])
+    assert overlays.retrieveOverlay("TST.lines", geometry = 10) == []
+
+    with pytest.raises(KeyError):
+        overlays.retrieveOverlay("TST.missing")
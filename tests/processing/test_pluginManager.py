@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+""" Tests for the plugin manager dispatch tables and timing. """
+import logging
+
+import pytest
+
+from overwatch.processing import pluginManager
+from overwatch.processing import processingClasses
+
+
+def processingFunction(subsystem, hist, processingOptions, **kwargs):
+    pass
+
+
+def invalidProcessingFunction(subsystem):
+    pass
+
+
+class SubsystemMock(object):
+    subsystem = "TST"
+
+    def __init__(self):
+        self.histsAvailable = {}
+
+
+@pytest.fixture
+def plugins(mocker):
+    """ Setup a test subsystem with a counting ``findFunctionsForTSTHistogram(...)`` plugin. """
+    mocker.patch.dict(pluginManager.dispatchTables)
+    mocker.patch.dict(pluginManager.histFunctionsCache)
+    calls = []
+
+    def findFunctionsForTSTHistogram(subsystem, hist):
+        calls.append(hist.histName)
+        if "proc" in hist.histName:
+            hist.functionsToApply.append(processingFunction)
+
+    mocker.patch.object(pluginManager, "TST_findFunctionsForTSTHistogram", findFunctionsForTSTHistogram, create = True)
+    pluginManager.dispatchTables["TST"] = pluginManager.compileDispatchTable("TST")
+    return calls
+
+
+def testDispatchTablesAreCompiledOnImport():
+    for subsystemName in set(pluginManager.processingParameters["subsystemList"]):
+        dispatchTable = pluginManager.dispatchTables[subsystemName]
+        assert set(dispatchTable) == set(pluginManager.pluginRoutes)
+        findFunction = dispatchTable["findFunctionsFor{}Histogram"]
+        if findFunction is not None:
+            assert findFunction.__name__ == "findFunctionsFor{}Histogram".format(subsystemName)
+
+
+def testUnknownSubsystem(mocker):
+    mocker.patch.dict(pluginManager.dispatchTables)
+    assert pluginManager.retrievePlugin("create{}HistogramGroups", "XYZ") is None
+    assert "XYZ" in pluginManager.dispatchTables
+    assert pluginManager.createHistGroups(SubsystemMock()) is False
+
+
+def testHistFunctionsAreCached(plugins):
+    subsystem = SubsystemMock()
+    hists = [processingClasses.histogramContainer(name) for name in ["procHist", "procHist", "otherHist"]]
+    for hist in hists:
+        pluginManager.findFunctionsForHist(subsystem, hist)
+
+    # The plugin is only called once per hist name.
+    assert plugins == ["procHist", "otherHist"]
+    assert [list(hist.functionsToApply) for hist in hists] == [[processingFunction], [processingFunction], []]
+
+
+@pytest.mark.parametrize("func, nArgs, expected", [
+    (processingFunction, 3, True),
+    (processingFunction, 2, False),
+    (invalidProcessingFunction, 3, False),
+    (lambda *args: None, 5, True),
+    ("notAFunction", 1, False),
+], ids = ["Valid", "Missing argument", "Too many arguments", "Variable arguments", "Not callable"])
+def testAcceptsPositionalArguments(func, nArgs, expected):
+    assert pluginManager.acceptsPositionalArguments(func, nArgs) is expected
+
+
+def testPluginsAreValidatedEagerly(mocker):
+    mocker.patch.object(pluginManager, "TST_createTSTHistogramStacks", invalidProcessingFunction, create = True)
+    mocker.patch.object(pluginManager, "TST_findFunctionsForTSTHistogram", invalidProcessingFunction, create = True)
+    with pytest.raises(ValueError, match = "TST_findFunctionsForTSTHistogram"):
+        pluginManager.compileDispatchTable("TST")
+
+
+def testInvalidHistFunction(plugins, mocker):
+    mocker.patch.object(pluginManager, "validatedFunctions", set())
+
+    def findFunctionsForTSTHistogram(subsystem, hist):
+        hist.functionsToApply.append(invalidProcessingFunction)
+
+    pluginManager.dispatchTables["TST"]["findFunctionsFor{}Histogram"] = findFunctionsForTSTHistogram
+    with pytest.raises(ValueError, match = "procHist"):
+        pluginManager.findFunctionsForHist(SubsystemMock(), processingClasses.histogramContainer("procHist"))
+
+
+def testPluginTimer(caplog):
+    timer = pluginManager.PluginTimer()
+    assert timer.call(processingFunction, None, None, {}) is None
+    timer.call(processingFunction, None, None, {})
+    timer.record("slowFunction", 2.)
+
+    summary = timer.summary()
+    assert [entry[:2] for entry in summary] == [("slowFunction", 1), ("processingFunction", 2)]
+    assert timer.summary(nFunctions = 1)[0][2:] == (2., 2.)
+
+    # Functions from subsystem modules are namespaced by the subsystem.
+    def fastOROptions(subsystem, hist, processingOptions):
+        pass
+    fastOROptions.__module__ = "overwatch.processing.detectors.EMC"
+    assert timer.functionName(fastOROptions) == "EMC_fastOROptions"
+
+    with caplog.at_level(logging.INFO, logger = pluginManager.__name__):
+        timer.logSummary()
+    assert "slowFunction: 1 calls" in caplog.text
+    assert timer.timings == {}
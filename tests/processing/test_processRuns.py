@@ -383,3 +383,202 @@ def testProcessMovedFilesWithInitialFileArrival(setupNewSubsystemsFromMovedFileI
             assert len(runs[runDir].subsystems[subsystem].histsAvailable) == 1
             assert runs[runDir].subsystems[subsystem].histsAvailable["hello"] == "world_{subsystem}".format(subsystem = subsystem)
 
+
+@pytest.fixture
+def setupTimeSliceCache(loggingMixin, mocker, tmpdir):
+    """ Setup a subsystem with a few files for testing the time slice cache. """
+    dirPrefix = str(tmpdir)
+    mocker.patch.dict(processingClasses.processingParameters, {"dirPrefix": dirPrefix})
+
+    runDir = "Run123"
+    filenames = ["EMChists.2015_11_24_18_05_10.root", "EMChists.2015_11_24_18_09_12.root", "EMChists.2015_11_24_18_15_14.root"]
+    startOfRun = utilities.extractTimeStampFromFilename(filenames[0])
+    endOfRun = utilities.extractTimeStampFromFilename(filenames[-1])
+    subsystem = processingClasses.subsystemContainer(subsystem = "EMC", runDir = runDir,
+                                                     startOfRun = startOfRun, endOfRun = endOfRun,
+                                                     fileLocationSubsystem = "EMC")
+    for filename in filenames:
+        fileCont = processingClasses.fileContainer(filename = os.path.join(subsystem.baseDir, filename), startOfRun = startOfRun)
+        subsystem.files[fileCont.fileTime] = fileCont
+    subsystem.processingOptions["scaleHists"] = True
+
+    return dirPrefix, subsystem
+
+def createTimeSliceFiles(dirPrefix, subsystem, timeSlice, size = 10):
+    """ Helper function to create the files which would be created when processing a time slice. """
+    filenames = [os.path.join(dirPrefix, subsystem.baseDir, timeSlice.filename.filename),
+                 os.path.join(dirPrefix, subsystem.imgDir, timeSlice.filenamePrefix + ".hist.png"),
+                 os.path.join(dirPrefix, subsystem.jsonDir, timeSlice.filenamePrefix + ".hist.json")]
+    for filename in filenames:
+        with open(filename, "w") as f:
+            f.write("a" * size)
+    return filenames
+
+def testTimeSliceCacheLookup(setupTimeSliceCache):
+    """ Test that an existing time slice is retrieved from the cache rather than recreated. """
+    dirPrefix, subsystem = setupTimeSliceCache
+
+    (key, newlyCreated, errors) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": False})
+    assert errors is None
+    assert newlyCreated is True
+    (sameKey, newlyCreated, errors) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": False})
+    assert sameKey == key
+    assert newlyCreated is False
+    # Different options with the same time range are a different time slice.
+    (otherKey, newlyCreated, errors) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": True})
+    assert otherKey != key
+    assert newlyCreated is True
+
+    assert list(subsystem.timeSlicesUsage) == [key, otherKey]
+    assert len(subsystem.timeSlicesIndex) == 2
+
+@pytest.mark.parametrize("maxEntries, maxBytes", [
+    (2, 0),
+    (0, 65),
+], ids = ["Limit entries", "Limit bytes"])
+def testTimeSliceCacheEviction(setupTimeSliceCache, maxEntries, maxBytes):
+    """ Test that the least recently used time slices and their files are evicted when the cache limits are exceeded. """
+    dirPrefix, subsystem = setupTimeSliceCache
+
+    keys = []
+    filenames = {}
+    for minTime, maxTime in [(0, 4), (4, 10), (0, 10)]:
+        (key, newlyCreated, errors) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, minTime, maxTime, {"scaleHists": False})
+        keys.append(key)
+        filenames[key] = createTimeSliceFiles(dirPrefix, subsystem, subsystem.timeSlices[key])
+    # Use the first time slice again so that the second is the least recently used.
+    processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 4, {"scaleHists": False})
+
+    evicted = subsystem.enforceTimeSliceCacheLimits(maxEntries = maxEntries, maxBytes = maxBytes, keepKey = keys[2])
+
+    assert evicted == [keys[1]]
+    assert set(subsystem.timeSlices) == {keys[0], keys[2]}
+    assert keys[1] not in subsystem.timeSlicesUsage
+    assert subsystem.findTimeSlice(*subsystem.timeSlices[keys[0]].cacheKey()) == keys[0]
+    assert all(not os.path.exists(filename) for filename in filenames[keys[1]])
+    assert all(os.path.exists(filename) for filename in filenames[keys[0]] + filenames[keys[2]])
+
+def testTimeSliceCacheIndexMigration(setupTimeSliceCache):
+    """ Test that the cache index is rebuilt for subsystems stored before it was introduced. """
+    dirPrefix, subsystem = setupTimeSliceCache
+
+    (key, newlyCreated, errors) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": False})
+    del subsystem.timeSlicesIndex
+    del subsystem.timeSlicesUsage
+
+    (sameKey, newlyCreated, errors) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": False})
+    assert sameKey == key
+    assert newlyCreated is False
+    assert list(subsystem.timeSlicesUsage) == [key]
+
+def testTimeSliceSharedMergedFile(setupTimeSliceCache):
+    """ Test that time slices which only differ in processing options share the merged file. """
+    dirPrefix, subsystem = setupTimeSliceCache
+
+    (key, _, _) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": False})
+    (otherKey, _, _) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": True})
+    timeSlice = subsystem.timeSlices[key]
+    otherTimeSlice = subsystem.timeSlices[otherKey]
+    filenames = createTimeSliceFiles(dirPrefix, subsystem, timeSlice)
+    otherFilenames = createTimeSliceFiles(dirPrefix, subsystem, otherTimeSlice)
+
+    assert timeSlice.mergedFilePath(subsystem) == otherTimeSlice.mergedFilePath(subsystem)
+    assert timeSlice.filenamePrefix != otherTimeSlice.filenamePrefix
+    assert subsystem.timeSlicesMergedFiles[timeSlice.fileRange()] == 2
+
+    # The merged file is still used by the other time slice, so only the outputs are removed.
+    subsystem.removeTimeSlice(key)
+    assert subsystem.timeSlicesMergedFiles[timeSlice.fileRange()] == 1
+    assert all(not os.path.exists(filename) for filename in filenames[1:])
+    assert all(os.path.exists(filename) for filename in otherFilenames)
+
+    # Removing the last reference removes the merged file.
+    subsystem.removeTimeSlice(otherKey)
+    assert timeSlice.fileRange() not in subsystem.timeSlicesMergedFiles
+    assert all(not os.path.exists(filename) for filename in otherFilenames)
+
+def testTimeSliceMergedFileMigration(setupTimeSliceCache):
+    """ Test that time slices with their own merged file don't take a reference to the shared merged file. """
+    dirPrefix, subsystem = setupTimeSliceCache
+
+    (legacyKey, _, _) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": False})
+    (key, _, _) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": True})
+    legacyTimeSlice = subsystem.timeSlices[legacyKey]
+    timeSlice = subsystem.timeSlices[key]
+    # Time slices created before the merged file was shared stored it under their own filename prefix.
+    legacyTimeSlice.filename = processingClasses.fileContainer(legacyTimeSlice.filenamePrefix + ".root")
+    legacyFilenames = createTimeSliceFiles(dirPrefix, subsystem, legacyTimeSlice)
+    filenames = createTimeSliceFiles(dirPrefix, subsystem, timeSlice)
+    del subsystem.timeSlicesMergedFiles
+
+    assert legacyTimeSlice.sharesMergedFile() is False
+    assert timeSlice.sharesMergedFile() is True
+    assert subsystem.findTimeSlice(*timeSlice.cacheKey()) == key
+    assert subsystem.timeSlicesMergedFiles[timeSlice.fileRange()] == 1
+
+    # The legacy time slice removes its own merged file, but leaves the shared file alone.
+    subsystem.removeTimeSlice(legacyKey)
+    assert all(not os.path.exists(filename) for filename in legacyFilenames)
+    assert all(os.path.exists(filename) for filename in filenames)
+    assert subsystem.timeSlicesMergedFiles[timeSlice.fileRange()] == 1
+
+    # Removing the last time slice which uses the shared merged file removes it.
+    subsystem.removeTimeSlice(key)
+    assert timeSlice.fileRange() not in subsystem.timeSlicesMergedFiles
+    assert all(not os.path.exists(filename) for filename in filenames)
+
+@pytest.mark.parametrize("histGroup, expectedToProcess, expectedPending", [
+    (None, ["first"], ["second"]),
+    ("second", ["second"], ["first"]),
+    ("missing", None, []),
+], ids = ["No hist group", "Requested hist group", "Missing hist group"])
+def testPartialTimeSliceRendering(setupTimeSliceCache, mocker, histGroup, expectedToProcess, expectedPending):
+    """ Test that only the requested hist group is rendered first, while the others are rendered when requested. """
+    dirPrefix, subsystem = setupTimeSliceCache
+    for selectionPattern in ["first", "empty", "second"]:
+        group = processingClasses.histogramGroupContainer(selectionPattern, selectionPattern)
+        if selectionPattern != "empty":
+            group.histList.append(selectionPattern + "Hist")
+        subsystem.histGroups.append(group)
+
+    histGroupsToProcess, pendingHistGroups = processRuns.determineHistGroupsToProcessFirst(subsystem, histGroup)
+    assert histGroupsToProcess == expectedToProcess
+    assert pendingHistGroups == expectedPending
+
+    # Render the pending hist groups.
+    (key, _, _) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": False})
+    timeSlice = subsystem.timeSlices[key]
+    timeSlice.pendingHistGroups.extend(pendingHistGroups)
+    mProcessRootFile = mocker.patch("overwatch.processing.processRuns.processRootFile")
+    for pattern in pendingHistGroups:
+        assert timeSlice.isHistGroupPending(pattern) is True
+        assert processRuns.processPendingTimeSliceHistGroups(subsystem, timeSlice, pattern) is True
+        assert mProcessRootFile.call_args[1]["histGroupsToProcess"] == [pattern]
+        assert timeSlice.isHistGroupPending(pattern) is False
+    # Nothing remains to be rendered.
+    assert processRuns.processPendingTimeSliceHistGroups(subsystem, timeSlice, "first") is False
+    assert mProcessRootFile.call_count == len(pendingHistGroups)
+
+def testBackgroundTimeSliceRendering(setupTimeSliceCache, mocker):
+    """ Test that the standard processing renders the pending hist groups of the time slices. """
+    dirPrefix, subsystem = setupTimeSliceCache
+    (key, _, _) = processRuns.validateAndCreateNewTimeSlice(None, subsystem, 0, 5, {"scaleHists": False})
+    timeSlice = subsystem.timeSlices[key]
+    timeSlice.pendingHistGroups.extend(["first", "second"])
+    mProcessRootFile = mocker.patch("overwatch.processing.processRuns.processRootFile")
+
+    # The merged file isn't available, so nothing can be rendered.
+    assert processRuns.processPendingTimeSlices(subsystem) == 0
+    assert list(timeSlice.pendingHistGroups) == ["first", "second"]
+
+    mergedFilePath = timeSlice.mergedFilePath(subsystem)
+    if not os.path.exists(os.path.dirname(mergedFilePath)):
+        os.makedirs(os.path.dirname(mergedFilePath))
+    open(mergedFilePath, "w").close()
+    assert processRuns.processPendingTimeSlices(subsystem) == 2
+    mProcessRootFile.assert_called_once()
+    assert mProcessRootFile.call_args[1]["histGroupsToProcess"] == ["first", "second"]
+    assert not timeSlice.pendingHistGroups
+    # Nothing remains to be rendered, either in the background or on request.
+    assert processRuns.processPendingTimeSlices(subsystem) == 0
+    assert processRuns.processPendingTimeSliceHistGroups(subsystem, timeSlice, "first") is False
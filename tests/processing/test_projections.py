@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+""" Tests for the shared projection engine. """
+import numpy as np
+import pytest
+import ROOT
+
+from overwatch.processing import processingClasses
+from overwatch.processing import projections
+from overwatch.processing.detectors import TPC
+
+sourceName = "TPCQA/h_tpc_track_pos_recvertex_0_5_7"
+
+
+class CountingFile(object):
+    """ Wraps a ``TFile`` to count how often the keys are retrieved. """
+    def __init__(self, fIn):
+        self.fIn = fIn
+        self.keysRetrieved = []
+
+    def GetKey(self, name):
+        self.keysRetrieved.append(name)
+        return self.fIn.GetKey(name)
+
+
+@pytest.fixture
+def sourceFile(tmpdir):
+    filename = tmpdir.join("TPChists.root").strpath
+    fOut = ROOT.TFile(filename, "RECREATE")
+    hist = ROOT.TH3F(sourceName, sourceName, 160, 0, 160, 30, 0, 30, 40, 0, 40)
+    rand = np.random.RandomState(5)
+    for x, y, z in zip(rand.uniform(0, 160, 20000), rand.uniform(0, 30, 20000), rand.uniform(0, 40, 20000)):
+        hist.Fill(x, y, z)
+    hist.Write()
+    fOut.Close()
+
+    fIn = ROOT.TFile(filename, "READ")
+    yield fIn
+    fIn.Close()
+
+
+def createHists():
+    """ Derived hists, which mirror those created in ``TPC.createAdditionalTPCHistograms()``. """
+    hists = []
+    for histName, func in [("DCAz_vs_Phi_postracks_aSide", TPC.aSideProjectToXZ),
+                           ("DCAz_vs_Phi_postracks_cSide", TPC.cSideProjectToXZ),
+                           ("Eta_vs_Phi_postracks", TPC.projectToYZ),
+                           ("pT_postracks", TPC.projectTo1D),
+                           ("Eta_postracks", TPC.projectTo1D)]:
+        hist = processingClasses.histogramContainer(histName = histName, histList = [sourceName])
+        hist.projectionFunctionsToApply.append(func)
+        hists.append(hist)
+    return hists
+
+
+def contents(hist):
+    return [hist.GetBinContent(i) for i in range(hist.GetNcells())]
+
+
+def testProjectionsMatchIndependentRetrieval(sourceFile):
+    expected = {}
+    for hist in createHists():
+        assert hist.retrieveHistogram(fIn = sourceFile, ROOT = ROOT)
+        for func in hist.projectionFunctionsToApply:
+            hist.hist = func(None, hist, {})
+        expected[hist.histName] = (hist.hist.GetName(), hist.hist.GetTitle(), hist.hist.GetEntries(), contents(hist.hist))
+        hist.hist = None
+
+    fIn = CountingFile(sourceFile)
+    hists = createHists()
+    engine = projections.ProjectionEngine(fIn = fIn, subsystem = None, processingOptions = {}, hists = hists)
+    for hist in hists:
+        assert engine.isRegistered(hist)
+        assert engine.retrieveProjection(hist)
+        assert (hist.hist.GetName(), hist.hist.GetTitle(), hist.hist.GetEntries(), contents(hist.hist)) == expected[hist.histName]
+        # The projections are detached from the file, so they're released with the hist container.
+        assert not hist.hist.GetDirectory()
+        hist.hist = None
+
+    # The source hist is only read once.
+    assert fIn.keysRetrieved == [sourceName]
+    assert engine.projections == {}
+
+
+def testUnregisteredAndMissingHists(sourceFile):
+    stackHist = processingClasses.histogramContainer(histName = "stack", histList = [sourceName, "other"])
+    plainHist = processingClasses.histogramContainer(histName = sourceName)
+    missingHist = processingClasses.histogramContainer(histName = "missing", histList = ["missingSource"])
+    missingHist.projectionFunctionsToApply.append(TPC.projectToYZ)
+
+    engine = projections.ProjectionEngine(fIn = sourceFile, subsystem = None, processingOptions = {},
+                                          hists = [stackHist, plainHist, missingHist])
+    assert not engine.isRegistered(stackHist)
+    assert not engine.isRegistered(plainHist)
+    assert engine.isRegistered(missingHist)
+    assert engine.retrieveProjection(missingHist) is False
+    assert missingHist.hist is None
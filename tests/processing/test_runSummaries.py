@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+""" Tests for the run summary index. """
+
+import pendulum
+import pytest
+
+from BTrees.OOBTree import OOBTree
+
+from overwatch.processing import runSummaries
+
+class FileMock(object):
+    def __init__(self, fileTime):
+        self.fileTime = fileTime
+
+class SubsystemMock(object):
+    def __init__(self, startOfRun, fileTimes, newFile = False):
+        self.startOfRun = startOfRun
+        self.newFile = newFile
+        self.files = OOBTree()
+        self.files.update({fileTime: FileMock(fileTime) for fileTime in fileTimes})
+
+class RunMock(object):
+    def __init__(self, runNumber, subsystems):
+        self.runDir = "Run{}".format(runNumber)
+        self.runNumber = runNumber
+        self.prettyName = "Run {}".format(runNumber)
+        self.subsystems = OOBTree()
+        self.subsystems.update(subsystems)
+
+# Runs are one hour apart, starting from 2018-11-06 00:00 (CERN time).
+startTime = int(pendulum.datetime(2018, 11, 6, tz = "Europe/Zurich").timestamp())
+
+@pytest.fixture
+def runs():
+    runs = OOBTree()
+    for i in range(100):
+        startOfRun = startTime + i * 3600
+        subsystems = {"HLT": SubsystemMock(startOfRun, [startOfRun + 60, startOfRun + 120])}
+        if i % 2 == 0:
+            subsystems["EMC"] = SubsystemMock(startOfRun, [startOfRun + 180])
+        run = RunMock(100000 + i, subsystems)
+        runs[run.runDir] = run
+    return runs
+
+@pytest.fixture
+def summaries(runs):
+    summaries = runSummaries.createRunSummaries()
+    assert runSummaries.updateRunSummaries(summaries, runs) == 100
+    return summaries
+
+def testCreateRunSummary(runs):
+    summary = runSummaries.createRunSummary(runs["Run100002"])
+    assert summary["runNumber"] == 100002
+    assert summary["prettyName"] == "Run 100002"
+    assert summary["subsystems"] == ["EMC", "HLT"]
+    assert summary["startOfRun"] == startTime + 2 * 3600
+    assert summary["startOfRunTimeStamp"] == "Tuesday, 6 Nov 2018 02:00:00"
+    assert summary["lastFileTime"] == startTime + 2 * 3600 + 180
+    assert summary["newFile"] is False
+    assert runSummaries.isRunOngoing(summary) is False
+
+    runs["Run100002"].subsystems["EMC"].newFile = True
+    assert runSummaries.isRunOngoing(runSummaries.createRunSummary(runs["Run100002"])) is True
+
+def testUpdateRunSummaries(runs, summaries):
+    run = RunMock(100100, {"TPC": SubsystemMock(startTime, [])})
+    runs[run.runDir] = run
+    runs["Run100001"].subsystems["EMC"] = SubsystemMock(startTime, [])
+    # Missing runs are always added, while existing runs are only updated if requested.
+    assert runSummaries.updateRunSummaries(summaries, runs, runDirs = []) == 1
+    assert summaries["Run100100"]["subsystems"] == ["TPC"]
+    assert summaries["Run100100"]["lastFileTime"] is None
+    assert summaries["Run100001"]["subsystems"] == ["HLT"]
+    runSummaries.updateRunSummaries(summaries, runs, runDirs = ["Run100001"])
+    assert summaries["Run100001"]["subsystems"] == ["EMC", "HLT"]
+    assert runSummaries.mostRecentRunSummary(summaries)["runNumber"] == 100100
+
+@pytest.mark.parametrize("btree", [True, False], ids = ["BTree", "dict"])
+def testRetrieveRunSummaries(runs, btree):
+    summaries = runSummaries.createRunSummaries(btree = btree)
+    runSummaries.updateRunSummaries(summaries, runs)
+
+    selected, nTotal = runSummaries.retrieveRunSummaries(summaries, runOffset = 0, nRuns = 10)
+    assert nTotal == 100
+    assert [summary["runNumber"] for summary in selected] == list(range(100099, 100089, -1))
+
+    selected, nTotal = runSummaries.retrieveRunSummaries(summaries, runOffset = 95, nRuns = 10)
+    assert [summary["runNumber"] for summary in selected] == list(range(100004, 99999, -1))
+    selected, _ = runSummaries.retrieveRunSummaries(summaries, runOffset = 200, nRuns = 10)
+    assert selected == []
+
+@pytest.mark.parametrize("filters, expectedRunNumbers, expectedTotal", [
+    ({"subsystemName": "EMC"}, [100098, 100096, 100094], 50),
+    ({"minTime": startTime + 95 * 3600}, [100099, 100098, 100097], 5),
+    ({"maxTime": startTime + 10 * 3600}, [100010, 100009, 100008], 11),
+    ({"subsystemName": "EMC", "minTime": startTime + 10 * 3600, "maxTime": startTime + 20 * 3600}, [100020, 100018, 100016], 6),
+    ({"subsystemName": "TPC"}, [], 0),
+], ids = ["Subsystem", "Min time", "Max time", "Combined", "Missing subsystem"])
+def testFilterRunSummaries(summaries, filters, expectedRunNumbers, expectedTotal):
+    selected, nTotal = runSummaries.retrieveRunSummaries(summaries, runOffset = 0, nRuns = 3, **filters)
+    assert [summary["runNumber"] for summary in selected] == expectedRunNumbers
+    assert nTotal == expectedTotal
+
+def testSummariesDontLoadRuns(runs, summaries):
+    """ Retrieving summaries only uses the summary index. """
+    runs.clear()
+    selected, nTotal = runSummaries.retrieveRunSummaries(summaries, nRuns = 1, subsystemName = "HLT")
+    assert selected[0]["runNumber"] == 100099
+    assert nTotal == 100
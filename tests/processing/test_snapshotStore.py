@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+""" Tests for the ``numpy`` snapshot store. """
+
+import pytest
+
+import numpy as np
+import os
+import struct
+import logging
+logger = logging.getLogger(__name__)
+
+import ROOT
+
+from overwatch.processing import compactFiles
+from overwatch.processing import mergeFiles
+from overwatch.processing import snapshotStore
+
+def testIngest(cumulativeFiles):
+    """ Test storing the received files. """
+    dirPrefix, subsystem, filenames = cumulativeFiles
+    directory = snapshotStore.snapshotsDir(dirPrefix, subsystem)
+
+    assert snapshotStore.ingestSubsystem(dirPrefix, subsystem) == 3
+    # Files which are already stored are skipped.
+    assert snapshotStore.ingestSubsystem(dirPrefix, subsystem) == 0
+
+    assert list(snapshotStore.loadTimestamps(directory)) == list(subsystem.files.keys())
+    assert snapshotStore.storedHistograms(directory) == ["hist1D", "hist2D"]
+    for i, filename in enumerate(filenames):
+        snapshot = compactFiles.readSnapshot(filename)
+        assert np.array_equal(snapshotStore.loadHistogram(directory, "hist1D")[i], snapshot["hist1D"].values)
+        assert np.array_equal(snapshotStore.loadHistogram(directory, "hist2D")[i], snapshot["hist2D"].values)
+        assert np.array_equal(snapshotStore.loadHistogram(directory, "hist2D", sumw2 = True)[i], snapshot["hist2D"].sumw2)
+    assert snapshotStore.loadHistogram(directory, "hist1D", sumw2 = True) is None
+
+def testAppendRow(tmpdir):
+    """ Test appending rows, including after an interrupted ingest. """
+    filename = os.path.join(str(tmpdir), "test.npy")
+    snapshotStore.appendRow(filename, np.array([1., 2.]), 0)
+    snapshotStore.appendRow(filename, np.array([3., 4.]), 1)
+    # Interrupted ingest: the row was written, but it wasn't recorded.
+    snapshotStore.appendRow(filename, np.array([5., 6.]), 2)
+    snapshotStore.appendRow(filename, np.array([7., 8.]), 2)
+    assert np.array_equal(np.load(filename), [[1., 2.], [3., 4.], [7., 8.]])
+
+    with pytest.raises(ValueError):
+        snapshotStore.appendRow(filename, np.array([1., 2., 3.]), 3)
+
+def testAppendRowRewritesAtomically(tmpdir):
+    """ Test that a file whose header can't be updated in place is replaced rather than rewritten in place. """
+    filename = os.path.join(str(tmpdir), "test.npy")
+    array = np.arange(18, dtype = np.float64).reshape(9, 2)
+    # Write a header which is longer than the one written by numpy, so it can't be updated in place.
+    header = "{{'descr': '<f8', 'fortran_order': False, 'shape': {shape}, }}".format(shape = array.shape)
+    header += " " * ((-(len(header) + 11)) % 64 + 64) + "\n"
+    with open(filename, "wb") as f:
+        f.write(np.lib.format.magic(1, 0) + struct.pack("<H", len(header)) + header.encode("latin1"))
+        f.write(array.tobytes())
+    reader = np.load(filename, mmap_mode = "r")
+    inode = os.stat(filename).st_ino
+
+    snapshotStore.appendRow(filename, np.array([18., 19.]), 9)
+    assert os.stat(filename).st_ino != inode
+    assert np.array_equal(np.load(filename), np.arange(20, dtype = np.float64).reshape(10, 2))
+    # The existing reader still sees the previous file.
+    assert np.array_equal(reader, array)
+    assert os.listdir(str(tmpdir)) == ["test.npy"]
+
+def testSubtractStoredSnapshots(cumulativeFiles):
+    """ Test that time slices from the stored snapshots are the same as those from subtracting the files. """
+    dirPrefix, subsystem, filenames = cumulativeFiles
+    directory = snapshotStore.snapshotsDir(dirPrefix, subsystem)
+    snapshotStore.ingestSubsystem(dirPrefix, subsystem)
+    expectedFilename = os.path.join(dirPrefix, "expected.root")
+    mergeFiles.subtractFiles(filenames[0], filenames[2], expectedFilename)
+    expectedSnapshot = compactFiles.readSnapshot(expectedFilename)
+
+    timestamps = list(subsystem.files.keys())
+    outputFilename = os.path.join(dirPrefix, "timeSlice.root")
+    snapshotStore.writeSubtractedSnapshots(directory, timestamps[0], timestamps[2], filenames[2], outputFilename)
+    snapshot = compactFiles.readSnapshot(outputFilename)
+
+    assert list(snapshot) == list(expectedSnapshot)
+    for histName, hist in snapshot.items():
+        assert np.allclose(hist.values, expectedSnapshot[histName].values)
+        if hist.sumw2 is not None:
+            assert np.allclose(hist.sumw2, expectedSnapshot[histName].sumw2)
+
+def testHistogramNameWithPathSeparator(loggingMixin, tmpdir):
+    """ Test that histograms with a path separator in their name are rebuilt with their original name. """
+    directory = os.path.join(str(tmpdir), "snapshots")
+    hist = ROOT.TH1F("EMC/hist", "EMC/hist", 5, 0, 5)
+    filenames = []
+    for i in range(2):
+        hist.Fill(i)
+        filenames.append(os.path.join(str(tmpdir), "file{i}.root".format(i = i)))
+        fOut = ROOT.TFile(filenames[-1], "RECREATE")
+        hist.Write()
+        fOut.Close()
+        assert snapshotStore.ingestSnapshot(directory, 100 + i, compactFiles.readSnapshot(filenames[-1]))
+    assert snapshotStore.storedHistograms(directory) == ["EMC_hist"]
+
+    outputFilename = os.path.join(str(tmpdir), "timeSlice.root")
+    snapshotStore.writeSubtractedSnapshots(directory, 100, 101, filenames[-1], outputFilename)
+    snapshot = compactFiles.readSnapshot(outputFilename)
+
+    assert list(snapshot) == ["EMC/hist"]
+    assert np.array_equal(snapshot["EMC/hist"].values, [0, 0, 1, 0, 0, 0, 0])
+
+def testTrendingAndOutliers(cumulativeFiles):
+    """ Test the vectorized operations on the stored snapshots. """
+    dirPrefix, subsystem, filenames = cumulativeFiles
+    directory = snapshotStore.snapshotsDir(dirPrefix, subsystem)
+    snapshotStore.ingestSubsystem(dirPrefix, subsystem)
+
+    timestamps, values = snapshotStore.trendValues(directory, "hist1D")
+    assert list(timestamps) == list(subsystem.files.keys())
+    assert list(values) == [1., 3., 6.]
+
+    outliers = snapshotStore.findOutliers(np.array([[1., 1., 1., 1., 1., 1., 1., 1., 1., 20.], np.ones(10)]), nSigma = 2.)
+    assert outliers.shape == (2, 10)
+    assert list(np.flatnonzero(outliers[0])) == [9]
+    assert not outliers[1].any()
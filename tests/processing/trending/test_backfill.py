@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+""" Tests for the trending backfill. """
+import os
+
+import numpy as np
+import pytest
+import ROOT
+
+import overwatch.processing.pluginManager as pluginManager
+import overwatch.processing.trending.constants as CON
+import overwatch.processing.trending.objects as to
+from overwatch.processing import processingClasses
+from overwatch.processing.trending import backfill, extraction
+from overwatch.processing.trending.info import TrendingInfo
+from overwatch.processing.trending.store import TrendingStoreReader, isBackfillInProgress, readCheckpoint, \
+    storeDirectory, updateCheckpoints
+
+
+class DatabaseMock(object):
+    def __init__(self):
+        self.data = {}
+        self.nCommits = 0
+
+    def contains(self, key):
+        return key in self.data
+
+    def get(self, key):
+        return self.data[key]
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def commit(self):
+        self.nCommits += 1
+
+
+@pytest.fixture
+def backfillArgs(tmpdir, tf_trendingArgs, mocker):
+    """ Create two runs of received files, where the maximum of the histogram increases with each file. """
+    ROOT.gROOT.SetBatch(True)
+    dirPrefix = tmpdir.strpath
+    mocker.patch.object(pluginManager, "TST_getTrendingObjectInfo", create=True,
+                        return_value=[TrendingInfo("max", "desc", ["hist"], to.MaximumTrending)])
+
+    runs = {}
+    maximum = 0
+    for runDir, filenames in [("Run124", ["TSThists.2015_11_24_19_05_10.root", "TSThists.2015_11_24_19_09_12.root"]),
+                              ("Run123", ["TSThists.2015_11_24_18_05_10.root", "TSThists.2015_11_24_18_09_12.root",
+                                          "TSThists.2015_11_24_18_15_14.root"])]:
+        startOfRun = processingClasses.fileContainer(filenames[0]).fileTime
+        subsystem = processingClasses.subsystemContainer(subsystem="TST", runDir=runDir,
+                                                         startOfRun=startOfRun, endOfRun=startOfRun,
+                                                         fileLocationSubsystem="TST")
+        os.makedirs(os.path.join(dirPrefix, subsystem.baseDir))
+        for filename in filenames:
+            fileCont = processingClasses.fileContainer(os.path.join(subsystem.baseDir, filename), startOfRun)
+            # The maximum is determined by the time of the file, so it should increase in the backfill.
+            maximum = fileCont.fileTime % 10000
+            hist = ROOT.TH1F("hist", "hist", 10, 0, 10)
+            hist.SetBinContent(1, maximum)
+            fOut = ROOT.TFile(os.path.join(dirPrefix, fileCont.filename), "RECREATE")
+            hist.Write()
+            fOut.Close()
+            subsystem.files[fileCont.fileTime] = fileCont
+        run = processingClasses.runContainer(runDir=runDir, fileMode=True)
+        run.subsystems["TST"] = subsystem
+        runs[runDir] = run
+
+    parameters = tf_trendingArgs[4]
+    parameters.update({CON.DIR_PREFIX: dirPrefix, CON.SUBSYSTEMS: ['TST'], CON.RECREATE: True})
+    return DatabaseMock(), runs, parameters
+
+
+@pytest.mark.parametrize("nProcesses", [1, 2])
+def testBackfill(backfillArgs, nProcesses):
+    db, runs, parameters = backfillArgs
+    assert backfill.backfillTrending(db, runs, parameters, nProcesses=nProcesses, checkpointInterval=2) == 5
+
+    # Values are filled in time order, regardless of the order of the runs.
+    trendingObject = db.get(CON.TRENDING)['TST']['max']
+    timestamps, values = trendingObject.chronologicalView()
+    assert np.all(np.diff(timestamps) > 0)
+    assert np.array_equal(values, timestamps % 10000)
+    assert list(trendingObject.runHistory(0, 1000).timestamps) == [123, 124]
+
+    directory = storeDirectory(parameters[CON.DIR_PREFIX], 'TST')
+    assert np.array_equal(TrendingStoreReader(directory).times(), timestamps)
+    assert readCheckpoint(directory) == {runDir: max(run.subsystems['TST'].files.keys()) for runDir, run in runs.items()}
+    assert os.path.exists(trendingObject.outputFilenames()[0])
+
+
+def testBackfillResumes(backfillArgs, mocker):
+    db, runs, parameters = backfillArgs
+    directory = storeDirectory(parameters[CON.DIR_PREFIX], 'TST')
+    # Interrupt the backfill after the first checkpoint, which contains the files of the first run.
+    extractFiles = extraction.extractFiles
+    nCalls = []
+
+    def interrupt(*args, **kwargs):
+        nCalls.append(True)
+        if len(nCalls) == 2:
+            raise RuntimeError("Interrupted")
+        return extractFiles(*args, **kwargs)
+
+    mocker.patch.object(extraction, "extractFiles", side_effect=interrupt)
+    with pytest.raises(RuntimeError):
+        backfill.backfillTrending(db, runs, parameters, nProcesses=1, checkpointInterval=3)
+    assert isBackfillInProgress(directory) is True
+
+    # Resuming continues with the existing trending object, even though recreating was requested.
+    assert backfill.backfillTrending(db, runs, parameters, nProcesses=1) == 2
+    timestamps, values = db.get(CON.TRENDING)['TST']['max'].chronologicalView()
+    assert len(values) == 5
+    assert np.all(np.diff(timestamps) > 0)
+    assert isBackfillInProgress(directory) is False
+
+    # Without recreating, the backfill catches up from the checkpoints, so nothing is left to backfill.
+    parameters[CON.RECREATE] = False
+    assert backfill.backfillTrending(db, runs, parameters, nProcesses=1) == 0
+    assert len(db.get(CON.TRENDING)['TST']['max'].chronologicalView()[1]) == 5
+
+
+def testBackfillIgnoresProcessingCheckpoints(backfillArgs):
+    """ The processing advances the checkpoints, but recreated trending objects still need all of the files. """
+    db, runs, parameters = backfillArgs
+    updateCheckpoints(parameters[CON.DIR_PREFIX],
+                      {'TST': {runDir: max(run.subsystems['TST'].files.keys()) for runDir, run in runs.items()}})
+
+    assert backfill.backfillTrending(db, runs, parameters, nProcesses=1) == 5
+    assert len(db.get(CON.TRENDING)['TST']['max'].chronologicalView()[1]) == 5
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+""" Tests for the extraction of trended values from the received files. """
+import os
+
+import numpy as np
+import pytest
+import ROOT
+
+import overwatch.processing.pluginManager as pluginManager
+import overwatch.processing.trending.constants as CON
+import overwatch.processing.trending.objects as to
+from overwatch.processing import processingClasses
+from overwatch.processing.alarms.impl.betweenValuesAlarm import BetweenValuesAlarm
+from overwatch.processing.trending import extraction
+from overwatch.processing.trending.manager import TrendingManager
+
+
+@pytest.fixture
+def receivedFiles(tmpdir, tf_trendingArgs):
+    """ Create a run with three received files and a trending object of the maximum of the histogram. """
+    ROOT.gROOT.SetBatch(True)
+    dirPrefix = tmpdir.strpath
+    runDir = "Run123"
+    filenames = ["TSThists.2015_11_24_18_05_10.root", "TSThists.2015_11_24_18_09_12.root", "TSThists.2015_11_24_18_15_14.root"]
+    startOfRun = processingClasses.fileContainer(filenames[0]).fileTime
+    subsystem = processingClasses.subsystemContainer(subsystem="TST", runDir=runDir,
+                                                     startOfRun=startOfRun, endOfRun=startOfRun,
+                                                     fileLocationSubsystem="TST")
+    os.makedirs(os.path.join(dirPrefix, subsystem.baseDir))
+    for i, filename in enumerate(filenames):
+        fileCont = processingClasses.fileContainer(os.path.join(subsystem.baseDir, filename), startOfRun)
+        hist = ROOT.TH1F("hist", "hist", 10, 0, 10)
+        hist.SetBinContent(1, 10 * (i + 1))
+        # Histograms which aren't trended shouldn't be read.
+        other = ROOT.TH1F("other", "other", 10, 0, 10)
+        fOut = ROOT.TFile(os.path.join(dirPrefix, fileCont.filename), "RECREATE")
+        hist.Write()
+        other.Write()
+        fOut.Close()
+        subsystem.files[fileCont.fileTime] = fileCont
+    run = processingClasses.runContainer(runDir=runDir, fileMode=True)
+    run.subsystems["TST"] = subsystem
+
+    parameters = tf_trendingArgs[4]
+    parameters.update({CON.DIR_PREFIX: dirPrefix, CON.SUBSYSTEMS: ['TST'], CON.RECREATE: False})
+    manager = TrendingManager({}, parameters)
+    trendingObject = to.MaximumTrending('max', 'desc', ['hist'], 'TST', parameters)
+    trendingObject.setAlarms([BetweenValuesAlarm(minVal=0, maxVal=25, alarmText="max")])
+    manager.subsystems['TST']['max'] = trendingObject
+    manager._subscribe(trendingObject, ['hist'])
+    return dirPrefix, {runDir: run}, filenames, manager
+
+
+def testReadHistograms(receivedFiles):
+    dirPrefix, runs, filenames, _ = receivedFiles
+    hists = extraction.readHistograms(os.path.join(dirPrefix, "Run123", "TST", filenames[0]), ["hist", "missing"])
+    assert list(hists) == ["hist"]
+    assert hists["hist"].GetMaximum() == 10
+    assert not hists["hist"].GetDirectory()
+
+
+def testExtractNewFiles(receivedFiles):
+    dirPrefix, runs, filenames, manager = receivedFiles
+    runDict = {"Run123": {"hltMode": "C", "TST": filenames[:2]}}
+    extracted = extraction.extractNewFiles(manager, runs, runDict, dirPrefix)
+
+    # One value per received file.
+    fileTimes = list(runs["Run123"].subsystems["TST"].files.keys())
+    assert extracted == {"TST": {"Run123": fileTimes[1]}}
+    timestamps, values = manager.subsystems['TST']['max'].chronologicalView()
+    assert list(timestamps) == fileTimes[:2]
+    assert np.array_equal(values, [10, 20])
+    assert not manager.popAlarmInformation("hist", 123)
+
+    # The alarm information is kept until the histogram is processed.
+    runDict = {"Run123": {"hltMode": "C", "TST": filenames[2:]}}
+    extraction.extractNewFiles(manager, runs, runDict, dirPrefix)
+    assert np.array_equal(manager.subsystems['TST']['max'].chronologicalView()[1], [10, 20, 30])
+    assert "Alarmmax" in manager.popAlarmInformation("hist", 123)
+    assert not manager.popAlarmInformation("hist", 123)
+
+
+def testFunctionsAreApplied(receivedFiles, mocker):
+    dirPrefix, runs, filenames, manager = receivedFiles
+    subsystem = runs["Run123"].subsystems["TST"]
+    for i, filename in enumerate(filenames):
+        fOut = ROOT.TFile(os.path.join(dirPrefix, subsystem.baseDir, filename), "UPDATE")
+        events = ROOT.TH1F("TSTEvents", "TSTEvents", 1, 0, 1)
+        events.SetBinContent(1, 2 * (i + 1))
+        events.Write()
+        fOut.Close()
+
+    # The run hasn't been processed yet, so the histogram containers are created from the most recent file.
+    assert not subsystem.hists
+    assert extraction.prepareHistogramContainers(subsystem, dirPrefix) is True
+    assert "hist" in subsystem.hists
+    assert subsystem.nEvents == 6
+
+    def normalize(subsystem, hist, processingOptions):
+        hist.hist.Scale(1. / subsystem.nEvents)
+
+    normalize.modifiesHistogramValues = True
+    # Functions which only change how the histogram is displayed aren't applied, since the histogram isn't drawn.
+    drawOptions = mocker.MagicMock()
+
+    subsystem.hists["hist"].functionsToApply.extend([normalize, drawOptions])
+    callPlugin = mocker.spy(pluginManager, "callPlugin")
+    extraction.extractNewFiles(manager, runs, {"Run123": {"hltMode": "C", "TST": filenames}}, dirPrefix)
+
+    # Each file is normalized by its own number of events.
+    assert np.allclose(manager.subsystems['TST']['max'].chronologicalView()[1], [5, 5, 5])
+    assert callPlugin.call_count == 3
+    assert drawOptions.call_count == 0
+    # The stored number of events isn't changed.
+    assert subsystem.nEvents == 6
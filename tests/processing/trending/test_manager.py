@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+""" Tests for TrendingManager. """
+import os
+
+import numpy as np
+import pytest
+import ROOT
+
+import overwatch.processing.alarms.collectors as collectors
+import overwatch.processing.trending.constants as CON
+import overwatch.processing.trending.objects as to
+from overwatch.processing.alarms.impl.betweenValuesAlarm import BetweenValuesAlarm
+from overwatch.processing.trending.manager import TrendingManager
+from overwatch.processing.trending.statistics import HistogramStatistics
+
+
+@pytest.fixture
+def trendingManager(tmpdir, tf_trendingArgs):
+    ROOT.gROOT.SetBatch(True)
+    parameters = tf_trendingArgs[4]
+    parameters.update({CON.DIR_PREFIX: tmpdir.strpath, CON.SUBSYSTEMS: ['TST'], CON.RECREATE: False})
+    manager = TrendingManager({}, parameters)
+    for name, histName in [('first', 'h1'), ('second', 'h2')]:
+        trendingObject = to.MaximumTrending(name, 'desc', [histName], 'TST', parameters)
+        manager.subsystems['TST'][name] = trendingObject
+        manager._subscribe(trendingObject, [histName])
+    return manager
+
+
+def testProcessOnlyUpdatedTrendingObjects(trendingManager, tf_histogram, mocker, tf_histogramContainerClass):
+    processHist = mocker.spy(to.MaximumTrending, 'processHist')
+
+    # Nothing has been rendered yet, so all objects are rendered.
+    trendingManager.processTrending()
+    assert processHist.call_count == 2
+    assert all(os.path.exists(filename) for filename in trendingManager.subsystems['TST']['first'].outputFilenames())
+
+    # Nothing changed, so nothing is rendered.
+    trendingManager.processTrending()
+    assert processHist.call_count == 2
+
+    # Only the updated object is rendered.
+    trendingManager.notifyAboutNewHistogramValue(tf_histogramContainerClass('h1', tf_histogram), timestamp=100, runNumber=1)
+    trendingManager.processTrending()
+    assert processHist.call_count == 3
+    assert processHist.call_args[0][0].name == 'first'
+
+    # Objects whose output is missing are rendered again.
+    os.remove(trendingManager.subsystems['TST']['second'].outputFilenames()[0])
+    trendingManager.processTrending()
+    assert processHist.call_count == 4
+    assert processHist.call_args[0][0].name == 'second'
+
+
+def testStatisticsAreSharedBetweenTrendingObjects(trendingManager, mocker, tf_histogramContainerClass):
+    parameters = trendingManager.parameters
+    for trendingClass in [to.MeanTrending, to.StdDevTrending]:
+        trendingObject = trendingClass(trendingClass.__name__, 'desc', ['h1'], 'TST', parameters)
+        trendingManager.subsystems['TST'][trendingObject.name] = trendingObject
+        trendingManager._subscribe(trendingObject, ['h1'])
+    readHistogram = mocker.spy(HistogramStatistics, '_readHistogram')
+
+    hist = ROOT.TH1F("testStatisticsAreShared", "test", 10, 0, 10)
+    hist.Fill(3, 2)
+    hist.Fill(5)
+    trendingManager.notifyAboutNewHistogramValue(tf_histogramContainerClass('h1', hist), timestamp=100, runNumber=1)
+
+    # The histogram is only read once for all three trending objects.
+    assert readHistogram.call_count == 1
+    assert trendingManager.subsystems['TST']['first'].trendedValues[-1] == hist.GetMaximum()
+    assert np.allclose(trendingManager.subsystems['TST']['MeanTrending'].trendedValues[-1],
+                       [hist.GetMean(), hist.GetMeanError()])
+    assert np.allclose(trendingManager.subsystems['TST']['StdDevTrending'].trendedValues[-1],
+                       [hist.GetStdDev(), hist.GetStdDevError()])
+
+
+def testConstructionHasNoSideEffects(tmpdir, tf_trendingArgs, mocker, tf_histogramContainerClass):
+    configureMail = mocker.patch.object(collectors.Mail, 'configure')
+    configureSlack = mocker.patch.object(collectors.SlackNotification, 'configure')
+    parameters = tf_trendingArgs[4]
+    parameters.update({CON.DIR_PREFIX: tmpdir.strpath, CON.SUBSYSTEMS: ['TST'], CON.RECREATE: False})
+
+    manager = TrendingManager({}, parameters)
+    assert tmpdir.listdir() == []
+    assert configureMail.call_count == 0
+    assert configureSlack.call_count == 0
+
+    trendingObject = to.MaximumTrending('first', 'desc', ['h1'], 'TST', parameters)
+    trendingObject.setAlarms([BetweenValuesAlarm(minVal=0, maxVal=10)])
+    manager.subsystems['TST']['first'] = trendingObject
+    manager._subscribe(trendingObject, ['h1'])
+    hist = ROOT.TH1F("testConstructionHasNoSideEffects", "test", 10, 0, 10)
+    for _ in range(2):
+        manager.notifyAboutNewHistogramValue(tf_histogramContainerClass('h1', hist), timestamp=100, runNumber=1)
+    # Only configured once, when the alarms are first checked.
+    assert configureMail.call_count == 1
+    assert configureSlack.call_count == 1
+
+    manager.processTrending()
+    assert os.path.isdir(os.path.join(tmpdir.strpath, CON.TRENDING, 'TST', CON.IMAGE))
+    assert os.path.isdir(os.path.join(tmpdir.strpath, CON.TRENDING, 'TST', CON.JSON))
@@ -3,10 +3,14 @@
 
 .. codeauthor:: Pawel Ostrowski <ostr000@interia.pl>, AGH University of Science and Technology
 """
+import numpy as np
 import pytest
 import ROOT
+import transaction
+import ZODB
 
 import overwatch.processing.trending.objects as to
+from overwatch.processing.trending.constants import ENTRIES, GAP_THRESHOLD, MINUTE_ENTRIES
 
 
 @pytest.mark.parametrize(
@@ -21,3 +25,165 @@ def testExampleTrendingObjects(tf_trendingArgs, tf_histogram, trendingClass):
         t.extractTrendValue(tf_histogram)
     h = t.retrieveHist()
     assert isinstance(h, ROOT.TObject)
+
+
+def testRingBufferWrapAround(tf_trendingArgs):
+    t = to.MaximumTrending(*tf_trendingArgs)
+    capacity = tf_trendingArgs[4][ENTRIES]
+    for i in range(50):
+        t.appendValue(i, timestamp=1000 + i)
+
+    assert t.currentEntry == capacity
+    assert np.array_equal(t.trendedValues, np.arange(50 - capacity, 50))
+    timestamps, values = t.chronologicalView(lastN=5)
+    assert np.array_equal(timestamps, 1000 + np.arange(45, 50))
+    assert np.array_equal(values, np.arange(45, 50))
+
+
+def testRingBufferValueShape(tf_trendingArgs, tf_histogram):
+    t = to.MeanTrending(*tf_trendingArgs)
+    for i in range(3):
+        t.extractTrendValue(tf_histogram)
+
+    assert t.trendedValues.shape == (3, 2)
+    assert np.array_equal(t.trendedValues[-1], [tf_histogram.GetMean(), tf_histogram.GetMeanError()])
+
+
+def testRingBufferMigration(tf_trendingArgs):
+    """ Objects stored before the ring buffer only have the ``trendedValues`` array. """
+    t = to.MeanTrending(*tf_trendingArgs)
+    oldValues = np.arange(60, dtype=np.float64).reshape(30, 2)
+    del t._chunks
+    t.__dict__["trendedValues"] = oldValues
+
+    assert np.array_equal(t.trendedValues, oldValues[-tf_trendingArgs[4][ENTRIES]:])
+    assert np.all(np.isnan(t.chronologicalView()[0]))
+    t.appendValue((100, 101), timestamp=5)
+    assert np.array_equal(t.trendedValues[-1], [100, 101])
+
+
+def testRingBufferPersistence(tf_trendingArgs):
+    """ Only the chunk which contains a new value should need to be written. """
+    db = ZODB.DB(None)
+    connection = db.open()
+    t = to.MaximumTrending(*tf_trendingArgs)
+    t.chunkSize = 8
+    t.trendedValues = []
+    connection.root()["trend"] = t
+    transaction.commit()
+
+    t.appendValue(3., timestamp=1, runNumber=123)
+    assert [chunk._p_changed for chunk in t._chunks] == [True, False, False]
+    transaction.commit()
+
+    # A value in an existing bucket only changes the chunk which contains the bucket, rather than the whole tier.
+    t.appendValue(4., timestamp=2, runNumber=123)
+    for tier in t._tiers:
+        assert tier._p_changed is False
+        assert [chunk._p_changed for chunk in tier._chunks][:2] == [True, False]
+    transaction.commit()
+
+    connection.close()
+    connection = db.open()
+    assert np.array_equal(connection.root()["trend"].trendedValues, [3., 4.])
+    assert np.array_equal(connection.root()["trend"].runHistory().count, [2])
+    connection.close()
+    db.close()
+
+
+def testRollupTiers(tf_trendingArgs):
+    t = to.MaximumTrending(*tf_trendingArgs)
+    startTime = 3600 * 1000
+    # One value every 30 seconds for two hours, split over two runs.
+    for i in range(240):
+        t.appendValue(i, timestamp=startTime + 30 * i, runNumber=123 if i < 120 else 124)
+
+    # The full resolution tier only covers the most recent values.
+    history = t.query(minTime=startTime + 30 * 235)
+    assert history.tier == "full"
+    assert np.array_equal(history.mean, np.arange(235, 240))
+
+    history = t.query(minTime=startTime)
+    assert history.tier == "minute"
+    assert len(history.timestamps) == 120
+    assert np.array_equal(history.minimum[:2], [0, 2])
+    assert np.array_equal(history.maximum[:2], [1, 3])
+    assert np.array_equal(history.count[:2], [2, 2])
+
+    history = t.query(minTime=startTime, resolution=3600)
+    assert history.tier == "hour"
+    assert np.array_equal(history.timestamps, [startTime, startTime + 3600])
+    assert np.array_equal(history.mean, [59.5, 179.5])
+
+    runs = t.runHistory()
+    assert np.array_equal(runs.timestamps, [123, 124])
+    assert np.array_equal(runs.count, [120, 120])
+
+
+def testRollupTierMigration():
+    """ Tiers stored before the chunks have the bucket arrays directly in the object. """
+    tier = to.object.TrendingRollupTier("run", None, 40)
+    for runNumber in range(35):
+        tier.add(runNumber, 0, runNumber)
+    expected = tier.view()
+    arrays = {name: np.concatenate([getattr(chunk, name) for chunk in tier._chunks]) for name in tier._bucketArrays}
+    del tier._chunks
+    tier.__dict__.update(arrays)
+
+    history = tier.view()
+    for name in expected._fields[1:]:
+        assert np.array_equal(getattr(history, name), getattr(expected, name))
+    tier.add(100, 0, 100)
+    assert tier.oldestKey() == 0
+    assert tier.view().timestamps[-1] == 100
+
+
+def testRollupTiersAreBounded(tf_trendingArgs):
+    tf_trendingArgs[4][MINUTE_ENTRIES] = 10
+    t = to.MeanTrending(*tf_trendingArgs)
+    for i in range(100):
+        t.setCurrentContext(60 * i, 1)
+        t.appendValue((i, 0.1))
+
+    history = t.query(minTime=0, resolution=60)
+    assert history.tier == "minute"
+    assert np.array_equal(history.mean, np.arange(90, 100))
+
+
+def testGraphTimeAxis(tf_trendingArgs):
+    t = to.MeanTrending(*tf_trendingArgs)
+    for i in range(5):
+        t.appendValue((i, 0.1 * i), timestamp=1000 + 60 * i)
+
+    graph = t.retrieveHist()
+    assert isinstance(graph, ROOT.TGraphErrors)
+    assert graph.GetN() == 5
+    assert np.array_equal(np.frombuffer(graph.GetX(), count=5), 1000 + 60 * np.arange(5))
+    assert np.array_equal(np.frombuffer(graph.GetY(), count=5), np.arange(5))
+    assert np.allclose(np.frombuffer(graph.GetEY(), count=5), 0.1 * np.arange(5))
+    assert graph.GetXaxis().GetTimeDisplay()
+
+
+def testGraphGaps(tf_trendingArgs):
+    tf_trendingArgs[4][GAP_THRESHOLD] = 600
+    t = to.MaximumTrending(*tf_trendingArgs)
+    # Two runs, separated by an hour.
+    for startTime in [1000, 5000]:
+        for i in range(3):
+            t.appendValue(i, timestamp=startTime + 60 * i)
+
+    graph = t.retrieveHist()
+    assert isinstance(graph, ROOT.TMultiGraph)
+    graphs = list(graph.GetListOfGraphs())
+    assert [g.GetN() for g in graphs] == [3, 3]
+    assert graphs[1].GetX()[0] == 5000
+
+
+def testGraphWithoutTimes(tf_trendingArgs):
+    t = to.MaximumTrending(*tf_trendingArgs)
+    assert t.retrieveHist().GetN() == 0
+    # Migrated values don't have times, so they're drawn by index.
+    t.trendedValues = [3, 4]
+    graph = t.retrieveHist()
+    assert list(graph.GetX())[:2] == [0, 1]
+    assert not graph.GetXaxis().GetTimeDisplay()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+""" Tests for the read-only trending queries. """
+import json
+import os
+
+import pytest
+
+import overwatch.processing.trending.objects as to
+from overwatch.processing.trending.query import TrendingQuery
+from overwatch.processing.trending.store import TrendingStore, TrendingStoreReader, storeDirectory
+
+
+@pytest.fixture
+def queryArgs(tmpdir, tf_trendingArgs):
+    store = TrendingStore(storeDirectory(tmpdir.strpath, 'TST'))
+    trendingObjects = {
+        'max': to.MaximumTrending('max', 'Maximum', ['hist'], 'TST', tf_trendingArgs[4]),
+        'mean/hist': to.MeanTrending('mean/hist', 'Mean', ['hist'], 'TST', tf_trendingArgs[4]),
+    }
+    store.writeMetadata(trendingObjects)
+    for i in range(10):
+        store.addValue('max', 100 + i, i)
+        if i % 2 == 0:
+            store.addValue('mean/hist', 100 + i, (i, 0.5))
+    store.flush()
+    return TrendingQuery(tmpdir.strpath, ['TST', 'EMC']), store
+
+
+def testIndex(queryArgs):
+    query, _ = queryArgs
+    index = query.index()
+    # Subsystems which haven't been stored aren't included.
+    assert list(index) == ['TST']
+    assert list(index['TST']) == ['max', 'mean/hist']
+    assert index['TST']['max']['desc'] == 'Maximum'
+
+
+def testIndexIsCachedUntilStoreChanges(queryArgs, mocker):
+    query, store = queryArgs
+    metadata = mocker.spy(TrendingStoreReader, 'metadata')
+    etag, lastModified = query.version()
+    query.index()
+    query.index()
+    assert metadata.call_count == 2
+    assert query.version() == (etag, lastModified)
+
+    store.addValue('max', 110, 10)
+    store.flush()
+    assert query.version()[0] != etag
+    query.index()
+    assert metadata.call_count == 4
+
+
+def testValues(queryArgs):
+    query, _ = queryArgs
+    result = query.values('TST', 'max', minTime=102, maxTime=105)
+    assert result['times'] == [102, 103, 104, 105]
+    assert result['values'] == [2, 3, 4, 5]
+    assert 'errors' not in result
+    # The result must be JSON serializable.
+    json.dumps(result)
+
+    # Times without values are skipped.
+    result = query.values('TST', 'mean/hist')
+    assert result['times'] == [100, 102, 104, 106, 108]
+    assert result['values'] == [0, 2, 4, 6, 8]
+    assert result['errors'] == [0.5] * 5
+    assert result['desc'] == 'Mean'
+
+    assert query.values('TST', 'missing') is None
+    assert query.values('EMC', 'max') is None
+
+
+def testMaxPoints(queryArgs):
+    query, _ = queryArgs
+    result = query.values('TST', 'max', maxPoints=4)
+    assert result['times'] == [100, 103, 106, 109]
+
+
+def testQueryHasNoSideEffects(tmpdir):
+    query = TrendingQuery(os.path.join(tmpdir.strpath, 'data'), ['TST'])
+    assert query.index() == {}
+    assert query.version()[1] is None
+    assert tmpdir.listdir() == []
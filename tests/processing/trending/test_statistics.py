@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+""" Tests for the batched histogram statistics. """
+import numpy as np
+import pytest
+import ROOT
+
+from overwatch.processing.trending.statistics import HistogramStatistics
+
+
+def createHist(histType):
+    ROOT.TH1.AddDirectory(False)
+    rand = ROOT.TRandom3(1)
+    if histType == "TH1F":
+        hist = ROOT.TH1F("testStatistics", "test", 50, -5, 5)
+        for _ in range(1000):
+            hist.Fill(rand.Gaus(0.5, 1.), rand.Uniform(0.5, 2))
+    elif histType == "TH1FRange":
+        hist = createHist("TH1F")
+        hist.GetXaxis().SetRangeUser(-1, 2)
+    elif histType == "TH2D":
+        hist = ROOT.TH2D("testStatistics", "test", 20, -5, 5, 10, 0, 10)
+        for _ in range(1000):
+            hist.Fill(rand.Gaus(0, 1.), rand.Uniform(0, 10))
+        hist.GetYaxis().SetRange(2, 5)
+    elif histType == "TProfile":
+        hist = ROOT.TProfile("testStatistics", "test", 20, 0, 10)
+        for _ in range(1000):
+            x = rand.Uniform(0, 10)
+            hist.Fill(x, 2 * x + rand.Gaus(0, 1))
+    return hist
+
+
+@pytest.mark.parametrize("histType", ["TH1F", "TH1FRange", "TH2D", "TProfile"])
+def testStatisticsAgreeWithROOT(histType):
+    hist = createHist(histType)
+    statistics = HistogramStatistics(hist)
+    values = statistics.compute(["maximum", "minimum", "mean", "meanError", "stdDev", "stdDevError", "entries"])
+
+    assert values["maximum"] == pytest.approx(hist.GetMaximum())
+    assert values["minimum"] == pytest.approx(hist.GetMinimum())
+    assert values["mean"] == pytest.approx(hist.GetMean())
+    assert values["meanError"] == pytest.approx(hist.GetMeanError())
+    assert values["stdDev"] == pytest.approx(hist.GetStdDev())
+    assert values["stdDevError"] == pytest.approx(hist.GetStdDevError())
+    assert values["entries"] == hist.GetEntries()
+
+
+def testAdditionalStatistics():
+    hist = createHist("TH1F")
+    statistics = HistogramStatistics(hist)
+
+    assert statistics["integral"] == pytest.approx(hist.Integral())
+    contents = np.array([hist.GetBinContent(i) for i in range(1, hist.GetNbinsX() + 1)])
+    assert statistics["emptyBinFraction"] == pytest.approx(np.mean(contents == 0))
+    quantiles = np.zeros(1)
+    hist.GetQuantiles(1, quantiles, np.array([0.5]))
+    assert statistics["quantile50"] == pytest.approx(quantiles[0])
+
+    with pytest.raises(KeyError):
+        statistics["unknown"]
+
+
+def testStatisticsAreCached(mocker):
+    hist = createHist("TH1F")
+    statistics = HistogramStatistics(hist)
+    readHistogram = mocker.spy(statistics, "_readHistogram")
+    statistics.compute(["maximum", "mean"])
+    statistics.compute(["stdDev", "integral"])
+    assert statistics["maximum"] == pytest.approx(hist.GetMaximum())
+    assert readHistogram.call_count == 1
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+""" Tests for the columnar trending store. """
+import numpy as np
+import pytest
+
+import overwatch.processing.trending.objects as to
+from overwatch.processing.trending.store import TrendingStore, TrendingStoreReader, readMetadata, storeDirectory
+
+
+@pytest.fixture
+def storeArgs(tmpdir):
+    directory = storeDirectory(tmpdir.strpath, 'TST')
+    return tmpdir.strpath, TrendingStore(directory), TrendingStoreReader(directory)
+
+
+def testStoreRoundTrip(storeArgs):
+    _, writer, reader = storeArgs
+    for i in range(3):
+        writer.addValue('max', 100 + i, i)
+        writer.addValue('mean/hist', 100 + i, (i, 0.5))
+    assert writer.flush() == 3
+    # New object, which only has values for later times
+    writer.addValue('max', 103, 3)
+    writer.addValue('new', 103, 30)
+    writer.addValue('max', 104, 4)
+    assert writer.flush() == 2
+
+    assert np.array_equal(reader.times(), [100, 101, 102, 103, 104])
+    times, values = reader.column('max')
+    assert np.array_equal(values, [0, 1, 2, 3, 4])
+    times, values = reader.column('mean/hist')
+    assert values.shape == (5, 2)
+    assert np.array_equal(values[:3, 0], [0, 1, 2])
+    assert np.all(np.isnan(values[3:]))
+    times, values = reader.column('new')
+    assert np.all(np.isnan(values[:3]))
+    assert np.array_equal(values[3:], [30, np.nan], equal_nan=True)
+
+    times, values = reader.column('max', minTime=101, maxTime=103)
+    assert np.array_equal(times, [101, 102, 103])
+    assert np.array_equal(values, [1, 2, 3])
+    # Slices are read-only views into the memory mapped store.
+    assert not values.flags.writeable
+    assert isinstance(values, np.memmap)
+
+
+def testStoreIgnoresIncompleteRows(storeArgs):
+    _, writer, reader = storeArgs
+    writer.addValue('max', 100, 1)
+    writer.flush()
+    # Simulate a row for which the column was written, but the time wasn't.
+    writer.addValue('max', 101, 2)
+    writer.flush()
+    np.save(writer._filename('time'), np.array([100.]))
+
+    times, values = reader.column('max')
+    assert np.array_equal(times, [100])
+    assert np.array_equal(values, [1])
+
+
+def testStoreMetadata(storeArgs, tf_trendingArgs):
+    dirPrefix, writer, reader = storeArgs
+    trendingObject = to.MaximumTrending(*tf_trendingArgs)
+    writer.writeMetadata({trendingObject.name: trendingObject})
+
+    metadata = readMetadata(dirPrefix, ['TST', 'OTHER'])
+    assert list(metadata) == ['TST']
+    assert metadata['TST'][trendingObject.name]['desc'] == trendingObject.desc
+    assert reader.metadata() == metadata['TST']
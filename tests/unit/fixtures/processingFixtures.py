@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+""" Fixtures for testing the processing of received files. """
+
+import ROOT
+import pytest
+import os
+
+from overwatch.processing import processingClasses
+
+@pytest.fixture
+def cumulativeFiles(loggingMixin, mocker, tmpdir):
+    """ Create a subsystem with a set of cumulative files. """
+    dirPrefix = str(tmpdir)
+    mocker.patch.dict(processingClasses.processingParameters, {"dirPrefix": dirPrefix})
+
+    runDir = "Run123"
+    filenames = ["EMChists.2015_11_24_18_05_10.root", "EMChists.2015_11_24_18_09_12.root", "EMChists.2015_11_24_18_15_14.root"]
+    startOfRun = processingClasses.fileContainer(filenames[0]).fileTime
+    endOfRun = processingClasses.fileContainer(filenames[-1]).fileTime
+    subsystem = processingClasses.subsystemContainer(subsystem = "EMC", runDir = runDir,
+                                                     startOfRun = startOfRun, endOfRun = endOfRun,
+                                                     fileLocationSubsystem = "EMC")
+    if not os.path.exists(os.path.join(dirPrefix, subsystem.baseDir)):
+        os.makedirs(os.path.join(dirPrefix, subsystem.baseDir))
+
+    # Fill the histograms cumulatively, as they are received from the HLT.
+    hist1D = ROOT.TH1F("hist1D", "hist1D", 10, 0, 10)
+    hist2D = ROOT.TH2F("hist2D", "hist2D", 4, 0, 4, 5, 0, 5)
+    hist2D.Sumw2()
+    for i, filename in enumerate(filenames):
+        for j in range(i + 1):
+            hist1D.Fill(i + j)
+            hist2D.Fill(i, j, 0.5 * (i + 1))
+        fileCont = processingClasses.fileContainer(filename = os.path.join(subsystem.baseDir, filename), startOfRun = startOfRun)
+        fOut = ROOT.TFile(os.path.join(dirPrefix, fileCont.filename), "RECREATE")
+        hist1D.Write()
+        hist2D.Write()
+        fOut.Close()
+        subsystem.files[fileCont.fileTime] = fileCont
+
+    return dirPrefix, subsystem, [os.path.join(dirPrefix, subsystem.baseDir, filename) for filename in filenames]
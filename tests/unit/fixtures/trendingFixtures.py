@@ -50,6 +50,18 @@ def tf_histogram():
     yield Histogram()
 
 
+class HistogramContainerMock(object):
+    def __init__(self, histName, hist):
+        self.histName = histName
+        self.hist = hist
+        self.information = {}
+
+
+@pytest.fixture
+def tf_histogramContainerClass():
+    yield HistogramContainerMock
+
+
 @pytest.fixture
 def tf_canvas():
     # Needs a random string so that ROOT doesn't complain about replacing the canvas.
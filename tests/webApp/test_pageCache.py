@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+""" Tests for the cache of rendered page fragments. """
+
+import pytest
+
+from overwatch.webApp import pageCache
+
+class Renderer(object):
+    """ Renders a fixed fragment while counting how often it's called. """
+    def __init__(self, fragment):
+        self.fragment = fragment
+        self.nCalls = 0
+
+    def __call__(self):
+        self.nCalls += 1
+        return self.fragment
+
+@pytest.fixture
+def cache():
+    return pageCache.PageCache(maxSize = 100)
+
+def testFragmentIsReused(cache):
+    """ Test that the same request is only rendered once. """
+    render = Renderer("<div>EMC</div>")
+    key = cache.key("Run123", "EMC", "runPageMainContent.html", 10, selectedHist = None, jsRoot = True)
+    assert cache.retrieve(key, render) == "<div>EMC</div>"
+    assert cache.retrieve(key, render) == "<div>EMC</div>"
+    assert render.nCalls == 1
+
+    # Different options lead to a separate fragment.
+    otherKey = cache.key("Run123", "EMC", "runPageMainContent.html", 10, selectedHist = None, jsRoot = False)
+    cache.retrieve(otherKey, render)
+    assert render.nCalls == 2
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hitRate"] == pytest.approx(1 / 3.)
+    assert stats["entries"] == 2
+    assert stats["size"] == 2 * len("<div>EMC</div>")
+
+def testNewProcessingReplacesFragments(cache):
+    """ Test that fragments from an earlier processing are dropped. """
+    cache.retrieve(cache.key("Run123", "EMC", "runPageDrawer.html", 10), Renderer("old"))
+    cache.retrieve(cache.key("Run123", "TPC", "runPageDrawer.html", 10), Renderer("tpc"))
+    render = Renderer("new")
+    assert cache.retrieve(cache.key("Run123", "EMC", "runPageDrawer.html", 20), render) == "new"
+    assert render.nCalls == 1
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["size"] == len("new") + len("tpc")
+
+def testInvalidate(cache):
+    """ Test explicitly removing the fragments of a subsystem. """
+    for subsystem in ["EMC", "TPC"]:
+        for template in ["runPageDrawer.html", "runPageMainContent.html"]:
+            cache.retrieve(cache.key("Run123", subsystem, template, 10), Renderer(subsystem))
+    assert cache.invalidate("Run123", "EMC") == 2
+    assert cache.stats()["size"] == 2 * len("TPC")
+    assert cache.invalidate() == 2
+    assert cache.stats()["size"] == 0
+
+def testEviction(cache):
+    """ Test that the least recently used fragments are evicted when the cache is full. """
+    keys = [cache.key("Run{}".format(i), "EMC", "runPageDrawer.html", 10) for i in range(3)]
+    for key in keys:
+        cache.retrieve(key, Renderer("a" * 40))
+    # Only two fragments fit, so the first one is evicted.
+    assert cache.stats()["entries"] == 2
+    render = Renderer("a" * 40)
+    cache.retrieve(keys[1], render)
+    assert render.nCalls == 0
+    cache.retrieve(keys[0], render)
+    assert render.nCalls == 1
+    # keys[1] was used more recently than keys[2], so keys[2] was evicted.
+    cache.retrieve(keys[1], render)
+    assert render.nCalls == 1
+    assert cache.stats()["size"] == 80
+
+    # Fragments which are larger than the cache are never stored.
+    render = Renderer("a" * 200)
+    key = cache.key("Run4", "EMC", "runPageDrawer.html", 10)
+    cache.retrieve(key, render)
+    cache.retrieve(key, render)
+    assert render.nCalls == 2